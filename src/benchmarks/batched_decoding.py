@@ -0,0 +1,105 @@
+from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from src.benchmarks.fakes import FakeBatchBackend
+from src.data_processing.chunk_store import iter_chunks
+from src.llm.batching import BatchedEngine, LlamaCppBackend
+from src.utils.metrics import Histogram
+import argparse
+import json
+import logging
+import time
+
+
+def build_prompts(chunks_path: str, count: int) -> List[str]:
+    """Mistral-style RAG prompts, one Q/A chunk of context each"""
+    contexts = [c["content"] for c in iter_chunks(chunks_path) if "\nA:" in c["content"]]
+    if not contexts:
+        raise ValueError(f"No Q/A chunks found in {chunks_path}")
+    prompts = []
+    for i in range(count):
+        context = contexts[i % len(contexts)]
+        question = context.split("\n", 1)[0].replace("Q:", "").strip()
+        prompts.append(f"[INST] Context: {context}\n\nQuestion: {question} [/INST]")
+    return prompts
+
+
+def run_concurrent(engine: BatchedEngine, prompts: List[str], concurrency: int,
+                   max_new_tokens: int) -> Dict[str, Any]:
+    """Send prompts from `concurrency` clients at once and measure aggregate throughput"""
+    ttft, latency = Histogram(), Histogram()
+
+    def one(prompt: str) -> int:
+        generation = engine.submit(prompt, max_new_tokens=max_new_tokens, temperature=0.0)
+        generation.result()
+        request = generation.request
+        ttft.observe((request.first_token_at or request.finished_at) - request.queued_at)
+        latency.observe(request.finished_at - request.queued_at)
+        return len(engine.backend.tokenize(request.text)) if request.text else 0
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        tokens = sum(pool.map(one, prompts))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(prompts),
+        "tokens": tokens,
+        "tokens_per_second": tokens / elapsed if elapsed > 0 else 0.0,
+        "ttft_ms": {k: v * 1000 for k, v in ttft.summary().items() if k.startswith("p")},
+        "latency_ms": {k: v * 1000 for k, v in latency.summary().items() if k.startswith("p")},
+    }
+
+
+def format_table(rows: List[Dict[str, Any]]) -> str:
+    lines = [f"{'clients':>8}{'max batch':>10}{'tok/s':>10}{'speedup':>9}{'ttft p50':>10}{'p99 ms':>9}"]
+    serial = rows[0]["tokens_per_second"] or 1.0
+    for r in rows:
+        lines.append(
+            f"{r['concurrency']:>8}{r['max_batch']:>10}{r['tokens_per_second']:>10.1f}"
+            f"{r['tokens_per_second'] / serial:>8.2f}x{r['ttft_ms']['p50']:>10.1f}{r['latency_ms']['p99']:>9.1f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    default_chunks = Path(__file__).parent.parent.parent / "tests" / "test_data" / "Chunks"
+
+    parser = argparse.ArgumentParser(description="Aggregate decode throughput with continuous batching")
+    parser.add_argument("--chunks", default=str(default_chunks))
+    parser.add_argument("--model", default=None, help="GGUF file, decodes with llama.cpp instead of the fake backend")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--max-new-tokens", type=int, default=48)
+    parser.add_argument("--context-length", type=int, default=2048)
+    parser.add_argument("--step-latency", type=float, default=0.02, help="Fake backend: fixed cost per decode step")
+    parser.add_argument("--token-latency", type=float, default=0.0005, help="Fake backend: cost per token in a step")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    prompts = build_prompts(args.chunks, args.requests)
+
+    rows = []
+    for concurrency in args.concurrency:
+        if args.model:
+            backend = LlamaCppBackend(args.model, context_length=args.context_length, max_sequences=concurrency)
+        else:
+            backend = FakeBatchBackend(step_latency=args.step_latency, token_latency=args.token_latency)
+        engine = BatchedEngine(backend, max_batch=concurrency, context_length=args.context_length)
+        try:
+            row = run_concurrent(engine, prompts, concurrency, args.max_new_tokens)
+        finally:
+            engine.close()
+        row["max_batch"] = concurrency
+        rows.append(row)
+
+    print(format_table(rows))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
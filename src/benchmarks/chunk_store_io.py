@@ -0,0 +1,123 @@
+from typing import List, Dict, Any
+from pathlib import Path
+from src.data_processing.chunk_store import ChunkStore, ChunkStoreWriter
+import argparse
+import json
+import random
+import tempfile
+import time
+
+
+def _sample_chunks(count: int, source_dir: Path) -> List[Dict[str, Any]]:
+    """Build count chunks by cycling over the chunks in source_dir"""
+    seeds = []
+    for chunk_file in sorted(source_dir.glob("chunk_*.json")):
+        with open(chunk_file, "r", encoding="utf-8") as f:
+            seeds.append(json.load(f))
+
+    if not seeds:
+        raise FileNotFoundError(f"No chunk_*.json files found in {source_dir}")
+
+    chunks = []
+    for i in range(count):
+        chunk = json.loads(json.dumps(seeds[i % len(seeds)]))
+        chunk["metadata"]["chunk_index"] = i
+        chunks.append(chunk)
+    return chunks
+
+
+def _dir_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.iterdir() if p.is_file())
+
+
+def bench_directory(chunks: List[Dict[str, Any]], workdir: Path, lookups: List[int]) -> Dict[str, float]:
+    """One indented JSON file per chunk, the layout written by the test suite"""
+    out_dir = workdir / "chunk_files"
+    out_dir.mkdir()
+
+    start = time.perf_counter()
+    for i, chunk in enumerate(chunks):
+        with open(out_dir / f"chunk_{i}.json", "w") as f:
+            json.dump(chunk, f, indent=2)
+    write_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for chunk_file in out_dir.glob("chunk_*.json"):
+        with open(chunk_file, "r") as f:
+            json.load(f)
+    scan_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in lookups:
+        with open(out_dir / f"chunk_{i}.json", "r") as f:
+            json.load(f)
+    lookup_time = time.perf_counter() - start
+
+    return {
+        "write_s": write_time,
+        "scan_s": scan_time,
+        "lookup_us": lookup_time / len(lookups) * 1e6,
+        "bytes": _dir_size(out_dir),
+    }
+
+
+def bench_store(chunks: List[Dict[str, Any]], workdir: Path, lookups: List[int], compression=None) -> Dict[str, float]:
+    store_path = workdir / f"chunks_{compression or 'plain'}.jsonl"
+
+    start = time.perf_counter()
+    with ChunkStoreWriter(store_path, compression=compression) as writer:
+        writer.extend(chunks)
+    write_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ChunkStore(store_path) as store:
+        for _ in store:
+            pass
+    scan_time = time.perf_counter() - start
+
+    with ChunkStore(store_path) as store:
+        start = time.perf_counter()
+        for i in lookups:
+            store[i]
+        lookup_time = time.perf_counter() - start
+
+    return {
+        "write_s": write_time,
+        "scan_s": scan_time,
+        "lookup_us": lookup_time / len(lookups) * 1e6,
+        "bytes": store_path.stat().st_size + store_path.with_name(store_path.name + ".idx").stat().st_size,
+    }
+
+
+def run(count: int, source_dir: Path, lookups: int = 1000) -> Dict[str, Dict[str, float]]:
+    chunks = _sample_chunks(count, source_dir)
+    rng = random.Random(0)
+    lookup_ids = [rng.randrange(count) for _ in range(lookups)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        return {
+            "chunk_files": bench_directory(chunks, workdir, lookup_ids),
+            "store_plain": bench_store(chunks, workdir, lookup_ids),
+            "store_zlib": bench_store(chunks, workdir, lookup_ids, compression="zlib"),
+        }
+
+
+if __name__ == "__main__":
+    default_source = Path(__file__).parent.parent.parent / "tests" / "test_data" / "Chunks"
+
+    parser = argparse.ArgumentParser(description="Compare chunk directory and packed chunk store I/O")
+    parser.add_argument("--count", type=int, default=20000, help="Number of chunks to write")
+    parser.add_argument("--source", default=str(default_source), help="Directory of seed chunk_*.json files")
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    results = run(args.count, Path(args.source))
+
+    print(f"{'layout':<14}{'write (s)':>12}{'scan (s)':>12}{'lookup (us)':>14}{'size (KB)':>12}")
+    for layout, r in results.items():
+        print(f"{layout:<14}{r['write_s']:>12.3f}{r['scan_s']:>12.3f}{r['lookup_us']:>14.1f}{r['bytes'] / 1024:>12.0f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"count": args.count, "results": results}, f, indent=2)
@@ -0,0 +1,402 @@
+from typing import List, Dict, Any, Optional, Iterator, Union, Tuple
+from src.db.ranking import HeuristicRanker
+from src.utils.lru_cache import LRUCache
+from src.utils.metrics import get_metrics
+import asyncio
+import json
+import re
+import time
+import zlib
+import numpy as np
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9€@.]+")
+
+
+class HashingEmbedder:
+    """
+    Deterministic stand-in for SentenceTransformer.
+
+    Words are hashed into a fixed number of signed buckets and the result is
+    L2-normalised, so texts sharing words end up close together.
+    """
+
+    def __init__(self, dimension: int = 384, latency_per_text: float = 0.0):
+        self.dimension = dimension
+        self.latency_per_text = latency_per_text
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for token in _TOKEN_RE.findall(text.lower()):
+            h = zlib.crc32(token.encode("utf-8"))
+            vector[h % self.dimension] += 1.0 if (h >> 16) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def encode(self, texts: Union[str, List[str]], **kwargs) -> np.ndarray:
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        if self.latency_per_text:
+            time.sleep(self.latency_per_text * len(texts))
+        vectors = np.stack([self._embed(t) for t in texts]) if texts else np.zeros((0, self.dimension), np.float32)
+        return vectors[0] if single else vectors
+
+
+class CountingEmbedder(HashingEmbedder):
+    """HashingEmbedder that counts its encode calls and the texts it embeds"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = 0
+        self.texts = 0
+
+    def encode(self, texts: Union[str, List[str]], **kwargs) -> np.ndarray:
+        self.calls += 1
+        self.texts += 1 if isinstance(texts, str) else len(texts)
+        return super().encode(texts, **kwargs)
+
+
+class InMemoryVectorStore:
+    """
+    Brute-force stand-in for MilvusClient with the same insert/search/delete
+    interface and the same candidate oversampling and heuristic re-ranking.
+    """
+
+    def __init__(self, dimension: int = 384, ranker: Optional[HeuristicRanker] = None,
+                 search_latency: float = 0.0, partition_key: Optional[str] = None,
+                 two_phase: bool = False, payload_cache_size: int = 4096):
+        self.dimension = dimension
+        self.ranker = ranker or HeuristicRanker()
+        self.search_latency = search_latency
+        self.partition_key = partition_key
+        self.two_phase = two_phase
+        self.payload_cache = LRUCache(payload_cache_size, name="payload")
+        self.metrics = get_metrics()
+        # Primary-key lookups done by the payload fetch phase
+        self.payload_fetches = 0
+        # Load state, mirroring Collection.load()/release()
+        self.loaded = False
+        self.loads = 0
+
+        self.ids: List[int] = []
+        self.contents: List[str] = []
+        # Metadata and ranking features are kept serialised, like the Milvus fields
+        self.metadata: List[str] = []
+        self.rank_features: List[str] = []
+        self._next_id = 0
+        self._vectors = np.zeros((0, dimension), dtype=np.float32)
+        self._pending: List[List[float]] = []
+
+    @property
+    def num_entities(self) -> int:
+        return len(self.contents)
+
+    def insert(self, content: str, embedding: List[float], metadata: Dict[str, Any]) -> None:
+        self.ids.append(self._next_id)
+        self._next_id += 1
+        self.contents.append(content)
+        self.metadata.append(json.dumps(metadata))
+        self.rank_features.append(json.dumps(self.ranker.features(content, metadata), separators=(",", ":")))
+        self._pending.append(embedding)
+
+    def insert_columns(self, contents: List[str], embeddings: np.ndarray, metadata: List[str],
+                       rank_features: Optional[List[str]] = None) -> int:
+        if rank_features is None:
+            rank_features = [json.dumps(self.ranker.features(c, json.loads(m)), separators=(",", ":"))
+                             for c, m in zip(contents, metadata)]
+        self._matrix()
+        self.ids.extend(range(self._next_id, self._next_id + len(contents)))
+        self._next_id += len(contents)
+        self.contents.extend(contents)
+        self.metadata.extend(metadata)
+        self.rank_features.extend(rank_features)
+        self._vectors = np.vstack([self._vectors, np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dimension)])
+        return len(contents)
+
+    def export_batches(self, batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        vectors = self._matrix()
+        for start in range(0, len(self.contents), batch_size):
+            stop = start + batch_size
+            yield {
+                "content": self.contents[start:stop],
+                "embedding": vectors[start:stop],
+                "metadata": self.metadata[start:stop],
+                "rank_features": self.rank_features[start:stop],
+            }
+
+    def _matrix(self) -> np.ndarray:
+        if self._pending:
+            pending = np.asarray(self._pending, dtype=np.float32).reshape(-1, self.dimension)
+            self._vectors = np.vstack([self._vectors, pending])
+            self._pending = []
+        return self._vectors
+
+    def _partition_value(self, i: int) -> Any:
+        return json.loads(self.metadata[i]).get(self.partition_key) if self.partition_key else None
+
+    def search(self, query_embedding: List[float], limit: int = 5, query: str = "",
+               oversample: int = 4, nprobe: Optional[int] = None,
+               partitions: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Exact search; nprobe is accepted for interface parity and ignored"""
+        if self.search_latency:
+            with self.metrics.span("ann_search"):
+                time.sleep(self.search_latency)
+        return self._search(query_embedding, limit, query, oversample, partitions)
+
+    async def asearch(self, query_embedding: List[float], limit: int = 5, query: str = "",
+                      oversample: int = 4, nprobe: Optional[int] = None,
+                      partitions: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """search() with the latency spent awaiting, like an RPC on AsyncMilvusClient"""
+        rpc = asyncio.ensure_future(asyncio.sleep(self.search_latency))
+        query_features = self.ranker.query_features(query)
+        await rpc
+        return self._search(query_embedding, limit, query, oversample, partitions, query_features)
+
+    def _search(self, query_embedding: List[float], limit: int, query: str, oversample: int,
+                partitions: Optional[List[str]], query_features: Optional[Dict[str, Any]] = None
+                ) -> List[Dict[str, Any]]:
+        with self.metrics.span("collection_load"):
+            vectors = self._matrix()
+            rows = np.arange(len(vectors))
+            if partitions and self.partition_key:
+                wanted = set(partitions)
+                rows = np.array([i for i in rows if self._partition_value(i) in wanted], dtype=np.int64)
+                vectors = vectors[rows]
+
+        with self.metrics.span("ann_search"):
+            if not len(vectors):
+                return []
+            q = np.asarray(query_embedding, dtype=np.float32)
+            distances = np.sum((vectors - q) ** 2, axis=1)
+            k = min(limit * oversample, len(distances))
+            top = np.argpartition(distances, k - 1)[:k]
+            top = top[np.argsort(distances[top])]
+
+        with self.metrics.span("rerank"):
+            if self.two_phase:
+                hits = self.ranker.rerank_features(
+                    ((self.ids[rows[i]], json.loads(self.rank_features[rows[i]]), float(distances[i])) for i in top),
+                    query, query_features
+                )
+            else:
+                candidates = (
+                    (self.contents[rows[i]], json.loads(self.metadata[rows[i]]), float(distances[i]))
+                    for i in top
+                )
+                hits = self.ranker.rerank(candidates, query, query_features)
+
+        hits.sort(key=lambda x: x["score"], reverse=True)
+        hits = hits[:limit]
+
+        if self.two_phase:
+            with self.metrics.span("fetch_payloads"):
+                hits = self._attach_payloads(hits)
+        return hits
+
+    def _attach_payloads(self, hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        payloads = self.payload_cache.get_many(hit["id"] for hit in hits)
+        missing = {hit["id"] for hit in hits if hit["id"] not in payloads}
+        if missing:
+            self.payload_fetches += len(missing)
+            for i, key in enumerate(self.ids):
+                if key in missing:
+                    payloads[key] = (self.contents[i], self.metadata[i])
+                    self.payload_cache.put(key, payloads[key])
+
+        result = []
+        for hit in hits:
+            if hit["id"] in payloads:
+                content, metadata = payloads[hit["id"]]
+                result.append({"content": content, "metadata": json.loads(metadata), **hit})
+        return result
+
+    def load(self) -> None:
+        if not self.loaded:
+            self.loaded = True
+            self.loads += 1
+
+    def release(self) -> None:
+        self.loaded = False
+        self.payload_cache.clear()
+
+    def ping(self) -> Dict[str, Any]:
+        return {"load_state": "Loaded", "loaded": True, "entities": self.num_entities}
+
+    def drop_partition(self, value: Any) -> bool:
+        if not self.partition_key:
+            raise ValueError("No partition key configured")
+        before = self.num_entities
+        self.delete({self.partition_key: value})
+        return self.num_entities < before
+
+    def delete(self, filter_params: Dict[str, Any]) -> None:
+        vectors = self._matrix()
+        keep = [
+            i for i, meta in enumerate(self.metadata)
+            if not all(json.loads(meta).get(k) == v for k, v in filter_params.items())
+        ]
+        self.ids = [self.ids[i] for i in keep]
+        self.contents = [self.contents[i] for i in keep]
+        self.metadata = [self.metadata[i] for i in keep]
+        self.rank_features = [self.rank_features[i] for i in keep]
+        self._vectors = vectors[keep]
+
+
+class FakeLLM:
+    """
+    Deterministic stand-in for a ctransformers model.
+
+    Answers by echoing the first context answer in the prompt, with a fixed
+    cost per prompt token and per generated token. Tokens are whitespace-split words.
+    """
+
+    def __init__(self, token_latency: float = 0.0, prompt_token_latency: float = 0.0,
+                 max_answer_tokens: int = 48):
+        self.token_latency = token_latency
+        self.prompt_token_latency = prompt_token_latency
+        self.max_answer_tokens = max_answer_tokens
+
+    def tokenize(self, text: str) -> List[str]:
+        return text.split()
+
+    def _answer_tokens(self, prompt: str, max_new_tokens: int) -> List[str]:
+        # Answer the latest turn of a conversation
+        match = re.search(r"\nA: (.*)", prompt.rsplit("[INST]", 1)[-1])
+        answer = match.group(1) if match else "I do not have information about that."
+        return answer.split()[:min(max_new_tokens, self.max_answer_tokens)]
+
+    def _stream(self, tokens: List[str]) -> Iterator[str]:
+        for i, token in enumerate(tokens):
+            if self.token_latency:
+                time.sleep(self.token_latency)
+            yield token if i == 0 else " " + token
+
+    def __call__(self, prompt: str, max_new_tokens: int = 256, temperature: float = 0.7,
+                 top_p: float = 0.95, stop: Optional[List[str]] = None, stream: bool = False, **kwargs):
+        if self.prompt_token_latency:
+            time.sleep(self.prompt_token_latency * len(self.tokenize(prompt)))
+
+        tokens = self._answer_tokens(prompt, max_new_tokens)
+        if stream:
+            return self._stream(tokens)
+
+        if self.token_latency:
+            time.sleep(self.token_latency * len(tokens))
+        return " ".join(tokens)
+
+
+class FakeBatchBackend:
+    """
+    Deterministic stand-in for a multi-sequence llama.cpp context.
+
+    Like FakeLLM, each sequence answers with the first context answer in its
+    prompt. A decode step costs a fixed `step_latency` (reading the weights)
+    plus `token_latency` per token in the batch, so batching amortises the
+    fixed part the way it does on a memory-bandwidth-bound CPU.
+    """
+
+    eos_token = 0
+
+    def __init__(self, step_latency: float = 0.0, token_latency: float = 0.0,
+                 max_batch_tokens: int = 512, max_answer_tokens: int = 48):
+        self.step_latency = step_latency
+        self.token_latency = token_latency
+        self.max_batch_tokens = max_batch_tokens
+        self.max_answer_tokens = max_answer_tokens
+        self.words = ["</s>"]
+        self.ids = {"</s>": 0}
+        self.sequences: Dict[int, Dict[str, Any]] = {}
+        self.steps = 0
+        self.tokens_decoded = 0
+        self.batch_sizes: List[int] = []
+
+    def tokenize(self, text: str) -> List[int]:
+        tokens = []
+        for word in text.split():
+            if word not in self.ids:
+                self.ids[word] = len(self.words)
+                self.words.append(word)
+            tokens.append(self.ids[word])
+        return tokens
+
+    def detokenize(self, tokens: List[int]) -> str:
+        return " ".join(self.words[t] for t in tokens)
+
+    def _answer(self, prompt: List[int]) -> List[int]:
+        words = [self.words[t] for t in prompt]
+        # Answer the latest turn of a conversation, turns are joined as "</s>[INST]"
+        turns = [i for i, word in enumerate(words) if word.endswith("[INST]")]
+        if turns:
+            words = words[turns[-1]:]
+        if "A:" not in words:
+            return self.tokenize("I do not have information about that.")
+        answer = []
+        for word in words[words.index("A:") + 1:]:
+            if word in ("Q:", "Question:", "[/INST]"):
+                break
+            answer.append(self.ids[word])
+        return answer[:self.max_answer_tokens]
+
+    def decode(self, entries):
+        n_tokens = sum(len(tokens) for _, tokens, _, _ in entries)
+        if self.step_latency or self.token_latency:
+            time.sleep(self.step_latency + self.token_latency * n_tokens)
+        self.steps += 1
+        self.tokens_decoded += n_tokens
+        self.batch_sizes.append(len(entries))
+
+        logits = {}
+        for slot, tokens, position, want_logits in entries:
+            # "kv" holds every token evaluated in the slot, the answer starts where the prompt ended
+            state = self.sequences.setdefault(slot, {"kv": [], "start": None, "answer": None})
+            if position != len(state["kv"]):
+                raise RuntimeError(f"slot {slot} decodes at {position} but holds {len(state['kv'])} tokens")
+            state["kv"].extend(tokens)
+            if not want_logits:
+                continue
+            if state["start"] is None:
+                state["start"] = len(state["kv"])
+                state["answer"] = self._answer(state["kv"])
+            index = len(state["kv"]) - state["start"]
+            answer = state["answer"]
+            row = np.zeros(len(self.words), dtype=np.float32)
+            row[answer[index] if index < len(answer) else self.eos_token] = 30.0
+            logits[slot] = row
+        return logits
+
+    def release(self, slot: int) -> None:
+        self.sequences.pop(slot, None)
+
+    def truncate(self, slot: int, n_keep: int) -> None:
+        state = self.sequences.setdefault(slot, {"kv": [], "start": None, "answer": None})
+        state["kv"] = state["kv"][:n_keep]
+        state["start"] = state["answer"] = None
+
+    def close(self) -> None:
+        pass
+
+
+class FakeCrossEncoder:
+    """
+    Stand-in for a sentence-transformers CrossEncoder.
+
+    Scores a (query, chunk) pair by the word overlap between the query and
+    the chunk's stored question, with a fixed cost per pair.
+    """
+
+    def __init__(self, latency_per_pair: float = 0.0):
+        self.latency_per_pair = latency_per_pair
+        self.pairs_scored = 0
+
+    def predict(self, pairs: List[Tuple[str, str]], **kwargs) -> np.ndarray:
+        if self.latency_per_pair:
+            time.sleep(self.latency_per_pair * len(pairs))
+        self.pairs_scored += len(pairs)
+        scores = []
+        for query, content in pairs:
+            question = content.split("\nA:", 1)[0]
+            query_terms = set(_TOKEN_RE.findall(query.lower()))
+            question_terms = set(_TOKEN_RE.findall(question.lower()))
+            overlap = len(query_terms & question_terms) / max(len(query_terms | question_terms), 1)
+            scores.append(8.0 * overlap - 4.0)
+        return np.asarray(scores, dtype=np.float32)
@@ -0,0 +1,329 @@
+from typing import List, Dict, Any, Optional, Callable
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from src.benchmarks.retrieval_eval import build_golden_set
+from src.data_processing.chunk_store import iter_chunks
+from src.utils.metrics import Histogram
+import argparse
+import json
+import logging
+import platform
+import random
+import sys
+import tempfile
+import time
+import urllib.request
+
+
+@dataclass
+class ScheduledRequest:
+    """A query and its arrival time in seconds after the start of the run"""
+    offset: float
+    query: str
+    top_k: int = 3
+
+
+@dataclass
+class RequestResult:
+    offset: float
+    queue_ms: float
+    latency_ms: float
+    ttft_ms: Optional[float]
+    error: Optional[str] = None
+
+
+def load_query_log(path: str) -> List[Dict[str, Any]]:
+    """
+    Read a query log, either plain text with one query per line or JSON lines
+    with a 'query' field and optional 'top_k' and 'ts' (epoch seconds) fields
+    """
+    entries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                record = json.loads(line)
+                entries.append({"query": record["query"], "top_k": record.get("top_k", 3), "ts": record.get("ts")})
+            else:
+                entries.append({"query": line, "top_k": 3, "ts": None})
+    return entries
+
+
+def schedule(entries: List[Dict[str, Any]], count: int, rate: float, seed: int = 0,
+             arrival: str = "poisson", replay_timing: bool = False, speed: float = 1.0) -> List[ScheduledRequest]:
+    """
+    Open-loop arrival schedule
+
+    Args:
+        entries: Queries to cycle through
+        count: Number of requests
+        rate: Mean arrivals per second
+        arrival: 'poisson' for exponential gaps, 'uniform' for fixed gaps
+        replay_timing: Use the entries' own 'ts' gaps divided by speed instead of rate
+    """
+    rng = random.Random(seed)
+    if replay_timing:
+        timed = [e for e in entries if e.get("ts") is not None][:count]
+        if not timed:
+            raise ValueError("Query log has no 'ts' fields to replay")
+        t0 = timed[0]["ts"]
+        return [ScheduledRequest((e["ts"] - t0) / speed, e["query"], e.get("top_k", 3)) for e in timed]
+
+    requests, offset = [], 0.0
+    for i in range(count):
+        entry = entries[i % len(entries)]
+        requests.append(ScheduledRequest(offset, entry["query"], entry.get("top_k", 3)))
+        offset += rng.expovariate(rate) if arrival == "poisson" else 1.0 / rate
+    return requests
+
+
+class HandlerTarget:
+    """Sends requests to an in-process QueryHandler, streaming when it can to measure TTFT"""
+
+    def __init__(self, handler, stream: bool = True):
+        self.handler = handler
+        self.stream = stream and hasattr(handler, "stream_query")
+
+    def __call__(self, query: str, top_k: int) -> Optional[float]:
+        start = time.perf_counter()
+        if not self.stream:
+            self.handler.process_query(query, top_k=top_k)
+            return None
+
+        ttft = None
+        for event in self.handler.stream_query(query, top_k=top_k):
+            if ttft is None and event["type"] == "token":
+                ttft = time.perf_counter() - start
+        return ttft
+
+
+class HttpTarget:
+    """
+    POSTs {"query", "top_k"} as JSON to a serving endpoint. TTFT is the time to
+    the first response line, which is the first event for a streaming endpoint.
+    """
+
+    def __init__(self, url: str, timeout: float = 60.0):
+        self.url = url
+        self.timeout = timeout
+
+    def __call__(self, query: str, top_k: int) -> Optional[float]:
+        body = json.dumps({"query": query, "top_k": top_k}).encode("utf-8")
+        request = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        start = time.perf_counter()
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.readline()
+            ttft = time.perf_counter() - start
+            while response.read(65536):
+                pass
+        return ttft
+
+
+def run_load(target: Callable[[str, int], Optional[float]], requests: List[ScheduledRequest],
+             concurrency: int) -> List[RequestResult]:
+    """
+    Issue requests at their scheduled times, whether or not earlier ones finished
+
+    Latency and TTFT are measured from the scheduled arrival, so time spent
+    waiting for a free worker counts against the request.
+    """
+    results: List[RequestResult] = []
+
+    def execute(request: ScheduledRequest, arrival: float) -> RequestResult:
+        begin = time.perf_counter()
+        error, ttft = None, None
+        try:
+            ttft = target(request.query, request.top_k)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        end = time.perf_counter()
+        return RequestResult(
+            offset=request.offset,
+            queue_ms=(begin - arrival) * 1000,
+            latency_ms=(end - arrival) * 1000,
+            ttft_ms=(begin - arrival + ttft) * 1000 if ttft is not None else None,
+            error=error,
+        )
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        start = time.perf_counter()
+        futures = []
+        for request in requests:
+            arrival = start + request.offset
+            delay = arrival - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(executor.submit(execute, request, arrival))
+        results = [f.result() for f in futures]
+    return results
+
+
+def _distribution(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    histogram = Histogram(window=len(values))
+    for value in values:
+        histogram.observe(value)
+    summary = histogram.summary()
+    return {
+        "p50": summary["p50"],
+        "p95": summary["p95"],
+        "p99": summary["p99"],
+        "mean": summary["sum"] / summary["count"],
+        "max": max(values),
+    }
+
+
+def summarize(results: List[RequestResult], wall_seconds: float) -> Dict[str, Any]:
+    """Latency percentiles, throughput, error rate and TTFT of one load step"""
+    ok = [r for r in results if r.error is None]
+    errors = Counter(r.error.split(":", 1)[0] for r in results if r.error is not None)
+    span = max((r.offset for r in results), default=0.0)
+    return {
+        "requests": len(results),
+        "completed": len(ok),
+        "errors": len(results) - len(ok),
+        "error_rate": (len(results) - len(ok)) / len(results) if results else 0.0,
+        "error_types": dict(errors),
+        "offered_qps": (len(results) - 1) / span if span else 0.0,
+        "throughput_qps": len(ok) / wall_seconds if wall_seconds else 0.0,
+        "duration_s": wall_seconds,
+        "latency_ms": _distribution([r.latency_ms for r in ok]),
+        "queue_ms": _distribution([r.queue_ms for r in ok]),
+        "ttft_ms": _distribution([r.ttft_ms for r in ok if r.ttft_ms is not None]),
+    }
+
+
+def run_steps(target, entries: List[Dict[str, Any]], rates: List[float], requests_per_step: int,
+              concurrency: int, seed: int = 0, arrival: str = "poisson") -> List[Dict[str, Any]]:
+    """Run one load step per arrival rate"""
+    steps = []
+    for rate in rates:
+        requests = schedule(entries, requests_per_step, rate, seed=seed, arrival=arrival)
+        start = time.perf_counter()
+        results = run_load(target, requests, concurrency)
+        steps.append({"rate": rate, "concurrency": concurrency,
+                      **summarize(results, time.perf_counter() - start)})
+    return steps
+
+
+def compare(steps: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """List rates where p99 latency or error rate grew, or throughput dropped, beyond tolerance"""
+    previous = {step["rate"]: step for step in baseline.get("steps", [])}
+    regressions = []
+    for step in steps:
+        old = previous.get(step["rate"])
+        if not old or not step["latency_ms"] or not old["latency_ms"]:
+            continue
+        if step["latency_ms"]["p99"] > old["latency_ms"]["p99"] * (1 + tolerance):
+            regressions.append(f"{step['rate']} qps: p99 {old['latency_ms']['p99']:.1f} -> "
+                               f"{step['latency_ms']['p99']:.1f} ms")
+        if step["throughput_qps"] < old["throughput_qps"] * (1 - tolerance):
+            regressions.append(f"{step['rate']} qps: throughput {old['throughput_qps']:.2f} -> "
+                               f"{step['throughput_qps']:.2f}")
+        if step["error_rate"] > old["error_rate"] + tolerance / 10:
+            regressions.append(f"{step['rate']} qps: error rate {old['error_rate']:.3f} -> {step['error_rate']:.3f}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    default_chunks = Path(__file__).parent.parent.parent / "tests" / "test_data" / "Chunks"
+
+    parser = argparse.ArgumentParser(description="Open-loop load generation and query log replay")
+    parser.add_argument("--target", default="offline",
+                        help="'offline' (in-memory fakes), 'local' (QueryHandler from config) or an http(s) URL")
+    parser.add_argument("--log", help="Query log to replay (text or JSON lines), default is a synthetic mix")
+    parser.add_argument("--chunks", default=str(default_chunks),
+                        help="Chunks for the synthetic mix and the offline index")
+    parser.add_argument("--rate", type=float, nargs="+", default=[2.0], help="Arrival rates (qps), one step each")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per step")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--arrival", choices=["poisson", "uniform"], default="poisson")
+    parser.add_argument("--replay-timing", action="store_true", help="Replay the log's own 'ts' gaps")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed-up with --replay-timing")
+    parser.add_argument("--no-stream", action="store_true", help="Call process_query instead of stream_query")
+    parser.add_argument("--timeout", type=float, default=60.0, help="HTTP request timeout")
+    parser.add_argument("--token-latency", type=float, default=0.02, help="Offline fake LLM seconds per token")
+    parser.add_argument("--prompt-token-latency", type=float, default=0.0)
+    parser.add_argument("--fast-path", action="store_true", help="Enable the fast path on the offline target")
+    parser.add_argument("--single-flight", action="store_true",
+                        help="Coalesce identical in-flight queries on the offline target")
+    parser.add_argument("--slo-p99-ms", type=float, help="Report the highest rate meeting this p99")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="load_results.json")
+    parser.add_argument("--baseline", help="Previous results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.log:
+        entries = load_query_log(args.log)
+    else:
+        chunks = list(iter_chunks(args.chunks))
+        entries = [{"query": g.query, "top_k": 3} for g in build_golden_set(chunks, paraphrases=2, seed=args.seed)]
+        random.Random(args.seed).shuffle(entries)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.target == "offline":
+            from src.benchmarks.offline_suite import build_offline_handler
+            handler = build_offline_handler(list(iter_chunks(args.chunks)), Path(tmp), args.token_latency,
+                                            args.prompt_token_latency, args.fast_path, args.single_flight)
+            target = HandlerTarget(handler, stream=not args.no_stream)
+        elif args.target == "local":
+            from src.llm.query_handler import QueryHandler
+            target = HandlerTarget(QueryHandler(), stream=not args.no_stream)
+        else:
+            target = HttpTarget(args.target, timeout=args.timeout)
+
+        if args.replay_timing:
+            requests = schedule(entries, len(entries), 1.0, replay_timing=True, speed=args.speed)
+            start = time.perf_counter()
+            results = run_load(target, requests, args.concurrency)
+            steps = [{"rate": "replay", "concurrency": args.concurrency,
+                      **summarize(results, time.perf_counter() - start)}]
+        else:
+            steps = run_steps(target, entries, args.rate, args.requests, args.concurrency,
+                              seed=args.seed, arrival=args.arrival)
+
+    output = {
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "params": vars(args),
+        "steps": steps,
+    }
+    if args.slo_p99_ms:
+        passing = [s["rate"] for s in steps
+                   if s["latency_ms"] and s["latency_ms"]["p99"] <= args.slo_p99_ms and not s["errors"]]
+        output["max_rate_within_slo"] = max(passing) if passing else None
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+
+    print(f"{'rate':>8}{'done':>7}{'err %':>7}{'qps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'ttft p50':>10}{'ttft p99':>10}")
+    for s in steps:
+        latency, ttft = s["latency_ms"] or {}, s["ttft_ms"] or {}
+        print(f"{s['rate']:>8}{s['completed']:>7}{s['error_rate'] * 100:>7.1f}{s['throughput_qps']:>8.2f}"
+              f"{latency.get('p50', 0):>9.1f}{latency.get('p95', 0):>9.1f}{latency.get('p99', 0):>9.1f}"
+              f"{ttft.get('p50', 0):>10.1f}{ttft.get('p99', 0):>10.1f}")
+    if "max_rate_within_slo" in output:
+        print(f"Highest rate with p99 <= {args.slo_p99_ms} ms: {output['max_rate_within_slo']}")
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            regressions = compare(steps, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
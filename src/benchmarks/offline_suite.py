@@ -0,0 +1,279 @@
+from typing import List, Dict, Any, Optional
+from pathlib import Path
+from datetime import datetime
+from src.benchmarks.fakes import HashingEmbedder, InMemoryVectorStore, FakeLLM
+from src.benchmarks.retrieval_eval import build_memory_backend
+from src.benchmarks.synthetic import generate_faq_pdfs, generate_queries
+from src.data_processing.pdf_processor import PDFProcessor
+from src.data_processing.text_chunker import TextChunker
+from src.db.cross_encoder import CrossEncoderReranker
+from src.db.data_loader import ChunkLoader
+from src.llm.conversation import ConversationStore
+from src.llm.mistral_client import MistralClient
+from src.llm.query_handler import QueryHandler
+from src.rag.context_compression import ContextCompressor
+from src.rag.entity_index import EntityIndex
+from src.rag.fast_path import FastPathGate
+from src.utils.admission import AdmissionController
+from src.utils.metrics import Metrics, Histogram, set_metrics
+from src.utils.single_flight import SingleFlight
+import argparse
+import json
+import logging
+import platform
+import sys
+import tempfile
+import time
+import yaml
+
+
+def _latency_summary(samples: List[float]) -> Dict[str, float]:
+    histogram = Histogram(window=max(len(samples), 1))
+    for sample in samples:
+        histogram.observe(sample * 1000)
+    summary = histogram.summary()
+    return {
+        "p50_ms": summary["p50"],
+        "p95_ms": summary["p95"],
+        "p99_ms": summary["p99"],
+        "mean_ms": summary["sum"] / summary["count"] if summary["count"] else 0.0,
+    }
+
+
+def _write_config(path: Path, batch_size: int) -> None:
+    config = {
+        "milvus": {"host": "localhost", "port": 19530, "collection_name": "offline_bench"},
+        "model": {"path": "fake", "context_length": 4096, "max_tokens": 256,
+                  "temperature": 0.7, "top_p": 0.95},
+        "embedding": {"model_name": "hashing", "dimension": 384, "batch_size": batch_size},
+    }
+    with open(path, "w") as f:
+        yaml.safe_dump(config, f)
+
+
+def build_query_handler(config_path: str, store: InMemoryVectorStore, embedder: HashingEmbedder,
+                        token_latency: float = 0.0, prompt_token_latency: float = 0.0,
+                        fast_path: bool = False, single_flight: bool = False, **components) -> QueryHandler:
+    """
+    QueryHandler wired to in-memory fakes instead of Milvus and the GGUF model
+
+    Every optional stage is disabled, so nothing is read from config/config.yaml.
+    Components passed as keyword arguments (mistral_client, reranker, entities,
+    compressor, conversations, admission, ...) replace the defaults.
+    """
+    mistral_client = components.pop("mistral_client", None) or MistralClient(
+        config_path, model=FakeLLM(token_latency=token_latency, prompt_token_latency=prompt_token_latency))
+    defaults = dict(
+        fast_path=FastPathGate(enabled=fast_path),
+        single_flight=SingleFlight(enabled=single_flight),
+        admission=AdmissionController(enabled=False),
+        # Only used by queries with a session_id
+        conversations=ConversationStore(mistral_client),
+        reranker=CrossEncoderReranker(enabled=False),
+        entities=EntityIndex(enabled=False),
+        compressor=ContextCompressor(embedder, mistral_client, enabled=False),
+    )
+    return QueryHandler(
+        embedding_model=embedder,
+        milvus_client=store,
+        mistral_client=mistral_client,
+        config_path=config_path,
+        **{**defaults, **components},
+    )
+
+
+def build_offline_handler(chunks: List[Dict[str, Any]], workdir: Path, token_latency: float = 0.0,
+                          prompt_token_latency: float = 0.0, fast_path: bool = False,
+                          single_flight: bool = False, **components) -> QueryHandler:
+    """
+    build_query_handler over an in-memory index of chunks, with its config written to workdir.
+    Used by the load test, the chat server's --offline mode and the tests.
+    """
+    config_path = workdir / "config.yaml"
+    _write_config(config_path, batch_size=32)
+    embedder = HashingEmbedder()
+    store, _ = build_memory_backend(chunks, embedder)
+    return build_query_handler(str(config_path), store, embedder, token_latency=token_latency,
+                               prompt_token_latency=prompt_token_latency, fast_path=fast_path,
+                               single_flight=single_flight, **components)
+
+
+def run_suite(
+    workdir: Path,
+    documents: int = 4,
+    pairs_per_document: int = 120,
+    queries: int = 200,
+    batch_size: int = 32,
+    token_latency: float = 0.0,
+    prompt_token_latency: float = 0.0,
+    fast_path: bool = False,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    Run every component benchmark against local fakes
+
+    Returns:
+        Results dictionary with throughput and latency per component
+    """
+    metrics = Metrics(enabled=True, window=max(queries, 2048))
+    set_metrics(metrics)
+
+    config_path = workdir / "config.yaml"
+    _write_config(config_path, batch_size)
+    results: Dict[str, Any] = {}
+
+    # PDFProcessor
+    pdf_paths, pairs = generate_faq_pdfs(workdir / "raw", documents, pairs_per_document, seed=seed)
+    processor = PDFProcessor(input_dir=str(workdir / "raw"), output_dir=str(workdir / "processed"))
+    latencies, pages = [], 0
+    for pdf_path in pdf_paths:
+        start = time.perf_counter()
+        processed = processor.process_single_pdf(str(pdf_path))
+        latencies.append(time.perf_counter() - start)
+        pages += processed.total_pages if processed else 0
+    results["pdf_processor"] = {
+        "items": pages,
+        "throughput": pages / sum(latencies),
+        "unit": "pages/s",
+        **_latency_summary(latencies),
+    }
+
+    # TextChunker
+    chunker = TextChunker()
+    processed_docs = []
+    for processed_file in sorted((workdir / "processed").glob("*.json")):
+        with open(processed_file, "r", encoding="utf-8") as f:
+            processed_docs.append(json.load(f))
+    latencies, chunks = [], []
+    for doc in processed_docs:
+        start = time.perf_counter()
+        chunks.extend(chunker.process_document(doc))
+        latencies.append(time.perf_counter() - start)
+    results["text_chunker"] = {
+        "items": len(chunks),
+        "throughput": len(chunks) / sum(latencies),
+        "unit": "chunks/s",
+        **_latency_summary(latencies),
+    }
+
+    # ChunkLoader
+    store_path = workdir / "chunks.jsonl"
+    chunker.save_chunks(chunks, str(store_path))
+    embedder = HashingEmbedder()
+    store = InMemoryVectorStore()
+    loader = ChunkLoader(str(config_path), embedding_model=embedder, milvus_client=store)
+    start = time.perf_counter()
+    loader.load_chunks(str(store_path))
+    elapsed = time.perf_counter() - start
+    results["chunk_loader"] = {
+        "items": store.num_entities,
+        "throughput": store.num_entities / elapsed,
+        "unit": "chunks/s",
+        "total_s": elapsed,
+    }
+
+    # QueryHandler
+    handler = build_query_handler(str(config_path), store, embedder,
+                                  token_latency=token_latency, prompt_token_latency=prompt_token_latency,
+                                  fast_path=fast_path)
+    query_load = generate_queries(pairs, queries, seed=seed)
+    metrics.reset()
+    latencies = []
+    for query in query_load:
+        start = time.perf_counter()
+        handler.process_query(query)
+        latencies.append(time.perf_counter() - start)
+    results["query_handler"] = {
+        "items": len(query_load),
+        "throughput": len(query_load) / sum(latencies),
+        "unit": "queries/s",
+        "fast_path_share": handler.fast_path.hit_rate,
+        **_latency_summary(latencies),
+    }
+
+    stages = {
+        name[len("stage_"):-len("_seconds")]: {
+            k: (v * 1000 if k.startswith("p") else v) for k, v in summary.items() if k != "sum"
+        }
+        for name, summary in metrics.snapshot()["histograms"].items()
+        if name.startswith("stage_")
+    }
+
+    set_metrics(Metrics())
+    return {"components": results, "query_stages_ms": stages}
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """List components whose throughput dropped or p95 latency grew by more than tolerance"""
+    regressions = []
+    for name, current in results["components"].items():
+        previous = baseline.get("components", {}).get(name)
+        if not previous:
+            continue
+        if current["throughput"] < previous["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {previous['throughput']:.1f} -> "
+                               f"{current['throughput']:.1f} {current['unit']}")
+        if "p95_ms" in current and current["p95_ms"] > previous.get("p95_ms", float("inf")) * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']:.2f} -> {current['p95_ms']:.2f} ms")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmarks with local fakes")
+    parser.add_argument("--documents", type=int, default=4)
+    parser.add_argument("--pairs", type=int, default=120, help="QA pairs per synthetic document")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Fake LLM seconds per generated token")
+    parser.add_argument("--prompt-token-latency", type=float, default=0.0,
+                        help="Fake LLM seconds per prompt token")
+    parser.add_argument("--fast-path", action="store_true", help="Enable the extractive fast path")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="Previous results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        suite = run_suite(
+            Path(tmp),
+            documents=args.documents,
+            pairs_per_document=args.pairs,
+            queries=args.queries,
+            batch_size=args.batch_size,
+            token_latency=args.token_latency,
+            prompt_token_latency=args.prompt_token_latency,
+            fast_path=args.fast_path,
+            seed=args.seed,
+        )
+
+    output = {
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "params": vars(args),
+        **suite,
+    }
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+
+    print(f"{'component':<16}{'items':>8}{'throughput':>16}{'p50 (ms)':>11}{'p95 (ms)':>11}")
+    for name, r in suite["components"].items():
+        p50 = f"{r['p50_ms']:.2f}" if "p50_ms" in r else "-"
+        p95 = f"{r['p95_ms']:.2f}" if "p95_ms" in r else "-"
+        print(f"{name:<16}{r['items']:>8}{r['throughput']:>10.1f} {r['unit']:<9}{p50:>8}{p95:>11}")
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            regressions = compare(suite, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
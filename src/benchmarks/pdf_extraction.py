@@ -0,0 +1,66 @@
+from typing import List, Dict, Any, Optional
+from pathlib import Path
+from src.benchmarks.synthetic import generate_faq_pdfs
+from src.data_processing.pdf_processor import FallbackExtractor, get_extractor
+import argparse
+import json
+import logging
+import tempfile
+import time
+
+
+def bench_extractor(name: str, pdf_paths: List[Path], repeats: int = 1) -> Dict[str, Any]:
+    """Pages per second of one extraction backend over pdf_paths"""
+    extractor = get_extractor(name)
+    pages = 0
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for path in pdf_paths:
+            pages += len(extractor.extract(str(path)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "extractor": extractor.name,
+        "pages": pages,
+        "seconds": elapsed,
+        "pages_per_s": pages / elapsed if elapsed else 0.0,
+        "fallback_pages": extractor.fallback_pages if isinstance(extractor, FallbackExtractor) else 0,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    default_raw = Path(__file__).parent.parent.parent / "tests" / "test_data" / "raw"
+
+    parser = argparse.ArgumentParser(description="Pages per second of each PDF extraction backend")
+    parser.add_argument("--input", default=str(default_raw), help="Directory of PDFs to extract")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="Also generate this many synthetic FAQ PDFs")
+    parser.add_argument("--backends", nargs="+", default=["pdfplumber", "pdfium", "auto"])
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_paths = sorted(Path(args.input).glob("*.pdf"))
+        if args.synthetic:
+            synthetic, _ = generate_faq_pdfs(Path(tmp), documents=args.synthetic, pairs_per_document=60)
+            pdf_paths += synthetic
+        if not pdf_paths:
+            raise SystemExit(f"No PDFs found in {args.input}")
+
+        rows = [bench_extractor(name, pdf_paths, args.repeats) for name in args.backends]
+
+    print(f"{'backend':<22}{'pages':>8}{'seconds':>10}{'pages/s':>10}{'fallbacks':>11}")
+    for row in rows:
+        print(f"{row['extractor']:<22}{row['pages']:>8}{row['seconds']:>10.2f}"
+              f"{row['pages_per_s']:>10.1f}{row['fallback_pages']:>11}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"pdfs": len(pdf_paths), "rows": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+from typing import List, Dict, Any, Optional, Tuple
+from dataclasses import dataclass
+from pathlib import Path
+from src.benchmarks.fakes import HashingEmbedder, InMemoryVectorStore
+from src.benchmarks.synthetic import paraphrase
+from src.data_processing.chunk_store import iter_chunks
+from src.db.ranking import DEFAULT_WEIGHTS
+from src.utils.metrics import Histogram
+import argparse
+import itertools
+import json
+import logging
+import random
+import time
+
+
+@dataclass
+class GoldenQuery:
+    """A query and the chunk keys that answer it"""
+    query: str
+    relevant: frozenset
+    paraphrased: bool
+
+
+def chunk_key(metadata: Dict[str, Any]) -> Tuple[str, int]:
+    return metadata.get("source_file", ""), metadata.get("chunk_index", -1)
+
+
+def build_golden_set(chunks: List[Dict[str, Any]], paraphrases: int = 2, seed: int = 0) -> List[GoldenQuery]:
+    """
+    Build evaluation queries from the chunks' own metadata.question fields
+
+    Every question is used verbatim plus `paraphrases` rewrites. Chunks that
+    share the same question text are all counted as relevant.
+    """
+    rng = random.Random(seed)
+    by_question: Dict[str, set] = {}
+    for chunk in chunks:
+        question = chunk["metadata"].get("question", "").strip()
+        if question:
+            by_question.setdefault(question.lower(), set()).add(chunk_key(chunk["metadata"]))
+
+    golden = []
+    seen = set()
+    for chunk in chunks:
+        question = chunk["metadata"].get("question", "").strip()
+        if not question or question.lower() in seen:
+            continue
+        seen.add(question.lower())
+        relevant = frozenset(by_question[question.lower()])
+        golden.append(GoldenQuery(question, relevant, False))
+        for _ in range(paraphrases):
+            golden.append(GoldenQuery(paraphrase(question, rng), relevant, True))
+    return golden
+
+
+def _chunk_text(chunk: Dict[str, Any]) -> Optional[str]:
+    """Embedding text used by ChunkLoader, None for chunks it would skip"""
+    content = chunk["content"]
+    if not content.startswith('Q:'):
+        return None
+    qa_parts = content.split('\nA:', 1)
+    if len(qa_parts) != 2 or len(qa_parts[1].strip()) < 10:
+        return None
+    return f"{qa_parts[0][2:].strip()} {qa_parts[1].strip()}"
+
+
+def build_memory_backend(chunks: List[Dict[str, Any]], embedder) -> Tuple[InMemoryVectorStore, List[Dict]]:
+    """Index chunks in an in-memory store, returns the store and the chunks that were indexed"""
+    store = InMemoryVectorStore()
+    indexed, texts = [], []
+    for chunk in chunks:
+        text = _chunk_text(chunk)
+        if text is not None:
+            indexed.append(chunk)
+            texts.append(text)
+
+    embeddings = embedder.encode(texts)
+    for chunk, embedding in zip(indexed, embeddings):
+        store.insert(chunk["content"], embedding.tolist(), chunk["metadata"])
+    return store, indexed
+
+
+def evaluate(client, embedder, golden: List[GoldenQuery], k: int = 5, oversample: int = 4,
+             nprobe: Optional[int] = None) -> Dict[str, float]:
+    """
+    Run every golden query and score the ranking
+
+    Returns:
+        recall@1/3/k, MRR@k and retrieval latency percentiles
+    """
+    latency = Histogram(window=max(len(golden), 1))
+    hits_at = {1: 0, 3: 0, k: 0}
+    reciprocal_rank = 0.0
+
+    for item in golden:
+        start = time.perf_counter()
+        embedding = embedder.encode([item.query])[0].tolist()
+        results = client.search(embedding, limit=k, query=item.query, oversample=oversample, nprobe=nprobe)
+        latency.observe((time.perf_counter() - start) * 1000)
+
+        rank = next((i for i, r in enumerate(results, 1) if chunk_key(r["metadata"]) in item.relevant), None)
+        if rank is not None:
+            reciprocal_rank += 1.0 / rank
+            for cutoff in hits_at:
+                if rank <= cutoff:
+                    hits_at[cutoff] += 1
+
+    total = max(len(golden), 1)
+    summary = latency.summary()
+    result = {f"recall@{cutoff}": hits / total for cutoff, hits in sorted(hits_at.items())}
+    result.update({
+        f"mrr@{k}": reciprocal_rank / total,
+        "p50_ms": summary["p50"],
+        "p95_ms": summary["p95"],
+        "p99_ms": summary["p99"],
+    })
+    return result
+
+
+def sweep(client, embedder, golden: List[GoldenQuery], weight_sets: List[Dict[str, float]],
+          oversamples: List[int], nprobes: List[Optional[int]], k: int = 5) -> List[Dict[str, Any]]:
+    """Evaluate every combination of score weights, oversampling and nprobe"""
+    original_weights = dict(client.ranker.weights)
+    rows = []
+    try:
+        for weights, oversample, nprobe in itertools.product(weight_sets, oversamples, nprobes):
+            client.ranker.weights = {**DEFAULT_WEIGHTS, **weights}
+            metrics = evaluate(client, embedder, golden, k=k, oversample=oversample, nprobe=nprobe)
+            rows.append({
+                "weights": dict(client.ranker.weights),
+                "oversample": oversample,
+                "nprobe": nprobe,
+                **metrics,
+            })
+    finally:
+        client.ranker.weights = original_weights
+    return rows
+
+
+def format_table(rows: List[Dict[str, Any]]) -> str:
+    if not rows:
+        return ""
+    metric_cols = [c for c in rows[0] if c.startswith(("recall@", "mrr@"))] + ["p50_ms", "p95_ms"]
+    header = f"{'weights (t/v/m/d)':<22}{'over':>6}{'nprobe':>8}" + "".join(f"{c:>11}" for c in metric_cols)
+    lines = [header, "-" * len(header)]
+    for row in rows:
+        w = row["weights"]
+        weights = f"{w['topic']:.2f}/{w['vector']:.2f}/{w['metadata']:.2f}/{w['direct']:.2f}"
+        nprobe = "-" if row["nprobe"] is None else str(row["nprobe"])
+        lines.append(f"{weights:<22}{row['oversample']:>6}{nprobe:>8}" +
+                     "".join(f"{row[c]:>11.3f}" for c in metric_cols))
+    return "\n".join(lines)
+
+
+def _parse_weights(value: str) -> Dict[str, float]:
+    parts = [float(p) for p in value.split(",")]
+    if len(parts) != 4:
+        raise argparse.ArgumentTypeError("weights are topic,vector,metadata,direct")
+    return dict(zip(("topic", "vector", "metadata", "direct"), parts))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    default_chunks = Path(__file__).parent.parent.parent / "tests" / "test_data" / "Chunks"
+
+    parser = argparse.ArgumentParser(description="Recall@k / MRR / latency sweeps over retrieval parameters")
+    parser.add_argument("--chunks", default=str(default_chunks), help="Chunk directory or chunk store")
+    parser.add_argument("--backend", choices=["memory", "milvus"], default="memory",
+                        help="memory: index the chunks locally, milvus: query the configured collection")
+    parser.add_argument("--embedder", choices=["hashing", "sentence-transformers"], default="hashing")
+    parser.add_argument("--model-name", default="all-MiniLM-L6-v2")
+    parser.add_argument("--weights", type=_parse_weights, action="append",
+                        help="topic,vector,metadata,direct; repeat to sweep")
+    parser.add_argument("--oversample", type=int, nargs="+", default=[4])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=None)
+    parser.add_argument("--paraphrases", type=int, default=2)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Optional JSON file for the result rows")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.embedder == "sentence-transformers" or args.backend == "milvus":
+        from sentence_transformers import SentenceTransformer
+        embedder = SentenceTransformer(args.model_name)
+    else:
+        embedder = HashingEmbedder()
+
+    chunks = list(iter_chunks(args.chunks))
+    if args.backend == "milvus":
+        from src.db.milvus_client import MilvusClient
+        client = MilvusClient()
+    else:
+        client, chunks = build_memory_backend(chunks, embedder)
+
+    golden = build_golden_set(chunks, paraphrases=args.paraphrases, seed=args.seed)
+    rows = sweep(
+        client,
+        embedder,
+        golden,
+        weight_sets=args.weights or [dict(DEFAULT_WEIGHTS)],
+        oversamples=args.oversample,
+        nprobes=args.nprobe or [None],
+        k=args.k,
+    )
+
+    print(f"{len(golden)} queries over {len(chunks)} chunks ({args.backend} backend, {args.embedder} embeddings)")
+    print(format_table(rows))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"queries": len(golden), "rows": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+from typing import List, Dict, Tuple, Union
+from pathlib import Path
+import random
+
+
+SECTIONS = [
+    "General Queries",
+    "Library Queries",
+    "International & VISA Queries",
+    "Disabilities Office Queries",
+    "Student Life Queries",
+    "Medical Information",
+    "FINANCE QUERIES",
+]
+
+# (question template, answer template) pairs. Answers avoid the words the
+# chunker treats as the start of a new question (How, What, I..., Do...).
+QA_TEMPLATES = [
+    ("How do I {verb} my {item}?",
+     "Students can {verb} their {item} through the {office}. Please allow {days} working days for the request to be processed and bring your student card."),
+    ("Where can I find information about {topic}?",
+     "Full details about {topic} are published on Moodle under the {office} page. You can also email {email} for help."),
+    ("When is the deadline for {topic}?",
+     "The deadline for {topic} is {day} {month} 2025. Late submissions are reviewed by the {office} on a case by case basis."),
+    ("Can I {verb} my {item} online?",
+     "Yes, the {item} can be managed online through the student portal. The {office} will confirm by email within {days} working days."),
+    ("What is the fee for {topic}?",
+     "The fee for {topic} is €{fee}. Payment is made through the online payments page and a receipt is sent to your student email."),
+    ("Who should I contact about {topic}?",
+     "Please contact the {office} at {email} or call 01 417 {phone}. The office is located in Room {room} on the Aungier Street campus."),
+]
+
+VERBS = ["renew", "replace", "update", "collect", "cancel", "request", "extend", "change"]
+ITEMS = ["student card", "visa letter", "library account", "exam timetable", "transcript",
+         "medical certificate", "timetable", "parking permit", "Moodle password", "repeat exam booking"]
+TOPICS = ["repeat exams", "visa renewal", "library access", "medical appointments", "student card photos",
+          "deferrals", "exam results", "tuition fees", "accommodation", "assignment extensions",
+          "graduation", "disability supports", "counselling services", "international orientation"]
+OFFICES = ["Student Services Office", "Registrar's Office", "Library Desk", "International Office",
+           "Disabilities Office", "Finance Office", "Academic Office"]
+MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August",
+          "September", "October", "November", "December"]
+
+PARAPHRASE_PREFIXES = ["", "hi, ", "quick question: ", "please tell me ", "i need to know "]
+PARAPHRASE_SWAPS = {
+    "how do i": ["how can i", "what is the way to", "steps to"],
+    "where can i find": ["where is", "where do i get", "looking for"],
+    "when is": ["what is the date of", "when's"],
+    "can i": ["is it possible to", "am i able to"],
+    "what is the fee for": ["how much does it cost for", "cost of", "price of"],
+    "who should i contact about": ["who do i contact about", "contact for", "who handles"],
+}
+
+
+def generate_qa_pairs(count: int, seed: int = 0) -> List[Dict[str, str]]:
+    """Generate count synthetic FAQ question/answer pairs with a section each"""
+    rng = random.Random(seed)
+    pairs = []
+    for i in range(count):
+        question_t, answer_t = rng.choice(QA_TEMPLATES)
+        values = {
+            "verb": rng.choice(VERBS),
+            "item": rng.choice(ITEMS),
+            "topic": rng.choice(TOPICS),
+            "office": rng.choice(OFFICES),
+            "days": rng.randint(2, 10),
+            "day": rng.randint(1, 28),
+            "month": rng.choice(MONTHS),
+            "fee": rng.choice([50, 75, 100, 150, 250, 400]),
+            "email": rng.choice(["studentservices@dbs.ie", "library@dbs.ie", "international@dbs.ie",
+                                 "finance@dbs.ie", "disability@dbs.ie"]),
+            "phone": rng.randint(1000, 9999),
+            "room": f"{rng.randint(1, 5)}.{rng.randint(1, 30):02d}",
+        }
+        pairs.append({
+            "section": SECTIONS[i * len(SECTIONS) // max(count, 1)],
+            "question": question_t.format(**values),
+            "answer": answer_t.format(**values),
+        })
+    return pairs
+
+
+def paraphrase(question: str, rng: random.Random) -> str:
+    """Rewrite a question the way a student might type it"""
+    text = question.lower().rstrip("?")
+    for phrase, options in PARAPHRASE_SWAPS.items():
+        if text.startswith(phrase):
+            text = rng.choice(options) + text[len(phrase):]
+            break
+
+    words = text.split()
+    # Drop a filler word now and then
+    if len(words) > 5 and rng.random() < 0.5:
+        fillers = [i for i, w in enumerate(words) if w in ("my", "the", "a", "about", "for")]
+        if fillers:
+            del words[rng.choice(fillers)]
+
+    suffix = "?" if rng.random() < 0.5 else ""
+    return rng.choice(PARAPHRASE_PREFIXES) + " ".join(words) + suffix
+
+
+def generate_queries(pairs: List[Dict[str, str]], count: int, seed: int = 0,
+                     off_topic_ratio: float = 0.1) -> List[str]:
+    """Build a query load of paraphrased FAQ questions plus some off-topic queries"""
+    rng = random.Random(seed)
+    off_topic = ["what time is it", "tell me a joke", "best pizza near campus", "hello"]
+    queries = []
+    for _ in range(count):
+        if rng.random() < off_topic_ratio:
+            queries.append(rng.choice(off_topic))
+        else:
+            queries.append(paraphrase(rng.choice(pairs)["question"], rng))
+    return queries
+
+
+# Line starts the chunker reads as a new question
+QUESTION_STARTS = ('How', 'What', 'Where', 'When', 'Why', 'Who', 'Can', 'Will', 'Do', 'I', 'Which')
+
+
+def _wrap(text: str, width: int = 90) -> List[str]:
+    lines, current = [], ""
+    for word in text.split():
+        if current and len(current) + len(word) + 1 > width and not word.startswith(QUESTION_STARTS):
+            lines.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        lines.append(current)
+    return lines
+
+
+def faq_page_lines(pairs: List[Dict[str, str]], lines_per_page: int = 55) -> List[List[str]]:
+    """
+    Lay out QA pairs as pages of text lines, mirroring the DBS FAQ layout:
+    two table-of-contents pages, then section headers followed by questions and answers.
+    """
+    toc = ["Click the question below to land on the answer you need"]
+    toc += [p["question"] for p in pairs[:lines_per_page * 2 - 2]]
+    pages = [toc[:lines_per_page], toc[lines_per_page:lines_per_page * 2] or ["Contents"]]
+
+    body, current_section = [], None
+    for pair in pairs:
+        if pair["section"] != current_section:
+            current_section = pair["section"]
+            body.append(current_section)
+        body.append(pair["question"])
+        body.extend(_wrap(pair["answer"]))
+
+    for i in range(0, len(body), lines_per_page):
+        pages.append(body[i:i + lines_per_page])
+    return pages
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_text_pdf(path: Union[str, Path], pages: List[List[str]]) -> None:
+    """Write a minimal text-only PDF, one line of Helvetica per entry"""
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    }
+    page_ids = []
+    next_id = 4
+    for lines in pages:
+        ops = ["BT", "/F1 10 Tf", "12 TL", "50 790 Td"]
+        for line in lines:
+            ops.append(f"({_escape(line)}) Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("cp1252", errors="replace")
+
+        page_id, content_id = next_id, next_id + 1
+        next_id += 2
+        objects[page_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode()
+        objects[content_id] = b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+        page_ids.append(page_id)
+
+    kids = " ".join(f"{i} 0 R" for i in page_ids)
+    objects[2] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for obj_id in sorted(objects):
+        offsets[obj_id] = len(out)
+        out += b"%d 0 obj\n" % obj_id + objects[obj_id] + b"\nendobj\n"
+
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for obj_id in sorted(objects):
+        out += b"%010d 00000 n \n" % offsets[obj_id]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+
+    Path(path).write_bytes(bytes(out))
+
+
+def generate_faq_pdfs(output_dir: Union[str, Path], documents: int, pairs_per_document: int,
+                      seed: int = 0) -> Tuple[List[Path], List[Dict[str, str]]]:
+    """
+    Write synthetic FAQ PDFs
+
+    Returns:
+        Paths of the written PDFs and all QA pairs they contain
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    paths, all_pairs = [], []
+    for doc in range(documents):
+        pairs = generate_qa_pairs(pairs_per_document, seed=seed + doc)
+        path = output_dir / f"Synthetic FAQ {doc}.pdf"
+        write_text_pdf(path, faq_page_lines(pairs))
+        paths.append(path)
+        all_pairs.extend(pairs)
+    return paths, all_pairs
@@ -0,0 +1,146 @@
+from typing import List, Dict, Any, Optional
+from pathlib import Path
+from src.benchmarks.fakes import HashingEmbedder
+from src.benchmarks.retrieval_eval import build_golden_set, _chunk_text
+from src.data_processing.chunk_store import iter_chunks
+from src.db.vector_compression import build_compressor, PCACompressor
+from src.utils.metrics import Histogram
+import argparse
+import json
+import logging
+import time
+import numpy as np
+
+
+def synthetic_vectors(count: int, dimension: int = 384, rank: int = 64, clusters: int = 64,
+                      seed: int = 0) -> np.ndarray:
+    """
+    Clustered, L2-normalised vectors that stand in for a large embedded corpus.
+    Like sentence embeddings, most of the variance lives in a low-rank subspace.
+    """
+    rng = np.random.RandomState(seed)
+    basis = rng.normal(size=(rank, dimension))
+    centers = rng.normal(size=(clusters, rank))
+    latent = centers[rng.randint(0, clusters, size=count)] + 0.5 * rng.normal(size=(count, rank))
+    vectors = (latent @ basis + 0.5 * rng.normal(size=(count, dimension))).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _top_k(distances: np.ndarray, k: int) -> np.ndarray:
+    k = min(k, len(distances))
+    top = np.argpartition(distances, k - 1)[:k]
+    return top[np.argsort(distances[top], kind="stable")]
+
+
+def benchmark_mode(vectors: np.ndarray, queries: np.ndarray, mode: str, k: int = 5,
+                   rescore_factor: int = 2, oversample: int = 4, pca_dim: int = 96) -> Dict[str, Any]:
+    """
+    Memory footprint and neighbour recall of one compression mode
+
+    The first stage is an exact search in the compressed space, so recall
+    measures what the representation loses rather than the ANN index.
+
+    Returns:
+        bytes per vector, corpus MB, first-stage and re-scored recall@k against
+        the exact float32 neighbours, and per-query latency percentiles
+    """
+    compressor = build_compressor({"mode": mode, "pca_dim": pca_dim}, dim=vectors.shape[1])
+    if isinstance(compressor, PCACompressor):
+        compressor.fit(vectors)
+
+    codes = compressor.encode(vectors)
+    codes = codes if mode == "binary" else np.asarray(codes)
+    candidates = k * oversample * (rescore_factor if mode != "none" else 1)
+
+    latency = Histogram(window=max(len(queries), 1))
+    first_stage_hits = rescored_hits = 0
+    for query in queries:
+        exact = set(_top_k(np.sum((vectors - query) ** 2, axis=1), k).tolist())
+
+        start = time.perf_counter()
+        query_code = compressor.encode(query[None, :])[0]
+        top = _top_k(compressor.distances(query_code, codes), candidates)
+        if mode != "none":
+            full = np.sum((vectors[top] - query) ** 2, axis=1)
+            rescored = top[np.argsort(full, kind="stable")][:k]
+        else:
+            rescored = top[:k]
+        latency.observe((time.perf_counter() - start) * 1000)
+
+        first_stage_hits += len(exact & set(top[:k].tolist()))
+        rescored_hits += len(exact & set(rescored.tolist()))
+
+    total = max(len(queries) * min(k, len(vectors)), 1)
+    summary = latency.summary()
+    return {
+        "mode": mode,
+        "bytes_per_vector": compressor.bytes_per_vector,
+        "index_mb": compressor.bytes_per_vector * len(vectors) / 1e6,
+        "compression_ratio": vectors.shape[1] * 4 / compressor.bytes_per_vector,
+        f"first_stage_recall@{k}": first_stage_hits / total,
+        f"rescored_recall@{k}": rescored_hits / total,
+        "p50_ms": summary["p50"],
+        "p95_ms": summary["p95"],
+    }
+
+
+def format_table(rows: List[Dict[str, Any]]) -> str:
+    if not rows:
+        return ""
+    cols = [c for c in rows[0] if c != "mode"]
+    header = f"{'mode':<10}" + "".join(f"{c:>22}" for c in cols)
+    lines = [header, "-" * len(header)]
+    for row in rows:
+        lines.append(f"{row['mode']:<10}" + "".join(f"{row[c]:>22.3f}" for c in cols))
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    default_chunks = Path(__file__).parent.parent.parent / "tests" / "test_data" / "Chunks"
+
+    parser = argparse.ArgumentParser(description="Memory and recall of compressed first-stage vectors")
+    parser.add_argument("--chunks", default=str(default_chunks), help="Chunk directory or chunk store")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="Use this many synthetic clustered vectors instead of the chunks")
+    parser.add_argument("--queries", type=int, default=200, help="Synthetic query count")
+    parser.add_argument("--embedder", choices=["hashing", "sentence-transformers"], default="hashing")
+    parser.add_argument("--model-name", default="all-MiniLM-L6-v2")
+    parser.add_argument("--modes", nargs="+", default=["none", "float16", "binary", "pca"])
+    parser.add_argument("--pca-dim", type=int, default=96)
+    parser.add_argument("--rescore-factor", type=int, default=2)
+    parser.add_argument("--oversample", type=int, default=4)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--output", help="Optional JSON file for the result rows")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.synthetic:
+        corpus = synthetic_vectors(args.synthetic + args.queries)
+        vectors, queries = corpus[:args.synthetic], corpus[args.synthetic:]
+    else:
+        if args.embedder == "sentence-transformers":
+            from sentence_transformers import SentenceTransformer
+            embedder = SentenceTransformer(args.model_name)
+        else:
+            embedder = HashingEmbedder()
+        chunks = [c for c in iter_chunks(args.chunks) if _chunk_text(c) is not None]
+        vectors = np.asarray(embedder.encode([_chunk_text(c) for c in chunks]), dtype=np.float32)
+        queries = np.asarray(embedder.encode([g.query for g in build_golden_set(chunks)]), dtype=np.float32)
+
+    rows = [
+        benchmark_mode(vectors, queries, mode, k=args.k, rescore_factor=args.rescore_factor,
+                       oversample=args.oversample, pca_dim=min(args.pca_dim, len(vectors)))
+        for mode in args.modes
+    ]
+
+    print(f"{len(queries)} queries over {len(vectors)} vectors")
+    print(format_table(rows))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"vectors": len(vectors), "queries": len(queries), "rows": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+from typing import List, Dict, Any, Iterator, Iterable, Optional, Union
+from pathlib import Path
+import argparse
+import json
+import logging
+import mmap
+import struct
+import zlib
+
+
+INDEX_MAGIC = b"CHKIDX01"
+# magic, compression flag, reserved
+INDEX_HEADER = struct.Struct("<8sB7x")
+# record offset, record length
+INDEX_ENTRY = struct.Struct("<QI")
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_CODES = {None: COMPRESSION_NONE, "zlib": COMPRESSION_ZLIB}
+
+
+def _index_path(store_path: Path) -> Path:
+    return store_path.with_name(store_path.name + ".idx")
+
+
+class ChunkStoreWriter:
+    """Append-only writer for a packed chunk store.
+
+    Records are stored back to back in a single data file (one JSON document
+    per line, or one zlib-compressed JSON document per record), and an index
+    file next to it holds the offset and length of every record.
+    """
+
+    def __init__(self, store_path: Union[str, Path], compression: Optional[str] = None):
+        """
+        Open a store for appending, creating it if needed
+
+        Args:
+            store_path: Path of the data file, the index is written to '<store_path>.idx'
+            compression: None or 'zlib'. Must match an existing store.
+        """
+        if compression not in COMPRESSION_CODES:
+            raise ValueError(f"Unsupported compression: {compression}")
+
+        self.logger = logging.getLogger(__name__)
+        self.store_path = Path(store_path)
+        self.index_path = _index_path(self.store_path)
+        self.store_path.parent.mkdir(parents=True, exist_ok=True)
+
+        code = COMPRESSION_CODES[compression]
+        if self.index_path.exists() and self.index_path.stat().st_size > 0:
+            with open(self.index_path, "rb") as f:
+                existing = _read_index_header(f.read(INDEX_HEADER.size), self.index_path)
+            if existing != code:
+                raise ValueError(
+                    f"Store {self.store_path} was written with compression code {existing}, "
+                    f"cannot append with '{compression}'"
+                )
+            end = self._recover()
+            self._index_file = open(self.index_path, "ab")
+        else:
+            end = 0
+            self._index_file = open(self.index_path, "wb")
+            self._index_file.write(INDEX_HEADER.pack(INDEX_MAGIC, code))
+
+        self.compression = compression
+        self._data_file = open(self.store_path, "ab")
+        self._data_file.truncate(end)
+        self._offset = end
+        self.count = 0
+
+    def _recover(self) -> int:
+        """
+        Cut the store back to the records an interrupted writer completed
+
+        Returns:
+            End offset of the last complete record in the data file
+        """
+        with open(self.index_path, "rb") as f:
+            index_bytes = f.read()
+        size = self.store_path.stat().st_size if self.store_path.exists() else 0
+
+        # Keep whole entries whose record reached the data file
+        end = 0
+        kept = 0
+        entries = (len(index_bytes) - INDEX_HEADER.size) // INDEX_ENTRY.size
+        for i in range(entries):
+            offset, length = INDEX_ENTRY.unpack_from(index_bytes, INDEX_HEADER.size + i * INDEX_ENTRY.size)
+            if offset != end or offset + length > size:
+                break
+            end = offset + length
+            kept += 1
+
+        index_size = INDEX_HEADER.size + kept * INDEX_ENTRY.size
+        if index_size != len(index_bytes) or end != size:
+            self.logger.warning(f"Chunk store {self.store_path} was not closed cleanly, "
+                                f"keeping the first {kept} records")
+            with open(self.index_path, "r+b") as f:
+                f.truncate(index_size)
+        return end
+
+    def append(self, record: Dict[str, Any]) -> None:
+        """Append a single record to the store"""
+        payload = json.dumps(record, ensure_ascii=False).encode("utf-8")
+        if self.compression == "zlib":
+            payload = zlib.compress(payload)
+        else:
+            payload += b"\n"
+
+        self._data_file.write(payload)
+        self._index_file.write(INDEX_ENTRY.pack(self._offset, len(payload)))
+        self._offset += len(payload)
+        self.count += 1
+
+    def extend(self, records: Iterable[Dict[str, Any]]) -> int:
+        """Append several records, returns how many were written"""
+        written = 0
+        for record in records:
+            self.append(record)
+            written += 1
+        return written
+
+    def close(self) -> None:
+        # Index entries may still reach the disk before their data, readers and
+        # reopening writers drop entries that point past the end of the data file
+        if not self._data_file.closed:
+            self._data_file.close()
+        if not self._index_file.closed:
+            self._index_file.close()
+
+    def __enter__(self) -> "ChunkStoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+class ChunkStore:
+    """Read-only view of a packed chunk store with memory-mapped random access"""
+
+    def __init__(self, store_path: Union[str, Path]):
+        self.logger = logging.getLogger(__name__)
+        self.store_path = Path(store_path)
+        self.index_path = _index_path(self.store_path)
+
+        if not self.store_path.exists() or not self.index_path.exists():
+            raise FileNotFoundError(f"Chunk store not found at {self.store_path}")
+
+        with open(self.index_path, "rb") as f:
+            index_bytes = f.read()
+        self.compression_code = _read_index_header(index_bytes[:INDEX_HEADER.size], self.index_path)
+
+        # Ignore a trailing partial entry left by an interrupted writer
+        entries = (len(index_bytes) - INDEX_HEADER.size) // INDEX_ENTRY.size
+        self._index = [
+            INDEX_ENTRY.unpack_from(index_bytes, INDEX_HEADER.size + i * INDEX_ENTRY.size)
+            for i in range(entries)
+        ]
+
+        self._file = open(self.store_path, "rb")
+        size = self.store_path.stat().st_size
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+        if self._index and self._index[-1][0] + self._index[-1][1] > size:
+            # Data for the last records never reached the disk
+            while self._index and self._index[-1][0] + self._index[-1][1] > size:
+                self._index.pop()
+            self.logger.warning(f"Chunk store {self.store_path} is truncated, "
+                                f"using the first {len(self._index)} records")
+
+    def _decode(self, payload: bytes) -> Dict[str, Any]:
+        if self.compression_code == COMPRESSION_ZLIB:
+            payload = zlib.decompress(payload)
+        return json.loads(payload)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        offset, length = self._index[i]
+        return self._decode(self._mmap[offset:offset + length])
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Stream records in insertion order"""
+        for offset, length in self._index:
+            yield self._decode(self._mmap[offset:offset + length])
+
+    def iter_batches(self, batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+        """Stream records in lists of at most batch_size"""
+        batch = []
+        for record in self:
+            batch.append(record)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+    def __enter__(self) -> "ChunkStore":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+def _read_index_header(header: bytes, index_path: Path) -> int:
+    if len(header) < INDEX_HEADER.size:
+        raise ValueError(f"Invalid chunk store index: {index_path}")
+    magic, code = INDEX_HEADER.unpack(header)
+    if magic != INDEX_MAGIC:
+        raise ValueError(f"Invalid chunk store index: {index_path}")
+    return code
+
+
+def is_chunk_store(path: Union[str, Path]) -> bool:
+    """Check whether path points at a packed chunk store"""
+    path = Path(path)
+    return path.is_file() and _index_path(path).exists()
+
+
+def _chunk_files(directory: Union[str, Path]) -> List[Path]:
+    """chunk_*.json files in natural order, chunk_2 before chunk_10"""
+    return sorted(Path(directory).glob("chunk_*.json"), key=lambda p: (len(p.stem), p.stem))
+
+
+def iter_chunks(path: Union[str, Path]) -> Iterator[Dict[str, Any]]:
+    """Yield chunks from a chunk store or a directory of chunk_*.json files"""
+    if is_chunk_store(path):
+        with ChunkStore(path) as store:
+            yield from store
+        return
+
+    for chunk_file in _chunk_files(path):
+        with open(chunk_file, "r", encoding="utf-8") as f:
+            yield json.load(f)
+
+
+def convert_chunk_directory(
+    chunks_dir: Union[str, Path],
+    store_path: Union[str, Path],
+    compression: Optional[str] = None,
+) -> int:
+    """
+    Pack a directory of chunk_*.json files into a chunk store
+
+    Args:
+        chunks_dir: Directory containing chunk_*.json files
+        store_path: Path of the chunk store to write
+        compression: None or 'zlib'
+
+    Returns:
+        Number of chunks written
+    """
+    logger = logging.getLogger(__name__)
+    with ChunkStoreWriter(store_path, compression=compression) as writer:
+        for chunk_file in _chunk_files(chunks_dir):
+            try:
+                with open(chunk_file, "r", encoding="utf-8") as f:
+                    writer.append(json.load(f))
+            except Exception as e:
+                logger.error(f"Error converting {chunk_file}: {e}")
+                continue
+        count = writer.count
+
+    logger.info(f"Packed {count} chunks from {chunks_dir} into {store_path}")
+    return count
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Convert a chunk directory into a packed chunk store")
+    parser.add_argument("chunks_dir", help="Directory containing chunk_*.json files")
+    parser.add_argument("store_path", help="Output chunk store path, e.g. data/chunks.jsonl")
+    parser.add_argument("--compression", choices=["zlib"], default=None)
+    args = parser.parse_args()
+
+    convert_chunk_directory(args.chunks_dir, args.store_path, compression=args.compression)
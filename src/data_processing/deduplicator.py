@@ -0,0 +1,203 @@
+from typing import List, Dict, Any, Union, Set
+from dataclasses import dataclass, field
+from src.data_processing.text_chunker import Chunk
+from src.data_processing.chunk_store import ChunkStoreWriter, iter_chunks
+import argparse
+import copy
+import logging
+import re
+import zlib
+import numpy as np
+
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_WORD_RE = re.compile(r"\w+")
+
+ChunkLike = Union[Chunk, Dict[str, Any]]
+
+
+@dataclass
+class DedupResult:
+    """Outcome of a deduplication pass"""
+    chunks: List[ChunkLike]
+    input_count: int
+    collapsed: int
+    clusters: List[List[int]] = field(default_factory=list)
+
+
+def _content(chunk: ChunkLike) -> str:
+    return chunk.content if isinstance(chunk, Chunk) else chunk["content"]
+
+
+def _metadata(chunk: ChunkLike) -> Dict[str, Any]:
+    return chunk.metadata if isinstance(chunk, Chunk) else chunk["metadata"]
+
+
+class ChunkDeduplicator:
+    """
+    Near-duplicate detection for chunks with MinHash signatures and LSH banding.
+
+    Candidate pairs that share an LSH bucket are confirmed with the exact
+    Jaccard similarity of their word shingles, then merged into one chunk that
+    keeps the source reference of every member.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        num_perm: int = 128,
+        bands: int = 32,
+        shingle_size: int = 3,
+        key: str = "content",
+        seed: int = 1,
+    ):
+        """
+        Args:
+            threshold: Jaccard similarity above which two chunks are merged
+            num_perm: Number of MinHash permutations
+            bands: Number of LSH bands, num_perm must be divisible by it
+            shingle_size: Words per shingle
+            key: 'content' to compare question and answer, 'answer' to compare answers only
+            seed: Seed for the permutation coefficients
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        if key not in ("content", "answer"):
+            raise ValueError(f"Unsupported dedup key: {key}")
+
+        self.logger = logging.getLogger(__name__)
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.key = key
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    def _text(self, chunk: ChunkLike) -> str:
+        content = _content(chunk)
+        if self.key == "answer":
+            parts = content.split('\nA:', 1)
+            content = parts[1] if len(parts) == 2 else content
+        return content.lower()
+
+    def shingles(self, text: str) -> Set[int]:
+        words = _WORD_RE.findall(text)
+        if len(words) <= self.shingle_size:
+            grams = [" ".join(words)] if words else []
+        else:
+            grams = [" ".join(words[i:i + self.shingle_size]) for i in range(len(words) - self.shingle_size + 1)]
+        return {zlib.crc32(g.encode("utf-8")) for g in grams}
+
+    def signature(self, shingles: Set[int]) -> np.ndarray:
+        if not shingles:
+            return np.full(self.num_perm, _MERSENNE_PRIME, dtype=np.uint64)
+        x = np.fromiter(shingles, dtype=np.uint64, count=len(shingles)) % np.uint64(_MERSENNE_PRIME)
+        # (a * x + b) mod p for every permutation and shingle, min over shingles
+        hashed = (np.outer(self._a, x) + self._b[:, None]) % np.uint64(_MERSENNE_PRIME)
+        return hashed.min(axis=1)
+
+    def deduplicate(self, chunks: List[ChunkLike]) -> DedupResult:
+        """
+        Merge near-duplicate chunks
+
+        Args:
+            chunks: Chunk objects or {'content', 'metadata'} dicts
+
+        Returns:
+            DedupResult with the surviving chunks in their original order
+        """
+        shingle_sets = [self.shingles(self._text(chunk)) for chunk in chunks]
+        signatures = [self.signature(s) for s in shingle_sets]
+
+        parent = list(range(len(chunks)))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        checked = set()
+        for band in range(self.bands):
+            buckets: Dict[bytes, List[int]] = {}
+            lo, hi = band * self.rows, (band + 1) * self.rows
+            for i, sig in enumerate(signatures):
+                if shingle_sets[i]:
+                    buckets.setdefault(sig[lo:hi].tobytes(), []).append(i)
+
+            for members in buckets.values():
+                for pos, i in enumerate(members):
+                    for j in members[pos + 1:]:
+                        if (i, j) in checked or find(i) == find(j):
+                            continue
+                        checked.add((i, j))
+                        a, b = shingle_sets[i], shingle_sets[j]
+                        if len(a & b) / len(a | b) >= self.threshold:
+                            # Keep the earliest chunk as the cluster root
+                            ri, rj = find(i), find(j)
+                            parent[max(ri, rj)] = min(ri, rj)
+
+        clusters: Dict[int, List[int]] = {}
+        for i in range(len(chunks)):
+            clusters.setdefault(find(i), []).append(i)
+
+        merged = [self._merge([chunks[i] for i in members]) for root, members in sorted(clusters.items())]
+        collapsed = len(chunks) - len(merged)
+        multi = [members for members in clusters.values() if len(members) > 1]
+
+        self.logger.info(f"Deduplicated {len(chunks)} chunks into {len(merged)} "
+                         f"({collapsed} collapsed in {len(multi)} clusters)")
+        return DedupResult(chunks=merged, input_count=len(chunks), collapsed=collapsed, clusters=multi)
+
+    def _merge(self, members: List[ChunkLike]) -> ChunkLike:
+        representative = members[0]
+        if len(members) == 1:
+            return representative
+
+        metadata = copy.deepcopy(_metadata(representative))
+        metadata["sources"] = [
+            {
+                "source_file": _metadata(m).get("source_file"),
+                "section": _metadata(m).get("section"),
+                "chunk_index": _metadata(m).get("chunk_index"),
+                "question": _metadata(m).get("question"),
+            }
+            for m in members
+        ]
+        metadata["duplicate_count"] = len(members) - 1
+
+        # Keep every extracted contact, fee and deadline across the duplicates
+        extracted = metadata.get("extracted_info")
+        if isinstance(extracted, dict):
+            for m in members[1:]:
+                for info_type, values in (_metadata(m).get("extracted_info") or {}).items():
+                    existing = extracted.setdefault(info_type, [])
+                    existing.extend(v for v in values if v not in existing)
+
+        if isinstance(representative, Chunk):
+            return Chunk(content=representative.content, metadata=metadata)
+        return {**representative, "metadata": metadata}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Merge near-duplicate chunks before loading")
+    parser.add_argument("source", help="Chunk directory or chunk store")
+    parser.add_argument("store_path", help="Output chunk store")
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--key", choices=["content", "answer"], default="content")
+    parser.add_argument("--compression", choices=["zlib"], default=None)
+    args = parser.parse_args()
+
+    deduplicator = ChunkDeduplicator(threshold=args.threshold, key=args.key)
+    result = deduplicator.deduplicate(list(iter_chunks(args.source)))
+
+    with ChunkStoreWriter(args.store_path, compression=args.compression) as writer:
+        writer.extend(result.chunks)
+
+    print(f"{result.input_count} chunks in, {len(result.chunks)} out, {result.collapsed} collapsed")
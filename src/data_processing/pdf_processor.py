@@ -4,8 +4,13 @@ import logging
 from pathlib import Path
 import pdfplumber
 import json
+import unicodedata
 from dataclasses import dataclass, asdict
 from datetime import datetime
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # fast backend is optional, pdfplumber is always available
+    pdfium = None
 
 
 @dataclass
@@ -28,17 +33,170 @@ class ProcessedPDF:
     processed_at: str
 
 
+@dataclass
+class ExtractedPage:
+    """Text layer of a single page as returned by an extractor"""
+
+    page_number: int
+    width: float
+    height: float
+    text: str
+    extractor: str
+
+
+class PDFExtractor:
+    """Interface for PDF text extraction backends"""
+
+    name = "base"
+
+    def extract(self, pdf_path: str, page_numbers: Optional[List[int]] = None) -> List[ExtractedPage]:
+        """
+        Extract the text of a PDF
+
+        Args:
+            pdf_path: Path to the PDF file
+            page_numbers: 1-based page numbers to extract, all pages if None
+
+        Returns:
+            One ExtractedPage per requested page, in page order
+        """
+        raise NotImplementedError
+
+
+class PDFPlumberExtractor(PDFExtractor):
+    """Full pdfplumber layout analysis, slow but robust"""
+
+    name = "pdfplumber"
+
+    def extract(self, pdf_path: str, page_numbers: Optional[List[int]] = None) -> List[ExtractedPage]:
+        pages = []
+        with pdfplumber.open(pdf_path, pages=page_numbers) as pdf:
+            for page in pdf.pages:
+                pages.append(ExtractedPage(
+                    page_number=page.page_number,
+                    width=page.width,
+                    height=page.height,
+                    text=page.extract_text() or "",
+                    extractor=self.name,
+                ))
+        return pages
+
+
+class PdfiumExtractor(PDFExtractor):
+    """Reads the embedded text layer with pypdfium2, without layout analysis"""
+
+    name = "pdfium"
+
+    def __init__(self):
+        if pdfium is None:
+            raise ImportError("pypdfium2 is required for the pdfium extractor")
+
+    def extract(self, pdf_path: str, page_numbers: Optional[List[int]] = None) -> List[ExtractedPage]:
+        pages = []
+        pdf = pdfium.PdfDocument(pdf_path)
+        try:
+            for page_number in page_numbers or range(1, len(pdf) + 1):
+                page = pdf[page_number - 1]
+                textpage = page.get_textpage()
+                try:
+                    width, height = page.get_size()
+                    text = textpage.get_text_range().replace("\r\n", "\n").replace("\r", "\n")
+                finally:
+                    textpage.close()
+                    page.close()
+                pages.append(ExtractedPage(page_number, width, height, text, self.name))
+        finally:
+            pdf.close()
+        return pages
+
+
+def degraded_reason(text: str, min_space_ratio: float = 0.05, max_bad_char_ratio: float = 0.01) -> Optional[str]:
+    """
+    Check whether text from a fast extractor looks unusable
+
+    Returns:
+        A short reason if the page should be re-extracted, None if it looks fine
+    """
+    stripped = text.strip()
+    if not stripped:
+        return "empty"
+
+    # Unmapped glyphs show up as replacement characters, control or private-use codepoints
+    bad = sum(
+        1 for c in stripped
+        if c == "\ufffd" or (unicodedata.category(c) in ("Cc", "Co") and c not in "\n\t")
+    )
+    if bad / len(stripped) > max_bad_char_ratio:
+        return "unmapped glyphs"
+
+    # Text drawn glyph by glyph can lose its word spacing
+    if len(stripped) > 200 and stripped.count(" ") / len(stripped) < min_space_ratio:
+        return "missing spaces"
+
+    return None
+
+
+class FallbackExtractor(PDFExtractor):
+    """Fast extractor that re-extracts degraded pages with a slower, more robust one"""
+
+    def __init__(self, primary: PDFExtractor, fallback: Optional[PDFExtractor] = None):
+        self.logger = logging.getLogger(__name__)
+        self.primary = primary
+        self.fallback = fallback or PDFPlumberExtractor()
+        self.name = f"{primary.name}+{self.fallback.name}"
+        self.fallback_pages = 0
+
+    def extract(self, pdf_path: str, page_numbers: Optional[List[int]] = None) -> List[ExtractedPage]:
+        pages = self.primary.extract(pdf_path, page_numbers)
+
+        degraded = {}
+        for page in pages:
+            reason = degraded_reason(page.text)
+            if reason:
+                degraded[page.page_number] = reason
+        if not degraded:
+            return pages
+
+        self.logger.info(f"Falling back to {self.fallback.name} for {len(degraded)} pages of {pdf_path}: "
+                         f"{sorted(degraded.items())}")
+        self.fallback_pages += len(degraded)
+        replacements = {p.page_number: p for p in self.fallback.extract(pdf_path, sorted(degraded))}
+        return [replacements.get(page.page_number, page) for page in pages]
+
+
+def get_extractor(name: str = "auto") -> PDFExtractor:
+    """
+    Build a PDF extractor by name
+
+    Args:
+        name: 'pdfplumber', 'pdfium', or 'auto' for pdfium with pdfplumber
+            fallback on degraded pages (plain pdfplumber if pypdfium2 is missing)
+    """
+    if name == "pdfplumber":
+        return PDFPlumberExtractor()
+    if name == "pdfium":
+        return PdfiumExtractor()
+    if name == "auto":
+        if pdfium is None:
+            return PDFPlumberExtractor()
+        return FallbackExtractor(PdfiumExtractor())
+    raise ValueError(f"Unknown PDF extractor: {name}")
+
+
 class PDFProcessor:
-    def __init__(self, input_dir: str = "data/raw", output_dir: str = "data/processed"):
+    def __init__(self, input_dir: str = "data/raw", output_dir: str = "data/processed",
+                 extractor: Optional[PDFExtractor] = None):
         """
         Initialize PDF processor
 
         Args:
             input_dir: Directory containing PDF files
             output_dir: Directory to save processed files
+            extractor: Text extraction backend, defaults to get_extractor("auto")
         """
         self.input_dir = Path(input_dir)
         self.output_dir = Path(output_dir)
+        self.extractor = extractor or get_extractor("auto")
         self._setup_directories()
         self._setup_logging()
 
@@ -69,33 +227,35 @@ class PDFProcessor:
             self.logger.info(f"Processing PDF: {pdf_path}")
             pdf_pages = []
 
-            with pdfplumber.open(pdf_path) as pdf:
-                # Extract basic metadata
-                metadata = {
-                    "title": os.path.basename(pdf_path),
-                    "pages": len(pdf.pages),
-                    "source_path": pdf_path,
-                }
-
-                # Process each page
-                for page_num, page in enumerate(pdf.pages, 1):
-                    text = page.extract_text()
-                    if text:
-                        # Extract page-specific metadata
-                        page_metadata = {
-                            "page_number": page_num,
-                            "width": page.width,
-                            "height": page.height,
-                            "has_text": bool(text.strip()),
-                        }
-
-                        pdf_pages.append(
-                            PDFPage(
-                                page_number=page_num,
-                                content=text,
-                                metadata=page_metadata,
-                            )
+            pages = self.extractor.extract(pdf_path)
+
+            # Extract basic metadata
+            metadata = {
+                "title": os.path.basename(pdf_path),
+                "pages": len(pages),
+                "source_path": pdf_path,
+            }
+
+            # Process each page
+            for page in pages:
+                text = page.text
+                if text:
+                    # Extract page-specific metadata
+                    page_metadata = {
+                        "page_number": page.page_number,
+                        "width": page.width,
+                        "height": page.height,
+                        "has_text": bool(text.strip()),
+                        "extractor": page.extractor,
+                    }
+
+                    pdf_pages.append(
+                        PDFPage(
+                            page_number=page.page_number,
+                            content=text,
+                            metadata=page_metadata,
                         )
+                    )
 
             # Create ProcessedPDF object
             processed_pdf = ProcessedPDF(
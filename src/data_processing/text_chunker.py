@@ -1,5 +1,7 @@
-from typing import List, Dict, Any
-from dataclasses import dataclass
+from typing import List, Dict, Any, Optional
+from dataclasses import dataclass, asdict
+from src.data_processing.chunk_store import ChunkStoreWriter
+from src.utils.profiling import profiled
 import re
 import logging
 
@@ -9,7 +11,6 @@ class Chunk:
     """Represents a chunk of text with its metadata"""
     content: str
     metadata: Dict[str, Any]
-RAG
 
 class TextChunker:
     def __init__(self):
@@ -26,8 +27,8 @@ class TextChunker:
 
     def _clean_text(self, text: str) -> str:
         """Clean text by removing headers and unnecessary formatting"""
-        # Remove standard headers and footers
-        text = re.sub(r'StudentFAQGuide\s*\nDublinBusinessSchool\s*\nLiveDocument\s*\n_{20,}', '', text)
+        # Remove standard headers and footers (pdfplumber drops the spaces, pdfium keeps them)
+        text = re.sub(r'Student ?FAQ ?Guide\s*\nDublin ?Business ?School\s*\nLive ?Document\s*\n_{20,}', '', text)
         text = re.sub(r'\n_{20,}\n', '\n', text)
         # Remove page numbers
         text = re.sub(r'\s+\d+\s*$', '', text, flags=re.MULTILINE)
@@ -122,6 +123,7 @@ class TextChunker:
 
         return qa_pairs
 
+    @profiled("process_document")
     def process_document(self, processed_pdf: Dict[str, Any]) -> List[Chunk]:
         """Process document into chunks"""
         # Skip table of contents pages
@@ -159,6 +161,24 @@ class TextChunker:
 
         return chunks
 
+    def save_chunks(self, chunks: List[Chunk], store_path: str, compression: Optional[str] = None) -> int:
+        """
+        Append chunks to a packed chunk store
+
+        Args:
+            chunks: Chunks produced by process_document
+            store_path: Path of the chunk store
+            compression: None or 'zlib'
+
+        Returns:
+            Number of chunks written
+        """
+        with ChunkStoreWriter(store_path, compression=compression) as writer:
+            written = writer.extend(asdict(chunk) for chunk in chunks)
+
+        self.logger.info(f"Saved {written} chunks to {store_path}")
+        return written
+
     def _determine_category(self, question: str, answer: str) -> str:
         """Determine category of QA pair"""
         text = (question + " " + answer).lower()
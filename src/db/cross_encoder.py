@@ -0,0 +1,210 @@
+from typing import List, Dict, Any, Optional
+try:
+    from sentence_transformers import CrossEncoder
+except ImportError:  # only needed when the cross-encoder stage is enabled without an injected model
+    CrossEncoder = None
+try:
+    import torch
+except ImportError:  # only needed to quantize the cross-encoder
+    torch = None
+from src.utils.lru_cache import LRUCache
+from src.utils.metrics import get_metrics
+from src.utils.path_utils import get_config_path
+from src.utils.single_flight import normalize_query
+import hashlib
+import logging
+import os
+import time
+import zlib
+import numpy as np
+import yaml
+
+
+def chunk_key(hit: Dict[str, Any]) -> Any:
+    """Stable id of a hit, its primary key when the search returned one"""
+    if hit.get("id") is not None:
+        return hit["id"]
+    return zlib.crc32(hit["content"].encode("utf-8"))
+
+
+def query_hash(query: str) -> str:
+    return hashlib.blake2b(normalize_query(query).encode("utf-8"), digest_size=8).hexdigest()
+
+
+class CrossEncoderReranker:
+    """
+    Optional second re-ranking stage over the heuristic top candidates.
+
+    A small cross-encoder reads each (query, chunk) pair together, which
+    orders near-duplicate FAQ answers better than keyword heuristics. Pairs
+    are scored in batches on CPU (int8 dynamic quantization when torch is
+    available), and scores are cached by (query hash, chunk id).
+
+    Each request has a latency budget. Before each batch, the expected
+    batch time is checked against what is left of the budget, using the
+    measured time per pair. If the candidates can't all be scored in time,
+    the heuristic order is kept. Scores computed so far stay cached for the
+    next identical query. The estimate only moves when a batch runs, so after
+    `probe_every` fallbacks in a row one batch is scored regardless, and a
+    single slow batch can't disable the stage for good.
+    """
+
+    def __init__(
+        self,
+        model=None,
+        enabled: bool = True,
+        model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        candidates: int = 12,
+        batch_size: int = 16,
+        budget_ms: float = 150.0,
+        cache_size: int = 8192,
+        context_chunks: Optional[int] = None,
+        quantize: bool = True,
+        smoothing: float = 0.2,
+        probe_every: int = 20,
+    ):
+        """
+        Args:
+            model: Anything with CrossEncoder.predict(pairs) -> scores, loaded from model_name when omitted
+            enabled: When False, search results pass through untouched
+            model_name: Hugging Face cross-encoder to load
+            candidates: Heuristic top hits re-scored per query
+            batch_size: Pairs per forward pass
+            budget_ms: Time the stage may take per request before falling back
+            cache_size: (query, chunk) scores kept
+            context_chunks: Chunks sent to Mistral after a cross-encoder ordering, None for all
+            quantize: Apply int8 dynamic quantization to the loaded model's linear layers
+            smoothing: Weight of the newest batch in the time-per-pair estimate
+            probe_every: Fallbacks in a row after which one batch is scored to re-measure
+        """
+        self.logger = logging.getLogger(__name__)
+        self.metrics = get_metrics()
+        self.enabled = enabled
+        self.candidates = candidates
+        self.batch_size = batch_size
+        self.budget = budget_ms / 1000
+        self.context_chunks = context_chunks
+        self.smoothing = smoothing
+        self.probe_every = probe_every
+        self.cache = LRUCache(cache_size, name="cross_encoder")
+        self.seconds_per_pair = 0.0
+        self.fallbacks = 0
+        self.probes = 0
+        self._fallbacks_in_row = 0
+
+        self.model = model
+        if enabled and model is None:
+            self.model = self._load(model_name, quantize)
+
+    @classmethod
+    def from_config(cls, config_path: str = None) -> "CrossEncoderReranker":
+        """Build from the optional 'reranker' section of config.yaml, disabled by default"""
+        config_path = config_path or get_config_path()
+        config = {"enabled": False}
+        if os.path.exists(config_path):
+            with open(config_path, "r") as file:
+                config.update((yaml.safe_load(file) or {}).get("reranker", {}) or {})
+        return cls(**config)
+
+    def _load(self, model_name: str, quantize: bool):
+        if CrossEncoder is None:
+            raise ImportError("sentence-transformers is required for the cross-encoder re-ranker")
+        model = CrossEncoder(model_name, device="cpu")
+        if quantize and torch is not None:
+            model.model = torch.quantization.quantize_dynamic(model.model, {torch.nn.Linear}, dtype=torch.qint8)
+            self.logger.info(f"Loaded {model_name} with int8 dynamic quantization")
+
+        # The first forward passes allocate and are much slower, time a warm one to seed the estimate
+        pairs = [("warmup query", "Q: warmup question\nA: warmup answer")] * self.batch_size
+        model.predict(pairs)
+        start = time.perf_counter()
+        model.predict(pairs)
+        self._observe(time.perf_counter() - start, len(pairs))
+        return model
+
+    def candidate_limit(self, top_k: int) -> int:
+        """Results to ask the vector search for"""
+        return max(top_k, self.candidates) if self.enabled else top_k
+
+    def rerank(self, query: str, hits: List[Dict[str, Any]], limit: int,
+               budget: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Order heuristic-ranked hits by cross-encoder score
+
+        Args:
+            query: Raw query text
+            hits: Search results, best heuristic score first
+            limit: Results to return
+            budget: Seconds available, defaults to budget_ms
+
+        Returns:
+            The best `limit` hits. Each carries a 'rerank_score' unless the stage fell back to the heuristic order
+        """
+        if not self.enabled or not hits:
+            return hits[:limit]
+
+        start = time.perf_counter()
+        budget = self.budget if budget is None else budget
+        candidates = hits[:self.candidates]
+        qhash = query_hash(query)
+        keys = [(qhash, chunk_key(hit)) for hit in candidates]
+        scores = self.cache.get_many(keys)
+
+        missing = [i for i, key in enumerate(keys) if key not in scores]
+        for offset in range(0, len(missing), self.batch_size):
+            batch = missing[offset:offset + self.batch_size]
+            elapsed = time.perf_counter() - start
+            probe = elapsed + len(batch) * self.seconds_per_pair > budget
+            if probe:
+                if self._fallbacks_in_row < self.probe_every:
+                    return self._fall_back(hits, limit, len(missing) - offset)
+                # Re-measure, the estimate may be stale; the scores are cached either way
+                self.probes += 1
+                self.metrics.incr("cross_encoder_probes")
+            self._fallbacks_in_row = 0
+
+            batch_start = time.perf_counter()
+            logits = self.model.predict([(query, candidates[i]["content"]) for i in batch])
+            self._observe(time.perf_counter() - batch_start, len(batch), reseed=probe)
+            for i, score in zip(batch, self._normalize(logits)):
+                scores[keys[i]] = float(score)
+                self.cache.put(keys[i], float(score))
+
+        ranked = sorted(
+            ({**hit, "rerank_score": scores[key]} for hit, key in zip(candidates, keys)),
+            key=lambda hit: hit["rerank_score"],
+            reverse=True,
+        )
+        self.metrics.observe("cross_encoder_seconds", time.perf_counter() - start)
+        return ranked[:limit]
+
+    def context_results(self, hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Hits to build the prompt from. A confident cross-encoder order needs fewer chunks"""
+        if self.context_chunks and hits and "rerank_score" in hits[0]:
+            return hits[:self.context_chunks]
+        return hits
+
+    def _observe(self, elapsed: float, pairs: int, reseed: bool = False) -> None:
+        per_pair = elapsed / pairs
+        # The first batch and probes seed the estimate, so the budget check is usable right away
+        weight = self.smoothing if self.seconds_per_pair and not reseed else 1.0
+        self.seconds_per_pair += weight * (per_pair - self.seconds_per_pair)
+
+    def _normalize(self, logits) -> np.ndarray:
+        """Logits to 0..1, so cached scores from different batches compare"""
+        return 1.0 / (1.0 + np.exp(-np.asarray(logits, dtype=np.float64).reshape(-1)))
+
+    def _fall_back(self, hits: List[Dict[str, Any]], limit: int, unscored: int) -> List[Dict[str, Any]]:
+        self.fallbacks += 1
+        self._fallbacks_in_row += 1
+        self.metrics.incr("cross_encoder_fallbacks")
+        self.logger.debug(f"Cross-encoder over budget with {unscored} pairs left, keeping the heuristic order")
+        return hits[:limit]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "seconds_per_pair": self.seconds_per_pair,
+            "fallbacks": self.fallbacks,
+            "probes": self.probes,
+            "cached_pairs": len(self.cache),
+        }
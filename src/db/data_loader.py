@@ -1,6 +1,12 @@
 from typing import List, Dict, Any
-from sentence_transformers import SentenceTransformer
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # only needed when no embedding model is injected
+    SentenceTransformer = None
 from src.db.milvus_client import MilvusClient
+from src.data_processing.chunk_store import ChunkStore, is_chunk_store
+from src.rag.entity_index import EntityIndex
+from src.utils.profiling import profiled
 from pathlib import Path
 import json
 import logging
@@ -8,7 +14,8 @@ import yaml
 
 
 class ChunkLoader:
-    def __init__(self, config_path: str = None):
+    def __init__(self, config_path: str = None, embedding_model=None, milvus_client=None,
+                 entity_index: EntityIndex = None):
         # Setup logging
         self.logger = logging.getLogger(__name__)
         logging.basicConfig(level=logging.INFO)
@@ -19,17 +26,35 @@ class ChunkLoader:
             self.config = yaml.safe_load(f)
 
         # Initialize components
-        self.embedding_model = SentenceTransformer(
+        self.embedding_model = embedding_model or SentenceTransformer(
             self.config['embedding']['model_name']
         )
-        self.milvus_client = MilvusClient(config_path)
+        self.milvus_client = milvus_client or MilvusClient(config_path)
+        # Extracted contacts, links, fees and deadlines, indexed as the chunks are loaded
+        self.entity_index = entity_index or EntityIndex.from_config(config_path)
+        self._replaced_partitions = None
 
     def reconnect_milvus(self):
         """Create fresh Milvus connection"""
         self.milvus_client = MilvusClient()
 
-    def load_chunks(self, chunks_dir: str) -> None:
-        """Load all chunk files from directory"""
+    @profiled("load_chunks")
+    def load_chunks(self, chunks_dir: str, replace_partitions: bool = False) -> None:
+        """
+        Load all chunk files from directory, or every record of a packed chunk store
+
+        Args:
+            chunks_dir: Chunk directory or chunk store path
+            replace_partitions: Drop each partition (e.g. source handbook) the chunks
+                                belong to before inserting, so a reload replaces it
+        """
+        self._replaced_partitions = set() if replace_partitions else None
+
+        if is_chunk_store(chunks_dir):
+            self.load_store(chunks_dir)
+            self._save_entity_index()
+            return
+
         chunks_dir = Path(chunks_dir)
         chunk_files = list(chunks_dir.glob("chunk_*.json"))
         total_chunks = len(chunk_files)
@@ -55,8 +80,47 @@ class ChunkLoader:
                 self.logger.error(f"Error processing {chunk_file}: {e}")
                 continue
 
+        self._save_entity_index()
+
+    def _save_entity_index(self) -> None:
+        if self.entity_index.enabled and self.entity_index.path:
+            self.entity_index.save()
+
+    def load_store(self, store_path: str) -> None:
+        """Stream all chunks from a packed chunk store"""
+        batch_size = self.config['embedding']['batch_size']
+
+        with ChunkStore(store_path) as store:
+            total_chunks = len(store)
+            self.logger.info(f"Found {total_chunks} chunks in store {store_path}")
+
+            processed = 0
+            for batch in store.iter_batches(batch_size):
+                try:
+                    self._process_batch(batch)
+                except Exception as e:
+                    self.logger.error(f"Error processing chunks {processed + 1}-{processed + len(batch)}: {e}")
+                processed += len(batch)
+                self.logger.info(f"Processed chunks {processed - len(batch) + 1}-{processed} of {total_chunks}")
+
+    def _replace_partitions(self, chunk_batch: List[Dict]) -> None:
+        """Drop partitions the first time a chunk for them is seen during a replacing load"""
+        partition_key = getattr(self.milvus_client, "partition_key", None)
+        if self._replaced_partitions is None or not partition_key:
+            return
+
+        for chunk in chunk_batch:
+            value = chunk["metadata"].get(partition_key)
+            if value and value not in self._replaced_partitions:
+                self._replaced_partitions.add(value)
+                if self.milvus_client.drop_partition(value):
+                    self.logger.info(f"Replacing partition for {partition_key}={value}")
+                self.entity_index.drop(partition_key, value)
+
     def _process_batch(self, chunk_batch: List[Dict]) -> None:
         """Process and insert a batch of chunks"""
+        self._replace_partitions(chunk_batch)
+
         # Prepare texts for embedding
         texts = []
         valid_chunks = []
@@ -86,6 +150,7 @@ class ChunkLoader:
         embeddings = self.embedding_model.encode(texts)
 
         # Insert each chunk with its embedding
+        inserted = []
         for chunk, embedding in zip(valid_chunks, embeddings):
             try:
                 self.milvus_client.insert(
@@ -93,6 +158,7 @@ class ChunkLoader:
                     embedding=embedding.tolist(),
                     metadata=chunk["metadata"]
                 )
+                inserted.append(chunk)
             except Exception as e:
                 self.logger.error(f"Error inserting chunk: {e}")
                 # Try to reconnect and retry once
@@ -103,9 +169,14 @@ class ChunkLoader:
                         embedding=embedding.tolist(),
                         metadata=chunk["metadata"]
                     )
+                    inserted.append(chunk)
                 except Exception as e2:
                     self.logger.error(f"Retry failed: {e2}")
 
+        # Only chunks that made it into Milvus are answered from the entity index
+        if self.entity_index.enabled:
+            self.entity_index.add(inserted)
+
 
 if __name__ == "__main__":
     # Create loader
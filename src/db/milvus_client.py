@@ -1,63 +1,124 @@
-from typing import List, Optional, Dict, Any
-from pymilvus import (
-    connections,
-    Collection,
-    FieldSchema,
-    CollectionSchema,
-    DataType,
-    utility,
-)
+from typing import List, Optional, Dict, Any, Iterator
+try:
+    from pymilvus import (
+        connections,
+        Collection,
+        FieldSchema,
+        CollectionSchema,
+        DataType,
+        utility,
+    )
+except ImportError:  # only needed when talking to a live Milvus server
+    connections = Collection = FieldSchema = CollectionSchema = DataType = utility = None
+try:
+    from pymilvus import AsyncMilvusClient
+except ImportError:  # pymilvus < 2.5, asearch falls back to a thread
+    AsyncMilvusClient = None
 from src.utils.path_utils import get_config_path
+from src.utils.metrics import get_metrics
+from src.utils.lru_cache import LRUCache
+from src.utils.profiling import profiled
+from src.db.ranking import HeuristicRanker
+from src.db.vector_compression import build_compressor, FullPrecisionStore
+import asyncio
+import functools
 import yaml
 import json
 import logging
+import re
+import weakref
+import zlib
 import numpy as np
 
 
+DEFAULT_PARTITION = "_default"
+
+
+def decode_json(value: Any) -> Any:
+    """
+    A JSON field as read back from Milvus: rows inserted through the SDK
+    return it serialised, bulk-imported rows return it already parsed
+    """
+    return json.loads(value) if isinstance(value, (str, bytes)) else value
+
+
+def partition_name_for(value: Any) -> str:
+    """
+    Map a partition key value (e.g. a source file name) to a valid Milvus
+    partition name. A checksum suffix keeps names unique after sanitising.
+    """
+    if value is None or value == "":
+        return DEFAULT_PARTITION
+    text = str(value)
+    slug = re.sub(r"[^A-Za-z0-9_]+", "_", text).strip("_")[:200]
+    return f"p_{slug}_{zlib.crc32(text.encode('utf-8')):08x}"
+
+
 class MilvusClient:
-    def __init__(self, config_path: str = None):
+    def __init__(self, config_path: str = None, overrides: Optional[Dict[str, Any]] = None,
+                 shared_connection: bool = False):
+        """
+        Args:
+            config_path: Path to config.yaml
+            overrides: Keys replacing the 'milvus' section, e.g. a tenant's
+                collection_name, priority_terms or payload_cache_size
+            shared_connection: Reuse an open connection and never close it,
+                for several clients (one per collection) in one process
+        """
         self.logger = logging.getLogger(__name__)
+        self.metrics = get_metrics()
 
         config_path = config_path or get_config_path()
         with open(config_path, "r") as file:
-            self.config = yaml.safe_load(file)["milvus"]
+            self.config = {**yaml.safe_load(file)["milvus"], **(overrides or {})}
 
         self.host = self.config["host"]
         self.port = self.config["port"]
         self.collection_name = self.config["collection_name"]
+        self.shared_connection = shared_connection
+
+        self.ranker = HeuristicRanker(
+            priority_terms=self.config.get("priority_terms"),
+            weights=self.config.get("score_weights"),
+        )
+        # Candidates fetched per requested result, and IVF lists probed per search
+        self.oversample = self.config.get("oversample", 4)
+        self.nprobe = self.config.get("nprobe", 16)
+        # Metadata field that routes chunks into partitions, e.g. source_file or section
+        self.partition_key = self.config.get("partition_key")
+        self._partitions = set()
+        self.priority_terms = self.ranker.priority_terms
+
+        # Optional compressed first-stage vectors, re-scored against full vectors kept on disk
+        compression = self.config.get("compression") or {}
+        self.compressor = build_compressor(compression)
+        self.rescore_factor = compression.get("rescore_factor", 2)
+        self.full_vectors = None
+        if self.compressor.mode != "none":
+            self.full_vectors = FullPrecisionStore(
+                compression.get("side_store_dir", "data/vectors"), self.collection_name
+            )
 
-        self.priority_terms = {
-            'exam': {
-                'direct': ['exam', 'examination', 'test', 'assessment'],
-                'schedule': ['schedule', 'timetable', 'date', 'time', 'when'],
-                'context': ['online', 'sit', 'take', 'repeat']
-            },
-            'visa': {
-                'direct': ['visa', 'permit', 'immigration', 'stamp'],
-                'requirements': ['requirement', 'document', 'need', 'must', 'necessary'],
-                'process': ['apply', 'application', 'submit', 'renew', 'extend']
-            },
-            'library': {
-                'direct': ['library', 'study room', 'book'],
-                'access': ['access', 'enter', 'use', 'visit', 'open'],
-                'services': ['resource', 'material', 'database', 'research']
-            },
-            'medical': {
-                'direct': ['medical', 'health', 'healthcare', 'treatment'],
-                'providers': ['doctor', 'gp', 'physician', 'clinic', 'hospital'],
-                'services': ['service', 'appointment', 'care', 'consultation']
-            },
-            'student': {
-                'direct': ['student card', 'id card', 'identification'],
-                'card': ['card', 'id', 'badge', 'photo'],
-                'status': ['active', 'current', 'registered', 'valid']
-            }
-        }
+        # Two-phase search ranks on compact features and fetches payloads for the final hits only
+        self.two_phase = self.config.get("two_phase", False)
+        self.payload_cache = LRUCache(self.config.get("payload_cache_size", 4096), name="payload")
+        # gRPC aio channels belong to the loop they were created on, one client per loop
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = \
+            weakref.WeakKeyDictionary()
 
-        self._connect()
+        if not (shared_connection and connections is not None and connections.has_connection("default")):
+            self._connect()
         self.collection = self._init_collection()
 
+    @property
+    def dimension(self) -> int:
+        """Dimension of the full-precision embeddings"""
+        return self.compressor.dim
+
     def _connect(self) -> None:
+        if connections is None:
+            raise ImportError("pymilvus is required to connect to Milvus")
+
         try:
             try:
                 connections.disconnect("default")
@@ -79,13 +140,23 @@ class MilvusClient:
             if utility.has_collection(self.collection_name):
                 collection = Collection(self.collection_name)
                 self.logger.info(f"Using existing collection: {self.collection_name}")
+                self._has_rank_features = any(f.name == "rank_features" for f in collection.schema.fields)
+                if self.two_phase and not self._has_rank_features:
+                    self.logger.warning("Collection has no rank_features field, two-phase search is disabled "
+                                        "until the collection is rebuilt")
                 return collection
 
+            embedding_type = getattr(DataType, self.compressor.data_type, None)
+            if embedding_type is None:
+                raise ValueError(f"This pymilvus version has no {self.compressor.data_type} "
+                                 f"for compression mode '{self.compressor.mode}'")
+
             fields = [
                 FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
                 FieldSchema(name="content", dtype=DataType.VARCHAR, max_length=65535),
-                FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=384),
+                FieldSchema(name="embedding", dtype=embedding_type, dim=self.compressor.field_dim),
                 FieldSchema(name="metadata", dtype=DataType.JSON),
+                FieldSchema(name="rank_features", dtype=DataType.VARCHAR, max_length=4096),
             ]
 
             schema = CollectionSchema(
@@ -94,16 +165,10 @@ class MilvusClient:
             )
 
             collection = Collection(name=self.collection_name, schema=schema)
+            self._has_rank_features = True
             self.logger.info(f"Created new collection: {self.collection_name}")
 
-            index_params = {
-                "metric_type": "COSINE",
-                "index_type": "IVF_SQ8",
-                "params": {
-                    "nlist": 2048,
-                    "sq8_force": 1
-                },
-            }
+            index_params = self.compressor.index_params()
             collection.create_index(field_name="embedding", index_params=index_params)
             self.logger.info("Created index on embedding field")
 
@@ -113,151 +178,446 @@ class MilvusClient:
             self.logger.error(f"Failed to initialize collection: {e}")
             raise
 
+    def partition_for(self, metadata: Dict[str, Any]) -> str:
+        """Partition a chunk belongs to under the configured partition key"""
+        if not self.partition_key:
+            return DEFAULT_PARTITION
+        return partition_name_for(metadata.get(self.partition_key))
+
+    def _has_partition(self, partition_name: str) -> bool:
+        if partition_name == DEFAULT_PARTITION or partition_name in self._partitions:
+            return True
+        if self.collection.has_partition(partition_name):
+            self._partitions.add(partition_name)
+            return True
+        return False
+
+    def _existing_partitions(self, partition_names: List[str]) -> List[str]:
+        """The partitions that exist, searching one that was never created is an error in Milvus"""
+        return [p for p in partition_names if self._has_partition(p)]
+
+    def _ensure_partition(self, partition_name: str) -> None:
+        if not self._has_partition(partition_name):
+            self.collection.create_partition(partition_name)
+            self._partitions.add(partition_name)
+            self.logger.info(f"Created partition: {partition_name}")
+
     def insert(self, content: str, embedding: List[float], metadata: Dict[str, Any]) -> None:
-        try:
-            data = [
-                [content],
-                [embedding],
-                [json.dumps(metadata)],
-            ]
+        partition_name = self.partition_for(metadata)
+        # Encoding errors are not connection errors, they are raised without a retry
+        data = [
+            [content],
+            self.compressor.encode(np.asarray([embedding], dtype=np.float32)),
+            [json.dumps(metadata)],
+        ]
+        if self._has_rank_features:
+            features = self.ranker.features(content, metadata)
+            data.append([json.dumps(features, separators=(",", ":"))])
 
-            self.collection.insert(data)
+        try:
+            self._ensure_partition(partition_name)
+            result = self.collection.insert(data, partition_name=partition_name)
         except Exception as e:
             self.logger.error(f"Failed to insert document: {e}")
             try:
                 self._connect()
                 self.collection = self._init_collection()
-                self.collection.insert(data)
+                self._partitions.clear()
+                self._ensure_partition(partition_name)
+                result = self.collection.insert(data, partition_name=partition_name)
             except Exception as e2:
                 self.logger.error(f"Retry failed: {e2}")
                 raise
 
-    def _normalize_score(self, score: float, min_val: float = 0.65, max_val: float = 0.98) -> float:
-        return min_val + score * (max_val - min_val)
+        if self.full_vectors is not None:
+            self.full_vectors.append(result.primary_keys, [embedding])
+
+    def insert_columns(self, contents: List[str], embeddings: np.ndarray, metadata: List[str],
+                       rank_features: Optional[List[str]] = None) -> int:
+        """
+        Insert many rows with one request per partition, e.g. from a snapshot
+
+        Args:
+            contents: Chunk texts
+            embeddings: Full-precision vectors of shape (n, dim)
+            metadata: Metadata serialised as JSON
+            rank_features: Ranking features serialised as JSON, computed when omitted
+
+        Returns:
+            Number of rows inserted
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dimension)
+        partitions: Dict[str, List[int]] = {}
+        for row, meta in enumerate(metadata):
+            partition_name = self.partition_for(decode_json(meta)) if self.partition_key else DEFAULT_PARTITION
+            partitions.setdefault(partition_name, []).append(row)
+
+        for partition_name, rows in partitions.items():
+            data = [
+                [contents[i] for i in rows],
+                self.compressor.encode(embeddings[rows]),
+                [metadata[i] for i in rows],
+            ]
+            if self._has_rank_features:
+                if rank_features is None:
+                    data.append([json.dumps(self.ranker.features(contents[i], decode_json(metadata[i])),
+                                            separators=(",", ":")) for i in rows])
+                else:
+                    data.append([rank_features[i] for i in rows])
 
-    def search(self, query_embedding: List[float], limit: int = 5, query: str = "") -> List[Dict[str, Any]]:
+            try:
+                self._ensure_partition(partition_name)
+                result = self.collection.insert(data, partition_name=partition_name)
+            except Exception as e:
+                self.logger.error(f"Failed to insert {len(rows)} rows into {partition_name}: {e}")
+                raise
+            if self.full_vectors is not None:
+                self.full_vectors.append(result.primary_keys, embeddings[rows])
+        return len(contents)
+
+    def export_batches(self, batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """
+        Every row of the collection as column batches, for snapshots. Compressed
+        collections read their full-precision vectors from the side store.
+
+        Yields:
+            Dicts of content, embedding (n, dim) float32, metadata and rank_features, JSON serialised
+        """
+        output_fields = ["content", "metadata"]
+        if self._has_rank_features:
+            output_fields.append("rank_features")
+        if self.full_vectors is None:
+            output_fields.append("embedding")
+
+        self.collection.load()
+        iterator = self.collection.query_iterator(batch_size=batch_size, expr="id >= 0",
+                                                  output_fields=output_fields)
         try:
-            self.collection.load()
-
-            search_params = {
-                "metric_type": "L2",
-                "params": {"nprobe": 16}
-            }
-
-            raw_results = self.collection.search(
-                data=[query_embedding],
-                anns_field="embedding",
-                param=search_params,
-                limit=limit * 4,
-                output_fields=["content", "metadata"]
-            )
-
-            hits = []
-            for hits_i in raw_results:
-                for hit in hits_i:
-                    content = hit.entity.get("content")
-                    metadata = json.loads(hit.entity.get("metadata"))
-
-                    qa_parts = content.split('\nA:', 1)
-                    question = qa_parts[0].replace('Q:', '').strip()
-                    answer = qa_parts[1].strip() if len(qa_parts) > 1 else ""
-
-                    try:
-                        vector_sim = 1.0 / (1.0 + np.clip(float(hit.score), 0, 10) * 1.5)
-                    except (TypeError, ValueError, ZeroDivisionError):
-                        vector_sim = 0.0
-
-                    topic_rel = self._calculate_topic_relevance(query, question, answer)
-                    meta_rel = self._calculate_metadata_relevance(query, metadata)
-                    direct_match = 0.15 if self._has_direct_match(query, question) else 0
-
-                    raw_score = (
-                            0.40 * topic_rel +
-                            0.25 * vector_sim +
-                            0.20 * meta_rel +
-                            direct_match
-                    )
-
-                    final_score = self._normalize_score(raw_score)
-
-                    hits.append({
-                        "content": content,
-                        "metadata": metadata,
-                        "score": final_score
-                    })
-
-            hits.sort(key=lambda x: x["score"], reverse=True)
-            return hits[:limit]
+            while True:
+                rows = iterator.next()
+                if not rows:
+                    break
+                if self.full_vectors is None:
+                    embeddings = np.asarray([row["embedding"] for row in rows], dtype=np.float32)
+                else:
+                    embeddings = self.full_vectors.get(row["id"] for row in rows)
+                    missing = np.isnan(embeddings).any(axis=1)
+                    if missing.any():
+                        self.logger.warning(f"{int(missing.sum())} rows have no full-precision vector, "
+                                            f"leaving them out of the export")
+                        rows = [row for row, m in zip(rows, missing) if not m]
+                        embeddings = embeddings[~missing]
+
+                metadata = [row["metadata"] if isinstance(row["metadata"], str) else json.dumps(row["metadata"])
+                            for row in rows]
+                if self._has_rank_features:
+                    features = [row["rank_features"] for row in rows]
+                else:
+                    features = [json.dumps(self.ranker.features(row["content"], json.loads(meta)),
+                                           separators=(",", ":")) for row, meta in zip(rows, metadata)]
+                yield {
+                    "content": [row["content"] for row in rows],
+                    "embedding": embeddings,
+                    "metadata": metadata,
+                    "rank_features": features,
+                }
+        finally:
+            iterator.close()
+
+    @profiled("search")
+    def search(
+        self,
+        query_embedding: List[float],
+        limit: int = 5,
+        query: str = "",
+        oversample: Optional[int] = None,
+        nprobe: Optional[int] = None,
+        partitions: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Search for chunks similar to the query embedding
+
+        Args:
+            query_embedding: Embedded query
+            limit: Number of results to return
+            query: Raw query text used for re-ranking
+            oversample: ANN candidates fetched per result, defaults to config
+            nprobe: IVF lists probed, defaults to config
+            partitions: Partition key values (e.g. source file names) to restrict the search to
+        """
+        oversample = oversample or self.oversample
+        nprobe = nprobe or self.nprobe
+        partition_names = [partition_name_for(v) for v in partitions] if partitions else None
+        if partition_names:
+            partition_names = self._existing_partitions(partition_names)
+            if not partition_names:
+                return []
+        try:
+            with self.metrics.span("collection_load"):
+                self.collection.load()
+
+            two_phase = self.two_phase and self._has_rank_features
+            ann_limit, candidate_limit = self._ann_limits(limit, oversample)
+
+            with self.metrics.span("ann_search"):
+                raw_results = self.collection.search(
+                    data=self.compressor.encode(np.asarray([query_embedding], dtype=np.float32)),
+                    anns_field="embedding",
+                    param=self.compressor.search_params(nprobe),
+                    limit=ann_limit,
+                    output_fields=["rank_features"] if two_phase else ["content", "metadata"],
+                    partition_names=partition_names
+                )
+                if two_phase:
+                    candidates = [
+                        (hit.id, hit.entity.get("rank_features"), hit.score)
+                        for hits_i in raw_results
+                        for hit in hits_i
+                    ]
+                else:
+                    candidates = [
+                        (hit.id, (hit.entity.get("content"), hit.entity.get("metadata")), hit.score)
+                        for hits_i in raw_results
+                        for hit in hits_i
+                    ]
+
+            hits = self._rank(candidates, query_embedding, query, limit, candidate_limit, two_phase)
+            if two_phase:
+                with self.metrics.span("fetch_payloads"):
+                    hits = self._attach_payloads(hits)
+            return hits
 
         except Exception as e:
             self.logger.error(f"Search failed: {e}")
             try:
                 self._connect()
                 self.collection = self._init_collection()
-                return self.search(query_embedding, limit, query)
+                return self.search(query_embedding, limit, query, oversample, nprobe, partitions)
             except Exception as e2:
                 self.logger.error(f"Retry failed: {e2}")
                 raise
 
-    def _has_direct_match(self, query: str, text: str) -> bool:
-        query_terms = set(query.lower().split())
-        text_terms = set(text.lower().split())
-        return len(query_terms & text_terms) / max(len(query_terms), 1) > 0.5
+    async def asearch(
+        self,
+        query_embedding: List[float],
+        limit: int = 5,
+        query: str = "",
+        oversample: Optional[int] = None,
+        nprobe: Optional[int] = None,
+        partitions: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        search() without blocking the event loop
+
+        The ANN request goes through pymilvus' AsyncMilvusClient, and the
+        query-side ranking features are computed while it is in flight.
+        Blocking calls (partition lookups, loading the collection, reconnecting)
+        run on the default executor. Without AsyncMilvusClient (pymilvus < 2.5)
+        the blocking search runs there instead.
+        """
+        loop = asyncio.get_running_loop()
+        if AsyncMilvusClient is None:
+            return await loop.run_in_executor(None, functools.partial(
+                self.search, query_embedding, limit, query, oversample, nprobe, partitions))
 
-    def _calculate_topic_relevance(self, query: str, question: str, answer: str) -> float:
-        query = query.lower()
-        question = question.lower()
-        answer = answer.lower()
-
-        max_score = 0
-        for topic, term_groups in self.priority_terms.items():
-            if any(term in query for group in term_groups.values() for term in group):
-                topic_score = 0
-
-                direct_matches = sum(term in question for term in term_groups['direct'])
-                topic_score += direct_matches * 0.8
-
-                for idx, (group_name, terms) in enumerate(term_groups.items()):
-                    if group_name != 'direct':
-                        weight = 0.4 / max(idx + 1, 1)
-                        matches = sum(term in question or term in answer for term in terms)
-                        topic_score += matches * weight
-
-                max_score = max(max_score, min(topic_score, 1.0))
+        try:
+            return await self._asearch(loop, query_embedding, limit, query, oversample, nprobe, partitions)
+        except Exception as e:
+            self.logger.error(f"Search failed: {e}")
+            try:
+                await loop.run_in_executor(None, self._reconnect)
+                stale = self._async_clients.pop(loop, None)
+                if stale is not None:
+                    await stale.close()
+                return await self._asearch(loop, query_embedding, limit, query, oversample, nprobe, partitions)
+            except Exception as e2:
+                self.logger.error(f"Retry failed: {e2}")
+                raise
 
-        return max_score if max_score > 0 else 0.2
+    def _reconnect(self) -> None:
+        self._connect()
+        self.collection = self._init_collection()
 
-    def _calculate_metadata_relevance(self, query: str, metadata: Dict) -> float:
-        query = query.lower()
-        category = metadata.get("category", "").lower()
-        section = metadata.get("section", "").lower()
+    async def _asearch(self, loop: asyncio.AbstractEventLoop, query_embedding: List[float], limit: int,
+                       query: str, oversample: Optional[int], nprobe: Optional[int],
+                       partitions: Optional[List[str]]) -> List[Dict[str, Any]]:
+        oversample = oversample or self.oversample
+        nprobe = nprobe or self.nprobe
+        partition_names = [partition_name_for(v) for v in partitions] if partitions else None
+        if partition_names:
+            partition_names = await loop.run_in_executor(None, self._existing_partitions, partition_names)
+            if not partition_names:
+                return []
+
+        with self.metrics.span("collection_load"):
+            await loop.run_in_executor(None, self.collection.load)
+
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = self._async_clients[loop] = AsyncMilvusClient(uri=f"http://{self.host}:{self.port}")
+        two_phase = self.two_phase and self._has_rank_features
+        ann_limit, candidate_limit = self._ann_limits(limit, oversample)
+        output_fields = ["rank_features"] if two_phase else ["content", "metadata"]
+
+        with self.metrics.span("ann_search"):
+            rpc = asyncio.ensure_future(client.search(
+                collection_name=self.collection_name,
+                data=self.compressor.encode(np.asarray([query_embedding], dtype=np.float32)),
+                anns_field="embedding",
+                search_params=self.compressor.search_params(nprobe),
+                limit=ann_limit,
+                output_fields=output_fields,
+                partition_names=partition_names,
+            ))
+            query_features = self.ranker.query_features(query)
+            raw_results = await rpc
+
+        candidates = [
+            (hit["id"],
+             hit["entity"].get("rank_features") if two_phase
+             else (hit["entity"].get("content"), hit["entity"].get("metadata")),
+             hit["distance"])
+            for hits_i in raw_results
+            for hit in hits_i
+        ]
+        hits = self._rank(candidates, query_embedding, query, limit, candidate_limit, two_phase, query_features)
+        if two_phase:
+            with self.metrics.span("fetch_payloads"):
+                hits = await loop.run_in_executor(None, self._attach_payloads, hits)
+        return hits
+
+    def _ann_limits(self, limit: int, oversample: int):
+        """Candidates fetched from the index, and candidates kept for re-ranking"""
+        candidate_limit = limit * oversample
+        if self.full_vectors is not None:
+            return candidate_limit * self.rescore_factor, candidate_limit
+        return candidate_limit, candidate_limit
+
+    def _rank(self, candidates: List[tuple], query_embedding: List[float], query: str, limit: int,
+              candidate_limit: int, two_phase: bool,
+              query_features: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Re-score compressed candidates, re-rank and keep the best limit"""
+        if self.full_vectors is not None:
+            with self.metrics.span("rescore"):
+                candidates = self._rescore(candidates, query_embedding, candidate_limit)
+
+        with self.metrics.span("rerank"):
+            if two_phase:
+                hits = self.ranker.rerank_features(
+                    ((key, decode_json(features), distance) for key, features, distance in candidates),
+                    query, query_features
+                )
+            else:
+                hits = self.ranker.rerank(
+                    ((content, decode_json(metadata), distance)
+                     for _, (content, metadata), distance in candidates),
+                    query, query_features
+                )
+
+        hits.sort(key=lambda x: x["score"], reverse=True)
+        return hits[:limit]
+
+    def _rescore(self, candidates: List[tuple], query_embedding: List[float], limit: int) -> List[tuple]:
+        """Replace compressed-space distances with exact L2 distances and keep the closest limit"""
+        if not candidates:
+            return candidates
+
+        full = self.full_vectors.get([c[0] for c in candidates])
+        distances = np.sum((full - np.asarray(query_embedding, dtype=np.float32)) ** 2, axis=1)
+        missing = np.isnan(distances)
+        if missing.any():
+            self.logger.warning(f"{int(missing.sum())} candidates have no full-precision vector, skipping them")
+
+        order = [i for i in np.argsort(np.where(missing, np.inf, distances), kind="stable") if not missing[i]]
+        return [(*candidates[i][:-1], float(distances[i])) for i in order[:limit]]
+
+    def _attach_payloads(self, hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Fill in content and metadata for ranked hits, from the payload cache or by primary key"""
+        payloads = self.payload_cache.get_many(hit["id"] for hit in hits)
+        missing = [hit["id"] for hit in hits if hit["id"] not in payloads]
+        if missing:
+            rows = self.collection.query(expr=f"id in {missing}", output_fields=["content", "metadata"])
+            for row in rows:
+                payload = (row["content"], row["metadata"])
+                self.payload_cache.put(row["id"], payload)
+                payloads[row["id"]] = payload
+
+        result = []
+        for hit in hits:
+            payload = payloads.get(hit["id"])
+            if payload is None:
+                # Deleted between the two phases
+                continue
+            content, metadata = payload
+            result.append({"content": content, "metadata": decode_json(metadata), **hit})
+        return result
+
+    def load(self) -> None:
+        """Load the collection into query node memory"""
+        self.collection.load()
+
+    def release(self) -> None:
+        """Release the collection from query node memory, it is loaded again by the next search"""
+        self.collection.release()
+        self.payload_cache.clear()
+
+    def ping(self) -> Dict[str, Any]:
+        """
+        Cheap health check over the existing connection: server version and
+        collection load state. Never reconnects or loads the collection.
+        """
+        state = utility.load_state(self.collection_name)
+        return {
+            "server_version": utility.get_server_version(),
+            "load_state": getattr(state, "name", str(state)),
+            "loaded": getattr(state, "name", str(state)) == "Loaded",
+        }
 
-        category_score = 0
-        for topic, term_groups in self.priority_terms.items():
-            if any(term in query for group in term_groups.values() for term in group):
-                if any(term in category for term in term_groups['direct']):
-                    category_score += 0.8
-                elif any(term in category for group in term_groups.values() for term in group):
-                    category_score += 0.4
+    def drop_partition(self, value: Any) -> bool:
+        """
+        Drop every chunk stored under a partition key value, e.g. one handbook.
+        Other partitions are not touched or compacted.
 
-                if any(term in section for term in term_groups['direct']):
-                    category_score += 0.4
-                elif any(term in section for group in term_groups.values() for term in group):
-                    category_score += 0.2
+        Returns:
+            True if a partition was dropped
+        """
+        partition_name = partition_name_for(value)
+        if partition_name == DEFAULT_PARTITION:
+            raise ValueError("Cannot drop the default partition")
 
-        return min(category_score, 1.0)
+        try:
+            if not self._has_partition(partition_name):
+                return False
+            self.collection.partition(partition_name).release()
+            self.collection.drop_partition(partition_name)
+            self._partitions.discard(partition_name)
+            self.logger.info(f"Dropped partition {partition_name} for {self.partition_key}={value}")
+            return True
+        except Exception as e:
+            self.logger.error(f"Failed to drop partition {partition_name}: {e}")
+            raise
 
     def delete(self, filter_params: Dict[str, Any]) -> None:
+        # Deleting a whole partition key value is a partition drop, not a scan
+        if self.partition_key and list(filter_params) == [self.partition_key]:
+            self.drop_partition(filter_params[self.partition_key])
+            return
+
         try:
             expr = " and ".join([f'json_contains(metadata, "{v}", "{k}")'
                                  for k, v in filter_params.items()])
-            self.collection.delete(expr)
+            partition_name = None
+            if self.partition_key and self.partition_key in filter_params:
+                partition_name = partition_name_for(filter_params[self.partition_key])
+            self.collection.delete(expr, partition_name=partition_name)
             self.logger.info(f"Deleted documents matching filter: {filter_params}")
         except Exception as e:
             self.logger.error(f"Failed to delete documents: {e}")
             raise
 
     def __del__(self):
+        if getattr(self, "shared_connection", False):
+            return
         try:
             connections.disconnect("default")
             self.logger.info("Disconnected from Milvus")
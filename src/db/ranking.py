@@ -0,0 +1,213 @@
+from typing import List, Dict, Any, Iterable, Tuple, Optional, Set
+import copy
+import numpy as np
+
+
+DEFAULT_PRIORITY_TERMS = {
+    'exam': {
+        'direct': ['exam', 'examination', 'test', 'assessment'],
+        'schedule': ['schedule', 'timetable', 'date', 'time', 'when'],
+        'context': ['online', 'sit', 'take', 'repeat']
+    },
+    'visa': {
+        'direct': ['visa', 'permit', 'immigration', 'stamp'],
+        'requirements': ['requirement', 'document', 'need', 'must', 'necessary'],
+        'process': ['apply', 'application', 'submit', 'renew', 'extend']
+    },
+    'library': {
+        'direct': ['library', 'study room', 'book'],
+        'access': ['access', 'enter', 'use', 'visit', 'open'],
+        'services': ['resource', 'material', 'database', 'research']
+    },
+    'medical': {
+        'direct': ['medical', 'health', 'healthcare', 'treatment'],
+        'providers': ['doctor', 'gp', 'physician', 'clinic', 'hospital'],
+        'services': ['service', 'appointment', 'care', 'consultation']
+    },
+    'student': {
+        'direct': ['student card', 'id card', 'identification'],
+        'card': ['card', 'id', 'badge', 'photo'],
+        'status': ['active', 'current', 'registered', 'valid']
+    }
+}
+
+
+# Weights of the re-ranking signals: topic relevance, vector similarity,
+# metadata relevance and the bonus for a direct question match
+DEFAULT_WEIGHTS = {
+    "topic": 0.40,
+    "vector": 0.25,
+    "metadata": 0.20,
+    "direct": 0.15,
+}
+
+
+class HeuristicRanker:
+    """Keyword and metadata heuristics used to re-rank ANN candidates"""
+
+    def __init__(
+        self,
+        priority_terms: Optional[Dict[str, Dict[str, List[str]]]] = None,
+        weights: Optional[Dict[str, float]] = None,
+    ):
+        self.priority_terms = priority_terms or copy.deepcopy(DEFAULT_PRIORITY_TERMS)
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+
+    def rerank(self, candidates: Iterable[Tuple[str, Dict, float]], query: str,
+               query_features: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Score ANN candidates
+
+        Args:
+            candidates: (content, metadata, distance) tuples from the vector search
+            query: Raw query text
+            query_features: query_features(query), when already computed
+
+        Returns:
+            Unsorted list of hits with content, metadata, score and vector_similarity
+        """
+        query_features = query_features or self.query_features(query)
+        hits = []
+        for content, metadata, distance in candidates:
+            hits.append({
+                "content": content,
+                "metadata": metadata,
+                "score": self.score_features(query, self.features(content, metadata), distance, query_features),
+                "vector_similarity": self._vector_similarity(distance)
+            })
+        return hits
+
+    def rerank_features(self, candidates: Iterable[Tuple[Any, Dict, float]], query: str,
+                        query_features: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Score ANN candidates from their compact ranking features, without payloads
+
+        Args:
+            candidates: (id, features, distance) tuples, features as built by features()
+            query: Raw query text
+            query_features: query_features(query), when already computed
+
+        Returns:
+            Unsorted list of hits with id, score and vector_similarity
+        """
+        query_features = query_features or self.query_features(query)
+        return [
+            {
+                "id": key,
+                "score": self.score_features(query, features, distance, query_features),
+                "vector_similarity": self._vector_similarity(distance)
+            }
+            for key, features, distance in candidates
+        ]
+
+    def features(self, content: str, metadata: Dict) -> Dict[str, Any]:
+        """
+        Everything score() reads from a chunk, small enough to fetch for every
+        ANN candidate: the question, category, section and the priority terms
+        that occur in the answer.
+        """
+        qa_parts = content.split('\nA:', 1)
+        question = qa_parts[0].replace('Q:', '').strip()
+        answer = qa_parts[1].strip().lower() if len(qa_parts) > 1 else ""
+        answer_terms = sorted({
+            term
+            for term_groups in self.priority_terms.values()
+            for terms in term_groups.values()
+            for term in terms
+            if term in answer
+        })
+        return {
+            "question": question,
+            "answer_terms": answer_terms,
+            "category": metadata.get("category", ""),
+            "section": metadata.get("section", ""),
+        }
+
+    def query_features(self, query: str) -> Dict[str, Any]:
+        """
+        Everything score() derives from the query alone: its terms and the
+        topics it mentions. Computed once per search instead of per candidate,
+        and while the ANN request is still in flight on the async path.
+        """
+        query = query.lower()
+        return {
+            "terms": set(query.split()),
+            "topics": [
+                term_groups for term_groups in self.priority_terms.values()
+                if any(term in query for group in term_groups.values() for term in group)
+            ],
+        }
+
+    def score(self, query: str, content: str, metadata: Dict, distance: float) -> float:
+        return self.score_features(query, self.features(content, metadata), distance)
+
+    def score_features(self, query: str, features: Dict[str, Any], distance: float,
+                       query_features: Optional[Dict[str, Any]] = None) -> float:
+        query_features = query_features or self.query_features(query)
+        question = features["question"]
+
+        vector_sim = self._vector_similarity(distance)
+        topic_rel = self._calculate_topic_relevance(query_features["topics"], question, set(features["answer_terms"]))
+        meta_rel = self._calculate_metadata_relevance(query_features["topics"], features)
+        direct_match = self.weights["direct"] if self._has_direct_match(query_features["terms"], question) else 0
+
+        raw_score = (
+                self.weights["topic"] * topic_rel +
+                self.weights["vector"] * vector_sim +
+                self.weights["metadata"] * meta_rel +
+                direct_match
+        )
+
+        return self._normalize_score(raw_score)
+
+    def _vector_similarity(self, distance: float) -> float:
+        try:
+            return 1.0 / (1.0 + np.clip(float(distance), 0, 10) * 1.5)
+        except (TypeError, ValueError, ZeroDivisionError):
+            return 0.0
+
+    def _normalize_score(self, score: float, min_val: float = 0.65, max_val: float = 0.98) -> float:
+        return min_val + score * (max_val - min_val)
+
+    def _has_direct_match(self, query_terms: Set[str], text: str) -> bool:
+        text_terms = set(text.lower().split())
+        return len(query_terms & text_terms) / max(len(query_terms), 1) > 0.5
+
+    def _calculate_topic_relevance(self, topics: List[Dict[str, List[str]]], question: str,
+                                   answer_terms: Set[str]) -> float:
+        question = question.lower()
+
+        max_score = 0
+        for term_groups in topics:
+            topic_score = 0
+
+            direct_matches = sum(term in question for term in term_groups['direct'])
+            topic_score += direct_matches * 0.8
+
+            for idx, (group_name, terms) in enumerate(term_groups.items()):
+                if group_name != 'direct':
+                    weight = 0.4 / max(idx + 1, 1)
+                    matches = sum(term in question or term in answer_terms for term in terms)
+                    topic_score += matches * weight
+
+            max_score = max(max_score, min(topic_score, 1.0))
+
+        return max_score if max_score > 0 else 0.2
+
+    def _calculate_metadata_relevance(self, topics: List[Dict[str, List[str]]], metadata: Dict) -> float:
+        category = metadata.get("category", "").lower()
+        section = metadata.get("section", "").lower()
+
+        category_score = 0
+        for term_groups in topics:
+            if any(term in category for term in term_groups['direct']):
+                category_score += 0.8
+            elif any(term in category for group in term_groups.values() for term in group):
+                category_score += 0.4
+
+            if any(term in section for term in term_groups['direct']):
+                category_score += 0.4
+            elif any(term in section for group in term_groups.values() for term in group):
+                category_score += 0.2
+
+        return min(category_score, 1.0)
@@ -0,0 +1,381 @@
+from typing import List, Dict, Any, Iterator, Optional, Union
+try:
+    from minio import Minio
+except ImportError:  # only needed for Milvus bulk import through MinIO
+    Minio = None
+try:
+    from pymilvus import utility
+except ImportError:  # only needed for Milvus bulk import
+    utility = None
+from src.utils.profiling import profiled
+from pathlib import Path
+import argparse
+import json
+import logging
+import tempfile
+import time
+import zlib
+import numpy as np
+
+
+SNAPSHOT_FORMAT = "dbsgpt-snapshot"
+SNAPSHOT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+EMBEDDINGS_FILE = "embeddings.f32"
+# Serialised string columns, each a UTF-8 blob '<name>.bin' and int64 row end offsets '<name>.off'
+STRING_COLUMNS = ("content", "metadata", "rank_features")
+
+logger = logging.getLogger(__name__)
+
+
+class _ChecksumFile:
+    """Binary file writer keeping a running CRC32 and byte count"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = open(path, "wb")
+        self.crc = 0
+        self.size = 0
+
+    def write(self, data: bytes) -> None:
+        self._file.write(data)
+        self.crc = zlib.crc32(data, self.crc)
+        self.size += len(data)
+
+    def close(self) -> Dict[str, Any]:
+        self._file.close()
+        return {"bytes": self.size, "crc32": f"{self.crc:08x}"}
+
+
+class SnapshotWriter:
+    """
+    Writes an indexed corpus as columnar files in one directory: float32
+    embeddings row after row, and each string column as a single blob with
+    an offsets file. The manifest is written last, so a directory without
+    one is an unfinished export.
+    """
+
+    def __init__(self, path: Union[str, Path], dimension: int, embedding_model: Optional[str] = None,
+                 collection_name: Optional[str] = None, partition_key: Optional[str] = None):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        (self.path / MANIFEST_FILE).unlink(missing_ok=True)
+
+        self.dimension = dimension
+        self.info = {
+            "embedding_model": embedding_model,
+            "collection_name": collection_name,
+            "partition_key": partition_key,
+        }
+        self.rows = 0
+        self.manifest: Optional[Dict[str, Any]] = None
+        self._embeddings = _ChecksumFile(self.path / EMBEDDINGS_FILE)
+        self._blobs = {name: _ChecksumFile(self.path / f"{name}.bin") for name in STRING_COLUMNS}
+        self._offsets = {name: _ChecksumFile(self.path / f"{name}.off") for name in STRING_COLUMNS}
+
+    def __enter__(self) -> "SnapshotWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            for f in (self._embeddings, *self._blobs.values(), *self._offsets.values()):
+                f.close()
+
+    def append(self, contents: List[str], embeddings: np.ndarray, metadata: List[str],
+               rank_features: List[str]) -> None:
+        """
+        Append a batch of rows
+
+        Args:
+            contents: Chunk texts
+            embeddings: Full-precision vectors of shape (n, dimension)
+            metadata: Metadata serialised as JSON
+            rank_features: Ranking features serialised as JSON
+        """
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32).reshape(-1, self.dimension)
+        columns = {"content": contents, "metadata": metadata, "rank_features": rank_features}
+        if any(len(values) != len(embeddings) for values in columns.values()):
+            raise ValueError("All snapshot columns must have the same number of rows")
+
+        self._embeddings.write(embeddings.tobytes())
+        for name, values in columns.items():
+            encoded = [value.encode("utf-8") for value in values]
+            ends = self._blobs[name].size + np.cumsum([len(e) for e in encoded], dtype=np.int64)
+            self._blobs[name].write(b"".join(encoded))
+            self._offsets[name].write(ends.astype(np.int64).tobytes())
+        self.rows += len(embeddings)
+
+    def close(self) -> Dict[str, Any]:
+        files = {EMBEDDINGS_FILE: self._embeddings.close()}
+        for name in STRING_COLUMNS:
+            files[f"{name}.bin"] = self._blobs[name].close()
+            files[f"{name}.off"] = self._offsets[name].close()
+
+        manifest = {
+            "format": SNAPSHOT_FORMAT,
+            "version": SNAPSHOT_VERSION,
+            "rows": self.rows,
+            "dimension": self.dimension,
+            **self.info,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "files": files,
+        }
+        with open(self.path / MANIFEST_FILE, "w") as f:
+            json.dump(manifest, f, indent=2)
+        self.manifest = manifest
+        return manifest
+
+
+class Snapshot:
+    """Read-only view of a snapshot directory, columns are memory-mapped"""
+
+    def __init__(self, path: Union[str, Path], verify: bool = True):
+        """
+        Args:
+            path: Snapshot directory
+            verify: Check every file's size and CRC32 against the manifest
+        """
+        self.path = Path(path)
+        manifest_path = self.path / MANIFEST_FILE
+        if not manifest_path.exists():
+            raise FileNotFoundError(f"No {MANIFEST_FILE} in {self.path}, not a snapshot or an unfinished export")
+        with open(manifest_path, "r") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format") != SNAPSHOT_FORMAT or self.manifest.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot format in {self.path}: "
+                             f"{self.manifest.get('format')} v{self.manifest.get('version')}")
+        if verify:
+            self.verify()
+
+        self.rows = self.manifest["rows"]
+        self.dimension = self.manifest["dimension"]
+        self.embeddings = self._map(EMBEDDINGS_FILE, np.float32).reshape(self.rows, self.dimension)
+        self._blobs = {name: self._map(f"{name}.bin", np.uint8) for name in STRING_COLUMNS}
+        self._ends = {name: self._map(f"{name}.off", np.int64) for name in STRING_COLUMNS}
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def _map(self, name: str, dtype) -> np.ndarray:
+        if self.manifest["files"][name]["bytes"] == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(self.path / name, dtype=dtype, mode="r")
+
+    def verify(self) -> None:
+        """Raise ValueError when a file was truncated or corrupted in transit"""
+        for name, expected in self.manifest["files"].items():
+            path = self.path / name
+            size = path.stat().st_size if path.exists() else -1
+            if size != expected["bytes"]:
+                raise ValueError(f"Snapshot file {name} has {size} bytes, expected {expected['bytes']}")
+            crc = 0
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    crc = zlib.crc32(block, crc)
+            if f"{crc:08x}" != expected["crc32"]:
+                raise ValueError(f"Snapshot file {name} failed its checksum")
+
+    def strings(self, name: str, start: int, stop: int) -> List[str]:
+        """Rows start..stop of a string column"""
+        ends = self._ends[name][start:stop]
+        blob_start = int(self._ends[name][start - 1]) if start else 0
+        data = self._blobs[name][blob_start:int(ends[-1]) if len(ends) else blob_start].tobytes()
+        bounds = np.concatenate(([0], ends - blob_start))
+        return [data[bounds[i]:bounds[i + 1]].decode("utf-8") for i in range(len(ends))]
+
+    def iter_batches(self, batch_size: int = 5000) -> Iterator[Dict[str, Any]]:
+        """Batches of rows as columns: content, embedding, metadata, rank_features"""
+        for start in range(0, self.rows, batch_size):
+            stop = min(start + batch_size, self.rows)
+            yield {
+                "embedding": np.asarray(self.embeddings[start:stop]),
+                **{name: self.strings(name, start, stop) for name in STRING_COLUMNS},
+            }
+
+
+def _store_dimension(store) -> int:
+    return getattr(store, "dimension", None) or store.compressor.dim
+
+
+@profiled("export_snapshot")
+def export_snapshot(store, path: Union[str, Path], batch_size: int = 1000,
+                    embedding_model: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Write every row of a live collection to a snapshot directory
+
+    Args:
+        store: MilvusClient or InMemoryVectorStore
+        path: Output directory
+        batch_size: Rows read from the collection per request
+        embedding_model: Name of the model the embeddings came from, checked on import
+
+    Returns:
+        The snapshot manifest
+    """
+    with SnapshotWriter(path, _store_dimension(store), embedding_model,
+                        getattr(store, "collection_name", None), store.partition_key) as writer:
+        for batch in store.export_batches(batch_size):
+            writer.append(batch["content"], batch["embedding"], batch["metadata"], batch["rank_features"])
+    logger.info(f"Exported {writer.rows} rows to {path}")
+    return writer.manifest
+
+
+@profiled("import_snapshot")
+def import_snapshot(store, path: Union[str, Path], batch_size: int = 5000,
+                    embedding_model: Optional[str] = None, verify: bool = True) -> int:
+    """
+    Insert a snapshot into an empty collection with columnar batch inserts,
+    no embedding or feature extraction is run
+
+    Args:
+        store: MilvusClient or InMemoryVectorStore
+        path: Snapshot directory
+        batch_size: Rows per insert request
+        embedding_model: Model the serving side embeds queries with, must match the snapshot's
+        verify: Check file checksums before inserting
+
+    Returns:
+        Number of rows inserted
+    """
+    snapshot = check_compatible(store, Snapshot(path, verify), embedding_model)
+    inserted = 0
+    for batch in snapshot.iter_batches(batch_size):
+        inserted += store.insert_columns(batch["content"], batch["embedding"], batch["metadata"],
+                                         batch["rank_features"])
+        logger.info(f"Imported {inserted} of {len(snapshot)} rows")
+    return inserted
+
+
+def check_compatible(store, snapshot: Snapshot, embedding_model: Optional[str] = None) -> Snapshot:
+    """Raise ValueError when the snapshot's vectors can't be searched by this store"""
+    if snapshot.dimension != _store_dimension(store):
+        raise ValueError(f"Snapshot vectors have {snapshot.dimension} dimensions, "
+                         f"the collection expects {_store_dimension(store)}")
+    exported_with = snapshot.manifest.get("embedding_model")
+    if embedding_model and exported_with and embedding_model != exported_with:
+        raise ValueError(f"Snapshot was embedded with {exported_with}, queries are embedded with {embedding_model}")
+    return snapshot
+
+
+def _bulk_columns(client, snapshot: Snapshot, rows: List[int], contents: List[str], metadata: List[str],
+                  features: List[str]) -> Dict[str, np.ndarray]:
+    """Numpy column arrays of one partition, named after the collection fields"""
+    rows = np.asarray(rows)
+    columns = {
+        "content": np.array([contents[i] for i in rows]),
+        "embedding": np.asarray(snapshot.embeddings[rows], dtype=np.float32),
+        # JSON strings, Milvus parses them into the JSON field
+        "metadata": np.array([metadata[i] for i in rows]),
+    }
+    if client._has_rank_features:
+        columns["rank_features"] = np.array([features[i] for i in rows])
+    return columns
+
+
+@profiled("bulk_import_snapshot")
+def bulk_import_snapshot(client, path: Union[str, Path], endpoint: str = "localhost:9000",
+                         access_key: str = "minioadmin", secret_key: str = "minioadmin",
+                         bucket: str = "a-bucket", prefix: str = "snapshots", timeout: float = 1800,
+                         embedding_model: Optional[str] = None, verify: bool = True) -> int:
+    """
+    Milvus bulk import of a snapshot: one set of numpy column files per
+    partition is uploaded to the MinIO bucket Milvus stores its data in, and
+    the data nodes build the segments without going through the insert path
+
+    Args:
+        client: MilvusClient of the target collection
+        path: Snapshot directory
+        endpoint, access_key, secret_key, bucket: MinIO of the Milvus deployment
+        prefix: Object prefix the column files are uploaded under
+        timeout: Seconds to wait for the import tasks
+
+    Returns:
+        Number of rows imported
+    """
+    if Minio is None or utility is None:
+        raise ImportError("minio and pymilvus are required for bulk import")
+    if client.full_vectors is not None:
+        raise ValueError("Bulk import can't fill the full-precision side store of a compressed collection, "
+                         "use import_snapshot")
+
+    snapshot = check_compatible(client, Snapshot(path, verify), embedding_model)
+    minio = Minio(endpoint, access_key=access_key, secret_key=secret_key, secure=False)
+    if not minio.bucket_exists(bucket):
+        raise ValueError(f"MinIO bucket {bucket} does not exist, it should be Milvus' own bucket")
+
+    contents = snapshot.strings("content", 0, len(snapshot))
+    metadata = snapshot.strings("metadata", 0, len(snapshot))
+    features = snapshot.strings("rank_features", 0, len(snapshot))
+    partitions: Dict[str, List[int]] = {}
+    for row, meta in enumerate(metadata):
+        partitions.setdefault(client.partition_for(json.loads(meta)), []).append(row)
+
+    tasks = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for partition_name, rows in partitions.items():
+            client._ensure_partition(partition_name)
+            columns = _bulk_columns(client, snapshot, rows, contents, metadata, features)
+
+            files = []
+            for field, values in columns.items():
+                local = Path(tmp) / f"{partition_name}_{field}.npy"
+                np.save(local, values)
+                # Milvus maps numpy files to fields by file name
+                key = f"{prefix}/{snapshot.path.name}/{partition_name}/{field}.npy"
+                minio.fput_object(bucket, key, str(local))
+                files.append(key)
+            tasks.append(utility.do_bulk_insert(client.collection_name, files=files, partition_name=partition_name))
+            logger.info(f"Started bulk import of {len(rows)} rows into {partition_name}")
+
+    deadline = time.monotonic() + timeout
+    imported = 0
+    for task in tasks:
+        while True:
+            state = utility.get_bulk_insert_state(task)
+            if state.state_name == "Completed":
+                imported += state.row_count
+                break
+            if state.state_name == "Failed":
+                raise RuntimeError(f"Bulk import task {task} failed: {state.failed_reason}")
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Bulk import task {task} still {state.state_name} after {timeout}s")
+            time.sleep(1)
+    logger.info(f"Bulk imported {imported} rows from {path}")
+    return imported
+
+
+if __name__ == "__main__":
+    from src.db.milvus_client import MilvusClient
+    from src.utils.path_utils import get_config_path
+    import yaml
+
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Export or import a snapshot of the indexed corpus")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("path", help="Snapshot directory")
+    parser.add_argument("--config", default=None)
+    parser.add_argument("--bulk", action="store_true", help="Milvus bulk import through MinIO")
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args()
+
+    config_path = args.config or get_config_path()
+    with open(config_path, "r") as file:
+        config = yaml.safe_load(file)
+    settings = config.get("snapshot", {}) or {}
+    model_name = config["embedding"]["model_name"]
+    client = MilvusClient(config_path)
+
+    start = time.perf_counter()
+    if args.command == "export":
+        manifest = export_snapshot(client, args.path, args.batch_size or settings.get("export_batch_size", 1000),
+                                   embedding_model=model_name)
+        count = manifest["rows"]
+    elif args.bulk:
+        count = bulk_import_snapshot(client, args.path, embedding_model=model_name, **(settings.get("minio") or {}))
+    else:
+        count = import_snapshot(client, args.path, args.batch_size or settings.get("import_batch_size", 5000),
+                                embedding_model=model_name)
+    print(f"{args.command.capitalize()}ed {count} rows in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,264 @@
+from typing import List, Dict, Any, Optional, Iterable
+from pathlib import Path
+import argparse
+import logging
+import os
+import threading
+import numpy as np
+
+
+class VectorCompressor:
+    """
+    Representation stored in the Milvus embedding field. The base class keeps
+    full float32 vectors and the original IVF_SQ8 index.
+    """
+
+    mode = "none"
+    data_type = "FLOAT_VECTOR"
+    metric_type = "L2"
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    @property
+    def field_dim(self) -> int:
+        return self.dim
+
+    @property
+    def bytes_per_vector(self) -> int:
+        return self.field_dim * 4
+
+    def encode(self, vectors: np.ndarray) -> List[Any]:
+        """Convert float32 vectors of shape (n, dim) into insertable field values"""
+        return np.asarray(vectors, dtype=np.float32).tolist()
+
+    def index_params(self) -> Dict[str, Any]:
+        return {
+            "metric_type": "COSINE",
+            "index_type": "IVF_SQ8",
+            "params": {
+                "nlist": 2048,
+                "sq8_force": 1
+            },
+        }
+
+    def search_params(self, nprobe: int) -> Dict[str, Any]:
+        return {"metric_type": self.metric_type, "params": {"nprobe": nprobe}}
+
+    def distances(self, query_codes: Any, codes: Any) -> np.ndarray:
+        """Distances in the compressed space, used by the offline benchmark"""
+        return np.sum((np.asarray(codes, np.float32) - np.asarray(query_codes, np.float32)) ** 2, axis=1)
+
+
+class Float16Compressor(VectorCompressor):
+    """Half-precision vectors, needs a Milvus/pymilvus release with FLOAT16_VECTOR (2.4+)"""
+
+    mode = "float16"
+    data_type = "FLOAT16_VECTOR"
+
+    @property
+    def bytes_per_vector(self) -> int:
+        return self.dim * 2
+
+    def encode(self, vectors: np.ndarray) -> List[Any]:
+        return list(np.asarray(vectors, dtype=np.float16))
+
+    def index_params(self) -> Dict[str, Any]:
+        return {"metric_type": "L2", "index_type": "IVF_FLAT", "params": {"nlist": 2048}}
+
+    def distances(self, query_codes: Any, codes: Any) -> np.ndarray:
+        codes = np.asarray(codes, dtype=np.float16).astype(np.float32)
+        return np.sum((codes - np.asarray(query_codes, np.float16).astype(np.float32)) ** 2, axis=1)
+
+
+class BinaryCompressor(VectorCompressor):
+    """One sign bit per dimension, searched by Hamming distance"""
+
+    mode = "binary"
+    data_type = "BINARY_VECTOR"
+    metric_type = "HAMMING"
+
+    @property
+    def bytes_per_vector(self) -> int:
+        return (self.dim + 7) // 8
+
+    def encode(self, vectors: np.ndarray) -> List[bytes]:
+        bits = np.packbits(np.asarray(vectors) > 0, axis=1)
+        return [row.tobytes() for row in bits]
+
+    def index_params(self) -> Dict[str, Any]:
+        return {"metric_type": "HAMMING", "index_type": "BIN_IVF_FLAT", "params": {"nlist": 1024}}
+
+    def distances(self, query_codes: Any, codes: Any) -> np.ndarray:
+        codes = np.frombuffer(b"".join(codes), dtype=np.uint8).reshape(len(codes), -1)
+        query = np.frombuffer(query_codes, dtype=np.uint8)
+        return np.unpackbits(codes ^ query, axis=1).sum(axis=1)
+
+
+class PCACompressor(VectorCompressor):
+    """Linear projection onto the top principal components fitted at ingest time"""
+
+    mode = "pca"
+
+    def __init__(self, dim: int = 384, pca_dim: int = 96, path: Optional[str] = None):
+        super().__init__(dim)
+        self.pca_dim = pca_dim
+        self.path = path
+        self.mean: Optional[np.ndarray] = None
+        self.components: Optional[np.ndarray] = None
+        if path and os.path.exists(path):
+            self.load(path)
+
+    @property
+    def field_dim(self) -> int:
+        return self.pca_dim
+
+    @property
+    def fitted(self) -> bool:
+        return self.components is not None
+
+    def fit(self, vectors: np.ndarray) -> "PCACompressor":
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(vectors) < self.pca_dim:
+            raise ValueError(f"Need at least {self.pca_dim} vectors to fit a {self.pca_dim}-d projection")
+        self.mean = vectors.mean(axis=0)
+        _, _, vt = np.linalg.svd(vectors - self.mean, full_matrices=False)
+        self.components = vt[:self.pca_dim].astype(np.float32)
+        return self
+
+    def save(self, path: Optional[str] = None) -> None:
+        path = path or self.path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez(f, mean=self.mean, components=self.components)
+
+    def load(self, path: str) -> None:
+        data = np.load(path)
+        self.mean = data["mean"]
+        self.components = data["components"]
+        self.pca_dim = self.components.shape[0]
+
+    def project(self, vectors: np.ndarray) -> np.ndarray:
+        if not self.fitted:
+            raise RuntimeError("PCA projection is not fitted, run the 'fit' command first")
+        return (np.asarray(vectors, dtype=np.float32) - self.mean) @ self.components.T
+
+    def encode(self, vectors: np.ndarray) -> List[Any]:
+        return self.project(vectors).tolist()
+
+    def index_params(self) -> Dict[str, Any]:
+        return {"metric_type": "L2", "index_type": "IVF_FLAT", "params": {"nlist": 2048}}
+
+
+def build_compressor(config: Optional[Dict[str, Any]], dim: int = 384) -> VectorCompressor:
+    """Create the compressor described by the 'milvus.compression' config section"""
+    config = config or {}
+    mode = config.get("mode", "none")
+    if mode == "none":
+        return VectorCompressor(dim)
+    if mode == "float16":
+        return Float16Compressor(dim)
+    if mode == "binary":
+        return BinaryCompressor(dim)
+    if mode == "pca":
+        return PCACompressor(dim, pca_dim=config.get("pca_dim", 96), path=config.get("pca_path"))
+    raise ValueError(f"Unknown vector compression mode: {mode}")
+
+
+class FullPrecisionStore:
+    """
+    Append-only, memory-mapped side store of float32 vectors keyed by Milvus
+    primary key, used to re-score candidates from a compressed first stage.
+    """
+
+    def __init__(self, directory: str, name: str, dim: int = 384):
+        self.logger = logging.getLogger(__name__)
+        self.dim = dim
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.vectors_path = self.directory / f"{name}.f32"
+        self.ids_path = self.directory / f"{name}.ids"
+
+        self._lock = threading.Lock()
+        self._rows: Dict[int, int] = {}
+        self._count = 0
+        if self.ids_path.exists() or self.vectors_path.exists():
+            id_bytes = self.ids_path.stat().st_size if self.ids_path.exists() else 0
+            ids = np.fromfile(self.ids_path, dtype=np.int64, count=id_bytes // 8) if id_bytes else []
+            vector_bytes = self.vectors_path.stat().st_size if self.vectors_path.exists() else 0
+            # An interrupted append leaves a tail in one file or both. Cut both back to
+            # the complete rows, so later appends line up ids with their vectors again.
+            self._count = min(len(ids), vector_bytes // (4 * dim))
+            for path in (self.vectors_path, self.ids_path):
+                with open(path, "ab") as f:
+                    f.truncate(self._count * (4 * dim if path is self.vectors_path else 8))
+            self._rows = {int(pk): row for row, pk in enumerate(ids[:self._count])}
+        self._mmap: Optional[np.memmap] = None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, ids: Iterable[int], vectors: np.ndarray) -> None:
+        ids = np.asarray(list(ids), dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if len(ids) != len(vectors):
+            raise ValueError("ids and vectors must have the same length")
+
+        with self._lock:
+            with open(self.vectors_path, "ab") as f:
+                f.write(vectors.tobytes())
+            with open(self.ids_path, "ab") as f:
+                f.write(ids.tobytes())
+            for pk in ids:
+                self._rows[int(pk)] = self._count
+                self._count += 1
+            self._mmap = None
+
+    def get(self, ids: Iterable[int]) -> np.ndarray:
+        """Full vectors for ids, NaN rows for ids that are not stored"""
+        ids = list(ids)
+        result = np.full((len(ids), self.dim), np.nan, dtype=np.float32)
+        with self._lock:
+            if self._count == 0:
+                return result
+            if self._mmap is None:
+                self._mmap = np.memmap(self.vectors_path, dtype=np.float32, mode="r",
+                                       shape=(self._count, self.dim))
+            mmap = self._mmap
+        for i, pk in enumerate(ids):
+            row = self._rows.get(int(pk))
+            if row is not None:
+                result[i] = mmap[row]
+        return result
+
+
+if __name__ == "__main__":
+    from src.data_processing.chunk_store import iter_chunks
+    from src.utils.path_utils import get_config_path
+    from sentence_transformers import SentenceTransformer
+    import yaml
+
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Fit the PCA projection used by milvus.compression.mode=pca")
+    parser.add_argument("chunks", help="Chunk directory or chunk store to fit on")
+    parser.add_argument("--config", default=None)
+    parser.add_argument("--samples", type=int, default=5000)
+    args = parser.parse_args()
+
+    with open(args.config or get_config_path(), "r") as file:
+        config = yaml.safe_load(file)
+
+    compressor = build_compressor(config["milvus"].get("compression"))
+    if not isinstance(compressor, PCACompressor) or not compressor.path:
+        raise SystemExit("milvus.compression must have mode: pca and a pca_path")
+
+    texts = []
+    for chunk in iter_chunks(args.chunks):
+        texts.append(chunk["content"].replace("Q:", "", 1).replace("\nA:", " ", 1).strip())
+        if len(texts) >= args.samples:
+            break
+
+    model = SentenceTransformer(config["embedding"]["model_name"])
+    compressor.fit(model.encode(texts)).save()
+    print(f"Fitted {compressor.pca_dim}-d projection on {len(texts)} chunks, saved to {compressor.path}")
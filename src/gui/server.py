@@ -0,0 +1,257 @@
+from typing import Dict, Any, Optional, List
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+from src.utils.admission import Rejected
+from src.utils.metrics import get_metrics, Histogram
+from src.utils.path_utils import get_config_path
+import argparse
+import json
+import logging
+import os
+import threading
+import yaml
+
+
+STATIC_DIR = Path(__file__).parent / "static"
+
+# Client-side timings accepted on /rum, in milliseconds
+RUM_FIELDS = ("ttft_ms", "ttlt_ms", "sources_ms")
+
+
+class ChatServer:
+    """
+    Local web chat on top of QueryHandler.stream_query.
+
+    GET /               chat page
+    GET|POST /chat      answer as Server-Sent Events: sources, token..., done.
+                        A session id (`session` / "session_id") continues that conversation
+    POST /rum           client-side timings of a finished answer
+    GET /rum            summary of the reported timings
+    """
+
+    def __init__(self, handler, host: str = "127.0.0.1", port: int = 8080, default_top_k: int = 3,
+                 trusted_proxies: List[str] = ()):
+        """
+        Args:
+            handler: QueryHandler (or anything with a compatible stream_query)
+            host: Interface to bind
+            port: Port to bind, 0 picks a free one
+            default_top_k: top_k for requests that don't set one
+            trusted_proxies: Peer addresses whose X-Client-Id header names the client.
+                Requests from anywhere else are charged to their peer address.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.metrics = get_metrics()
+        self.handler = handler
+        self.host = host
+        self.port = port
+        self.default_top_k = default_top_k
+        self.trusted_proxies = set(trusted_proxies)
+
+        self.rum: Dict[str, Histogram] = {field: Histogram() for field in RUM_FIELDS}
+        self.rum_cache_hits = 0
+        self.rum_reports = 0
+        self._rum_lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @classmethod
+    def from_config(cls, handler, config_path: str = None) -> "ChatServer":
+        """Build from the optional 'gui' section of config.yaml"""
+        config_path = config_path or get_config_path()
+        config = {}
+        if os.path.exists(config_path):
+            with open(config_path, "r") as file:
+                config = (yaml.safe_load(file) or {}).get("gui", {}) or {}
+        return cls(handler, **config)
+
+    def record_rum(self, report: Dict[str, Any]) -> None:
+        """Store one client timing report and forward it to the metrics"""
+        with self._rum_lock:
+            self.rum_reports += 1
+            if report.get("cached"):
+                self.rum_cache_hits += 1
+            for field in RUM_FIELDS:
+                value = report.get(field)
+                if isinstance(value, (int, float)) and 0 <= value < 3_600_000:
+                    self.rum[field].observe(value)
+                    self.metrics.observe(f"client_{field[:-3]}_seconds", value / 1000)
+        self.metrics.incr("client_cache_hits" if report.get("cached") else "client_answers")
+
+    def rum_summary(self) -> Dict[str, Any]:
+        with self._rum_lock:
+            summary = {"reports": self.rum_reports, "cache_hits": self.rum_cache_hits}
+            for field, histogram in self.rum.items():
+                stats = histogram.summary()
+                summary[field] = {k: v for k, v in stats.items() if k.startswith("p") or k == "count"}
+        return summary
+
+    def client_id(self, peer: str, header: Optional[str]) -> str:
+        """Key the admission quota is charged to, a client can't pick its own by sending a header"""
+        if header and peer in self.trusted_proxies:
+            return header
+        return peer
+
+    def _events(self, query: str, top_k: int, client_id: str, session_id: Optional[str] = None):
+        """Stream events, with the first one pulled eagerly so rejections can still set the status"""
+        kwargs = {"session_id": session_id} if session_id else {}
+        stream = self.handler.stream_query(query, top_k=top_k, client_id=client_id, **kwargs)
+        first = next(stream)
+        return first, stream
+
+    def start(self) -> None:
+        """Serve on a background thread"""
+        server = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path in ("/", "/index.html"):
+                    self._send_file(STATIC_DIR / "index.html", "text/html; charset=utf-8")
+                elif url.path == "/chat":
+                    params = parse_qs(url.query)
+                    self._chat(params.get("q", [""])[0], params.get("top_k", [None])[0],
+                               params.get("session", [None])[0])
+                elif url.path == "/rum":
+                    self._send_json(200, server.rum_summary())
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                try:
+                    body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                except ValueError:
+                    self._send_json(400, {"error": "invalid JSON"})
+                    return
+                if url.path == "/chat":
+                    self._chat(body.get("query", ""), body.get("top_k"), body.get("session_id"))
+                elif url.path == "/rum":
+                    server.record_rum(body)
+                    self.send_response(204)
+                    self.end_headers()
+                else:
+                    self.send_error(404)
+
+            def _chat(self, query: str, top_k, session_id: Optional[str] = None) -> None:
+                query = query.strip()
+                if not query:
+                    self._send_json(400, {"error": "empty query"})
+                    return
+                try:
+                    top_k = int(top_k) if top_k else server.default_top_k
+                except ValueError:
+                    self._send_json(400, {"error": "top_k must be an integer"})
+                    return
+
+                client_id = server.client_id(self.client_address[0], self.headers.get("X-Client-Id"))
+                try:
+                    first, stream = server._events(query, top_k, client_id, session_id)
+                except Rejected as e:
+                    status = 429 if e.reason == "quota" else 503
+                    self._send_json(status, {"error": str(e), "reason": e.reason},
+                                    {"Retry-After": str(max(1, round(e.retry_after)))})
+                    return
+                except Exception as e:
+                    server.logger.error(f"Chat request failed: {e}")
+                    self._send_json(500, {"error": "internal error"})
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("X-Accel-Buffering", "no")
+                self.end_headers()
+                try:
+                    self._send_event(first)
+                    for event in stream:
+                        self._send_event(event)
+                except (BrokenPipeError, ConnectionResetError):
+                    # Client went away, stop generating and release the admission slot
+                    pass
+                except Exception as e:
+                    server.logger.error(f"Chat stream failed: {e}")
+                    try:
+                        self._send_event({"type": "error", "error": str(e)})
+                    except OSError:
+                        pass
+                finally:
+                    stream.close()
+
+            def _send_event(self, event: Dict[str, Any]) -> None:
+                payload = f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+                self.wfile.write(payload.encode("utf-8"))
+                self.wfile.flush()
+
+            def _send_json(self, status: int, body: Dict[str, Any], headers: Dict[str, str] = None) -> None:
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _send_file(self, path: Path, content_type: str) -> None:
+                payload = path.read_bytes()
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        thread = threading.Thread(target=self._server.serve_forever, name="chat-server", daemon=True)
+        thread.start()
+        self.logger.info(f"Serving chat on http://{self.host}:{self.port}/")
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    default_chunks = Path(__file__).parent.parent.parent / "tests" / "test_data" / "Chunks"
+
+    parser = argparse.ArgumentParser(description="Local streaming chat UI")
+    parser.add_argument("--host", default=None)
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--offline", action="store_true",
+                        help="Answer from in-memory fakes over --chunks instead of Milvus and the GGUF model")
+    parser.add_argument("--chunks", default=str(default_chunks))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.offline:
+        import tempfile
+        from src.benchmarks.offline_suite import build_offline_handler
+        from src.data_processing.chunk_store import iter_chunks
+        handler = build_offline_handler(list(iter_chunks(args.chunks)), Path(tempfile.mkdtemp()), token_latency=0.03)
+    else:
+        from src.llm.query_handler import QueryHandler
+        handler = QueryHandler()
+
+    server = ChatServer.from_config(handler)
+    if args.host:
+        server.host = args.host
+    if args.port is not None:
+        server.port = args.port
+    server.start()
+    print(f"Chat UI on http://{server.host}:{server.port}/ (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
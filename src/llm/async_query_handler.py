@@ -0,0 +1,361 @@
+from typing import Dict, Any, Optional, AsyncIterator, Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from src.llm.query_handler import QueryHandler
+from src.utils.metrics import get_metrics
+from src.utils.path_utils import get_config_path
+import asyncio
+import logging
+import os
+import threading
+import yaml
+
+
+class _Failure:
+    """An exception raised on a worker thread, handed to the awaiting coroutine"""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class _Flight:
+    """A shared answer and the number of callers still waiting for it"""
+
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+
+class _StreamFlight:
+    """A shared stream: the events so far, and the number of callers still reading it"""
+
+    def __init__(self):
+        self.task: Optional["asyncio.Task"] = None
+        self.events = []
+        self.error: Optional[BaseException] = None
+        self.done = False
+        self.changed = asyncio.Event()
+        self.readers = 0
+
+    def publish(self) -> None:
+        """Wake the readers waiting for the next event"""
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+class AsyncQueryHandler:
+    """
+    asyncio front end of a QueryHandler, for servers that hold many
+    connections on one event loop.
+
+    Nothing blocks the loop. The query is embedded, and re-ranked by the
+    cross-encoder when enabled, on a dedicated embedding executor. Milvus
+    is searched through `asearch` (AsyncMilvusClient), which computes the
+    query-side ranking features while the ANN request is in flight.
+    Generation runs on a dedicated generation executor, one token at a
+    time. Cancelling the awaiting task (a client disconnect) stops the
+    model at the next token and releases the admission slot.
+
+    Identical queries in flight share one answer, or one stream replayed to
+    every reader, when the handler's single-flight group is enabled. Only the
+    caller that starts the answer takes an admission slot, and the answer is
+    only cancelled once every caller waiting for it has gone. Conversation
+    turns run the handler's own streaming path on the generation executor,
+    since they hold the conversation's lock.
+    """
+
+    def __init__(self, handler: QueryHandler = None, embed_workers: int = 1, generate_workers: int = 4,
+                 io_workers: int = 8):
+        """
+        Args:
+            handler: QueryHandler whose components are used, created from config when omitted
+            embed_workers: Threads running the embedding model and the cross-encoder
+            generate_workers: Threads driving generations, at most this many run at once
+            io_workers: Threads for blocking calls without an async variant
+                (admission waits, searches on stores without asearch)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.metrics = get_metrics()
+        self.handler = handler or QueryHandler()
+        self._embed = ThreadPoolExecutor(embed_workers, thread_name_prefix="embed")
+        self._generate = ThreadPoolExecutor(generate_workers, thread_name_prefix="generate")
+        self._io = ThreadPoolExecutor(io_workers, thread_name_prefix="query-io")
+        self._flights: Dict[Any, _Flight] = {}
+        self._streams: Dict[Any, _StreamFlight] = {}
+
+    @classmethod
+    def from_config(cls, handler: QueryHandler = None, config_path: str = None) -> "AsyncQueryHandler":
+        """Build from the optional 'async_query' section of config.yaml"""
+        config_path = config_path or get_config_path()
+        config = {}
+        if os.path.exists(config_path):
+            with open(config_path, "r") as file:
+                config = (yaml.safe_load(file) or {}).get("async_query", {}) or {}
+        return cls(handler, **config)
+
+    def close(self) -> None:
+        for executor in (self._embed, self._generate, self._io):
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def process_query(self, query: str, top_k: int = 3, client_id: str = "anonymous",
+                            timeout: Optional[float] = None, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Answer a query, see QueryHandler.process_query
+
+        Raises:
+            Rejected: When admission control sheds the request
+        """
+        # Quota is charged per caller, a slot only per computation
+        self.handler.admission.charge(client_id)
+        if self._is_turn(session_id):
+            async with self._admit(client_id, timeout) as ticket:
+                result = await self._collect(self._pump(
+                    lambda: self._turn_events(session_id, query, ticket.top_k(top_k), ticket)))
+                result['degraded'] = ticket.tier_name if ticket.tier else None
+        elif self.handler.single_flight.enabled:
+            result = await self._shared(self.handler._flight_key(query, top_k),
+                                        lambda: self._admitted_query(query, top_k, client_id, timeout))
+        else:
+            result = await self._admitted_query(query, top_k, client_id, timeout)
+        return {**result, 'query': query}
+
+    async def stream_query(self, query: str, top_k: int = 3, client_id: str = "anonymous",
+                           timeout: Optional[float] = None,
+                           session_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Stream an answer, with the events of QueryHandler.stream_query"""
+        self.handler.admission.charge(client_id)
+        if self._is_turn(session_id):
+            events = self._turn_stream(session_id, query, top_k, client_id, timeout)
+        elif self.handler.single_flight.enabled:
+            events = self._shared_stream(self.handler._flight_key(query, top_k),
+                                         lambda: self._admitted_events(query, top_k, client_id, timeout))
+        else:
+            events = self._admitted_events(query, top_k, client_id, timeout)
+        try:
+            async for event in events:
+                yield event
+        finally:
+            await events.aclose()
+
+    async def _admitted_query(self, query: str, top_k: int, client_id: str,
+                              timeout: Optional[float]) -> Dict[str, Any]:
+        """Answer in an admission slot, at the tier the slot was granted at"""
+        async with self._admit(client_id, timeout) as ticket:
+            result = await self._collect(self._events(query, ticket.top_k(top_k), ticket))
+        return {**result, 'degraded': ticket.tier_name if ticket.tier else None}
+
+    async def _admitted_events(self, query: str, top_k: int, client_id: str,
+                               timeout: Optional[float]) -> AsyncIterator[Dict[str, Any]]:
+        async with self._admit(client_id, timeout) as ticket:
+            events = self._events(query, ticket.top_k(top_k), ticket)
+            try:
+                async for event in events:
+                    yield event
+            finally:
+                await events.aclose()
+
+    async def _turn_stream(self, session_id: str, query: str, top_k: int, client_id: str,
+                           timeout: Optional[float]) -> AsyncIterator[Dict[str, Any]]:
+        async with self._admit(client_id, timeout) as ticket:
+            events = self._pump(lambda: self._turn_events(session_id, query, ticket.top_k(top_k), ticket))
+            try:
+                async for event in events:
+                    yield event
+            finally:
+                await events.aclose()
+
+    def _is_turn(self, session_id: Optional[str]) -> bool:
+        return session_id is not None and self.handler.conversations.enabled
+
+    @asynccontextmanager
+    async def _admit(self, client_id: str, timeout: Optional[float]):
+        """QueryHandler's admission slot, waited for on a thread instead of the loop. The quota is charged apart"""
+        admission = self.handler.admission.admit(client_id, timeout, charge=False)
+        if not self.handler.admission.enabled:
+            ticket = admission.__enter__()
+        else:
+            entered = asyncio.get_running_loop().run_in_executor(self._io, admission.__enter__)
+            try:
+                ticket = await asyncio.shield(entered)
+            except asyncio.CancelledError:
+                # The wait can't be interrupted, give the slot back once it is granted
+                entered.add_done_callback(
+                    lambda f: f.cancelled() or f.exception() is not None or admission.__exit__(None, None, None))
+                raise
+        try:
+            yield ticket
+        finally:
+            admission.__exit__(None, None, None)
+
+    async def _events(self, query: str, top_k: int, ticket) -> AsyncIterator[Dict[str, Any]]:
+        handler = self.handler
+        loop = asyncio.get_running_loop()
+
+        # An in-memory lookup, cheap enough to run on the loop
+        response, search_results = handler.entities.try_answer(query)
+        query_embedding = None
+        if response is None:
+            with self.metrics.span("embed"):
+                query_embedding = await loop.run_in_executor(
+                    self._embed, lambda: handler.embedding_model.encode([query])[0].tolist())
+            with self.metrics.span("search"):
+                search_results = await self._search(query_embedding, handler.reranker.candidate_limit(top_k), query)
+            if handler.reranker.enabled:
+                with self.metrics.span("cross_rerank"):
+                    search_results = await loop.run_in_executor(
+                        self._embed, handler.reranker.rerank, query, search_results, top_k)
+        yield {'type': 'sources', 'sources': handler._format_sources(search_results)}
+
+        if response is None:
+            response = handler.fast_path.try_answer(query, search_results)
+        fast_path = response is not None
+        if not fast_path and ticket.retrieval_only:
+            response = handler._retrieval_only_answer(search_results)
+
+        if response is not None:
+            yield {'type': 'token', 'text': response}
+        else:
+            # Compression embeds the answer sentences, on the embedding executor
+            context = await loop.run_in_executor(self._embed, handler._format_context, search_results, query_embedding)
+            pieces = []
+            generation = self._pump(lambda: handler.mistral_client.stream_response(
+                query=query, context=context, max_new_tokens=ticket.max_new_tokens))
+            try:
+                async for piece in generation:
+                    pieces.append(piece)
+                    yield {'type': 'token', 'text': piece}
+            finally:
+                await generation.aclose()
+            response = "".join(pieces).strip()
+
+        yield {'type': 'done', 'response': response, 'fast_path': fast_path}
+
+    async def _search(self, query_embedding, top_k: int, query: str):
+        store = self.handler.milvus_client
+        if hasattr(store, "asearch"):
+            return await store.asearch(query_embedding=query_embedding, limit=top_k, query=query)
+        return await asyncio.get_running_loop().run_in_executor(
+            self._io, lambda: store.search(query_embedding=query_embedding, limit=top_k, query=query))
+
+    def _turn_events(self, session_id: str, query: str, top_k: int, ticket) -> Iterator[Dict[str, Any]]:
+        with self.handler.conversations.turn(session_id) as conversation:
+            yield from self.handler._stream_query(query, top_k, ticket.max_new_tokens, ticket.retrieval_only,
+                                                  conversation)
+
+    async def _pump(self, make_iterator: Callable[[], Iterator]) -> AsyncIterator:
+        """
+        Drive a blocking iterator on the generation executor and yield its items.
+        Closing or cancelling the consumer closes the iterator at its next item.
+        """
+        loop = asyncio.get_running_loop()
+        items: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        done = object()
+
+        def put(item) -> None:
+            try:
+                loop.call_soon_threadsafe(items.put_nowait, item)
+            except RuntimeError:
+                stop.set()  # the loop is gone
+
+        def drive() -> None:
+            iterator = make_iterator()
+            try:
+                for item in iterator:
+                    if stop.is_set():
+                        break
+                    put(item)
+            except BaseException as e:
+                put(_Failure(e))
+                return
+            finally:
+                close = getattr(iterator, "close", None)
+                if close is not None:
+                    close()
+            put(done)
+
+        loop.run_in_executor(self._generate, drive)
+        try:
+            while True:
+                item = await items.get()
+                if item is done:
+                    break
+                if isinstance(item, _Failure):
+                    raise item.error
+                yield item
+        finally:
+            stop.set()
+
+    async def _collect(self, events: AsyncIterator[Dict[str, Any]]) -> Dict[str, Any]:
+        """process_query's result from a stream of events"""
+        result = {}
+        try:
+            async for event in events:
+                if event['type'] == 'sources':
+                    result['sources'] = event['sources']
+                elif event['type'] == 'done':
+                    result.update(response=event['response'], fast_path=event['fast_path'])
+        finally:
+            await events.aclose()
+        return result
+
+    async def _shared(self, key, make_coroutine: Callable) -> Dict[str, Any]:
+        """Join the flight for this key, or start it"""
+        flight = self._flights.get(key)
+        if flight is None or flight.task.done():
+            flight = self._flights[key] = _Flight(asyncio.ensure_future(make_coroutine()))
+            flight.task.add_done_callback(lambda _: self._flights.get(key) is flight and self._flights.pop(key))
+            self.handler.single_flight._count("leaders")
+        else:
+            self.handler.single_flight._count("coalesced")
+
+        flight.waiters += 1
+        try:
+            return dict(await asyncio.shield(flight.task))
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Everyone waiting for this answer has gone
+                flight.task.cancel()
+
+    async def _shared_stream(self, key, make_events: Callable) -> AsyncIterator[Dict[str, Any]]:
+        """Read the stream in flight for this key from its first event, or start it"""
+        flight = self._streams.get(key)
+        if flight is None or flight.task.done():
+            flight = self._streams[key] = _StreamFlight()
+            flight.task = asyncio.ensure_future(self._broadcast(flight, make_events()))
+            flight.task.add_done_callback(lambda _: self._streams.get(key) is flight and self._streams.pop(key))
+            self.handler.single_flight._count("leaders")
+        else:
+            self.handler.single_flight._count("coalesced")
+
+        flight.readers += 1
+        try:
+            position = 0
+            while True:
+                changed = flight.changed
+                while position < len(flight.events):
+                    position += 1
+                    yield flight.events[position - 1]
+                if flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                await changed.wait()
+        finally:
+            flight.readers -= 1
+            if flight.readers == 0 and not flight.task.done():
+                # Everyone reading this stream has gone
+                flight.task.cancel()
+
+    async def _broadcast(self, flight: _StreamFlight, events: AsyncIterator[Dict[str, Any]]) -> None:
+        try:
+            async for event in events:
+                flight.events.append(event)
+                flight.publish()
+        except Exception as e:
+            flight.error = e
+        finally:
+            flight.done = True
+            flight.publish()
+            await events.aclose()
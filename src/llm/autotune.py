@@ -0,0 +1,245 @@
+from typing import List, Dict, Any, Optional, Callable
+from datetime import datetime
+from pathlib import Path
+from src.data_processing.chunk_store import iter_chunks
+from src.llm.mistral_client import MistralClient
+from src.utils.hardware import (
+    INFERENCE_PARAMS,
+    cpu_model,
+    hardware_fingerprint,
+    has_gpu,
+    inference_params,
+    load_tuned,
+    tuned_path,
+)
+from src.utils.path_utils import get_config_path
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import time
+import yaml
+
+
+def representative_prompt(client: MistralClient, chunks_path: str, contexts: int = 3) -> str:
+    """A RAG prompt built like QueryHandler does, from the first chunks that hold a Q/A pair"""
+    context, question = [], "How do I renew my visa?"
+    for chunk in iter_chunks(chunks_path):
+        if chunk["content"].startswith("Q:") and "\nA:" in chunk["content"]:
+            context.append(chunk["content"])
+            if len(context) == 1:
+                question = chunk["metadata"].get("question", question)
+        if len(context) >= contexts:
+            break
+    return client._create_prompt(question, "\n\n".join(context))
+
+
+def serving_context(config: Dict[str, Any], prompt_tokens: int) -> int:
+    """
+    Smallest context window that serves requests: the RAG prompt, the longest
+    answer MistralClient asks for (model.max_tokens) and, with conversations
+    enabled, the history kept before summarizing
+    """
+    needed = prompt_tokens + (config.get("model") or {}).get("max_tokens", 2048)
+    conversations = config.get("conversations") or {}
+    if conversations.get("enabled"):
+        needed += conversations.get("max_history_tokens", 1536)
+    return needed
+
+
+def candidate_values(prompt_tokens: int, max_new_tokens: int, gpu: bool,
+                     min_context: int = 0) -> Dict[str, List[Any]]:
+    """
+    Values tried for each parameter on this host
+
+    Args:
+        prompt_tokens: Tokens of the timed prompt
+        max_new_tokens: Tokens generated per trial
+        gpu: Whether GPU offload is tried
+        min_context: Context window serving needs, see serving_context
+    """
+    cores = os.cpu_count() or 1
+    needed = max(prompt_tokens + max_new_tokens, min_context)
+    contexts = [c for c in (1024, 2048, 4096, 8192, 16384, 32768) if c >= needed] or [32768]
+    return {
+        "threads": sorted({max(1, cores // 4), max(1, cores // 2), max(1, cores - 1), cores}),
+        "batch_size": [8, 32, 128, 512],
+        # Smallest windows serving fits in, a smaller KV cache is cheaper to allocate and scan
+        "context_length": contexts[:2],
+        "gpu_layers": [0, 16, 32, 99] if gpu else [0],
+    }
+
+
+class Autotuner:
+    """
+    Coordinate-descent search over the ctransformers load parameters.
+
+    Each parameter is swept in turn with the best values found so far for the
+    others. A trial loads the model, streams the representative prompt and
+    scores the end-to-end time of the request.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        prompt: str,
+        loader: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        max_new_tokens: int = 64,
+        repeats: int = 2,
+    ):
+        """
+        Args:
+            model_path: GGUF model file
+            prompt: Prompt to time
+            loader: Builds a model from load parameters, defaults to ctransformers
+            max_new_tokens: Tokens generated per trial
+            repeats: Timed generations per trial, the median is kept
+        """
+        self.logger = logging.getLogger(__name__)
+        self.model_path = model_path
+        self.prompt = prompt
+        self.loader = loader or self._load_ctransformers
+        self.max_new_tokens = max_new_tokens
+        self.repeats = repeats
+        self.trials: List[Dict[str, Any]] = []
+
+    def _load_ctransformers(self, params: Dict[str, Any]):
+        from ctransformers import AutoModelForCausalLM
+        return AutoModelForCausalLM.from_pretrained(self.model_path, model_type="mistral", **params)
+
+    def measure(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Load the model with params and time the prompt"""
+        start = time.perf_counter()
+        model = self.loader(params)
+        load_s = time.perf_counter() - start
+
+        totals, ttfts, rates = [], [], []
+        # One untimed run warms caches and the allocator
+        for run in range(self.repeats + 1):
+            start = time.perf_counter()
+            first, tokens = None, 0
+            for _ in model(self.prompt, max_new_tokens=self.max_new_tokens, temperature=0.0, stream=True):
+                if first is None:
+                    first = time.perf_counter() - start
+                tokens += 1
+            total = time.perf_counter() - start
+            if run:
+                totals.append(total)
+                ttfts.append(first or total)
+                rates.append(tokens / (total - (first or 0.0)) if total > (first or 0.0) and tokens > 1 else 0.0)
+        del model
+
+        result = {
+            **params,
+            "load_s": load_s,
+            "total_s": statistics.median(totals),
+            "ttft_s": statistics.median(ttfts),
+            "tokens_per_second": statistics.median(rates),
+        }
+        self.trials.append(result)
+        self.logger.info(f"Trial {params}: total {result['total_s']:.3f}s, ttft {result['ttft_s']:.3f}s")
+        return result
+
+    def tune(self, start: Dict[str, Any], candidates: Dict[str, List[Any]]) -> Dict[str, Any]:
+        """
+        Returns:
+            The best parameters and their measurements
+        """
+        best = self.measure(start)
+        for name in INFERENCE_PARAMS:
+            for value in candidates.get(name, []):
+                if value == best[name]:
+                    continue
+                params = {k: best[k] for k in INFERENCE_PARAMS}
+                params[name] = value
+                try:
+                    result = self.measure(params)
+                except Exception as e:
+                    self.logger.warning(f"Trial {params} failed: {e}")
+                    continue
+                if result["total_s"] < best["total_s"]:
+                    best = result
+        return best
+
+
+def save_tuned(config_path: str, fingerprint: str, result: Dict[str, Any]) -> Path:
+    """
+    Store the tuned parameters under <fingerprint> in the tuned file next to
+    config.yaml, which is left as written. The file is replaced atomically, so
+    a reader never sees it half written.
+
+    Returns:
+        Path of the tuned file
+    """
+    path = tuned_path(config_path)
+    tuned = load_tuned(config_path)
+    tuned[fingerprint] = {
+        **{k: result[k] for k in INFERENCE_PARAMS},
+        "cpu": cpu_model(),
+        "total_s": round(result["total_s"], 4),
+        "tokens_per_second": round(result["tokens_per_second"], 2),
+        "tuned_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+    with tempfile.NamedTemporaryFile("w", dir=path.parent, prefix=path.name, suffix=".tmp", delete=False) as file:
+        yaml.safe_dump(tuned, file, sort_keys=False)
+    os.replace(file.name, path)
+    return path
+
+
+class _PromptOnly:
+    """Placeholder model so MistralClient can build prompts without loading the GGUF file"""
+
+    def __call__(self, *args, **kwargs):
+        raise RuntimeError("prompt-only client")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    default_chunks = Path(__file__).parent.parent.parent / "tests" / "test_data" / "Chunks"
+
+    parser = argparse.ArgumentParser(description="Benchmark ctransformers load parameters on this host")
+    parser.add_argument("--config", default=None, help="config.yaml to read, results go to the tuned file next to it")
+    parser.add_argument("--chunks", default=str(default_chunks), help="Chunks used to build the RAG prompt")
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=2)
+    parser.add_argument("--dry-run", action="store_true", help="Print the result without saving it")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+
+    config_path = args.config or get_config_path()
+    with open(config_path, "r") as file:
+        config = yaml.safe_load(file)
+    model_config = config["model"]
+
+    fingerprint = hardware_fingerprint()
+    start = inference_params(model_config, fingerprint, tuned=load_tuned(config_path))
+    loader_client = MistralClient(config_path, model=_PromptOnly())
+    prompt = representative_prompt(loader_client, args.chunks)
+
+    tuner = Autotuner(os.path.abspath(model_config["path"]), prompt,
+                      max_new_tokens=args.max_new_tokens, repeats=args.repeats)
+    # Mistral's tokenizer averages a little over 3 characters per token on this corpus
+    prompt_tokens = len(prompt) // 3
+    candidates = candidate_values(prompt_tokens, args.max_new_tokens, has_gpu(),
+                                  min_context=serving_context(config, prompt_tokens))
+    if "context_length" in model_config:
+        # An explicit window is kept at serve time, there is nothing to tune
+        candidates["context_length"] = [model_config["context_length"]]
+    best = tuner.tune(start, candidates)
+
+    print(f"Host {fingerprint}: {len(tuner.trials)} trials, prompt ~{prompt_tokens} tokens")
+    print(f"{'threads':>8}{'batch':>7}{'context':>9}{'gpu':>5}{'total s':>9}{'ttft s':>8}{'tok/s':>8}")
+    for t in sorted(tuner.trials, key=lambda t: t["total_s"]):
+        print(f"{t['threads']:>8}{t['batch_size']:>7}{t['context_length']:>9}{t['gpu_layers']:>5}"
+              f"{t['total_s']:>9.3f}{t['ttft_s']:>8.3f}{t['tokens_per_second']:>8.1f}")
+
+    if args.dry_run:
+        return
+    path = save_tuned(config_path, fingerprint, best)
+    print(f"Saved {dict((k, best[k]) for k in INFERENCE_PARAMS)} to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,582 @@
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+from collections import OrderedDict
+from dataclasses import dataclass, field
+try:
+    import llama_cpp
+except ImportError:  # only needed for batched decoding of a GGUF model
+    llama_cpp = None
+from src.utils.metrics import get_metrics
+import logging
+import os
+import queue
+import threading
+import time
+import numpy as np
+
+
+class BatchBackend:
+    """
+    A model that decodes several sequences in one forward pass.
+
+    Every sequence owns a slot in a shared KV cache. One `decode` call feeds
+    a mix of prompt chunks (new sequences) and single tokens (running ones),
+    so the weights are read once per step for the whole batch.
+    """
+
+    # Upper bound on tokens fed to one decode call
+    max_batch_tokens: int = 512
+    eos_token: int = -1
+
+    def tokenize(self, text: str) -> List[int]:
+        raise NotImplementedError
+
+    def detokenize(self, tokens: List[int]) -> str:
+        raise NotImplementedError
+
+    def decode(self, entries: List[Tuple[int, List[int], int, bool]]) -> Dict[int, np.ndarray]:
+        """
+        Args:
+            entries: (slot, tokens, position of the first token, whether logits are wanted)
+
+        Returns:
+            Next-token logits of the last token, for every slot that asked for them
+        """
+        raise NotImplementedError
+
+    def release(self, slot: int) -> None:
+        """Drop a finished sequence from the KV cache"""
+        raise NotImplementedError
+
+    def truncate(self, slot: int, n_keep: int) -> None:
+        """Drop everything after the first n_keep tokens of a sequence from the KV cache"""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class LlamaCppBackend(BatchBackend):
+    """Multi-sequence batches on llama.cpp through llama-cpp-python's low-level API"""
+
+    def __init__(
+        self,
+        model_path: str,
+        context_length: int = 4096,
+        max_sequences: int = 8,
+        batch_size: int = 512,
+        threads: int = -1,
+        gpu_layers: int = 0,
+    ):
+        """
+        Args:
+            model_path: GGUF model file
+            context_length: Tokens per sequence, the KV cache holds max_sequences of them
+            max_sequences: Sequences decoded together
+            batch_size: Tokens per decode call
+            threads: CPU threads, -1 for all cores
+            gpu_layers: Layers offloaded to the GPU
+        """
+        if llama_cpp is None:
+            raise ImportError("llama-cpp-python is required for batched decoding")
+
+        model_params = llama_cpp.llama_model_default_params()
+        model_params.n_gpu_layers = gpu_layers
+        self.model = llama_cpp.llama_load_model_from_file(model_path.encode("utf-8"), model_params)
+        if not self.model:
+            raise RuntimeError(f"Failed to load model from {model_path}")
+
+        threads = threads if threads > 0 else (os.cpu_count() or 1)
+        context_params = llama_cpp.llama_context_default_params()
+        context_params.n_ctx = context_length * max_sequences
+        context_params.n_batch = batch_size
+        context_params.n_seq_max = max_sequences
+        context_params.n_threads = threads
+        context_params.n_threads_batch = threads
+        self.ctx = llama_cpp.llama_new_context_with_model(self.model, context_params)
+
+        self.max_batch_tokens = batch_size
+        self.n_vocab = llama_cpp.llama_n_vocab(self.model)
+        self.eos_token = llama_cpp.llama_token_eos(self.model)
+        self.batch = llama_cpp.llama_batch_init(batch_size, 0, max_sequences)
+
+    def tokenize(self, text: str) -> List[int]:
+        data = text.encode("utf-8")
+        buffer = (llama_cpp.llama_token * (len(data) + 8))()
+        n = llama_cpp.llama_tokenize(self.model, data, len(data), buffer, len(buffer), True, False)
+        return list(buffer[:n])
+
+    def detokenize(self, tokens: List[int]) -> str:
+        out = bytearray()
+        buffer = (llama_cpp.ctypes.c_char * 64)()
+        for token in tokens:
+            n = llama_cpp.llama_token_to_piece(self.model, token, buffer, len(buffer), 0, False)
+            out += buffer.raw[:n]
+        return out.decode("utf-8", errors="ignore")
+
+    def decode(self, entries: List[Tuple[int, List[int], int, bool]]) -> Dict[int, np.ndarray]:
+        batch = self.batch
+        batch.n_tokens = 0
+        rows = {}
+        for slot, tokens, position, want_logits in entries:
+            for j, token in enumerate(tokens):
+                i = batch.n_tokens
+                batch.token[i] = token
+                batch.pos[i] = position + j
+                batch.n_seq_id[i] = 1
+                batch.seq_id[i][0] = slot
+                batch.logits[i] = want_logits and j == len(tokens) - 1
+                batch.n_tokens += 1
+            if want_logits:
+                rows[slot] = batch.n_tokens - 1
+
+        status = llama_cpp.llama_decode(self.ctx, batch)
+        if status != 0:
+            raise RuntimeError(f"llama_decode failed with status {status}")
+
+        return {
+            slot: np.ctypeslib.as_array(llama_cpp.llama_get_logits_ith(self.ctx, row), shape=(self.n_vocab,)).copy()
+            for slot, row in rows.items()
+        }
+
+    def release(self, slot: int) -> None:
+        llama_cpp.llama_kv_cache_seq_rm(self.ctx, slot, -1, -1)
+
+    def truncate(self, slot: int, n_keep: int) -> None:
+        llama_cpp.llama_kv_cache_seq_rm(self.ctx, slot, n_keep, -1)
+
+    def close(self) -> None:
+        if self.ctx:
+            llama_cpp.llama_batch_free(self.batch)
+            llama_cpp.llama_free(self.ctx)
+            llama_cpp.llama_free_model(self.model)
+            self.ctx = None
+
+
+@dataclass
+class GenerationRequest:
+    """One prompt and its own sampling parameters"""
+    prompt: str
+    max_new_tokens: int = 256
+    temperature: float = 0.7
+    top_p: float = 0.95
+    top_k: int = 40
+    repetition_penalty: float = 1.1
+    stop: List[str] = field(default_factory=list)
+    seed: Optional[int] = None
+    # Keeps the sequence's KV cache after it finishes, the next request of the
+    # same session only decodes what its prompt adds to the cached tokens
+    session: Optional[str] = None
+
+    # Set by the engine
+    text: str = ""
+    finish_reason: Optional[str] = None
+    queued_at: float = field(default_factory=time.perf_counter)
+    first_token_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+
+class Generation:
+    """Handle on a submitted request: iterate for text pieces, or wait for the whole text"""
+
+    def __init__(self, request: GenerationRequest):
+        self.request = request
+        self._pieces: "queue.Queue" = queue.Queue()
+        self._done = threading.Event()
+        self._cancelled = threading.Event()
+        self._error: Optional[BaseException] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        """Stop generating at the next decode step, the text so far is kept"""
+        self._cancelled.set()
+
+    def _emit(self, piece: str) -> None:
+        self._pieces.put(piece)
+
+    def _finish(self, error: Optional[BaseException] = None) -> None:
+        self._error = error
+        self.request.finished_at = time.perf_counter()
+        self._done.set()
+        self._pieces.put(None)
+
+    def __iter__(self) -> Iterator[str]:
+        try:
+            while True:
+                piece = self._pieces.get()
+                if piece is None:
+                    break
+                yield piece
+        finally:
+            # A stream closed early (client gone) frees its slot instead of decoding on
+            if not self._done.is_set():
+                self.cancel()
+        if self._error is not None:
+            raise self._error
+
+    def result(self, timeout: Optional[float] = None) -> str:
+        if not self._done.wait(timeout):
+            raise TimeoutError("generation did not finish in time")
+        if self._error is not None:
+            raise self._error
+        return self.request.text
+
+
+@dataclass
+class _CachedSession:
+    """KV cache of a finished session request, kept in its slot for the next turn"""
+    slot: int
+    tokens: List[int]
+    last_used: float
+
+
+class _Sequence:
+    """Decoding state of one request in the running batch"""
+
+    def __init__(self, generation: Generation, slot: int, prompt_tokens: List[int]):
+        self.generation = generation
+        self.request = generation.request
+        self.slot = slot
+        self.prompt_tokens = prompt_tokens
+        self.n_past = 0
+        self.output: List[int] = []
+        self.emitted = 0
+        self.rng = np.random.default_rng(self.request.seed)
+
+    @property
+    def prefilling(self) -> bool:
+        return self.n_past < len(self.prompt_tokens)
+
+
+def sample_token(logits: np.ndarray, request: GenerationRequest, recent: List[int],
+                 rng: np.random.Generator) -> int:
+    """Pick the next token with the request's own sampling parameters"""
+    logits = logits.astype(np.float64, copy=True)
+    if request.repetition_penalty != 1.0 and recent:
+        ids = np.unique(recent)
+        values = logits[ids]
+        logits[ids] = np.where(values > 0, values / request.repetition_penalty,
+                               values * request.repetition_penalty)
+
+    if request.temperature <= 0:
+        return int(np.argmax(logits))
+    logits /= request.temperature
+
+    if 0 < request.top_k < len(logits):
+        cutoff = np.partition(logits, -request.top_k)[-request.top_k]
+        logits[logits < cutoff] = -np.inf
+
+    probs = np.exp(logits - logits.max())
+    probs /= probs.sum()
+    if request.top_p < 1.0:
+        order = np.argsort(-probs)
+        cumulative = np.cumsum(probs[order])
+        keep = order[: int(np.searchsorted(cumulative, request.top_p)) + 1]
+        mask = np.zeros_like(probs)
+        mask[keep] = probs[keep]
+        probs = mask / mask.sum()
+    return int(rng.choice(len(probs), p=probs))
+
+
+class BatchedEngine:
+    """
+    Continuous batching over a BatchBackend.
+
+    A scheduler thread runs one decode step at a time for every running
+    sequence. Requests waiting in the queue join at the next step (their
+    prompt is prefilled in the same forward pass as the other sequences'
+    next tokens), and finished sequences leave the batch and free their
+    slot right away.
+
+    Calling the engine works like calling a ctransformers model, so it can
+    be used as MistralClient's model. Concurrent callers block on their own
+    request while their tokens are decoded together.
+
+    Requests that name a session keep their KV cache when they finish. The
+    next request of that session reuses the longest common token prefix and
+    only prefills the rest, so a conversation turn costs its new tokens
+    rather than the whole history. Idle session caches are dropped after
+    `session_ttl`, least recently used first when a slot is needed, and when
+    together they hold more than `max_session_tokens`.
+    """
+
+    supports_sessions = True
+
+    # Most recent tokens the repetition penalty applies to
+    PENALTY_WINDOW = 64
+
+    def __init__(self, backend: BatchBackend, max_batch: int = 8, context_length: int = 4096,
+                 session_slots: int = 0, session_ttl: float = 600.0, max_session_tokens: Optional[int] = None):
+        """
+        Args:
+            backend: Model that decodes several sequences per step
+            max_batch: Sequences decoded together
+            context_length: Prompt plus generated tokens per sequence
+            session_slots: Slots beyond max_batch that only hold idle session caches,
+                the backend must have room for max_batch + session_slots sequences
+            session_ttl: Seconds an idle session cache is kept
+            max_session_tokens: Tokens all idle session caches may hold together, None for no cap
+        """
+        self.logger = logging.getLogger(__name__)
+        self.metrics = get_metrics()
+        self.backend = backend
+        self.max_batch = max_batch
+        self.context_length = context_length
+        self.session_ttl = session_ttl
+        self.max_session_tokens = max_session_tokens
+
+        self._waiting: "queue.Queue" = queue.Queue()
+        self._running: List[_Sequence] = []
+        self._free_slots = list(range(max_batch + session_slots))
+        self._sessions: "OrderedDict[str, _CachedSession]" = OrderedDict()
+        self._ended: "queue.Queue" = queue.Queue()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        self.steps = 0
+        self.tokens_generated = 0
+        self.tokens_prefilled = 0
+        self.tokens_reused = 0
+        self.session_evictions = 0
+
+    @classmethod
+    def from_config(cls, model_config: Dict[str, Any], params: Dict[str, Any]) -> "BatchedEngine":
+        """Engine on a llama.cpp backend, from the 'model' section of config.yaml and the load parameters"""
+        batching = model_config.get("batching") or {}
+        max_batch = batching.get("max_batch", 8)
+        session_slots = batching.get("session_slots", 0)
+        backend = LlamaCppBackend(
+            os.path.abspath(model_config["path"]),
+            context_length=params["context_length"],
+            max_sequences=max_batch + session_slots,
+            batch_size=batching.get("batch_tokens", 512),
+            threads=params["threads"],
+            gpu_layers=params["gpu_layers"],
+        )
+        return cls(backend, max_batch=max_batch, context_length=params["context_length"],
+                   session_slots=session_slots, session_ttl=batching.get("session_ttl", 600.0),
+                   max_session_tokens=batching.get("max_session_tokens"))
+
+    def tokenize(self, text: str) -> List[int]:
+        return self.backend.tokenize(text)
+
+    def submit(self, prompt: str, **params) -> Generation:
+        """Queue a prompt, it joins the running batch at the next decode step"""
+        generation = Generation(GenerationRequest(prompt=prompt, **params))
+        self._ensure_started()
+        self._waiting.put(generation)
+        return generation
+
+    def __call__(self, prompt: str, max_new_tokens: int = 256, temperature: float = 0.7,
+                 top_p: float = 0.95, stop: Optional[List[str]] = None, stream: bool = False, **kwargs):
+        generation = self.submit(prompt, max_new_tokens=max_new_tokens, temperature=temperature,
+                                 top_p=top_p, stop=list(stop or []), **kwargs)
+        return iter(generation) if stream else generation.result()
+
+    def end_session(self, session: str) -> None:
+        """Drop a session's cached KV state, its next request starts from scratch"""
+        self._ended.put(session)
+        self._waiting.put(None)
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="batched-decoding", daemon=True)
+                self._thread.start()
+
+    def close(self) -> None:
+        """Stop the scheduler, fail anything still queued and free the backend"""
+        self._stop.set()
+        self._waiting.put(None)
+        if self._thread is not None:
+            self._thread.join()
+        error = RuntimeError("engine closed")
+        for sequence in self._running:
+            sequence.generation._finish(error)
+        self._running = []
+        self._sessions.clear()
+        while not self._waiting.empty():
+            generation = self._waiting.get_nowait()
+            if generation is not None:
+                generation._finish(error)
+        self.backend.close()
+
+    def _admit(self, block: bool) -> None:
+        """Move waiting requests into free slots"""
+        self._expire_sessions()
+        # Idle session caches give up their slot when nothing else is free
+        while len(self._running) < self.max_batch and (self._free_slots or self._sessions):
+            try:
+                generation = self._waiting.get(block=block and not self._running, timeout=0.1)
+            except queue.Empty:
+                return
+            if generation is None:
+                return
+            if generation.cancelled:
+                generation.request.finish_reason = "cancelled"
+                generation._finish()
+                continue
+
+            request = generation.request
+            tokens = self.backend.tokenize(request.prompt)
+            # Keep the end of an overlong prompt, that is where the question is. Room
+            # for the answer is capped so a large max_new_tokens can't eat the prompt
+            reserve = min(request.max_new_tokens, self.context_length // 4)
+            tokens = tokens[-(self.context_length - reserve):]
+            slot, reused = self._take_slot(request.session, tokens)
+            sequence = _Sequence(generation, slot, tokens)
+            sequence.n_past = reused
+            self._running.append(sequence)
+
+            self.tokens_prefilled += len(tokens) - reused
+            self.tokens_reused += reused
+            if reused:
+                self.metrics.incr("kv_reused_tokens", reused)
+            self.metrics.observe("batch_queue_wait_seconds", time.perf_counter() - request.queued_at)
+
+    def _take_slot(self, session: Optional[str], tokens: List[int]) -> Tuple[int, int]:
+        """A slot for the prompt, and how many of its first tokens are already in that slot's KV cache"""
+        cached = self._sessions.pop(session, None) if session is not None else None
+        if cached is None:
+            if not self._free_slots:
+                self._evict_session(next(iter(self._sessions)))
+            return self._free_slots.pop(0), 0
+
+        n = min(len(cached.tokens), len(tokens))
+        mismatch = np.flatnonzero(np.asarray(cached.tokens[:n]) != np.asarray(tokens[:n]))
+        keep = int(mismatch[0]) if len(mismatch) else n
+        # The last prompt token is always decoded again, its logits start the answer
+        keep = min(keep, len(tokens) - 1)
+        self.backend.truncate(cached.slot, keep)
+        return cached.slot, keep
+
+    def _keep_session(self, session: str, sequence: _Sequence) -> None:
+        """Park a finished sequence's KV cache for the session's next request"""
+        previous = self._sessions.pop(session, None)
+        if previous is not None:
+            # Two requests of one session ran at once, the later one wins
+            self._free_slot(previous.slot)
+        evaluated = (sequence.prompt_tokens + sequence.output)[:sequence.n_past]
+        self._sessions[session] = _CachedSession(sequence.slot, evaluated, time.monotonic())
+
+        if self.max_session_tokens is not None:
+            while sum(len(cached.tokens) for cached in self._sessions.values()) > self.max_session_tokens:
+                self._evict_session(next(iter(self._sessions)))
+
+    def _expire_sessions(self) -> None:
+        while not self._ended.empty():
+            session = self._ended.get_nowait()
+            if session in self._sessions:
+                self._evict_session(session)
+
+        now = time.monotonic()
+        for session, cached in list(self._sessions.items()):
+            if now - cached.last_used > self.session_ttl:
+                self._evict_session(session)
+
+    def _evict_session(self, session: str) -> None:
+        self._free_slot(self._sessions.pop(session).slot)
+        self.session_evictions += 1
+        self.metrics.incr("session_kv_evictions")
+
+    def _free_slot(self, slot: int) -> None:
+        try:
+            self.backend.release(slot)
+        finally:
+            self._free_slots.append(slot)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._admit(block=True)
+            for sequence in [s for s in self._running if s.generation.cancelled]:
+                self._retire(sequence, "cancelled")
+            if not self._running:
+                continue
+            try:
+                self._step()
+            except Exception as e:
+                self.logger.error(f"Decode step failed, failing {len(self._running)} requests: {e}")
+                for sequence in list(self._running):
+                    self._retire(sequence, "error", e)
+
+    def _step(self) -> None:
+        """One forward pass: next token for running sequences, prompt chunks for new ones"""
+        entries, budget = [], self.backend.max_batch_tokens
+        decoding = [s for s in self._running if not s.prefilling]
+        for sequence in decoding:
+            entries.append((sequence.slot, [sequence.output[-1]], sequence.n_past, True))
+        budget -= len(decoding)
+
+        # Prompts share what is left of the token budget, long ones continue next step
+        scheduled = {s.slot: 1 for s in decoding}
+        for sequence in self._running:
+            if not sequence.prefilling or budget <= 0:
+                continue
+            chunk = sequence.prompt_tokens[sequence.n_past:sequence.n_past + budget]
+            done = sequence.n_past + len(chunk) == len(sequence.prompt_tokens)
+            entries.append((sequence.slot, chunk, sequence.n_past, done))
+            scheduled[sequence.slot] = len(chunk)
+            budget -= len(chunk)
+
+        logits = self.backend.decode(entries)
+        self.steps += 1
+        self.metrics.observe("decode_batch_sequences", len(entries))
+
+        for sequence in list(self._running):
+            if sequence.slot not in scheduled:
+                continue
+            sequence.n_past += scheduled[sequence.slot]
+            if sequence.slot in logits:
+                self._advance(sequence, logits[sequence.slot])
+
+    def _advance(self, sequence: _Sequence, logits: np.ndarray) -> None:
+        request = sequence.request
+        token = sample_token(logits, request, sequence.output[-self.PENALTY_WINDOW:], sequence.rng)
+        if token == self.backend.eos_token:
+            self._retire(sequence, "eos")
+            return
+
+        sequence.output.append(token)
+        self.tokens_generated += 1
+        if request.first_token_at is None:
+            request.first_token_at = time.perf_counter()
+
+        text = self.backend.detokenize(sequence.output)
+        reason = None
+        for stop in request.stop:
+            # Only the new piece and the stop's length before it can hold a new match
+            index = text.find(stop, max(0, len(request.text) - len(stop)))
+            if index != -1:
+                text, reason = text[:index], "stop"
+        request.text = text
+
+        if reason is None and len(sequence.output) >= request.max_new_tokens:
+            reason = "length"
+        if reason is None and sequence.n_past + 1 >= self.context_length:
+            reason = "context"
+        if reason is not None:
+            self._retire(sequence, reason)
+        else:
+            # Hold back a tail that could still turn into a stop sequence
+            holdback = max((len(stop) - 1 for stop in request.stop), default=0)
+            self._flush(sequence, len(text) - holdback)
+
+    def _flush(self, sequence: _Sequence, end: int) -> None:
+        if end > sequence.emitted:
+            sequence.generation._emit(sequence.request.text[sequence.emitted:end])
+            sequence.emitted = end
+
+    def _retire(self, sequence: _Sequence, reason: str, error: Optional[BaseException] = None) -> None:
+        """Leave the batch and free the slot for the next waiting request"""
+        self._running.remove(sequence)
+        self._flush(sequence, len(sequence.request.text))
+        if sequence.request.session is not None and error is None:
+            self._keep_session(sequence.request.session, sequence)
+        else:
+            self._free_slot(sequence.slot)
+        sequence.request.finish_reason = reason
+        sequence.generation._finish(error)
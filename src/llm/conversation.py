@@ -0,0 +1,189 @@
+from typing import Dict, Any, List, Optional, Iterator
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from src.utils.metrics import get_metrics
+from src.utils.path_utils import get_config_path
+import logging
+import os
+import threading
+import time
+import uuid
+import yaml
+
+
+@dataclass
+class Turn:
+    """One question of a conversation, with the context it was answered from"""
+    query: str
+    context: Optional[str]
+    answer: str
+
+
+@dataclass
+class Conversation:
+    """A session's turns since the last compaction, and a summary of the ones before"""
+    session_id: str
+    turns: List[Turn] = field(default_factory=list)
+    summary: Optional[str] = None
+    # Key of the model state for this conversation, fresh for every new conversation
+    # so a session id that comes back after eviction never meets stale state
+    state_key: str = field(default_factory=lambda: uuid.uuid4().hex)
+    last_used: float = field(default_factory=time.monotonic)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+
+class ConversationStore:
+    """
+    Multi-turn conversations for QueryHandler.
+
+    Every turn is prompted as a continuation of the previous ones, so a model
+    that supports sessions (BatchedEngine) only evaluates the new turn's
+    tokens and keeps its KV cache between turns. When the history grows past
+    `max_history_tokens`, all but the last `keep_recent_turns` turns are
+    replaced by a summary, which bounds the prompt and therefore the cost of
+    a turn however long the conversation runs.
+
+    Conversations are dropped after `ttl` idle seconds, and the least
+    recently used ones when there are more than `max_sessions`.
+    """
+
+    def __init__(
+        self,
+        mistral_client,
+        enabled: bool = True,
+        max_sessions: int = 1000,
+        ttl: float = 1800.0,
+        max_history_tokens: int = 1536,
+        keep_recent_turns: int = 2,
+        summary_tokens: int = 160,
+        follow_up_words: int = 4,
+    ):
+        """
+        Args:
+            mistral_client: MistralClient that builds the prompts and writes the summaries
+            enabled: When False, session ids are ignored and every query is a single turn
+            max_sessions: Conversations kept at once
+            ttl: Seconds a conversation is kept without a new turn
+            max_history_tokens: History size that triggers a compaction
+            keep_recent_turns: Turns kept verbatim by a compaction
+            summary_tokens: Generation cap for a summary
+            follow_up_words: Queries this short are searched together with the previous question
+        """
+        self.logger = logging.getLogger(__name__)
+        self.metrics = get_metrics()
+        self.mistral_client = mistral_client
+        self.enabled = enabled
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_history_tokens = max_history_tokens
+        self.keep_recent_turns = keep_recent_turns
+        self.summary_tokens = summary_tokens
+        self.follow_up_words = follow_up_words
+
+        self._conversations: "OrderedDict[str, Conversation]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.compactions = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_config(cls, mistral_client, config_path: str = None) -> "ConversationStore":
+        """Build from the optional 'conversations' section of config.yaml, disabled by default"""
+        config_path = config_path or get_config_path()
+        config = {"enabled": False}
+        if os.path.exists(config_path):
+            with open(config_path, "r") as file:
+                config.update((yaml.safe_load(file) or {}).get("conversations", {}) or {})
+        return cls(mistral_client, **config)
+
+    def get(self, session_id: str) -> Conversation:
+        """The session's conversation, started if it doesn't exist or has expired"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [c for c in self._conversations.values() if now - c.last_used > self.ttl]
+            for conversation in expired:
+                del self._conversations[conversation.session_id]
+
+            conversation = self._conversations.get(session_id)
+            if conversation is None:
+                conversation = self._conversations[session_id] = Conversation(session_id)
+                while len(self._conversations) > self.max_sessions:
+                    expired.append(self._conversations.popitem(last=False)[1])
+            self._conversations.move_to_end(session_id)
+            conversation.last_used = now
+
+        for old in expired:
+            self._drop(old)
+        return conversation
+
+    @contextmanager
+    def turn(self, session_id: str) -> Iterator[Conversation]:
+        """Hold the conversation for one turn, turns of a session run one at a time"""
+        conversation = self.get(session_id)
+        with conversation.lock:
+            yield conversation
+            conversation.last_used = time.monotonic()
+
+    def end(self, session_id: str) -> None:
+        """Forget a conversation and free its model state"""
+        with self._lock:
+            conversation = self._conversations.pop(session_id, None)
+        if conversation is not None:
+            self._drop(conversation)
+
+    def _drop(self, conversation: Conversation) -> None:
+        self.evictions += 1
+        self.metrics.incr("conversation_evictions")
+        try:
+            self.mistral_client.end_session(conversation.state_key)
+        except Exception as e:
+            self.logger.error(f"Failed to free state of session {conversation.session_id}: {e}")
+
+    def history(self, conversation: Conversation) -> str:
+        """Prompt text of the turns so far, the next turn's prompt continues it"""
+        return self.mistral_client.history_prompt(
+            [(t.query, t.context, t.answer) for t in conversation.turns], conversation.summary
+        )
+
+    def retrieval_query(self, conversation: Conversation, query: str) -> str:
+        """Search text for a turn. Short follow-ups like "and the fee?" need the previous question to find anything"""
+        if not conversation.turns or len(query.split()) > self.follow_up_words:
+            return query
+        return f"{conversation.turns[-1].query} {query}"
+
+    def record(self, conversation: Conversation, query: str, context: Optional[str], answer: str) -> None:
+        """Add an answered turn, compacting the history when it got too long"""
+        conversation.turns.append(Turn(query, context, answer))
+        if (len(conversation.turns) > self.keep_recent_turns
+                and self._count_tokens(self.history(conversation)) > self.max_history_tokens):
+            self._compact(conversation)
+
+    def _compact(self, conversation: Conversation) -> None:
+        """Replace all but the most recent turns with a summary"""
+        split = len(conversation.turns) - self.keep_recent_turns
+        old, recent = conversation.turns[:split], conversation.turns[split:]
+
+        lines = [f"Earlier: {conversation.summary}"] if conversation.summary else []
+        for turn in old:
+            lines.append(f"Student: {turn.query}\nAssistant: {turn.answer}")
+        with self.metrics.span("conversation_compaction"):
+            summary = self.mistral_client.summarize("\n\n".join(lines), max_new_tokens=self.summary_tokens)
+
+        conversation.summary = summary
+        conversation.turns = recent
+        self.compactions += 1
+        self.metrics.incr("conversation_compactions")
+        self.logger.debug(f"Compacted {len(old)} turns of session {conversation.session_id}")
+
+    def _count_tokens(self, text: str) -> int:
+        try:
+            return len(self.mistral_client.model.tokenize(text))
+        except Exception:
+            return len(text.split())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._conversations),
+            "compactions": self.compactions,
+            "evictions": self.evictions,
+        }
@@ -1,42 +1,71 @@
-from ctransformers import AutoModelForCausalLM
-from typing import Dict, Optional
+from typing import Dict, Optional, Iterator, Any, List, Tuple
+try:
+    from ctransformers import AutoModelForCausalLM
+except ImportError:  # only needed when loading a GGUF model from disk
+    AutoModelForCausalLM = None
 from src.utils.path_utils import get_config_path
+from src.utils.metrics import get_metrics
+from src.utils.hardware import inference_params, load_tuned
+from src.llm.batching import BatchedEngine
 import yaml
 import os
+import time
+
+
+# Base system prompt to encourage concise, direct responses
+SYSTEM_PROMPT = "You are a helpful AI assistant. Provide direct, concise answers without disclaimers or apologies."
 
 
 class MistralClient:
-    def __init__(self, config_path: str = None):
+    def __init__(self, config_path: str = None, model=None):
+        """
+        Initialize the Mistral client
+
+        Args:
+            config_path: Path to config.yaml
+            model: Already loaded model with the ctransformers call interface.
+                   Skips loading the GGUF file when given.
+        """
         # Load configuration
-        config_path = config_path or get_config_path()
-        with open(config_path, "r") as file:
+        self.config_path = config_path or get_config_path()
+        with open(self.config_path, "r") as file:
             self.config = yaml.safe_load(file)["model"]
 
+        self.metrics = get_metrics()
+
         # Initialize model
-        self.model = self._init_model()
+        self.model = model if model is not None else self._init_model()
 
-    def _init_model(self) -> AutoModelForCausalLM:
+    def _init_model(self):
         """Initialize the Mistral model"""
         model_path = os.path.abspath(self.config["path"])
 
         if not os.path.exists(model_path):
             raise FileNotFoundError(f"Model file not found at {model_path}")
 
+        # Autotuned settings for this host, see src/llm/autotune.py
+        params = inference_params(self.config, tuned=load_tuned(self.config_path))
+
+        # Concurrent requests share decode steps, see src/llm/batching.py
+        if (self.config.get("batching") or {}).get("enabled"):
+            return BatchedEngine.from_config(self.config, params)
+
+        if AutoModelForCausalLM is None:
+            raise ImportError("ctransformers is required to load the Mistral model")
         return AutoModelForCausalLM.from_pretrained(
             model_path,
             model_type="mistral",
-            context_length=self.config["context_length"],
-            gpu_layers=50,
+            **params,
         )
 
-    def _create_prompt(self, query: str, context: Optional[str] = None) -> str:
-        """Create a well-structured prompt for the model"""
-        # Base system prompt to encourage concise, direct responses
-        system_prompt = "You are a helpful AI assistant. Provide direct, concise answers without disclaimers or apologies."
+    def _create_prompt(self, query: str, context: Optional[str] = None, history: Optional[str] = None) -> str:
+        """Create a well-structured prompt for the model, continuing `history` when given"""
+        if history:
+            return history + self._turn_prompt(query, context)
 
         if context:
             # If we have context, use it in a structured way
-            prompt = f"""[INST] {system_prompt}
+            prompt = f"""[INST] {SYSTEM_PROMPT}
 
 Context: {context}
 
@@ -45,7 +74,7 @@ Question: {query}
 Provide a concise answer based on the context above. [/INST]"""
         else:
             # For direct questions, keep it simple
-            prompt = f"""[INST] {system_prompt}
+            prompt = f"""[INST] {SYSTEM_PROMPT}
 
 Question: {query}
 
@@ -53,6 +82,48 @@ Provide a concise answer in one line. [/INST]"""
 
         return prompt
 
+    def _turn_prompt(self, query: str, context: Optional[str] = None) -> str:
+        """A follow-up turn, the system prompt is already in the history"""
+        if context:
+            return f"""[INST] Context: {context}
+
+Question: {query}
+
+Provide a concise answer based on the context above. [/INST]"""
+        return f"""[INST] Question: {query}
+
+Provide a concise answer in one line. [/INST]"""
+
+    def history_prompt(self, turns: List[Tuple[str, Optional[str], str]], summary: Optional[str] = None) -> str:
+        """
+        Earlier turns of a conversation, exactly as they were prompted and answered
+
+        Args:
+            turns: (query, context, answer) of every turn since the summary
+            summary: Summary of the turns before those
+        """
+        parts = []
+        if summary:
+            parts.append(f"[INST] {SYSTEM_PROMPT}\n\nSummary of the conversation so far: {summary} [/INST] Understood.</s>")
+        for query, context, answer in turns:
+            prompt = self._turn_prompt(query, context) if parts else self._create_prompt(query, context)
+            parts.append(f"{prompt} {answer}</s>")
+        return "".join(parts)
+
+    def summarize(self, transcript: str, max_new_tokens: int = 160) -> str:
+        """Condense a conversation transcript, used to keep long histories short"""
+        prompt = f"""[INST] Summarize this conversation between a student and the assistant in a few sentences. Keep names, dates, numbers and open questions.
+
+{transcript} [/INST]"""
+        with self.metrics.span("summarize"):
+            summary = self.model(prompt, **self._generation_kwargs(max_new_tokens, 0.2, None))
+        return summary.strip()
+
+    def end_session(self, session_id: str) -> None:
+        """Free the model state kept for a conversation"""
+        if getattr(self.model, "supports_sessions", False):
+            self.model.end_session(session_id)
+
     def generate_response(
         self,
         query: str,
@@ -60,19 +131,27 @@ Provide a concise answer in one line. [/INST]"""
         max_new_tokens: Optional[int] = None,
         temperature: Optional[float] = None,
         top_p: Optional[float] = None,
+        history: Optional[str] = None,
+        session_id: Optional[str] = None,
     ) -> str:
-        """Generate a response using the Mistral model"""
+        """
+        Generate a response using the Mistral model
+
+        Args:
+            history: Earlier turns of the conversation, see history_prompt
+            session_id: Lets a model that supports sessions reuse its state for the history
+        """
         # Create well-structured prompt
-        prompt = self._create_prompt(query, context)
+        with self.metrics.span("prompt_build"):
+            prompt = self._create_prompt(query, context, history)
 
         # Generate response with appropriate parameters
-        response = self.model(
-            prompt,
-            max_new_tokens=max_new_tokens or self.config.get("max_tokens", 2048),
-            temperature=temperature or self.config.get("temperature", 0.7),
-            top_p=top_p or self.config.get("top_p", 0.95),
-            stop=["</s>", "[/INST]"],
-        )
+        start = time.perf_counter()
+        with self.metrics.span("generate"):
+            response = self.model(prompt, **self._generation_kwargs(max_new_tokens, temperature, top_p, session_id))
+
+        if self.metrics.enabled:
+            self._record_token_metrics(prompt, response, time.perf_counter() - start)
 
         # Clean up the response
         response = response.strip()
@@ -82,6 +161,73 @@ Provide a concise answer in one line. [/INST]"""
 
         return response
 
+    def stream_response(
+        self,
+        query: str,
+        context: Optional[str] = None,
+        max_new_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        top_p: Optional[float] = None,
+        history: Optional[str] = None,
+        session_id: Optional[str] = None,
+    ) -> Iterator[str]:
+        """Generate a response token by token, yields text pieces as the model produces them"""
+        with self.metrics.span("prompt_build"):
+            prompt = self._create_prompt(query, context, history)
+
+        start = time.perf_counter()
+        pieces = []
+        with self.metrics.span("generate"):
+            stream = self.model(prompt, stream=True,
+                                **self._generation_kwargs(max_new_tokens, temperature, top_p, session_id))
+            try:
+                for piece in stream:
+                    if not pieces:
+                        self.metrics.observe("time_to_first_token_seconds", time.perf_counter() - start)
+                    pieces.append(piece)
+                    yield piece
+            finally:
+                # Stops the model when the caller stops reading, e.g. after a client disconnect
+                close = getattr(stream, "close", None)
+                if close is not None:
+                    close()
+
+        if self.metrics.enabled:
+            self._record_token_metrics(prompt, "".join(pieces), time.perf_counter() - start)
+
+    def _generation_kwargs(
+        self,
+        max_new_tokens: Optional[int],
+        temperature: Optional[float],
+        top_p: Optional[float],
+        session_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        kwargs = {
+            "max_new_tokens": max_new_tokens or self.config.get("max_tokens", 2048),
+            "temperature": temperature or self.config.get("temperature", 0.7),
+            "top_p": top_p or self.config.get("top_p", 0.95),
+            "stop": ["</s>", "[/INST]"],
+        }
+        if session_id is not None and getattr(self.model, "supports_sessions", False):
+            kwargs["session"] = session_id
+        return kwargs
+
+    def _record_token_metrics(self, prompt: str, response: str, elapsed: float) -> None:
+        """Record prompt/completion token counts and generation throughput"""
+        try:
+            prompt_tokens = len(self.model.tokenize(prompt))
+            completion_tokens = len(self.model.tokenize(response))
+        except Exception:
+            return
+
+        self.metrics.incr("prompt_tokens_total", prompt_tokens)
+        self.metrics.incr("completion_tokens_total", completion_tokens)
+        self.metrics.observe("prompt_tokens", prompt_tokens)
+        self.metrics.observe("completion_tokens", completion_tokens)
+        if elapsed > 0:
+            self.metrics.observe("generation_tokens_per_second", completion_tokens / elapsed)
+        self.metrics.annotate(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
     def __del__(self):
         """Cleanup when object is destroyed"""
         pass
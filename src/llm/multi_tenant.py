@@ -0,0 +1,208 @@
+from typing import Dict, Any, Optional, Callable, Iterator
+from collections import OrderedDict
+from contextlib import contextmanager
+from src.db.cross_encoder import CrossEncoderReranker
+from src.db.milvus_client import MilvusClient
+from src.llm.conversation import ConversationStore
+from src.llm.mistral_client import MistralClient
+from src.llm.query_handler import QueryHandler
+from src.rag.entity_index import EntityIndex
+from src.rag.fast_path import FastPathGate
+from src.utils.admission import AdmissionController
+from src.utils.metrics import get_metrics
+from src.utils.path_utils import get_config_path
+from src.utils.single_flight import SingleFlight
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # only needed when no embedding model is injected
+    SentenceTransformer = None
+import logging
+import os
+import threading
+import yaml
+
+
+class CollectionPool:
+    """
+    Keeps at most `max_loaded` tenant collections loaded in Milvus.
+
+    A tenant's collection is loaded when a request for it arrives. When too
+    many are loaded, the least recently used one with no request in flight
+    is released. Collections in use are never released, so the bound can be
+    exceeded briefly when every loaded tenant is busy.
+    """
+
+    def __init__(self, max_loaded: int = 2):
+        self.logger = logging.getLogger(__name__)
+        self.metrics = get_metrics()
+        self.max_loaded = max_loaded
+        self._loaded: "OrderedDict[str, Any]" = OrderedDict()
+        self._in_use: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.releases = 0
+
+    @property
+    def loaded(self):
+        return list(self._loaded)
+
+    @contextmanager
+    def lease(self, tenant: str, store):
+        """Hold the tenant's collection loaded for the duration of the block"""
+        with self._lock:
+            self._in_use[tenant] = self._in_use.get(tenant, 0) + 1
+            if tenant in self._loaded:
+                self._loaded.move_to_end(tenant)
+                load = False
+            else:
+                self._loaded[tenant] = store
+                self.loads += 1
+                load = True
+
+        try:
+            if load:
+                with self.metrics.span("collection_load"):
+                    store.load()
+                self.metrics.incr("tenant_collection_loads")
+                self.logger.info(f"Loaded collection for tenant {tenant}")
+            self._evict()
+            yield store
+        finally:
+            with self._lock:
+                self._in_use[tenant] -= 1
+            self._evict()
+
+    def _evict(self) -> None:
+        with self._lock:
+            victims = []
+            for tenant in list(self._loaded):
+                if len(self._loaded) - len(victims) <= self.max_loaded:
+                    break
+                if not self._in_use.get(tenant):
+                    victims.append((tenant, self._loaded.pop(tenant)))
+            self.releases += len(victims)
+
+        for tenant, store in victims:
+            try:
+                store.release()
+                self.metrics.incr("tenant_collection_releases")
+                self.logger.info(f"Released collection for tenant {tenant}")
+            except Exception as e:
+                self.logger.error(f"Failed to release collection for tenant {tenant}: {e}")
+
+
+class MultiTenantQueryHandler:
+    """
+    Serves several tenants (campuses, departments) from one process.
+
+    Every tenant has its own collection, priority-term profile, payload
+    cache, entity index, fast-path gate and single-flight group. All tenants share one
+    embedding model, one cross-encoder, one LLM and one admission controller,
+    since those are what the tenants compete for.
+    """
+
+    def __init__(
+        self,
+        tenants: Dict[str, Dict[str, Any]],
+        embedding_model=None,
+        mistral_client=None,
+        store_factory: Optional[Callable[[str, Dict[str, Any]], Any]] = None,
+        max_loaded_collections: int = 2,
+        admission: AdmissionController = None,
+        reranker: CrossEncoderReranker = None,
+        config_path: str = None,
+    ):
+        """
+        Args:
+            tenants: Tenant name to profile. A profile holds 'milvus' overrides
+                (collection_name, priority_terms, score_weights, payload_cache_size, ...)
+                and optional 'fast_path', 'single_flight' and 'entity_index' settings
+            embedding_model: Shared embedding model, created from config when omitted
+            mistral_client: Shared MistralClient, created from config when omitted
+            store_factory: Builds a tenant's vector store from its name and profile,
+                defaults to a MilvusClient on the shared connection
+            max_loaded_collections: Collections kept loaded at once
+            admission: Admission controller shared by every tenant
+            reranker: Cross-encoder shared by every tenant, created from config when omitted
+            config_path: Path to config.yaml
+        """
+        if not tenants:
+            raise ValueError("At least one tenant is required")
+
+        self.logger = logging.getLogger(__name__)
+        self.metrics = get_metrics()
+        self.config_path = config_path
+        self.tenants = tenants
+        self.embedding_model = embedding_model or SentenceTransformer("all-MiniLM-L6-v2")
+        self.mistral_client = mistral_client or MistralClient(config_path)
+        self.store_factory = store_factory or self._milvus_store
+        self.admission = admission or AdmissionController.from_config(config_path)
+        self.reranker = reranker or CrossEncoderReranker.from_config(config_path)
+        self.pool = CollectionPool(max_loaded_collections)
+
+        self._handlers: Dict[str, QueryHandler] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config_path: str = None, **components) -> "MultiTenantQueryHandler":
+        """Build from the 'tenants' section of config.yaml"""
+        config_path = config_path or get_config_path()
+        config = {}
+        if os.path.exists(config_path):
+            with open(config_path, "r") as file:
+                config = (yaml.safe_load(file) or {}).get("tenants", {}) or {}
+        return cls(
+            tenants=config.get("profiles", {}),
+            max_loaded_collections=config.get("max_loaded_collections", 2),
+            config_path=config_path,
+            **components,
+        )
+
+    def _milvus_store(self, tenant: str, profile: Dict[str, Any]) -> MilvusClient:
+        return MilvusClient(self.config_path, overrides=profile.get("milvus"), shared_connection=True)
+
+    def _tenant_component(self, component, profile: Dict[str, Any], section: str):
+        """A tenant's own instance, from its profile or else from the shared config section"""
+        if profile.get(section) is not None:
+            return component(**profile[section])
+        return component.from_config(self.config_path)
+
+    def handler_for(self, tenant: str) -> QueryHandler:
+        """The tenant's QueryHandler, built on first use around the shared models"""
+        handler = self._handlers.get(tenant)
+        if handler is not None:
+            return handler
+
+        with self._lock:
+            if tenant not in self._handlers:
+                profile = self.tenants.get(tenant)
+                if profile is None:
+                    raise KeyError(f"Unknown tenant: {tenant}")
+                self._handlers[tenant] = QueryHandler(
+                    embedding_model=self.embedding_model,
+                    milvus_client=self.store_factory(tenant, profile),
+                    mistral_client=self.mistral_client,
+                    fast_path=self._tenant_component(FastPathGate, profile, "fast_path"),
+                    single_flight=self._tenant_component(SingleFlight, profile, "single_flight"),
+                    admission=self.admission,
+                    conversations=ConversationStore.from_config(self.mistral_client, self.config_path),
+                    reranker=self.reranker,
+                    # Never the shared entity_index section, its answers come from another collection
+                    entities=EntityIndex(**profile.get("entity_index") or {}),
+                    config_path=self.config_path,
+                )
+                self.logger.info(f"Initialized tenant {tenant}")
+            return self._handlers[tenant]
+
+    def process_query(self, tenant: str, query: str, top_k: int = 3, **kwargs) -> Dict[str, Any]:
+        """Answer a query against the tenant's collection, see QueryHandler.process_query"""
+        handler = self.handler_for(tenant)
+        with self.pool.lease(tenant, handler.milvus_client):
+            result = handler.process_query(query, top_k=top_k, **kwargs)
+        return {**result, 'tenant': tenant}
+
+    def stream_query(self, tenant: str, query: str, top_k: int = 3, **kwargs) -> Iterator[Dict[str, Any]]:
+        """Stream an answer from the tenant's collection, see QueryHandler.stream_query"""
+        handler = self.handler_for(tenant)
+        with self.pool.lease(tenant, handler.milvus_client):
+            yield from handler.stream_query(query, top_k=top_k, **kwargs)
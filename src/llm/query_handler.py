@@ -1,50 +1,267 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional
+from src.db.cross_encoder import CrossEncoderReranker
 from src.db.milvus_client import MilvusClient
+from src.llm.conversation import ConversationStore, Conversation
 from src.llm.mistral_client import MistralClient
-from sentence_transformers import SentenceTransformer
+from src.rag.context_compression import ContextCompressor
+from src.rag.entity_index import EntityIndex
+from src.rag.fast_path import FastPathGate
+from src.utils.admission import AdmissionController
+from src.utils.metrics import get_metrics
+from src.utils.profiling import profiled
+from src.utils.single_flight import SingleFlight, normalize_query
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # only needed when no embedding model is injected
+    SentenceTransformer = None
 import logging
 
 
 class QueryHandler:
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+    def __init__(
+        self,
+        model_name: str = "all-MiniLM-L6-v2",
+        embedding_model=None,
+        milvus_client=None,
+        mistral_client=None,
+        fast_path: FastPathGate = None,
+        single_flight: SingleFlight = None,
+        admission: AdmissionController = None,
+        conversations: ConversationStore = None,
+        reranker: CrossEncoderReranker = None,
+        entities: EntityIndex = None,
+        compressor: ContextCompressor = None,
+        config_path: str = None,
+    ):
+        """
+        Initialize the query handler. Components that are passed in are used
+        as-is, the rest are created from config_path (config/config.yaml when omitted).
+        """
         self.logger = logging.getLogger(__name__)
-        self.embedding_model = SentenceTransformer(model_name)
-        self.milvus_client = MilvusClient()
-        self.mistral_client = MistralClient()
+        self.metrics = get_metrics()
+        self.embedding_model = embedding_model or SentenceTransformer(model_name)
+        self.milvus_client = milvus_client or MilvusClient(config_path)
+        self.mistral_client = mistral_client or MistralClient(config_path)
+        self.fast_path = fast_path or FastPathGate.from_config(config_path)
+        self.single_flight = single_flight or SingleFlight.from_config(config_path)
+        self.admission = admission or AdmissionController.from_config(config_path)
+        self.conversations = conversations or ConversationStore.from_config(self.mistral_client, config_path)
+        self.reranker = reranker or CrossEncoderReranker.from_config(config_path)
+        self.entities = entities or EntityIndex.from_config(config_path)
+        self.compressor = compressor or ContextCompressor.from_config(self.embedding_model, self.mistral_client,
+                                                                      config_path)
 
-    def process_query(self, query: str, top_k: int = 3) -> Dict[str, Any]:
-        try:
-            query_embedding = self.embedding_model.encode([query])[0].tolist()
+    @profiled("query")
+    def process_query(self, query: str, top_k: int = 3, client_id: str = "anonymous",
+                      timeout: Optional[float] = None, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Answer a query
 
-            search_results = self.milvus_client.search(
-                query_embedding=query_embedding,
-                limit=top_k,
-                query=query
+        Args:
+            query: User question
+            top_k: Number of chunks to retrieve
+            client_id: Client the admission quota is charged to
+            timeout: Seconds the caller will wait, requests that can't make it are rejected
+            session_id: Conversation the query continues, None for a single-turn query
+
+        Raises:
+            Rejected: When admission control sheds the request
+        """
+        # Quota is charged per caller, a slot only per computation
+        self.admission.charge(client_id)
+        if session_id is not None and self.conversations.enabled:
+            # A turn depends on its conversation, so it is never shared with other callers
+            with self.admission.admit(client_id, timeout, charge=False) as ticket, \
+                    self.conversations.turn(session_id) as conversation:
+                result = self._process_query(query, ticket.top_k(top_k), ticket.max_new_tokens,
+                                             ticket.retrieval_only, conversation)
+                result['degraded'] = ticket.tier_name if ticket.tier else None
+        else:
+            # Identical queries in flight at the same time share one retrieval and generation,
+            # and only the leader that runs it waits for an admission slot
+            result = self.single_flight.do(
+                self._flight_key(query, top_k),
+                lambda: self._admitted_query(query, top_k, client_id, timeout),
             )
+        return {**result, 'query': query}
 
-            # Format context for Mistral
-            context = self._format_context(search_results)
+    def end_session(self, session_id: str) -> None:
+        """Forget a conversation"""
+        self.conversations.end(session_id)
 
-            # Generate response with Mistral
-            response = self.mistral_client.generate_response(
-                query=query,
-                context=context,  # Pass as context parameter
-                max_new_tokens=None,  # Use default from config
-                temperature=None,  # Use default from config
-                top_p=None  # Use default from config
-            )
+    def _flight_key(self, query: str, top_k: int):
+        return (normalize_query(query), top_k)
+
+    def _admitted_query(self, query: str, top_k: int, client_id: str,
+                        timeout: Optional[float]) -> Dict[str, Any]:
+        """Run a query in an admission slot, at the tier the slot was granted at"""
+        with self.admission.admit(client_id, timeout, charge=False) as ticket:
+            result = self._process_query(query, ticket.top_k(top_k), ticket.max_new_tokens, ticket.retrieval_only)
+        return {**result, 'degraded': ticket.tier_name if ticket.tier else None}
+
+    def _admitted_stream(self, query: str, top_k: int, client_id: str,
+                         timeout: Optional[float]) -> Iterator[Dict[str, Any]]:
+        with self.admission.admit(client_id, timeout, charge=False) as ticket:
+            yield from self._stream_query(query, ticket.top_k(top_k), ticket.max_new_tokens, ticket.retrieval_only)
+
+    def _conversation_kwargs(self, conversation: Optional[Conversation]) -> Dict[str, Any]:
+        if conversation is None:
+            return {}
+        return {'history': self.conversations.history(conversation), 'session_id': conversation.state_key}
+
+    def _process_query(self, query: str, top_k: int, max_new_tokens: Optional[int] = None,
+                       retrieval_only: bool = False, conversation: Optional[Conversation] = None) -> Dict[str, Any]:
+        try:
+            with self.metrics.trace("query", top_k=top_k):
+                search_query = self.conversations.retrieval_query(conversation, query) if conversation else query
+                # Contact, link, fee and deadline lookups are answered from the entity index
+                response, search_results = self.entities.try_answer(query, search_query)
+                query_embedding = None
+                if response is None:
+                    query_embedding = self._embed_query(search_query)
+                    search_results = self._retrieve(search_query, top_k, query_embedding)
+
+                    # Serve confident FAQ matches without running the LLM
+                    response = self.fast_path.try_answer(query, search_results)
+                fast_path = response is not None
+
+                # Format context for Mistral, compressed only when it will be generated from
+                generate = not fast_path and not retrieval_only
+                context = self._format_context(search_results, query_embedding if generate else None)
+
+                if not fast_path and retrieval_only:
+                    # Overloaded: serve the best stored answer instead of generating
+                    response = self._retrieval_only_answer(search_results)
+                elif not fast_path:
+                    # Generate response with Mistral
+                    response = self.mistral_client.generate_response(
+                        query=query,
+                        context=context,  # Pass as context parameter
+                        max_new_tokens=max_new_tokens,  # None uses the default from config
+                        temperature=None,  # Use default from config
+                        top_p=None,  # Use default from config
+                        **self._conversation_kwargs(conversation)
+                    )
+
+                if conversation is not None:
+                    self.conversations.record(conversation, query, context, response)
 
             return {
                 'query': query,
                 'response': response,
-                'sources': self._format_sources(search_results)
+                'sources': self._format_sources(search_results),
+                'fast_path': fast_path
             }
 
         except Exception as e:
             self.logger.error(f"Error processing query: {e}")
             raise
 
-    def _format_context(self, search_results: List[Dict]) -> str:
+    def stream_query(self, query: str, top_k: int = 3, client_id: str = "anonymous",
+                     timeout: Optional[float] = None, session_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Process a query and stream the answer
+
+        Yields:
+            {'type': 'sources', 'sources': [...]} once retrieval is done,
+            {'type': 'token', 'text': ...} for every generated piece, and
+            {'type': 'done', 'response': ..., 'fast_path': ...} at the end
+        """
+        self.admission.charge(client_id)
+        if session_id is not None and self.conversations.enabled:
+            with self.admission.admit(client_id, timeout, charge=False) as ticket, \
+                    self.conversations.turn(session_id) as conversation:
+                yield from self._stream_query(query, ticket.top_k(top_k), ticket.max_new_tokens,
+                                              ticket.retrieval_only, conversation)
+        else:
+            yield from self.single_flight.stream(
+                self._flight_key(query, top_k),
+                lambda: self._admitted_stream(query, top_k, client_id, timeout),
+            )
+
+    def _stream_query(self, query: str, top_k: int, max_new_tokens: Optional[int] = None,
+                      retrieval_only: bool = False, conversation: Optional[Conversation] = None
+                      ) -> Iterator[Dict[str, Any]]:
+        try:
+            with self.metrics.trace("query", top_k=top_k, stream=True):
+                search_query = self.conversations.retrieval_query(conversation, query) if conversation else query
+                response, search_results = self.entities.try_answer(query, search_query)
+                query_embedding = None
+                if response is None:
+                    query_embedding = self._embed_query(search_query)
+                    search_results = self._retrieve(search_query, top_k, query_embedding)
+                yield {'type': 'sources', 'sources': self._format_sources(search_results)}
+
+                if response is None:
+                    response = self.fast_path.try_answer(query, search_results)
+                fast_path = response is not None
+                generate = not fast_path and not retrieval_only
+                context = self._format_context(search_results, query_embedding if generate else None)
+
+                if not fast_path and retrieval_only:
+                    response = self._retrieval_only_answer(search_results)
+
+                if response is not None:
+                    yield {'type': 'token', 'text': response}
+                else:
+                    pieces = []
+                    for piece in self.mistral_client.stream_response(
+                        query=query,
+                        context=context,
+                        max_new_tokens=max_new_tokens,
+                        **self._conversation_kwargs(conversation)
+                    ):
+                        pieces.append(piece)
+                        yield {'type': 'token', 'text': piece}
+                    response = "".join(pieces).strip()
+
+                if conversation is not None:
+                    self.conversations.record(conversation, query, context, response)
+
+            yield {'type': 'done', 'response': response, 'fast_path': fast_path}
+
+        except Exception as e:
+            self.logger.error(f"Error processing query: {e}")
+            raise
+
+    def _embed_query(self, query: str) -> List[float]:
+        with self.metrics.span("embed"):
+            return self.embedding_model.encode([query])[0].tolist()
+
+    def _retrieve(self, query: str, top_k: int, query_embedding: Optional[List[float]] = None
+                  ) -> List[Dict[str, Any]]:
+        if query_embedding is None:
+            query_embedding = self._embed_query(query)
+
+        with self.metrics.span("search"):
+            search_results = self.milvus_client.search(
+                query_embedding=query_embedding,
+                limit=self.reranker.candidate_limit(top_k),
+                query=query
+            )
+
+        if self.reranker.enabled:
+            with self.metrics.span("cross_rerank"):
+                search_results = self.reranker.rerank(query, search_results, top_k)
+        return search_results
+
+    def _retrieval_only_answer(self, search_results: List[Dict]) -> str:
+        """Stored answer of the best hit, served without generation when overloaded"""
+        for result in search_results:
+            qa_parts = result['content'].split('\nA:', 1)
+            if len(qa_parts) == 2:
+                return qa_parts[1].strip()
+        return "The assistant is busy right now. Please check the sources below or try again shortly."
+
+    def _format_context(self, search_results: List[Dict], query_embedding: Optional[List[float]] = None) -> str:
+        """
+        Prompt context from the search results. Given the query embedding,
+        long answers are cut down to the sentences relevant to the query.
+        """
+        search_results = self.reranker.context_results(search_results)
+        if query_embedding is not None:
+            search_results = self.compressor.compress(search_results, query_embedding)
+
         contexts = []
         for result in search_results:
             content = result['content']
@@ -1,6 +1,7 @@
 from src.db.milvus_client import MilvusClient
 from src.llm.mistral_client import MistralClient
 from src.utils.path_utils import get_config_path
+from src.utils.metrics import get_metrics
 import time
 import os
 import traceback
@@ -94,6 +95,13 @@ if __name__ == "__main__":
     milvus_success = test_milvus()
     mistral_success = test_mistral()
 
+    metrics = get_metrics()
+    if metrics.enabled:
+        print("\nStage latencies:")
+        for name, summary in sorted(metrics.snapshot()["histograms"].items()):
+            print(f"  {name}: p50={summary['p50']:.4f} p95={summary['p95']:.4f} "
+                  f"p99={summary['p99']:.4f} (n={summary['count']})")
+
     if milvus_success and mistral_success:
         print("\n✅ All tests passed successfully!")
     else:
@@ -0,0 +1,186 @@
+from typing import List, Dict, Any
+from src.utils.lru_cache import LRUCache
+from src.utils.metrics import get_metrics
+from src.utils.path_utils import get_config_path
+import logging
+import os
+import re
+import threading
+import numpy as np
+import yaml
+
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_RE.split(text) if s.strip()]
+
+
+class ContextCompressor:
+    """
+    Query-aware sentence selection for the prompt context.
+
+    Long answers are split into sentences, and all sentences of all
+    retrieved chunks are scored against the query embedding with one matrix
+    product. Sentence embeddings are computed in one batch and cached, since
+    the same chunks are retrieved again and again. Every chunk keeps its
+    question and its best sentence. Further sentences are kept best first,
+    each with its neighbours, until `ratio` of the answer tokens is reached.
+    Short answers are passed through whole.
+    """
+
+    def __init__(
+        self,
+        embedding_model,
+        mistral_client=None,
+        enabled: bool = True,
+        ratio: float = 0.5,
+        min_sentences: int = 4,
+        neighbours: int = 1,
+        cache_size: int = 16384,
+    ):
+        """
+        Args:
+            embedding_model: Model the query embedding came from, used to embed sentences
+            mistral_client: MistralClient whose tokenizer counts the tokens saved, words when omitted
+            enabled: When False, chunks are passed to Mistral whole
+            ratio: Share of the answer tokens of long chunks to keep
+            min_sentences: Answers with at most this many sentences are kept whole
+            neighbours: Sentences kept on each side of a selected sentence
+            cache_size: Sentence embeddings kept
+        """
+        self.logger = logging.getLogger(__name__)
+        self.metrics = get_metrics()
+        self.embedding_model = embedding_model
+        self.mistral_client = mistral_client
+        self.enabled = enabled
+        self.ratio = ratio
+        self.min_sentences = min_sentences
+        self.neighbours = neighbours
+        self.cache = LRUCache(cache_size, name="sentence_embedding")
+
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.tokens_in = 0
+        self.tokens_saved = 0
+
+    @classmethod
+    def from_config(cls, embedding_model, mistral_client=None, config_path: str = None) -> "ContextCompressor":
+        """Build from the optional 'context_compression' section of config.yaml, disabled by default"""
+        config_path = config_path or get_config_path()
+        config = {"enabled": False}
+        if os.path.exists(config_path):
+            with open(config_path, "r") as file:
+                config.update((yaml.safe_load(file) or {}).get("context_compression", {}) or {})
+        return cls(embedding_model, mistral_client, **config)
+
+    def compress(self, hits: List[Dict[str, Any]], query_embedding: List[float]) -> List[Dict[str, Any]]:
+        """
+        Shorten the answers of long Q/A chunks to the sentences that matter for the query
+
+        Args:
+            hits: Search results going into the prompt
+            query_embedding: The query embedding already computed for the search
+
+        Returns:
+            The hits, with the content of long chunks replaced by their selected sentences
+        """
+        if not self.enabled:
+            return hits
+
+        # (chunk, question header, sentences) of the answers worth compressing
+        parsed = []
+        for i, hit in enumerate(hits):
+            qa_parts = hit["content"].split("\nA:", 1)
+            if len(qa_parts) != 2:
+                continue
+            sentences = split_sentences(qa_parts[1])
+            if len(sentences) > self.min_sentences:
+                parsed.append((i, qa_parts[0], sentences))
+        if not parsed:
+            return hits
+
+        sentences = [s for _, _, chunk_sentences in parsed for s in chunk_sentences]
+        owner = np.repeat(np.arange(len(parsed)), [len(s) for _, _, s in parsed])
+        tokens = np.array([self._count_tokens(s) for s in sentences])
+
+        with self.metrics.span("compress_context"):
+            scores = self._embed(sentences) @ self._normalize(np.asarray(query_embedding, dtype=np.float32))
+            keep = self._select(scores, owner, tokens)
+
+        compressed = list(hits)
+        start = 0
+        for i, question, chunk_sentences in parsed:
+            kept = keep[start:start + len(chunk_sentences)]
+            compressed[i] = {**hits[i], "content": f"{question}\nA: {self._join(chunk_sentences, kept)}"}
+            start += len(chunk_sentences)
+
+        total = int(tokens.sum())
+        saved = total - int(tokens[keep].sum())
+        with self._lock:
+            self.requests += 1
+            self.tokens_in += total
+            self.tokens_saved += saved
+        self.metrics.observe("context_tokens_saved", saved)
+        self.metrics.annotate(context_tokens_saved=saved)
+        return compressed
+
+    def _embed(self, sentences: List[str]) -> np.ndarray:
+        """Normalized embeddings of sentences, the uncached ones encoded in one batch"""
+        cached = self.cache.get_many(sentences)
+        missing = list(dict.fromkeys(s for s in sentences if s not in cached))
+        if missing:
+            encoded = self._normalize(np.asarray(self.embedding_model.encode(missing), dtype=np.float32))
+            for sentence, vector in zip(missing, encoded):
+                self.cache.put(sentence, vector)
+                cached[sentence] = vector
+        return np.stack([cached[s] for s in sentences])
+
+    def _normalize(self, vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def _select(self, scores: np.ndarray, owner: np.ndarray, tokens: np.ndarray) -> np.ndarray:
+        """Mask of the sentences to keep"""
+        keep = np.zeros(len(scores), dtype=bool)
+        order = np.argsort(-scores, kind="stable")
+
+        # Each chunk keeps its best sentence
+        _, first = np.unique(owner[order], return_index=True)
+        keep[order[first]] = True
+
+        budget = self.ratio * tokens.sum()
+        kept_tokens = tokens[keep].sum()
+        for i in order:
+            if kept_tokens >= budget:
+                break
+            window = np.arange(max(i - self.neighbours, 0), min(i + self.neighbours + 1, len(scores)))
+            added = window[(owner[window] == owner[i]) & ~keep[window]]
+            keep[added] = True
+            kept_tokens += tokens[added].sum()
+        return keep
+
+    def _join(self, sentences: List[str], kept: np.ndarray) -> str:
+        """Kept sentences in their original order, gaps marked with an ellipsis"""
+        parts = []
+        for i, sentence in enumerate(sentences):
+            if kept[i]:
+                if i > 0 and not kept[i - 1]:
+                    parts.append("...")
+                parts.append(sentence)
+        return " ".join(parts)
+
+    def _count_tokens(self, text: str) -> int:
+        try:
+            return len(self.mistral_client.model.tokenize(text))
+        except Exception:
+            return len(text.split())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "tokens_saved": self.tokens_saved,
+            "saved_ratio": self.tokens_saved / self.tokens_in if self.tokens_in else 0.0,
+            "cached_sentences": len(self.cache),
+        }
@@ -0,0 +1,317 @@
+from typing import List, Dict, Any, Iterable, Optional, Set, Tuple
+from src.rag.fast_path import STOPWORDS
+from src.utils.metrics import get_metrics
+from src.utils.path_utils import get_config_path
+from collections import Counter
+from pathlib import Path
+import argparse
+import json
+import logging
+import os
+import re
+import threading
+import yaml
+
+
+_WORD_RE = re.compile(r"[a-z0-9€]+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+# Entity types of TextChunker._extract_metadata and the phrasings that ask for them
+INTENTS = {
+    "emails": re.compile(r"\be-?mail(?:\s+address)?\b"),
+    "phone_numbers": re.compile(r"\b(?:(?:tele)?phone|call|ring)(?:\s+number)?\b"),
+    "urls": re.compile(r"\b(?:web\s?site|web\s?page|link|url|portal)\b"),
+    "fees": re.compile(r"\b(?:fees?|costs?|price|charge|how much)\b"),
+    "deadlines": re.compile(r"\b(?:deadlines?|due date|closing date|last day)\b"),
+    "locations": re.compile(r"\b(?:where is|where are|which room|what room|located|location)\b"),
+}
+
+LABELS = {
+    "emails": "Email",
+    "phone_numbers": "Phone",
+    "urls": "Website",
+    "fees": "Fee",
+    "deadlines": "Deadline",
+    "locations": "Location",
+}
+
+# Words of lookup questions that say nothing about what is being looked up
+QUERY_STOPWORDS = STOPWORDS | {
+    "what's", "whats", "who", "which", "where", "when", "please", "there", "get", "need",
+    "contact", "number", "address", "s", "much", "was", "their", "your", "from", "about",
+}
+
+
+def _stem(word: str) -> str:
+    return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+
+
+def subject_terms(text: str) -> Set[str]:
+    """Content words of a question, lightly stemmed"""
+    return {_stem(w) for w in _WORD_RE.findall(text.lower()) if w not in QUERY_STOPWORDS}
+
+
+class EntityIndex:
+    """
+    Inverted index over the contacts, links, fees and deadlines that
+    TextChunker extracts from every answer (metadata['extracted_info']).
+
+    Built at ingest time, it maps each entity type to postings of the
+    question and section words of the chunks that hold that type, and each
+    (type, value) to its chunks. A query that asks for one entity type
+    ("what's the email for ...", "how much is ...") is matched against the
+    postings of that type and answered with the answer sentences holding
+    the values, with no embedding, vector search or generation.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        path: Optional[str] = None,
+        intents: Optional[List[str]] = None,
+        min_coverage: float = 0.6,
+        min_subject_terms: int = 2,
+        max_query_words: int = 12,
+        template: str = "{sentences}",
+    ):
+        """
+        Args:
+            enabled: Whether queries are looked up at all
+            path: JSON file the index is saved to and loaded from
+            intents: Entity types answered directly, defaults to all but the noisy locations
+            min_coverage: Share of the query's subject words the matched question or section must contain
+            min_subject_terms: Subject words a query needs, and the matched question or section must share;
+                               a single generic word ("student") matches too many chunks
+            max_query_words: Longer queries ask for more than one value and go through retrieval
+            template: Format string for the answer, with {sentences}, {values}, {label}, {question},
+                      {section} and {source_file}
+        """
+        self.logger = logging.getLogger(__name__)
+        self.metrics = get_metrics()
+        self.enabled = enabled
+        self.path = path
+        self.intents = intents or ["emails", "phone_numbers", "urls", "fees", "deadlines"]
+        self.min_coverage = min_coverage
+        self.min_subject_terms = min_subject_terms
+        self.max_query_words = max_query_words
+        self.template = template
+
+        self._entries: List[Dict[str, Any]] = []
+        self._postings: Dict[str, Dict[str, Set[int]]] = {}
+        self._values: Dict[Tuple[str, str], Set[int]] = {}
+
+        self._lock = threading.Lock()
+        self.evaluated = 0
+        self.served = 0
+
+        if path and os.path.exists(path):
+            self.load(path)
+
+    @classmethod
+    def from_config(cls, config_path: str = None) -> "EntityIndex":
+        """Build from the optional 'entity_index' section of config.yaml, disabled by default"""
+        config_path = config_path or get_config_path()
+        config = {}
+        if os.path.exists(config_path):
+            with open(config_path, "r") as file:
+                config = (yaml.safe_load(file) or {}).get("entity_index", {}) or {}
+        return cls(**config)
+
+    @property
+    def size(self) -> int:
+        """Chunks holding at least one entity"""
+        return len(self._entries)
+
+    def add(self, chunks: Iterable[Dict[str, Any]]) -> int:
+        """
+        Index the extracted entities of chunks. A chunk already indexed
+        (same source_file and chunk_index) is replaced, so reloading is idempotent.
+
+        Returns:
+            Number of chunks that held an entity
+        """
+        entries = []
+        for chunk in chunks:
+            metadata = chunk.get("metadata") or {}
+            extracted = metadata.get("extracted_info") or {}
+            qa_parts = chunk["content"].split("\nA:", 1)
+            answer = qa_parts[1].strip() if len(qa_parts) == 2 else chunk["content"]
+            sentences = _SENTENCE_RE.split(answer)
+
+            entities = {}
+            for entity_type, values in extracted.items():
+                values = list(dict.fromkeys(v for v in values if v))
+                if values:
+                    entities[entity_type] = {
+                        "values": values,
+                        "sentences": [s for s in sentences if any(v in s for v in values)] or values,
+                    }
+            if not entities:
+                continue
+
+            entries.append({
+                "question": metadata.get("question") or qa_parts[0].replace("Q:", "").strip(),
+                # Scalar metadata, so replaced partitions can be dropped
+                "metadata": {k: v for k, v in metadata.items() if isinstance(v, (str, int, float))},
+                "entities": entities,
+            })
+
+        keys = {self._key(entry) for entry in entries}
+        if any(self._key(entry) in keys for entry in self._entries):
+            self._rebuild([entry for entry in self._entries if self._key(entry) not in keys])
+        for entry in entries:
+            self._index(entry)
+        return len(entries)
+
+    def _key(self, entry: Dict[str, Any]) -> Tuple[Any, Any]:
+        metadata = entry["metadata"]
+        return metadata.get("source_file"), metadata.get("chunk_index", entry["question"])
+
+    def _rebuild(self, entries: List[Dict[str, Any]]) -> None:
+        self._entries, self._postings, self._values = [], {}, {}
+        for entry in entries:
+            self._index(entry)
+
+    def _index(self, entry: Dict[str, Any]) -> None:
+        row = len(self._entries)
+        self._entries.append(entry)
+        terms = subject_terms(f"{entry['question']} {entry['metadata'].get('section', '')}")
+        for entity_type, entity in entry["entities"].items():
+            postings = self._postings.setdefault(entity_type, {})
+            for term in terms:
+                postings.setdefault(term, set()).add(row)
+            for value in entity["values"]:
+                self._values.setdefault((entity_type, value.lower()), set()).add(row)
+
+    def drop(self, key: str, value: Any) -> int:
+        """Remove the chunks whose metadata[key] equals value, e.g. a replaced handbook"""
+        entries = [e for e in self._entries if e["metadata"].get(key) != value]
+        dropped = len(self._entries) - len(entries)
+        if dropped:
+            self._rebuild(entries)
+        return dropped
+
+    def find(self, entity_type: str, value: str) -> List[Dict[str, Any]]:
+        """Chunks holding an entity value, e.g. every answer that mentions an email address"""
+        return [self._entries[row] for row in sorted(self._values.get((entity_type, value.lower()), ()))]
+
+    def save(self, path: Optional[str] = None) -> None:
+        path = path or self.path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "entries": self._entries}, f, ensure_ascii=False)
+        self.logger.info(f"Saved entity index of {self.size} chunks to {path}")
+
+    def load(self, path: str) -> None:
+        with open(path, "r", encoding="utf-8") as f:
+            self._rebuild(json.load(f)["entries"])
+
+    def detect(self, query: str) -> Optional[str]:
+        """Entity type a query asks for, None unless it asks for exactly one"""
+        text = query.lower()
+        found = [entity_type for entity_type in self.intents if INTENTS[entity_type].search(text)]
+        return found[0] if len(found) == 1 else None
+
+    def try_answer(self, query: str, subject_query: Optional[str] = None
+                   ) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+        """
+        Answer an entity lookup from the index
+
+        Args:
+            query: User question
+            subject_query: Text to take the subject from when the query has none,
+                e.g. a follow-up merged with the previous question
+
+        Returns:
+            (answer, [source hit]) or (None, []) when the query isn't a confident lookup
+        """
+        if not self.enabled or not self._entries:
+            return None, []
+
+        answer, hits = self._answer(query, subject_query)
+        with self._lock:
+            self.evaluated += 1
+            if answer is not None:
+                self.served += 1
+        self.metrics.incr("entity_index_served" if answer is not None else "entity_index_skipped")
+        return answer, hits
+
+    def _answer(self, query: str, subject_query: Optional[str]) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+        if len(query.split()) > self.max_query_words:
+            return None, []
+        entity_type = self.detect(query)
+        if entity_type is None:
+            return None, []
+
+        pattern = INTENTS[entity_type]
+        subject = subject_terms(pattern.sub(" ", query.lower()))
+        if len(subject) < self.min_subject_terms and subject_query:
+            subject = subject_terms(pattern.sub(" ", subject_query.lower()))
+        if len(subject) < self.min_subject_terms:
+            return None, []
+
+        postings = self._postings.get(entity_type, {})
+        matches = Counter(row for term in subject for row in postings.get(term, ()))
+        if not matches:
+            return None, []
+        best = max(matches.values())
+        if best < self.min_subject_terms or best / len(subject) < self.min_coverage:
+            return None, []
+
+        # Equally good chunks must agree, otherwise the lookup is ambiguous
+        rows = [row for row, count in matches.items() if count == best]
+        values = {tuple(self._entries[row]["entities"][entity_type]["values"]) for row in rows}
+        if len(values) > 1:
+            return None, []
+
+        entry = self._entries[min(rows)]
+        entity = entry["entities"][entity_type]
+        metadata = entry["metadata"]
+        try:
+            answer = self.template.format(
+                sentences=" ".join(entity["sentences"]),
+                values=", ".join(entity["values"]),
+                label=LABELS[entity_type],
+                question=entry["question"],
+                section=metadata.get("section", ""),
+                source_file=metadata.get("source_file", ""),
+            )
+        except (KeyError, IndexError) as e:
+            self.logger.error(f"Invalid entity index template: {e}")
+            answer = " ".join(entity["sentences"])
+
+        hit = {
+            "content": f"Q: {entry['question']}\nA: {' '.join(entity['sentences'])}",
+            "metadata": metadata,
+            "score": best / len(subject),
+        }
+        return answer, [hit]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "chunks": self.size,
+            "evaluated": self.evaluated,
+            "served": self.served,
+            "types": {entity_type: len({r for rows in postings.values() for r in rows})
+                      for entity_type, postings in self._postings.items()},
+        }
+
+
+if __name__ == "__main__":
+    from src.data_processing.chunk_store import iter_chunks
+
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Build the entity index from already chunked documents")
+    parser.add_argument("chunks", help="Chunk directory or chunk store")
+    parser.add_argument("--config", default=None)
+    parser.add_argument("--output", default=None, help="Defaults to entity_index.path from config")
+    args = parser.parse_args()
+
+    output = args.output or EntityIndex.from_config(args.config).path
+    if not output:
+        raise SystemExit("Set entity_index.path in config.yaml or pass --output")
+    index = EntityIndex()
+    count = index.add(iter_chunks(args.chunks))
+    index.save(output)
+    print(f"Indexed {count} chunks with entities: {index.stats()['types']}")
@@ -0,0 +1,144 @@
+from typing import List, Dict, Any, Optional
+from src.utils.path_utils import get_config_path
+from src.utils.metrics import get_metrics
+import logging
+import os
+import re
+import threading
+import yaml
+
+
+_WORD_RE = re.compile(r"[a-z0-9€]+")
+
+STOPWORDS = {
+    "a", "an", "the", "i", "my", "me", "is", "are", "do", "does", "can", "to", "of", "for",
+    "in", "on", "at", "and", "or", "be", "it", "this", "that", "with", "what", "how",
+}
+
+
+def question_overlap(query: str, question: str) -> float:
+    """Dice overlap of content words between the query and a stored question"""
+    query_terms = set(_WORD_RE.findall(query.lower())) - STOPWORDS
+    question_terms = set(_WORD_RE.findall(question.lower())) - STOPWORDS
+    if not query_terms or not question_terms:
+        return 0.0
+    return 2 * len(query_terms & question_terms) / (len(query_terms) + len(question_terms))
+
+
+class FastPathGate:
+    """
+    Confidence gate that answers straight from the top FAQ chunk.
+
+    Every chunk is already a curated Q/A pair, so when the best hit clears the
+    re-rank score, vector similarity and question overlap thresholds its stored
+    answer is returned without running the LLM. Hits ordered by the
+    cross-encoder are gated on its score instead of the heuristic one, with
+    thresholds of their own since the two are on different scales.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        min_score: float = 0.75,
+        min_vector_similarity: float = 0.40,
+        min_question_overlap: float = 0.7,
+        min_margin: float = 0.0,
+        min_rerank_score: float = 0.8,
+        min_rerank_margin: float = 0.0,
+        template: str = "{answer}",
+    ):
+        """
+        Args:
+            enabled: Whether the fast path is used at all
+            min_score: Minimum re-rank score of the top hit
+            min_vector_similarity: Minimum vector similarity of the top hit
+            min_question_overlap: Minimum word overlap between query and stored question
+            min_margin: Minimum score lead of the top hit over the runner-up
+            min_rerank_score: Minimum cross-encoder score of the top hit, used instead of min_score
+            min_rerank_margin: Minimum cross-encoder score lead, used instead of min_margin
+            template: Format string for the answer, with {answer}, {question}, {section} and {source_file}
+        """
+        self.logger = logging.getLogger(__name__)
+        self.metrics = get_metrics()
+        self.enabled = enabled
+        self.min_score = min_score
+        self.min_vector_similarity = min_vector_similarity
+        self.min_question_overlap = min_question_overlap
+        self.min_margin = min_margin
+        self.min_rerank_score = min_rerank_score
+        self.min_rerank_margin = min_rerank_margin
+        self.template = template
+
+        self._lock = threading.Lock()
+        self.evaluated = 0
+        self.served = 0
+
+    @classmethod
+    def from_config(cls, config_path: str = None) -> "FastPathGate":
+        """Build the gate from the optional 'fast_path' section of config.yaml"""
+        config_path = config_path or get_config_path()
+        config = {}
+        if os.path.exists(config_path):
+            with open(config_path, "r") as file:
+                config = (yaml.safe_load(file) or {}).get("fast_path", {}) or {}
+        return cls(**config)
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of evaluated queries that were answered by the fast path"""
+        return self.served / self.evaluated if self.evaluated else 0.0
+
+    def try_answer(self, query: str, search_results: List[Dict[str, Any]]) -> Optional[str]:
+        """
+        Return the stored answer of the top hit if it clears the gate, None otherwise
+        """
+        if not self.enabled:
+            return None
+
+        answer = self._answer(query, search_results)
+
+        with self._lock:
+            self.evaluated += 1
+            if answer is not None:
+                self.served += 1
+        self.metrics.incr("fast_path_served" if answer is not None else "fast_path_skipped")
+        self.metrics.annotate(fast_path=answer is not None)
+        return answer
+
+    def _answer(self, query: str, search_results: List[Dict[str, Any]]) -> Optional[str]:
+        if not search_results:
+            return None
+
+        top = search_results[0]
+        if "rerank_score" in top:
+            key, min_score, min_margin = "rerank_score", self.min_rerank_score, self.min_rerank_margin
+        else:
+            # No cross-encoder, or it fell back to the heuristic order
+            key, min_score, min_margin = "score", self.min_score, self.min_margin
+        if top[key] < min_score:
+            return None
+        if top.get("vector_similarity", 0.0) < self.min_vector_similarity:
+            return None
+        if len(search_results) > 1 and top[key] - search_results[1][key] < min_margin:
+            return None
+
+        qa_parts = top["content"].split('\nA:', 1)
+        if len(qa_parts) != 2:
+            return None
+        question = qa_parts[0].replace('Q:', '').strip()
+        answer = qa_parts[1].strip()
+
+        if question_overlap(query, question) < self.min_question_overlap:
+            return None
+
+        metadata = top.get("metadata", {})
+        try:
+            return self.template.format(
+                answer=answer,
+                question=question,
+                section=metadata.get("section", ""),
+                source_file=metadata.get("source_file", ""),
+            )
+        except (KeyError, IndexError) as e:
+            self.logger.error(f"Invalid fast path template: {e}")
+            return answer
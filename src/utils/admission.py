@@ -0,0 +1,268 @@
+from typing import Dict, Optional, List, Iterator
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from src.utils.metrics import get_metrics
+from src.utils.path_utils import get_config_path
+import logging
+import os
+import threading
+import time
+import yaml
+
+
+# Degradation tiers, in the order they kick in as queue wait grows
+TIERS = ("normal", "reduced_top_k", "capped_tokens", "retrieval_only")
+
+
+class Rejected(RuntimeError):
+    """A request was shed instead of queued. HTTP callers map this to 429 (quota) or 503."""
+
+    def __init__(self, reason: str, retry_after: float = 1.0):
+        super().__init__(f"request rejected: {reason}")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Allows `burst` requests at once, refilled at `rate` per second"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def try_take(self, now: float) -> bool:
+        self.tokens = min(self.burst, self.tokens + max(0.0, now - self.updated) * self.rate)
+        self.updated = max(self.updated, now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def retry_after(self) -> float:
+        return (1 - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+
+@dataclass
+class Ticket:
+    """An admitted request and the degradation tier it runs at"""
+    client_id: str
+    tier: int
+    queue_wait: float
+    deadline: Optional[float]
+    degraded_top_k: int
+    degraded_max_new_tokens: int
+
+    @property
+    def tier_name(self) -> str:
+        return TIERS[self.tier]
+
+    def top_k(self, requested: int) -> int:
+        return min(requested, self.degraded_top_k) if self.tier >= 1 else requested
+
+    @property
+    def max_new_tokens(self) -> Optional[int]:
+        """Token cap for generation, None for the configured default"""
+        return self.degraded_max_new_tokens if self.tier >= 2 else None
+
+    @property
+    def retrieval_only(self) -> bool:
+        return self.tier >= 3
+
+
+class AdmissionController:
+    """
+    Admission control in front of QueryHandler.
+
+    A request must first pass its client's token bucket. It then takes one
+    of `max_concurrency` slots, or waits in a bounded FIFO queue. A request
+    that can't be served before its deadline is rejected up front (from the
+    estimated wait) or when its deadline passes while queued, so capacity
+    isn't spent on answers nobody will receive.
+
+    The smoothed queue wait picks the degradation tier. Cheaper work per
+    request drains the queue faster and keeps goodput up at peak load.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        max_concurrency: int = 4,
+        max_queue: int = 64,
+        client_rate: float = 1.0,
+        client_burst: float = 5.0,
+        default_timeout: Optional[float] = 30.0,
+        degrade_after: List[float] = (0.5, 1.0, 2.0),
+        degraded_top_k: int = 1,
+        degraded_max_new_tokens: int = 128,
+        smoothing: float = 0.2,
+        max_clients: int = 10000,
+    ):
+        """
+        Args:
+            enabled: When False, every request is admitted at once at the normal tier
+            max_concurrency: Requests processed at the same time
+            max_queue: Requests waiting for a slot, beyond that new ones are rejected
+            client_rate: Sustained requests per second per client, 0 disables quotas
+            client_burst: Requests a client may send at once
+            default_timeout: Deadline in seconds for requests that don't bring one
+            degrade_after: Smoothed queue wait in seconds at which each degraded tier starts
+            degraded_top_k: top_k from the first degraded tier on
+            degraded_max_new_tokens: Generation cap from the second degraded tier on
+            smoothing: Weight of the newest sample in the moving averages
+            max_clients: Token buckets kept before idle ones are dropped
+        """
+        self.logger = logging.getLogger(__name__)
+        self.metrics = get_metrics()
+        self.enabled = enabled
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.default_timeout = default_timeout
+        self.degrade_after = list(degrade_after)
+        self.degraded_top_k = degraded_top_k
+        self.degraded_max_new_tokens = degraded_max_new_tokens
+        self.smoothing = smoothing
+        self.max_clients = max_clients
+
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting: deque = deque()
+        self._buckets: Dict[str, TokenBucket] = {}
+
+        self.queue_wait = 0.0    # smoothed seconds spent waiting for a slot
+        self.service_time = 0.0  # smoothed seconds holding a slot
+        self.admitted = 0
+        self.completed = 0
+        self.rejected: Dict[str, int] = {}
+
+    @classmethod
+    def from_config(cls, config_path: str = None) -> "AdmissionController":
+        """Build from the optional 'admission' section of config.yaml, disabled by default"""
+        config_path = config_path or get_config_path()
+        config = {"enabled": False}
+        if os.path.exists(config_path):
+            with open(config_path, "r") as file:
+                config.update((yaml.safe_load(file) or {}).get("admission", {}) or {})
+        return cls(**config)
+
+    @property
+    def tier(self) -> int:
+        """Degradation tier for the current smoothed queue wait"""
+        return sum(1 for threshold in self.degrade_after if self.queue_wait >= threshold)
+
+    def _reject(self, reason: str, retry_after: float = 1.0) -> None:
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        self.metrics.incr(f"admission_rejected_{reason}")
+        raise Rejected(reason, retry_after)
+
+    def _check_quota(self, client_id: str, now: float) -> None:
+        if self.client_rate <= 0:
+            return
+        bucket = self._buckets.get(client_id)
+        if bucket is None:
+            if len(self._buckets) >= self.max_clients:
+                # Buckets that refilled completely carry no state worth keeping
+                idle = self.client_burst / self.client_rate
+                self._buckets = {k: b for k, b in self._buckets.items() if now - b.updated < idle}
+            bucket = self._buckets[client_id] = TokenBucket(self.client_rate, self.client_burst)
+        if not bucket.try_take(now):
+            self._reject("quota", bucket.retry_after())
+
+    def charge(self, client_id: str = "anonymous") -> None:
+        """
+        Take one request from the client's token bucket without taking a slot
+
+        Raises:
+            Rejected: The client is over its quota
+        """
+        if not self.enabled:
+            return
+        with self._cond:
+            self._check_quota(client_id, time.monotonic())
+
+    def _estimated_wait(self, position: int) -> float:
+        """Seconds until the request at this queue position gets a slot"""
+        return position * self.service_time / self.max_concurrency
+
+    @contextmanager
+    def admit(self, client_id: str = "anonymous", timeout: Optional[float] = None,
+              charge: bool = True) -> Iterator[Ticket]:
+        """
+        Hold a processing slot for the duration of the block
+
+        Args:
+            client_id: Key of the token bucket
+            timeout: Seconds the caller will wait for an answer, defaults to default_timeout
+            charge: False when the request was already charged through charge()
+
+        Raises:
+            Rejected: Over quota, queue full, or the deadline can't be met
+        """
+        now = time.monotonic()
+        timeout = timeout if timeout is not None else self.default_timeout
+        deadline = now + timeout if timeout is not None else None
+
+        if not self.enabled:
+            yield Ticket(client_id, 0, 0.0, deadline, self.degraded_top_k, self.degraded_max_new_tokens)
+            return
+
+        with self._cond:
+            if charge:
+                self._check_quota(client_id, now)
+
+            if self._active >= self.max_concurrency or self._waiting:
+                if len(self._waiting) >= self.max_queue:
+                    self._reject("queue_full", self._estimated_wait(len(self._waiting)))
+                estimate = self._estimated_wait(len(self._waiting) + 1)
+                if deadline is not None and now + estimate + self.service_time > deadline:
+                    self._reject("deadline", estimate)
+
+                waiter = object()
+                self._waiting.append(waiter)
+                try:
+                    while self._waiting[0] is not waiter or self._active >= self.max_concurrency:
+                        remaining = deadline - time.monotonic() if deadline is not None else None
+                        if remaining is not None and remaining <= 0:
+                            self._reject("deadline_expired")
+                        self._cond.wait(remaining)
+                finally:
+                    self._waiting.remove(waiter)
+                    self._cond.notify_all()
+
+            self._active += 1
+            started = time.monotonic()
+            waited = started - now
+            self.queue_wait += self.smoothing * (waited - self.queue_wait)
+            tier = self.tier
+            self.admitted += 1
+
+        self.metrics.observe("admission_queue_wait_seconds", waited)
+        if tier:
+            self.metrics.incr(f"admission_degraded_{TIERS[tier]}")
+        try:
+            yield Ticket(client_id, tier, waited, deadline, self.degraded_top_k, self.degraded_max_new_tokens)
+        finally:
+            with self._cond:
+                self._active -= 1
+                elapsed = time.monotonic() - started
+                # The first sample seeds the average, so wait estimates are usable right away
+                weight = self.smoothing if self.completed else 1.0
+                self.service_time += weight * (elapsed - self.service_time)
+                self.completed += 1
+                self._cond.notify_all()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "active": self._active,
+            "waiting": len(self._waiting),
+            "queue_wait_s": self.queue_wait,
+            "service_time_s": self.service_time,
+            "tier": TIERS[self.tier],
+            "admitted": self.admitted,
+            "completed": self.completed,
+            "rejected": dict(self.rejected),
+        }
@@ -0,0 +1,95 @@
+from typing import Dict, Any
+from pathlib import Path
+import os
+import platform
+import re
+import shutil
+import yaml
+import zlib
+
+
+# ctransformers parameters MistralClient passes when loading the model
+INFERENCE_PARAMS = ("threads", "batch_size", "context_length", "gpu_layers")
+
+DEFAULT_INFERENCE_PARAMS = {
+    "threads": -1,  # ctransformers picks
+    "batch_size": 8,
+    "context_length": 4096,
+    "gpu_layers": 50,
+}
+
+
+def cpu_model() -> str:
+    """CPU model name, e.g. 'Intel(R) Xeon(R) Gold 6248R CPU @ 3.00GHz'"""
+    try:
+        with open("/proc/cpuinfo", "r") as f:
+            for line in f:
+                if line.lower().startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def has_gpu() -> bool:
+    """Whether a GPU llama.cpp can offload to is visible: NVIDIA (CUDA), AMD (ROCm) or Apple Silicon (Metal)"""
+    if os.environ.get("CUDA_VISIBLE_DEVICES", None) in ("", "-1"):
+        return False
+    if shutil.which("nvidia-smi") is not None or os.path.exists("/dev/nvidia0"):
+        return True
+    if os.environ.get("HIP_VISIBLE_DEVICES", None) not in ("", "-1") and (
+            shutil.which("rocm-smi") is not None or os.path.exists("/dev/kfd")):
+        return True
+    return platform.system() == "Darwin" and platform.machine() == "arm64"
+
+
+def hardware_fingerprint() -> str:
+    """
+    Stable key for the inference-relevant hardware of this host. Hosts of the
+    same CPU generation, core count and GPU presence share tuned settings.
+    """
+    model = cpu_model()
+    slug = re.sub(r"[^a-z0-9]+", "-", model.lower()).strip("-")[:48]
+    accelerator = "gpu" if has_gpu() else "cpu"
+    raw = f"{platform.machine()}|{model}|{os.cpu_count()}|{accelerator}"
+    return f"{slug}-{os.cpu_count()}c-{accelerator}-{zlib.crc32(raw.encode('utf-8')):08x}"
+
+
+def tuned_path(config_path: str) -> Path:
+    """File the autotuner writes next to config.yaml, e.g. config/config.tuned.yaml"""
+    path = Path(config_path)
+    return path.with_name(f"{path.stem}.tuned.yaml")
+
+
+def load_tuned(config_path: str) -> Dict[str, Any]:
+    """Tuned entries saved for config_path, keyed by hardware fingerprint"""
+    path = tuned_path(config_path)
+    if not path.exists():
+        return {}
+    with open(path, "r") as file:
+        return yaml.safe_load(file) or {}
+
+
+def inference_params(model_config: Dict[str, Any], fingerprint: str = None,
+                     tuned: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    ctransformers load parameters for this host
+
+    Values tuned for this host's fingerprint win over explicit 'model' keys,
+    which win over the defaults. Tuned entries come from 'model.tuned' and
+    from `tuned` (see load_tuned), the latter winning. An explicit
+    context_length always wins: it is sized for the prompts served, not the
+    one timed. Without a detected GPU, gpu_layers is 0 unless set explicitly.
+    """
+    params = dict(DEFAULT_INFERENCE_PARAMS)
+    params.update({k: model_config[k] for k in INFERENCE_PARAMS if k in model_config})
+
+    entries = {**(model_config.get("tuned") or {}), **(tuned or {})}
+    entry = entries.get(fingerprint or hardware_fingerprint())
+    if entry:
+        params.update({k: entry[k] for k in INFERENCE_PARAMS if k in entry and
+                       not (k == "context_length" and k in model_config)})
+
+    if "gpu_layers" not in model_config and not has_gpu():
+        params["gpu_layers"] = 0
+    return params
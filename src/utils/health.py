@@ -0,0 +1,226 @@
+from typing import Dict, Any, Optional, Callable, Tuple
+from dataclasses import dataclass, asdict
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from src.utils.path_utils import get_config_path
+from src.utils.metrics import get_metrics
+import json
+import logging
+import os
+import threading
+import time
+import yaml
+
+
+@dataclass
+class CheckResult:
+    """Outcome of one health check"""
+    name: str
+    ok: bool
+    message: str
+    latency_ms: float
+    checked_at: float
+
+
+class HealthMonitor:
+    """
+    Readiness and liveness state for the components of an already running
+    QueryHandler.
+
+    Checks reuse the loaded clients in place (no new connections, no model
+    loads, no generation) and run on a background interval. Probes only read
+    the last snapshot, so answering them never touches Milvus or the model.
+    Starting the monitor loads the collection once, so a fresh process can
+    become ready. With lazy_load, a released collection still counts as ready,
+    since the next search loads it (e.g. idle tenants in a CollectionPool).
+    """
+
+    # Tokenized on every refresh to prove the model is loaded and responsive
+    PROBE_TEXT = "health"
+
+    def __init__(
+        self,
+        milvus_client=None,
+        mistral_client=None,
+        embedding_model=None,
+        interval: float = 15.0,
+        stale_after: Optional[float] = None,
+        lazy_load: bool = False,
+    ):
+        """
+        Args:
+            milvus_client: MilvusClient (or compatible store) to ping
+            mistral_client: MistralClient whose loaded model is checked
+            embedding_model: Embedding model that must be loaded
+            interval: Seconds between background refreshes
+            stale_after: Seconds after which a snapshot no longer counts as ready,
+                defaults to three intervals
+            lazy_load: Whether a reachable but unloaded collection counts as ready
+        """
+        self.logger = logging.getLogger(__name__)
+        self.metrics = get_metrics()
+        self.interval = interval
+        self.stale_after = stale_after or interval * 3
+        self.lazy_load = lazy_load
+        self.milvus_client = milvus_client
+
+        self.checks: Dict[str, Callable[[], str]] = {}
+        if milvus_client is not None:
+            self.checks["milvus"] = lambda: self._check_milvus(milvus_client)
+        if mistral_client is not None:
+            self.checks["model"] = lambda: self._check_model(mistral_client)
+        if embedding_model is not None:
+            self.checks["embedding"] = lambda: self._check_embedding(embedding_model)
+
+        self._results: Dict[str, CheckResult] = {}
+        self._refreshed_at = 0.0
+        self._started_at = time.time()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._server = None
+
+    @classmethod
+    def for_handler(cls, handler, config_path: str = None) -> "HealthMonitor":
+        """Monitor the components of a QueryHandler, using the optional 'health' section of config.yaml"""
+        config_path = config_path or get_config_path()
+        config = {}
+        if os.path.exists(config_path):
+            with open(config_path, "r") as file:
+                config = (yaml.safe_load(file) or {}).get("health", {}) or {}
+        monitor = cls(
+            milvus_client=handler.milvus_client,
+            mistral_client=handler.mistral_client,
+            embedding_model=handler.embedding_model,
+            interval=config.get("interval", 15.0),
+            stale_after=config.get("stale_after"),
+            lazy_load=config.get("lazy_load", False),
+        )
+        if config.get("port"):
+            monitor.serve(config["port"], config.get("host", "127.0.0.1"))
+        return monitor
+
+    def _check_milvus(self, milvus_client) -> str:
+        status = milvus_client.ping()
+        message = ", ".join(f"{k}={v}" for k, v in status.items())
+        if not status.get("loaded"):
+            if not self.lazy_load:
+                raise RuntimeError(f"collection not loaded: {status}")
+            message += " (loaded by the next search)"
+        return message
+
+    def _check_model(self, mistral_client) -> str:
+        model = getattr(mistral_client, "model", None)
+        if model is None:
+            raise RuntimeError("model not loaded")
+        tokens = model.tokenize(self.PROBE_TEXT)
+        if not len(tokens):
+            raise RuntimeError("tokenizer returned no tokens")
+        return f"loaded, {len(tokens)} probe tokens"
+
+    @staticmethod
+    def _check_embedding(embedding_model) -> str:
+        return f"loaded ({type(embedding_model).__name__})"
+
+    def add_check(self, name: str, check: Callable[[], str]) -> None:
+        """Register an extra check, which returns a message or raises on failure"""
+        self.checks[name] = check
+
+    def refresh(self) -> Dict[str, CheckResult]:
+        """Run every check now and replace the snapshot"""
+        results = {}
+        for name, check in self.checks.items():
+            start = time.perf_counter()
+            try:
+                ok, message = True, check()
+            except Exception as e:
+                ok, message = False, f"{type(e).__name__}: {e}"
+                self.metrics.incr(f"health_{name}_failures")
+            results[name] = CheckResult(
+                name=name,
+                ok=ok,
+                message=message,
+                latency_ms=(time.perf_counter() - start) * 1000,
+                checked_at=time.time(),
+            )
+            if not ok:
+                self.logger.warning(f"Health check {name} failed: {message}")
+
+        # Swap the whole dict so readers never see a half-updated snapshot
+        self._results = results
+        self._refreshed_at = time.time()
+        return results
+
+    def start(self) -> None:
+        """Load the collection, run a first refresh, then keep refreshing on a daemon thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        if self.milvus_client is not None and not self.lazy_load and hasattr(self.milvus_client, "load"):
+            try:
+                with self.metrics.span("collection_load"):
+                    self.milvus_client.load()
+            except Exception as e:
+                # Reported by the milvus check
+                self.logger.error(f"Failed to load collection: {e}")
+        self.refresh()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="health-monitor", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                self.logger.error(f"Health refresh failed: {e}")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+
+    def liveness(self) -> Tuple[bool, Dict[str, Any]]:
+        """The process is up and, once started, the refresh loop is still running"""
+        alive = self._thread is None or self._thread.is_alive()
+        return alive, {"status": "ok" if alive else "refresh loop stopped",
+                       "uptime_s": time.time() - self._started_at}
+
+    def readiness(self) -> Tuple[bool, Dict[str, Any]]:
+        """Every check passed in a snapshot that is not stale"""
+        results = self._results
+        age = time.time() - self._refreshed_at
+        fresh = bool(results) and age <= self.stale_after
+        ready = fresh and all(r.ok for r in results.values())
+        return ready, {
+            "status": "ready" if ready else ("stale" if results and not fresh else "not ready"),
+            "age_s": age if results else None,
+            "checks": {name: asdict(r) for name, r in results.items()},
+        }
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> None:
+        """Expose /healthz (liveness) and /readyz (readiness) on a background HTTP server"""
+        monitor = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.rstrip("/")
+                if path == "/healthz":
+                    ok, body = monitor.liveness()
+                elif path == "/readyz":
+                    ok, body = monitor.readiness()
+                else:
+                    self.send_error(404)
+                    return
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(200 if ok else 503)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = HTTPServer((host, port), _Handler)
+        thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        thread.start()
+        self.logger.info(f"Serving health probes on http://{host}:{port}/healthz and /readyz")
@@ -0,0 +1,61 @@
+from typing import Any, Dict, Hashable, Iterable, Optional
+from collections import OrderedDict
+from src.utils.metrics import get_metrics
+import threading
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache that reports hits and misses to the metrics"""
+
+    def __init__(self, capacity: int = 1024, name: str = "lru"):
+        self.capacity = capacity
+        self.name = name
+        self.metrics = get_metrics()
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            hit = key in self._data
+            if hit:
+                self._data.move_to_end(key)
+                value = self._data[key]
+        self.metrics.record_cache(self.name, hit)
+        return value if hit else default
+
+    def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        """Cached values for the keys that are present"""
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._data:
+                    self._data.move_to_end(key)
+                    found[key] = self._data[key]
+                    hit = True
+                else:
+                    hit = False
+                self.metrics.record_cache(self.name, hit)
+        return found
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.capacity:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
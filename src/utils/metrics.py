@@ -0,0 +1,263 @@
+from typing import Dict, Any, Optional, List
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from src.utils.path_utils import get_config_path
+import json
+import logging
+import os
+import threading
+import time
+import yaml
+
+
+# Shared no-op context returned by span() while metrics are disabled
+_NULL_SPAN = nullcontext()
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """Sliding window of observations with exact percentiles over the window"""
+
+    def __init__(self, window: int = 2048):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def summary(self) -> Dict[str, float]:
+        ordered = sorted(self.samples)
+        result = {"count": self.count, "sum": self.total}
+        for q in QUANTILES:
+            result[f"p{int(q * 100)}"] = ordered[min(int(q * len(ordered)), len(ordered) - 1)] if ordered else 0.0
+        return result
+
+
+class Metrics:
+    """
+    In-process latency spans, histograms and counters for the query path.
+
+    When disabled every entry point returns immediately, so instrumented code
+    only pays for an attribute check.
+    """
+
+    def __init__(self, enabled: bool = False, trace_file: Optional[str] = None, window: int = 2048):
+        self.logger = logging.getLogger(__name__)
+        self.enabled = enabled
+        self.trace_file = trace_file
+        self.window = window
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.histograms: Dict[str, Histogram] = {}
+        self.counters: Dict[str, float] = {}
+        self._server = None
+
+    @classmethod
+    def from_config(cls, config_path: str = None) -> "Metrics":
+        """Build metrics from the optional 'metrics' section of config.yaml"""
+        config_path = config_path or get_config_path()
+        config = {}
+        if os.path.exists(config_path):
+            with open(config_path, "r") as file:
+                config = (yaml.safe_load(file) or {}).get("metrics", {}) or {}
+
+        metrics = cls(
+            enabled=config.get("enabled", False),
+            trace_file=config.get("trace_file"),
+            window=config.get("window", 2048),
+        )
+        if metrics.enabled and config.get("prometheus_port"):
+            metrics.serve_prometheus(config["prometheus_port"], config.get("prometheus_host", "127.0.0.1"))
+        return metrics
+
+    def observe(self, name: str, value: float) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(self.window)
+            histogram.observe(value)
+
+    def incr(self, name: str, value: float = 1) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def record_cache(self, cache: str, hit: bool) -> None:
+        """Count a lookup against a named cache"""
+        if not self.enabled:
+            return
+        self.incr(f"cache_{cache}_{'hits' if hit else 'misses'}")
+
+    def cache_hit_ratio(self, cache: str) -> float:
+        hits = self.counters.get(f"cache_{cache}_hits", 0)
+        misses = self.counters.get(f"cache_{cache}_misses", 0)
+        return hits / (hits + misses) if hits + misses else 0.0
+
+    def span(self, name: str):
+        """Time a stage of the current trace, e.g. `with metrics.span("embed"):`"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._span(name)
+
+    @contextmanager
+    def _span(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe(f"stage_{name}_seconds", elapsed)
+            trace = getattr(self._local, "trace", None)
+            if trace is not None:
+                trace["spans"].append({
+                    "name": name,
+                    "start_ms": round((start - trace["_t0"]) * 1000, 3),
+                    "duration_ms": round(elapsed * 1000, 3),
+                })
+
+    def trace(self, name: str, **attributes):
+        """
+        Group the spans of one request. Nested traces are folded into the outer one.
+
+        Args:
+            name: Trace name, e.g. 'query'
+            attributes: Extra fields written to the trace record
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._trace(name, attributes)
+
+    @contextmanager
+    def _trace(self, name: str, attributes: Dict[str, Any]):
+        if getattr(self._local, "trace", None) is not None:
+            # Already inside a trace, record as a plain span
+            with self._span(name):
+                yield self._local.trace
+            return
+
+        start = time.perf_counter()
+        trace = {"name": name, "ts": time.time(), "_t0": start, "spans": [], **attributes}
+        self._local.trace = trace
+        error = None
+        try:
+            yield trace
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            self._local.trace = None
+            elapsed = time.perf_counter() - start
+            self.observe(f"{name}_seconds", elapsed)
+            self.incr(f"{name}_total")
+            if error is not None:
+                self.incr(f"{name}_errors")
+                trace["error"] = error
+            trace["duration_ms"] = round(elapsed * 1000, 3)
+            del trace["_t0"]
+            self._write_trace(trace)
+
+    def annotate(self, **fields) -> None:
+        """Attach fields (token counts, cache hits...) to the current trace"""
+        if not self.enabled:
+            return
+        trace = getattr(self._local, "trace", None)
+        if trace is not None:
+            trace.update(fields)
+
+    def _write_trace(self, trace: Dict[str, Any]) -> None:
+        if not self.trace_file:
+            return
+        try:
+            line = json.dumps(trace, default=str)
+            with self._lock:
+                with open(self.trace_file, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+        except Exception as e:
+            self.logger.error(f"Failed to write trace: {e}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current histograms and counters as plain dicts"""
+        with self._lock:
+            return {
+                "histograms": {name: h.summary() for name, h in self.histograms.items()},
+                "counters": dict(self.counters),
+            }
+
+    def to_prometheus(self, prefix: str = "chatbot") -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        lines: List[str] = []
+
+        for name, summary in sorted(snapshot["histograms"].items()):
+            metric = f"{prefix}_{name}"
+            lines.append(f"# TYPE {metric} summary")
+            for q in QUANTILES:
+                lines.append(f'{metric}{{quantile="{q}"}} {summary[f"p{int(q * 100)}"]:.6f}')
+            lines.append(f"{metric}_sum {summary['sum']:.6f}")
+            lines.append(f"{metric}_count {summary['count']}")
+
+        for name, value in sorted(snapshot["counters"].items()):
+            metric = f"{prefix}_{name}"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+
+        return "\n".join(lines) + "\n"
+
+    def serve_prometheus(self, port: int, host: str = "127.0.0.1") -> None:
+        """Expose /metrics on a background HTTP server"""
+        metrics = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = HTTPServer((host, port), _Handler)
+        thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        thread.start()
+        self.logger.info(f"Serving Prometheus metrics on http://{host}:{port}/metrics")
+
+    def reset(self) -> None:
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+
+_metrics: Optional[Metrics] = None
+
+
+def get_metrics() -> Metrics:
+    """Process-wide metrics instance, configured from config.yaml on first use"""
+    global _metrics
+    if _metrics is None:
+        try:
+            _metrics = Metrics.from_config()
+        except Exception as e:
+            logging.getLogger(__name__).error(f"Failed to configure metrics: {e}")
+            _metrics = Metrics()
+    return _metrics
+
+
+def set_metrics(metrics: Metrics) -> None:
+    """Replace the process-wide metrics instance"""
+    global _metrics
+    _metrics = metrics
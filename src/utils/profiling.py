@@ -0,0 +1,289 @@
+from typing import Dict, Any, Optional, List, Callable
+from collections import Counter
+from pathlib import Path
+from src.utils.path_utils import get_config_path
+import atexit
+import cProfile
+import functools
+import io
+import logging
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import yaml
+
+
+_OWN_FRAMES = ("profiling.py:", "cProfile.py:")
+
+
+class _StackSampler:
+    """Background thread that records the Python stack of registered threads at a fixed interval"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = threading.Lock()
+        # thread id -> (profile name, depth of the profiled call's caller, stack counter)
+        self._targets: Dict[int, tuple] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._wakeup = threading.Event()
+
+    def start(self, thread_id: int, name: str, root_depth: int) -> Counter:
+        stacks = Counter()
+        with self._lock:
+            self._targets[thread_id] = (name, root_depth, stacks)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+        return stacks
+
+    def stop(self, thread_id: int) -> None:
+        with self._lock:
+            self._targets.pop(thread_id, None)
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                idle = not self._targets
+                if idle:
+                    self._wakeup.clear()
+                else:
+                    self._sample()
+            if idle:
+                self._wakeup.wait()
+            else:
+                time.sleep(self.interval)
+
+    def _sample(self) -> None:
+        # Runs under the lock so stop() never returns while a target is being sampled
+        frames = sys._current_frames()
+        for thread_id, (name, root_depth, stacks) in self._targets.items():
+            frame = frames.get(thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            stack.reverse()
+            # Drop the frames above the profiled call and the profiler's own frames
+            stack = [f for f in stack[root_depth:] if not f.startswith(_OWN_FRAMES)]
+            stacks[";".join([name] + stack)] += 1
+
+
+class Profiler:
+    """
+    Opt-in sampling profiler for the query and ingestion hot paths.
+
+    A fraction of calls to functions decorated with @profiled runs under a
+    stack sampler (and optionally cProfile). Results are aggregated per
+    profile name and written as collapsed-stack files for flamegraph tools
+    and as top-N hotspot reports. When disabled, decorated functions only pay
+    for an attribute check.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        sample_rate: float = 0.01,
+        output_dir: str = "profiles",
+        interval: float = 0.001,
+        top_n: int = 25,
+        cprofile: bool = False,
+        flush_every: int = 50,
+    ):
+        """
+        Args:
+            enabled: Whether any call is profiled at all
+            sample_rate: Fraction of calls that are profiled
+            output_dir: Directory for the collapsed-stack and report files
+            interval: Seconds between stack samples
+            top_n: Functions listed in the hotspot reports
+            cprofile: Also run cProfile on sampled calls for exact call counts
+            flush_every: Write the files after this many profiled calls
+        """
+        self.logger = logging.getLogger(__name__)
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.output_dir = Path(output_dir)
+        self.top_n = top_n
+        self.cprofile = cprofile
+        self.flush_every = flush_every
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._sampler = _StackSampler(interval)
+        self.stacks: Dict[str, Counter] = {}
+        self.stats: Dict[str, pstats.Stats] = {}
+        self.calls: Counter = Counter()
+        self.profiled_calls: Counter = Counter()
+        self._pending = 0
+
+        if enabled:
+            atexit.register(self.flush)
+
+    @classmethod
+    def from_config(cls, config_path: str = None) -> "Profiler":
+        """Build the profiler from the optional 'profiling' section of config.yaml"""
+        config_path = config_path or get_config_path()
+        config = {}
+        if os.path.exists(config_path):
+            with open(config_path, "r") as file:
+                config = (yaml.safe_load(file) or {}).get("profiling", {}) or {}
+        return cls(**config)
+
+    def call(self, name: str, func: Callable, args: tuple, kwargs: Dict[str, Any]) -> Any:
+        """Run func, profiling it if this call is sampled"""
+        with self._lock:
+            self.calls[name] += 1
+        # Calls nested in a profiled call are already covered by its stacks
+        if getattr(self._local, "active", False) or random.random() >= self.sample_rate:
+            return func(*args, **kwargs)
+
+        self._local.active = True
+        thread_id = threading.get_ident()
+        root_depth = _stack_depth()
+        stacks = self._sampler.start(thread_id, name, root_depth)
+        profile = cProfile.Profile() if self.cprofile else None
+        try:
+            if profile is None:
+                return func(*args, **kwargs)
+            return profile.runcall(func, *args, **kwargs)
+        finally:
+            self._sampler.stop(thread_id)
+            self._local.active = False
+            self._record(name, stacks, profile)
+
+    def _record(self, name: str, stacks: Counter, profile: Optional[cProfile.Profile]) -> None:
+        with self._lock:
+            self.profiled_calls[name] += 1
+            self.stacks.setdefault(name, Counter()).update(stacks)
+            if profile is not None:
+                if name in self.stats:
+                    self.stats[name].add(profile)
+                else:
+                    self.stats[name] = pstats.Stats(profile)
+            self._pending += 1
+            flush = self._pending >= self.flush_every
+        if flush:
+            self.flush()
+
+    def hotspots(self, name: str, top_n: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Functions with the most samples on top of the stack (self) and anywhere in it (total)"""
+        top_n = top_n or self.top_n
+        own, total = Counter(), Counter()
+        with self._lock:
+            stacks = dict(self.stacks.get(name, {}))
+        samples = sum(stacks.values())
+        for stack, count in stacks.items():
+            frames = stack.split(";")[1:]
+            if frames:
+                own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+
+        return [
+            {
+                "function": function,
+                "self_pct": 100.0 * own[function] / samples,
+                "total_pct": 100.0 * total[function] / samples,
+            }
+            for function, _ in sorted(total.items(), key=lambda x: (own[x[0]], x[1]), reverse=True)[:top_n]
+        ] if samples else []
+
+    def report(self, name: str) -> str:
+        """Top-N hotspot report for one profile name"""
+        with self._lock:
+            calls, profiled = self.calls[name], self.profiled_calls[name]
+            samples = sum(self.stacks.get(name, {}).values())
+            stats = self.stats.get(name)
+
+        lines = [f"{name}: {profiled} of {calls} calls profiled, {samples} stack samples", ""]
+        lines.append(f"{'self %':>8}{'total %':>9}  function")
+        for row in self.hotspots(name):
+            lines.append(f"{row['self_pct']:>8.1f}{row['total_pct']:>9.1f}  {row['function']}")
+
+        if stats is not None:
+            out = io.StringIO()
+            stats.stream = out
+            stats.sort_stats("cumulative").print_stats(self.top_n)
+            lines += ["", "cProfile (cumulative):", out.getvalue()]
+        return "\n".join(lines) + "\n"
+
+    def flush(self) -> None:
+        """Write '<name>.collapsed' and '<name>.top.txt' for every profile name"""
+        with self._lock:
+            self._pending = 0
+            stacks = {name: Counter(counter) for name, counter in self.stacks.items()}
+        if not stacks:
+            return
+
+        try:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            for name, counter in stacks.items():
+                with open(self.output_dir / f"{name}.collapsed", "w", encoding="utf-8") as f:
+                    for stack, count in sorted(counter.items()):
+                        f.write(f"{stack} {count}\n")
+                with open(self.output_dir / f"{name}.top.txt", "w", encoding="utf-8") as f:
+                    f.write(self.report(name))
+        except Exception as e:
+            self.logger.error(f"Failed to write profiles: {e}")
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stacks.clear()
+            self.stats.clear()
+            self.calls.clear()
+            self.profiled_calls.clear()
+            self._pending = 0
+
+
+def _stack_depth() -> int:
+    """Frames from the thread's entry point down to the caller of Profiler.call, exclusive"""
+    depth = 0
+    frame = sys._getframe(3)
+    while frame is not None:
+        depth += 1
+        frame = frame.f_back
+    return depth
+
+
+_profiler: Optional[Profiler] = None
+
+
+def get_profiler() -> Profiler:
+    """Process-wide profiler instance, configured from config.yaml on first use"""
+    global _profiler
+    if _profiler is None:
+        try:
+            _profiler = Profiler.from_config()
+        except Exception as e:
+            logging.getLogger(__name__).error(f"Failed to configure profiler: {e}")
+            _profiler = Profiler()
+    return _profiler
+
+
+def set_profiler(profiler: Profiler) -> None:
+    """Replace the process-wide profiler, e.g. in tests or benchmarks"""
+    global _profiler
+    _profiler = profiler
+
+
+def profiled(name: str) -> Callable:
+    """Decorator that lets the process-wide profiler sample calls under the given name"""
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = _profiler or get_profiler()
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+            return profiler.call(name, func, args, kwargs)
+
+        return wrapper
+
+    return decorator
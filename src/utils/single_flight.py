@@ -0,0 +1,209 @@
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional
+from src.utils.metrics import get_metrics
+from src.utils.path_utils import get_config_path
+import logging
+import os
+import re
+import threading
+import yaml
+
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Case, whitespace and trailing punctuation don't change the answer"""
+    return _SPACE_RE.sub(" ", query).strip().rstrip("?!. ").lower()
+
+
+class _Call:
+    """One in-flight computation that duplicates wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class _Broadcast:
+    """
+    Events of one in-flight stream, replayed to every subscriber.
+
+    A daemon thread drives the source so a slow or abandoned subscriber
+    never holds up the others. Late subscribers first replay what was
+    already produced, then follow live. When the last subscriber leaves
+    before the end, the source is closed at its next event, which stops
+    the generation behind it.
+    """
+
+    def __init__(self, source: Iterator[Any], on_close: Callable[["_Broadcast"], None]):
+        self.events: List[Any] = []
+        self.finished = False
+        self.cancelled = False
+        self.subscribers = 0
+        self.error: Optional[BaseException] = None
+        self._cond = threading.Condition()
+        self._source = source
+        self._on_close = on_close
+        threading.Thread(target=self._drive, name="single-flight-stream", daemon=True).start()
+
+    def _drive(self) -> None:
+        try:
+            for event in self._source:
+                with self._cond:
+                    if self.cancelled:
+                        break
+                    self.events.append(event)
+                    self._cond.notify_all()
+        except BaseException as e:
+            self.error = e
+        finally:
+            if self.cancelled:
+                close = getattr(self._source, "close", None)
+                if close is not None:
+                    close()
+            # No new subscribers once the stream is complete
+            self._on_close(self)
+            with self._cond:
+                self.finished = True
+                self._cond.notify_all()
+
+    def join(self) -> bool:
+        """Count a subscriber, False when the stream was already abandoned"""
+        with self._cond:
+            if self.cancelled:
+                return False
+            self.subscribers += 1
+            return True
+
+    def leave(self) -> None:
+        with self._cond:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.finished:
+                self.cancelled = True
+        if self.cancelled:
+            self._on_close(self)
+
+    def subscribe(self, timeout: Optional[float]) -> Iterator[Any]:
+        index = 0
+        while True:
+            with self._cond:
+                if not self._cond.wait_for(lambda: index < len(self.events) or self.finished, timeout):
+                    raise TimeoutError(f"no stream event within {timeout}s")
+                if index < len(self.events):
+                    event = self.events[index]
+                elif self.error is not None:
+                    raise self.error
+                else:
+                    return
+            index += 1
+            yield event
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one computation.
+
+    The first caller for a key runs it, callers that arrive while it is in
+    flight wait for and share its result (or its exception). Nothing is
+    cached: once the computation finishes, the next call runs again.
+    """
+
+    def __init__(self, enabled: bool = True, timeout: float = 30.0, name: str = "query"):
+        """
+        Args:
+            enabled: When False, every call runs on its own
+            timeout: Seconds a duplicate waits before computing on its own (for
+                results) or failing with TimeoutError (for streams, per event)
+            name: Prefix of the metric counters
+        """
+        self.logger = logging.getLogger(__name__)
+        self.metrics = get_metrics()
+        self.enabled = enabled
+        self.timeout = timeout
+        self.name = name
+
+        self._calls: Dict[Hashable, _Call] = {}
+        self._streams: Dict[Hashable, _Broadcast] = {}
+        self._lock = threading.Lock()
+
+        self.leaders = 0
+        self.coalesced = 0
+        self.timeouts = 0
+
+    @classmethod
+    def from_config(cls, config_path: str = None) -> "SingleFlight":
+        """Build from the optional 'single_flight' section of config.yaml, disabled by default"""
+        config_path = config_path or get_config_path()
+        config = {"enabled": False}
+        if os.path.exists(config_path):
+            with open(config_path, "r") as file:
+                config.update((yaml.safe_load(file) or {}).get("single_flight", {}) or {})
+        return cls(**config)
+
+    def _count(self, kind: str) -> None:
+        with self._lock:
+            setattr(self, kind, getattr(self, kind) + 1)
+        self.metrics.incr(f"{self.name}_single_flight_{kind}")
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Run fn, or wait for the identical call already in flight and return its result"""
+        if not self.enabled:
+            return fn()
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if leader:
+            self._count("leaders")
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+            return call.result
+
+        if not call.done.wait(self.timeout):
+            self._count("timeouts")
+            self.logger.warning(f"In-flight call for {key!r} exceeded {self.timeout}s, computing separately")
+            return fn()
+
+        self._count("coalesced")
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stream(self, key: Hashable, fn: Callable[[], Iterator[Any]]) -> Iterator[Any]:
+        """Iterate fn(), or the identical stream already in flight from its first event"""
+        if not self.enabled:
+            yield from fn()
+            return
+
+        with self._lock:
+            broadcast = self._streams.get(key)
+            # Joined under the lock, so an abandoned stream is never joined after its last subscriber left
+            leader = broadcast is None or not broadcast.join()
+            if leader:
+                broadcast = self._streams[key] = _Broadcast(fn(), lambda b: self._close_stream(key, b))
+                broadcast.join()
+
+        self._count("leaders" if leader else "coalesced")
+        try:
+            yield from broadcast.subscribe(self.timeout)
+        except TimeoutError:
+            self._count("timeouts")
+            raise
+        finally:
+            broadcast.leave()
+
+    def _close_stream(self, key: Hashable, broadcast: _Broadcast) -> None:
+        with self._lock:
+            if self._streams.get(key) is broadcast:
+                del self._streams[key]
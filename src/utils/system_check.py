@@ -19,7 +19,7 @@ class SystemCheck:
 
     @staticmethod
     def check_model() -> Tuple[bool, str, str]:
-        """Test Mistral model loading and basic inference"""
+        """Test Mistral model loading and basic inference. Loads the full model, not for probes."""
         try:
             llm = MistralClient()
             test_query = "What is 2+2? Answer in one word."
@@ -29,8 +29,24 @@ class SystemCheck:
             return False, f"Model loading failed: {str(e)}", ""
 
     @staticmethod
-    def run_all_checks() -> Dict[str, Dict[str, any]]:
-        """Run all system checks and return results"""
+    def run_all_checks(monitor=None) -> Dict[str, Dict[str, any]]:
+        """
+        Run all system checks and return results
+
+        Args:
+            monitor: Optional running HealthMonitor. Its last snapshot is reported
+                instead of connecting to Milvus and loading the model again.
+        """
+        if monitor is not None:
+            _, readiness = monitor.readiness()
+            return {
+                name: {
+                    "status": "✅" if check["ok"] else "❌",
+                    "message": check["message"],
+                }
+                for name, check in readiness["checks"].items()
+            }
+
         results = {"milvus": {}, "model": {}}
 
         # Check Milvus
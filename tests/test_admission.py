@@ -0,0 +1,149 @@
+import unittest
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from src.benchmarks.offline_suite import build_offline_handler
+from src.data_processing.chunk_store import iter_chunks
+from src.utils.admission import AdmissionController, Rejected
+
+
+class TestAdmissionController(unittest.TestCase):
+    def _hold(self, controller, seconds):
+        """Occupy one slot from a background thread"""
+        admitted = threading.Event()
+
+        def run():
+            with controller.admit("holder", timeout=None):
+                admitted.set()
+                time.sleep(seconds)
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        admitted.wait(1)
+        return thread
+
+    def test_client_quota(self):
+        """Test that each client gets its own token bucket"""
+        controller = AdmissionController(client_rate=0.01, client_burst=2)
+        for _ in range(2):
+            with controller.admit("alice"):
+                pass
+        with self.assertRaises(Rejected) as ctx:
+            with controller.admit("alice"):
+                pass
+        self.assertEqual(ctx.exception.reason, "quota")
+        self.assertGreater(ctx.exception.retry_after, 1)
+        with controller.admit("bob"):
+            pass
+
+    def test_bounded_queue(self):
+        """Test that requests beyond the queue bound are rejected at once"""
+        controller = AdmissionController(max_concurrency=1, max_queue=1, client_rate=0)
+        holder = self._hold(controller, 0.2)
+        waiter = threading.Thread(target=lambda: controller.admit("w", timeout=5).__enter__())
+        waiter.start()
+        time.sleep(0.02)
+        try:
+            start = time.perf_counter()
+            with self.assertRaises(Rejected) as ctx:
+                with controller.admit("late"):
+                    pass
+            self.assertEqual(ctx.exception.reason, "queue_full")
+            self.assertLess(time.perf_counter() - start, 0.05)
+        finally:
+            holder.join()
+            waiter.join()
+
+    def test_deadline_rejection(self):
+        """Test rejection from the estimated wait and when a deadline passes in the queue"""
+        controller = AdmissionController(max_concurrency=1, client_rate=0)
+        holder = self._hold(controller, 0.15)
+        with self.assertRaises(Rejected) as ctx:
+            with controller.admit("x", timeout=0.03):
+                pass
+        self.assertEqual(ctx.exception.reason, "deadline_expired")
+        holder.join()
+
+        # The controller now knows a request takes ~0.15s, so it refuses up front
+        holder = self._hold(controller, 0.15)
+        start = time.perf_counter()
+        with self.assertRaises(Rejected) as ctx:
+            with controller.admit("x", timeout=0.1):
+                pass
+        self.assertEqual(ctx.exception.reason, "deadline")
+        self.assertLess(time.perf_counter() - start, 0.05)
+        holder.join()
+
+    def test_degradation_tiers(self):
+        """Test that the smoothed queue wait selects the tier"""
+        controller = AdmissionController(degrade_after=[0.5, 1.0, 2.0], degraded_top_k=1,
+                                         degraded_max_new_tokens=64, smoothing=0.0, client_rate=0)
+        expected = [(0.0, 3, None, False), (0.7, 1, None, False), (1.5, 1, 64, False), (3.0, 1, 64, True)]
+        for wait, top_k, max_new_tokens, retrieval_only in expected:
+            controller.queue_wait = wait
+            with controller.admit() as ticket:
+                self.assertEqual((ticket.top_k(3), ticket.max_new_tokens, ticket.retrieval_only),
+                                 (top_k, max_new_tokens, retrieval_only))
+
+    def test_degradation_keeps_goodput(self):
+        """Test that cheaper degraded work answers more requests before their deadline"""
+        def served(degrade_after):
+            controller = AdmissionController(max_concurrency=2, max_queue=100, client_rate=0,
+                                             degrade_after=degrade_after, smoothing=0.5)
+
+            def request(_):
+                try:
+                    with controller.admit(timeout=0.4) as ticket:
+                        time.sleep(0.005 if ticket.retrieval_only else 0.04)
+                    return 1
+                except Rejected:
+                    return 0
+
+            with ThreadPoolExecutor(max_workers=60) as pool:
+                return sum(pool.map(request, range(60)))
+
+        self.assertGreater(served([0.02, 0.04, 0.06]), served([99, 99, 99]) + 10)
+
+
+class TestQueryHandlerAdmission(unittest.TestCase):
+    def setUp(self):
+        """Set up test environment"""
+        chunks = list(iter_chunks(str(Path(__file__).parent / "test_data" / "Chunks")))
+        if not chunks:
+            self.skipTest("No chunk files available for testing")
+        with tempfile.TemporaryDirectory() as tmp:
+            self.handler = build_offline_handler(chunks, Path(tmp), token_latency=0.0, prompt_token_latency=0.0,
+                                                 fast_path=False)
+        self.handler.admission = AdmissionController(degrade_after=[0.5, 1.0, 2.0], smoothing=0.0,
+                                                     degraded_max_new_tokens=4, client_rate=0)
+        self.calls = []
+        generate = self.handler.mistral_client.generate_response
+        self.handler.mistral_client.generate_response = lambda **kw: self.calls.append(kw) or generate(**kw)
+
+    def test_tiers_applied_to_queries(self):
+        """Test top_k shrinking, token caps and retrieval-only answers"""
+        result = self.handler.process_query("How do I renew my visa?")
+        self.assertIsNone(result["degraded"])
+        self.assertEqual(len(result["sources"]), 3)
+
+        self.handler.admission.queue_wait = 1.5
+        result = self.handler.process_query("How do I renew my visa?")
+        self.assertEqual(result["degraded"], "capped_tokens")
+        self.assertEqual(len(result["sources"]), 1)
+        self.assertEqual(self.calls[-1]["max_new_tokens"], 4)
+
+        self.handler.admission.queue_wait = 3.0
+        result = self.handler.process_query("How do I renew my visa?")
+        self.assertEqual(result["degraded"], "retrieval_only")
+        self.assertEqual(len(self.calls), 2)
+        self.assertTrue(result["response"])
+
+        events = list(self.handler.stream_query("How do I renew my visa?"))
+        self.assertEqual(events[-1]["response"], result["response"])
+        self.assertEqual(len(self.calls), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
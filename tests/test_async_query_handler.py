@@ -0,0 +1,164 @@
+import unittest
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+from src.benchmarks.fakes import HashingEmbedder, InMemoryVectorStore, FakeLLM, FakeBatchBackend
+from src.benchmarks.offline_suite import _write_config, build_query_handler
+from src.llm.async_query_handler import AsyncQueryHandler
+from src.llm.batching import BatchedEngine
+from src.llm.mistral_client import MistralClient
+from src.utils.admission import AdmissionController, Rejected
+
+
+CHUNKS = [
+    ("Q: Where is the library?\nA: The library is on Bishopsgate next to the station.", "Library"),
+    ("Q: How do I renew my visa?\nA: Book an appointment with the visa team online.", "Visa"),
+    ("Q: What is the long answer?\nA: " + " ".join(f"word{i}" for i in range(40)), "Misc"),
+]
+
+
+class CountingLLM(FakeLLM):
+    """FakeLLM that counts the generations it runs"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = 0
+
+    def __call__(self, prompt: str, **kwargs):
+        self.calls += 1
+        return super().__call__(prompt, **kwargs)
+
+
+class TestAsyncQueryHandler(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        """Set up test environment"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.config_path = str(Path(self.tmp.name) / "config.yaml")
+        _write_config(Path(self.config_path), batch_size=32)
+        self.embedder = HashingEmbedder()
+        self.store = InMemoryVectorStore(search_latency=0.05)
+        for content, section in CHUNKS:
+            self.store.insert(content, self.embedder.encode(content).tolist(),
+                              {"section": section, "category": section.lower(), "question": content.split("\n")[0][3:]})
+        self.engine = None
+
+    def tearDown(self):
+        if self.engine is not None:
+            self.engine.close()
+        self.tmp.cleanup()
+
+    def _handler(self, model, single_flight=False, admission=None) -> AsyncQueryHandler:
+        handler = build_query_handler(self.config_path, self.store, self.embedder, single_flight=single_flight,
+                                      mistral_client=MistralClient(self.config_path, model=model),
+                                      admission=admission or AdmissionController(enabled=False))
+        return AsyncQueryHandler(handler, generate_workers=8)
+
+    async def test_matches_sync_handler(self):
+        """Test that the async path gives the synchronous answer and sources"""
+        handler = self._handler(FakeLLM())
+        try:
+            result = await handler.process_query("Where is the library?", top_k=2)
+            expected = await asyncio.to_thread(handler.handler.process_query, "Where is the library?", 2)
+            self.assertEqual(result, expected)
+
+            events = [e async for e in handler.stream_query("How do I renew my visa?", top_k=1)]
+            self.assertEqual(events[0]["type"], "sources")
+            self.assertIn("appointment", events[-1]["response"])
+
+            turn = await handler.process_query("Where is the library?", top_k=1, session_id="s")
+            self.assertIn("Bishopsgate", turn["response"])
+            self.assertEqual(len(handler.handler.conversations.get("s").turns), 1)
+        finally:
+            handler.close()
+
+    async def test_searches_do_not_block_the_loop(self):
+        """Test that concurrent queries overlap their search latency"""
+        handler = self._handler(FakeLLM())
+        try:
+            start = time.perf_counter()
+            results = await asyncio.gather(*(handler.process_query("Where is the library?", top_k=1)
+                                             for _ in range(8)))
+            elapsed = time.perf_counter() - start
+        finally:
+            handler.close()
+        self.assertTrue(all("Bishopsgate" in r["response"] for r in results))
+        self.assertLess(elapsed, 8 * self.store.search_latency / 2)
+
+    async def test_disconnect_stops_generation(self):
+        """Test that cancelling a streaming request stops the model and frees the slot"""
+        self.engine = BatchedEngine(FakeBatchBackend(step_latency=0.01), max_batch=2)
+        handler = self._handler(self.engine, admission=AdmissionController(max_concurrency=1, client_rate=0))
+        try:
+            async def read_three():
+                tokens = 0
+                async for event in handler.stream_query("What is the long answer?", top_k=1):
+                    tokens += event["type"] == "token"
+                    if tokens == 3:
+                        await asyncio.sleep(10)
+
+            task = asyncio.create_task(read_three())
+            while self.engine.tokens_generated < 3:
+                await asyncio.sleep(0.005)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            await asyncio.sleep(0.1)
+
+            self.assertLess(self.engine.tokens_generated, 20)
+            self.assertEqual(self.engine._running, [])
+            self.assertEqual(handler.handler.admission.stats()["active"], 0)
+        finally:
+            handler.close()
+
+    async def test_shared_flight_survives_one_cancellation(self):
+        """Test that identical queries share one generation, and one caller leaving doesn't cancel it"""
+        llm = CountingLLM(token_latency=0.01)
+        handler = self._handler(llm, single_flight=True)
+        try:
+            first = asyncio.create_task(handler.process_query("Where is the library?", top_k=1))
+            second = asyncio.create_task(handler.process_query("Where is the library?", top_k=1))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            result = await second
+        finally:
+            handler.close()
+        self.assertIn("Bishopsgate", result["response"])
+        self.assertEqual(llm.calls, 1)
+        self.assertEqual(handler.handler.single_flight.coalesced, 1)
+
+    async def test_followers_take_no_admission_slot(self):
+        """Test that identical queries and streams are served through one admission slot"""
+        llm = CountingLLM(token_latency=0.01)
+        handler = self._handler(llm, single_flight=True,
+                                admission=AdmissionController(max_concurrency=1, max_queue=0, client_rate=0))
+
+        async def stream():
+            return [e async for e in handler.stream_query("Where is the library?", top_k=1)]
+        try:
+            results = await asyncio.gather(*(handler.process_query("Where is the library?", top_k=1)
+                                             for _ in range(10)))
+            streams = await asyncio.gather(*(stream() for _ in range(10)))
+        finally:
+            handler.close()
+        self.assertTrue(all("Bishopsgate" in r["response"] for r in results))
+        self.assertEqual(len({tuple(e["type"] for e in s) for s in streams}), 1)
+        self.assertTrue(all(s[-1]["response"] == results[0]["response"] for s in streams))
+        self.assertEqual(llm.calls, 2)
+        self.assertEqual(handler.handler.admission.admitted, 2)
+        self.assertEqual(handler.handler.single_flight.leaders, 2)
+        self.assertEqual(handler.handler.admission.stats()["active"], 0)
+
+    async def test_rejections_propagate(self):
+        """Test that admission rejections reach the caller"""
+        handler = self._handler(FakeLLM(), admission=AdmissionController(client_rate=0.01, client_burst=1))
+        try:
+            await handler.process_query("Where is the library?", client_id="c")
+            with self.assertRaises(Rejected):
+                await handler.process_query("Where is the library?", client_id="c")
+        finally:
+            handler.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+import tempfile
+from pathlib import Path
+import yaml
+from src.llm.autotune import Autotuner, candidate_values, save_tuned, serving_context
+from src.utils.hardware import hardware_fingerprint, has_gpu, inference_params, load_tuned
+
+
+class _TimedModel:
+    """Streams tokens with a per-token cost that depends on the load parameters"""
+
+    def __init__(self, params):
+        # Fastest at 4 threads and batch 32
+        self.cost = abs(params["threads"] - 4) + abs(params["batch_size"] - 32) / 32
+        self.calls = 0
+
+    def __call__(self, prompt, max_new_tokens=8, stream=False, **kwargs):
+        self.calls += 1
+        for i in range(max_new_tokens):
+            self.cost_spin()
+            yield f"t{i} "
+
+    def cost_spin(self):
+        # Deterministic busy work instead of sleeping, so the ordering is stable
+        total = 0
+        for i in range(int(2000 * (1 + self.cost))):
+            total += i
+
+
+class TestAutotune(unittest.TestCase):
+    def test_tune_finds_fastest_params(self):
+        """Test that coordinate descent converges on the fastest settings"""
+        tuner = Autotuner("fake.gguf", "prompt", loader=_TimedModel, max_new_tokens=8, repeats=1)
+        start = {"threads": 1, "batch_size": 8, "context_length": 2048, "gpu_layers": 0}
+        candidates = {"threads": [1, 2, 4, 8], "batch_size": [8, 32, 128], "context_length": [2048], "gpu_layers": [0]}
+
+        best = tuner.tune(start, candidates)
+        self.assertEqual((best["threads"], best["batch_size"]), (4, 32))
+        self.assertGreater(best["tokens_per_second"], 0)
+        self.assertEqual(len(tuner.trials), 1 + 3 + 2)
+
+    def test_candidates_fit_prompt(self):
+        """Test that context windows fit the prompt and CPU hosts skip GPU offload"""
+        candidates = candidate_values(prompt_tokens=1500, max_new_tokens=512, gpu=False)
+        self.assertEqual(candidates["context_length"], [2048, 4096])
+        self.assertEqual(candidates["gpu_layers"], [0])
+
+        # Serving needs room for the longest answer and the conversation history, not just the timed prompt
+        config = {"model": {"max_tokens": 2048}, "conversations": {"enabled": True, "max_history_tokens": 1536}}
+        candidates = candidate_values(1500, 64, gpu=False, min_context=serving_context(config, 1500))
+        self.assertEqual(candidates["context_length"], [8192, 16384])
+
+    def test_saved_params_are_picked_up(self):
+        """Test that tuned settings for this host override the config defaults"""
+        with tempfile.TemporaryDirectory() as tmp:
+            config_path = Path(tmp) / "config.yaml"
+            original = "model:\n  path: fake\n  context_length: 4096  # sized for served prompts\n  batch_size: 16\n"
+            with open(config_path, "w") as f:
+                f.write(original)
+
+            fingerprint = hardware_fingerprint()
+            for threads in (4, 6):
+                save_tuned(str(config_path), fingerprint, {
+                    "threads": threads, "batch_size": 128, "context_length": 2048, "gpu_layers": 20,
+                    "total_s": 1.0, "tokens_per_second": 10.0,
+                })
+            # config.yaml keeps its comments and layout, results go next to it
+            with open(config_path, "r") as f:
+                self.assertEqual(f.read(), original)
+            self.assertEqual(sorted(p.name for p in Path(tmp).iterdir()), ["config.tuned.yaml", "config.yaml"])
+            model_config = yaml.safe_load(original)["model"]
+            tuned = load_tuned(str(config_path))
+
+        self.assertEqual(inference_params(model_config)["threads"], -1)
+        params = inference_params(model_config, tuned=tuned)
+        # The explicit context_length is kept, the tuned one only applies when none is configured
+        self.assertEqual((params["threads"], params["batch_size"], params["context_length"]), (6, 128, 4096))
+        self.assertEqual(params["gpu_layers"], 20 if has_gpu() else 0)
+        del model_config["context_length"]
+        self.assertEqual(inference_params(model_config, tuned=tuned)["context_length"], 2048)
+
+        # An explicit gpu_layers is never zeroed, the GPU may be one that isn't detected
+        self.assertEqual(inference_params({"gpu_layers": 50}, fingerprint="other-host")["gpu_layers"], 50)
+
+        # Another host only sees the explicit keys and defaults
+        other = inference_params(model_config, fingerprint="other-host", tuned=tuned)
+        self.assertEqual((other["threads"], other["batch_size"], other["context_length"]), (-1, 16, 4096))
+
+
+if __name__ == "__main__":
+    unittest.main()
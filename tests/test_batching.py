@@ -0,0 +1,117 @@
+import unittest
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import numpy as np
+import yaml
+from src.benchmarks.batched_decoding import run_concurrent
+from src.benchmarks.fakes import FakeBatchBackend
+from src.llm.batching import BatchedEngine, GenerationRequest, sample_token
+from src.llm.mistral_client import MistralClient
+
+
+def _prompt(answer: str) -> str:
+    return f"[INST] Context: Q: question?\nA: {answer}\n\nQuestion: question? [/INST]"
+
+
+class TestBatchedEngine(unittest.TestCase):
+    def setUp(self):
+        """Set up test environment"""
+        self.backend = FakeBatchBackend(step_latency=0.002)
+        self.engine = BatchedEngine(self.backend, max_batch=4, context_length=512)
+
+    def tearDown(self):
+        self.engine.close()
+
+    def test_concurrent_requests_get_their_own_answers(self):
+        """Test that sequences decoded in one batch stay separate"""
+        answers = [f"answer number {i} with some words" for i in range(10)]
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            results = list(pool.map(lambda a: self.engine(_prompt(a), temperature=0.0), answers))
+
+        self.assertEqual(results, answers)
+        self.assertGreater(max(self.backend.batch_sizes), 1)
+        self.assertLessEqual(max(self.backend.batch_sizes), 4)
+        self.assertEqual(self.backend.sequences, {})
+
+    def test_per_request_stop_and_length(self):
+        """Test that stop sequences and max_new_tokens apply per request"""
+        long = self.engine.submit(_prompt("one two three four five six"), temperature=0.0)
+        stopped = self.engine.submit(_prompt("one two three four five six"), temperature=0.0, stop=["four"])
+        short = self.engine.submit(_prompt("one two three four five six"), temperature=0.0, max_new_tokens=2)
+
+        self.assertEqual(long.result(5), "one two three four five six")
+        self.assertEqual(stopped.result(5), "one two three ")
+        self.assertEqual(short.result(5), "one two")
+        self.assertEqual([long.request.finish_reason, stopped.request.finish_reason, short.request.finish_reason],
+                         ["eos", "stop", "length"])
+        # Held-back text is flushed, nothing of the stop sequence leaks into the stream
+        self.assertEqual("".join(self.engine.submit(_prompt("a b four c"), temperature=0.0, stop=["four"])), "a b ")
+
+    def test_join_in_flight_batch(self):
+        """Test that a request submitted mid-generation joins the running batch"""
+        first = self.engine.submit(_prompt(" ".join(["word"] * 40)), temperature=0.0)
+        time.sleep(0.02)
+        second = self.engine.submit(_prompt("late arrival"), temperature=0.0)
+
+        self.assertEqual(second.result(5), "late arrival")
+        self.assertFalse(first._done.is_set())
+        self.assertEqual(len(first.result(5).split()), 40)
+        self.assertLess(second.request.finished_at, first.request.finished_at)
+
+    def test_long_prompt_prefills_in_chunks(self):
+        """Test that prompts longer than a step's token budget are split across steps"""
+        self.backend.max_batch_tokens = 8
+        context = " ".join(f"filler{i}" for i in range(30))
+        result = self.engine(f"{context} A: short answer", temperature=0.0)
+        self.assertEqual(result, "short answer")
+
+    def test_aggregate_throughput_scales(self):
+        """Test that batching raises tokens per second under concurrent load"""
+        prompts = [_prompt(" ".join(["token"] * 20)) for _ in range(8)]
+        serial = BatchedEngine(FakeBatchBackend(step_latency=0.005), max_batch=1)
+        batched = BatchedEngine(FakeBatchBackend(step_latency=0.005), max_batch=8)
+        try:
+            one = run_concurrent(serial, prompts, 8, max_new_tokens=20)
+            eight = run_concurrent(batched, prompts, 8, max_new_tokens=20)
+        finally:
+            serial.close()
+            batched.close()
+        self.assertGreater(eight["tokens_per_second"], 3 * one["tokens_per_second"])
+
+    def test_mistral_client_uses_engine(self):
+        """Test that MistralClient runs on the engine through the model call interface"""
+        with tempfile.TemporaryDirectory() as tmp:
+            config_path = Path(tmp) / "config.yaml"
+            with open(config_path, "w") as f:
+                yaml.safe_dump({"model": {"path": "fake", "context_length": 512}}, f)
+            client = MistralClient(str(config_path), model=self.engine)
+
+        response = client.generate_response("question?", context="Q: question?\nA: batched answer", temperature=0.01)
+        self.assertEqual(response, "batched answer")
+        self.assertEqual("".join(client.stream_response("question?", context="Q: x\nA: streamed")).strip(), "streamed")
+
+
+class TestSampling(unittest.TestCase):
+    def test_sampling_parameters(self):
+        """Test greedy, top-k and seeded sampling"""
+        logits = np.array([1.0, 3.0, 2.0, 0.5])
+        greedy = GenerationRequest(prompt="", temperature=0.0, repetition_penalty=1.0)
+        self.assertEqual(sample_token(logits, greedy, [], np.random.default_rng(0)), 1)
+
+        top2 = GenerationRequest(prompt="", temperature=5.0, top_k=2, top_p=1.0, repetition_penalty=1.0)
+        rng = np.random.default_rng(0)
+        self.assertEqual({sample_token(logits, top2, [], rng) for _ in range(200)}, {1, 2})
+
+        seeded = GenerationRequest(prompt="", temperature=1.0, top_k=0, repetition_penalty=1.0)
+        a = [sample_token(logits, seeded, [], np.random.default_rng(7)) for _ in range(5)]
+        b = [sample_token(logits, seeded, [], np.random.default_rng(7)) for _ in range(5)]
+        self.assertEqual(a, b)
+
+        penalised = GenerationRequest(prompt="", temperature=0.0, repetition_penalty=2.0)
+        self.assertEqual(sample_token(logits, penalised, [1], np.random.default_rng(0)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+import tempfile
+import json
+from pathlib import Path
+from src.data_processing.chunk_store import (
+    ChunkStore,
+    ChunkStoreWriter,
+    convert_chunk_directory,
+    is_chunk_store,
+    iter_chunks,
+)
+
+
+class TestChunkStore(unittest.TestCase):
+    def setUp(self):
+        """Set up test environment"""
+        self.test_dir = Path(__file__).parent
+        self.chunks_dir = self.test_dir / "test_data" / "Chunks"
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store_path = Path(self.tmp.name) / "chunks.jsonl"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _records(self, count):
+        return [{"content": f"Q: Question {i}?\nA: Answer {i}", "metadata": {"chunk_index": i}}
+                for i in range(count)]
+
+    def test_round_trip(self):
+        """Test random access and streaming for both encodings"""
+        for compression in (None, "zlib"):
+            store_path = Path(self.tmp.name) / f"chunks_{compression}.jsonl"
+            records = self._records(50)
+            with ChunkStoreWriter(store_path, compression=compression) as writer:
+                writer.extend(records)
+
+            self.assertTrue(is_chunk_store(store_path))
+            with ChunkStore(store_path) as store:
+                self.assertEqual(len(store), 50)
+                self.assertEqual(store[17], records[17])
+                self.assertEqual(store[-1], records[-1])
+                self.assertEqual(list(store), records)
+                self.assertEqual([len(b) for b in store.iter_batches(20)], [20, 20, 10])
+
+    def test_append(self):
+        """Test that reopening a store appends to it"""
+        records = self._records(10)
+        with ChunkStoreWriter(self.store_path) as writer:
+            writer.extend(records[:4])
+        with ChunkStoreWriter(self.store_path) as writer:
+            writer.extend(records[4:])
+
+        with ChunkStore(self.store_path) as store:
+            self.assertEqual(list(store), records)
+
+        with self.assertRaises(ValueError):
+            ChunkStoreWriter(self.store_path, compression="zlib")
+
+    def test_append_after_interrupted_write(self):
+        """Test that a torn index entry or missing data doesn't hide later records"""
+        with ChunkStoreWriter(self.store_path) as writer:
+            writer.append({"content": "a"})
+            writer.append({"content": "lost"})
+        index_path = Path(str(self.store_path) + ".idx")
+        # The second record's data never reached the disk, a third entry is torn
+        with open(self.store_path, "r+b") as f:
+            f.truncate(len(b'{"content": "a"}\n') + 3)
+        with open(index_path, "ab") as f:
+            f.write(b"\x01\x02\x03")
+
+        with ChunkStoreWriter(self.store_path) as writer:
+            writer.append({"content": "b"})
+        with ChunkStore(self.store_path) as store:
+            self.assertEqual(list(store), [{"content": "a"}, {"content": "b"}])
+        with open(self.store_path, "r") as f:
+            self.assertEqual([json.loads(line) for line in f], [{"content": "a"}, {"content": "b"}])
+
+    def test_directory_in_natural_order(self):
+        """Test that chunk_10 follows chunk_9 both when reading and packing a directory"""
+        chunks_dir = Path(self.tmp.name) / "chunks"
+        chunks_dir.mkdir()
+        for i in (10, 2, 9, 1):
+            with open(chunks_dir / f"chunk_{i}.json", "w") as f:
+                json.dump({"content": str(i)}, f)
+
+        expected = [{"content": str(i)} for i in (1, 2, 9, 10)]
+        self.assertEqual(list(iter_chunks(chunks_dir)), expected)
+        convert_chunk_directory(chunks_dir, self.store_path)
+        self.assertEqual(list(iter_chunks(self.store_path)), expected)
+
+    def test_plain_store_is_jsonl(self):
+        """Test that uncompressed stores stay readable as plain JSONL"""
+        records = self._records(3)
+        with ChunkStoreWriter(self.store_path) as writer:
+            writer.extend(records)
+
+        with open(self.store_path, "r") as f:
+            self.assertEqual([json.loads(line) for line in f], records)
+
+    def test_convert_directory(self):
+        """Test packing the test chunk directory"""
+        chunk_files = list(self.chunks_dir.glob("chunk_*.json"))
+        if not chunk_files:
+            self.skipTest("No chunk files available for testing")
+
+        count = convert_chunk_directory(self.chunks_dir, self.store_path, compression="zlib")
+        self.assertEqual(count, len(chunk_files))
+
+        with open(self.chunks_dir / "chunk_0.json", "r") as f:
+            first = json.load(f)
+        with ChunkStore(self.store_path) as store:
+            self.assertEqual(store[0], first)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,92 @@
+import unittest
+import tempfile
+from pathlib import Path
+from src.benchmarks.fakes import CountingEmbedder, InMemoryVectorStore, FakeLLM
+from src.benchmarks.offline_suite import _write_config, build_query_handler
+from src.llm.mistral_client import MistralClient
+from src.rag.context_compression import ContextCompressor, split_sentences
+
+
+LONG_ANSWER = " ".join([
+    "Welcome to the student services handbook section.",
+    "Our team supports students throughout the academic year.",
+    "Office hours vary during the summer months.",
+    "Visa renewals require an appointment with immigration.",
+    "Bring your passport and student card to the visa appointment.",
+    "The canteen serves hot food every weekday.",
+    "Sports clubs meet on Wednesday afternoons.",
+    "Parking permits are issued by reception.",
+])
+LONG_CHUNK = f"Q: What does student services do?\nA: {LONG_ANSWER}"
+SHORT_CHUNK = "Q: Where is the library?\nA: The library is on Aungier Street."
+
+
+class TestContextCompressor(unittest.TestCase):
+    def setUp(self):
+        """Set up test environment"""
+        self.embedder = CountingEmbedder()
+        self.compressor = ContextCompressor(self.embedder, ratio=0.3)
+        self.hits = [
+            {"content": LONG_CHUNK, "metadata": {}, "score": 0.9},
+            {"content": SHORT_CHUNK, "metadata": {}, "score": 0.5},
+        ]
+
+    def test_keeps_relevant_sentences(self):
+        """Test that the question, the relevant sentences and their neighbours survive"""
+        query = self.embedder.encode("visa renewal appointment passport").tolist()
+        compressed = self.compressor.compress(self.hits, query)
+
+        content = compressed[0]["content"]
+        self.assertTrue(content.startswith("Q: What does student services do?\nA: "))
+        self.assertIn("Visa renewals require an appointment with immigration.", content)
+        self.assertIn("Bring your passport and student card to the visa appointment.", content)
+        self.assertNotIn("Sports clubs", content)
+        self.assertIn("...", content)
+        self.assertEqual(compressed[1], self.hits[1])
+
+        stats = self.compressor.stats()
+        self.assertGreater(stats["tokens_saved"], 0)
+        self.assertLess(len(content.split()), len(LONG_CHUNK.split()))
+        self.assertGreaterEqual(1 - stats["saved_ratio"], 0.3)
+
+    def test_sentence_embeddings_are_cached(self):
+        """Test that sentences are embedded in one batch and reused by later queries"""
+        self.compressor.compress(self.hits, self.embedder.encode("visa").tolist())
+        self.assertEqual(self.embedder.texts, 1 + len(split_sentences(LONG_ANSWER)))
+        self.compressor.compress(self.hits, self.embedder.encode("parking").tolist())
+        self.assertEqual(self.embedder.texts, 2 + len(split_sentences(LONG_ANSWER)))
+
+    def test_disabled_and_short_answers_pass_through(self):
+        """Test that nothing changes when disabled or when every answer is short"""
+        query = self.embedder.encode("visa").tolist()
+        self.assertEqual(ContextCompressor(self.embedder, enabled=False).compress(self.hits, query), self.hits)
+        self.assertEqual(self.compressor.compress(self.hits[1:], query), self.hits[1:])
+        self.assertEqual(self.compressor.stats()["requests"], 0)
+
+    def test_query_handler_prompt(self):
+        """Test that the handler compresses the context it generates from"""
+        with tempfile.TemporaryDirectory() as tmp:
+            config_path = str(Path(tmp) / "config.yaml")
+            _write_config(Path(config_path), batch_size=32)
+            store = InMemoryVectorStore()
+            for content in (LONG_CHUNK, SHORT_CHUNK):
+                store.insert(content, self.embedder.encode(content).tolist(), {"section": "Services"})
+
+            mistral_client = MistralClient(config_path, model=FakeLLM())
+            handler = build_query_handler(config_path, store, self.embedder, mistral_client=mistral_client,
+                                          compressor=ContextCompressor(self.embedder, mistral_client, ratio=0.3))
+            # Overloaded requests serve a stored answer, there is nothing to compress for
+            handler._process_query("visa renewal appointment passport", top_k=2, retrieval_only=True)
+            list(handler._stream_query("visa renewal appointment passport", top_k=2, retrieval_only=True))
+            self.assertEqual(handler.compressor.stats()["requests"], 0)
+
+            result = handler.process_query("visa renewal appointment passport", top_k=2)
+
+        # FakeLLM answers with the first answer in the prompt
+        self.assertNotIn("Sports clubs", result["response"])
+        self.assertIn("Visa renewals", result["response"])
+        self.assertGreater(handler.compressor.stats()["tokens_saved"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+import unittest
+import tempfile
+from pathlib import Path
+from src.benchmarks.fakes import HashingEmbedder, InMemoryVectorStore, FakeLLM, FakeBatchBackend
+from src.benchmarks.offline_suite import _write_config, build_query_handler
+from src.llm.batching import BatchedEngine
+from src.llm.conversation import ConversationStore
+from src.llm.mistral_client import MistralClient
+from src.llm.query_handler import QueryHandler
+
+
+CHUNKS = [
+    ("Q: Where is the library?\nA: The library is on Bishopsgate next to the station.", "Library"),
+    ("Q: When does the library open?\nA: The library opens at eight every weekday.", "Library"),
+    ("Q: How do I renew my visa?\nA: Book an appointment with the visa team online.", "Visa"),
+    ("Q: How much is the visa fee?\nA: The visa fee is four hundred pounds.", "Visa"),
+]
+
+QUESTIONS = ["Where is the library?", "When does the library open?",
+             "How do I renew my visa?", "How much is the visa fee?"]
+
+
+class TestConversations(unittest.TestCase):
+    def setUp(self):
+        """Set up test environment"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.config_path = Path(self.tmp.name) / "config.yaml"
+        _write_config(self.config_path, batch_size=32)
+        self.embedder = HashingEmbedder()
+        self.store = InMemoryVectorStore()
+        for content, section in CHUNKS:
+            self.store.insert(content, self.embedder.encode(content).tolist(),
+                              {"section": section, "category": section.lower(), "question": content.split("\n")[0][3:]})
+        self.backend = FakeBatchBackend()
+        self.engine = BatchedEngine(self.backend, max_batch=2, context_length=4096)
+
+    def tearDown(self):
+        self.engine.close()
+        self.tmp.cleanup()
+
+    def _handler(self, model, **conversations) -> QueryHandler:
+        mistral_client = MistralClient(str(self.config_path), model=model)
+        return build_query_handler(str(self.config_path), self.store, self.embedder, mistral_client=mistral_client,
+                                   conversations=ConversationStore(mistral_client, **conversations))
+
+    def _turn(self, handler, session_id, query):
+        before = self.engine.tokens_prefilled
+        result = handler.process_query(query, top_k=1, session_id=session_id)
+        return result, self.engine.tokens_prefilled - before
+
+    def test_turns_reuse_kv_state(self):
+        """Test that a follow-up turn only prefills the tokens it adds"""
+        handler = self._handler(self.engine, max_history_tokens=100000)
+        prefilled, answers = [], []
+        for query in QUESTIONS * 2:
+            result, cost = self._turn(handler, "student-1", query)
+            answers.append(result["response"])
+            prefilled.append(cost)
+
+        self.assertIn("Bishopsgate", answers[0])
+        self.assertIn("four hundred pounds", answers[3])
+        self.assertIn("eight every weekday", answers[5])
+        # A turn costs its own block, not the history in front of it
+        history = handler.conversations.history(handler.conversations.get("student-1"))
+        self.assertLess(max(prefilled[4:]), max(prefilled[:4]) + 10)
+        self.assertLess(prefilled[-1] * 4, len(history.split()))
+        self.assertGreater(self.engine.tokens_reused, sum(prefilled))
+
+        conversation = handler.conversations.get("student-1")
+        self.assertEqual(len(conversation.turns), 8)
+        self.assertTrue(handler.conversations.history(conversation).startswith("[INST] You are"))
+
+    def test_single_turn_queries_do_not_keep_state(self):
+        """Test that queries without a session leave no KV state behind"""
+        handler = self._handler(self.engine)
+        handler.process_query("Where is the library?", top_k=1)
+        self.assertEqual(self.engine._sessions, {})
+        self.assertEqual(self.backend.sequences, {})
+
+    def test_long_history_is_compacted(self):
+        """Test that the history is summarized so the prompt stops growing"""
+        handler = self._handler(self.engine, max_history_tokens=150, keep_recent_turns=1)
+        prompt_sizes = []
+        for query in QUESTIONS * 3:
+            self._turn(handler, "student-1", query)
+            conversation = handler.conversations.get("student-1")
+            prompt_sizes.append(len(handler.conversations.history(conversation).split()))
+
+        self.assertGreater(handler.conversations.compactions, 0)
+        self.assertIsNotNone(conversation.summary)
+        self.assertLess(len(conversation.turns), 4)
+        # Never more than the threshold plus the turn that crossed it
+        self.assertLess(max(prompt_sizes), 150 + prompt_sizes[0])
+
+    def test_session_kv_eviction(self):
+        """Test that idle session caches give their slot to new requests, oldest first"""
+        handler = self._handler(self.engine)
+        for session in ("a", "b", "c"):
+            handler.process_query("Where is the library?", top_k=1, session_id=session)
+        self.assertEqual(len(self.engine._sessions), 2)
+        self.assertEqual(self.engine.session_evictions, 1)
+
+        # The evicted session still answers, from a full prefill
+        result, cost = self._turn(handler, "a", "When does the library open?")
+        self.assertIn("eight", result["response"])
+        _, resident_cost = self._turn(handler, "c", "When does the library open?")
+        self.assertGreater(cost, resident_cost * 1.5)
+
+        capped = BatchedEngine(FakeBatchBackend(), max_batch=2, session_slots=2, max_session_tokens=150)
+        try:
+            handler = self._handler(capped)
+            for session in ("a", "b", "c"):
+                handler.process_query("Where is the library?", top_k=1, session_id=session)
+            # Four slots, but the token cap only leaves room for some of the three caches
+            self.assertLessEqual(sum(len(c.tokens) for c in capped._sessions.values()), 150)
+            self.assertGreater(capped.session_evictions, 0)
+        finally:
+            capped.close()
+
+    def test_conversation_ttl_and_lru(self):
+        """Test that conversations expire and the least recently used are dropped"""
+        handler = self._handler(FakeLLM(), max_sessions=2)
+        for session in ("a", "b", "a", "c"):
+            handler.process_query("Where is the library?", top_k=1, session_id=session)
+        self.assertEqual(list(handler.conversations._conversations), ["a", "c"])
+        self.assertEqual(handler.conversations.evictions, 1)
+
+        handler.conversations.ttl = 0.0
+        handler.conversations.get("a")
+        self.assertEqual(list(handler.conversations._conversations), ["a"])
+        self.assertEqual(handler.conversations.get("a").turns, [])
+
+    def test_follow_up_retrieval_and_stream(self):
+        """Test that a short follow-up is searched together with the previous question"""
+        handler = self._handler(FakeLLM())
+        handler.process_query("How do I renew my visa?", top_k=1, session_id="s")
+        conversation = handler.conversations.get("s")
+        self.assertEqual(handler.conversations.retrieval_query(conversation, "and the fee?"),
+                         "How do I renew my visa? and the fee?")
+        self.assertEqual(handler.conversations.retrieval_query(conversation, "How much is the visa fee?"),
+                         "How much is the visa fee?")
+
+        events = list(handler.stream_query("How much is the visa fee?", top_k=1, session_id="s"))
+        self.assertIn("four hundred pounds", events[-1]["response"])
+        self.assertEqual(len(conversation.turns), 2)
+
+        handler.end_session("s")
+        self.assertEqual(handler.conversations.stats()["sessions"], 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import unittest
+import tempfile
+from pathlib import Path
+from src.benchmarks.fakes import HashingEmbedder, InMemoryVectorStore, FakeCrossEncoder
+from src.benchmarks.offline_suite import _write_config, build_query_handler
+from src.db.cross_encoder import CrossEncoderReranker
+from src.rag.fast_path import FastPathGate
+
+
+QUESTIONS = [
+    "When does the library open on Saturday?",
+    "When does the library close on Saturday?",
+    "When does the library open on Sunday?",
+    "When does the library close on Sunday?",
+    "Where is the library?",
+]
+
+
+def _hits():
+    """Heuristic order with the best match last"""
+    return [{"content": f"Q: {q}\nA: answer {i}", "metadata": {}, "score": 0.9 - i * 0.01, "vector_similarity": 0.5}
+            for i, q in enumerate(QUESTIONS)]
+
+
+class TestCrossEncoderReranker(unittest.TestCase):
+    def test_reorders_and_caches(self):
+        """Test that pairs are re-ordered by the model and cached by query and chunk"""
+        model = FakeCrossEncoder()
+        reranker = CrossEncoderReranker(model, candidates=5, batch_size=2)
+        top = reranker.rerank("When does the library close on Sunday?", _hits(), 3)
+
+        self.assertEqual(top[0]["content"].split("\n")[0], "Q: When does the library close on Sunday?")
+        self.assertEqual(len(top), 3)
+        self.assertTrue(all(0 < hit["rerank_score"] < 1 for hit in top))
+        self.assertEqual(model.pairs_scored, 5)
+
+        # Same query (up to case and spacing), no new pairs to score
+        again = reranker.rerank("when does the library close on  sunday?", _hits(), 3)
+        self.assertEqual(model.pairs_scored, 5)
+        self.assertEqual([h["content"] for h in again], [h["content"] for h in top])
+
+    def test_falls_back_over_budget(self):
+        """Test that the heuristic order is kept when scoring would exceed the budget"""
+        model = FakeCrossEncoder(latency_per_pair=0.01)
+        reranker = CrossEncoderReranker(model, candidates=5, batch_size=2, budget_ms=25)
+        hits = _hits()
+        top = reranker.rerank("When does the library close on Sunday?", hits, 3)
+
+        self.assertEqual(top, hits[:3])
+        self.assertEqual(reranker.fallbacks, 1)
+        self.assertLess(model.pairs_scored, 5)
+        self.assertGreater(reranker.seconds_per_pair, 0)
+
+        # The pairs scored before the fallback are cached, a second request finishes the job
+        reranker.budget = 1.0
+        top = reranker.rerank("When does the library close on Sunday?", hits, 3)
+        self.assertIn("rerank_score", top[0])
+        self.assertEqual(model.pairs_scored, 5)
+
+    def test_probes_after_fallbacks(self):
+        """Test that a stale slow estimate is re-measured instead of falling back forever"""
+        model = FakeCrossEncoder()
+        reranker = CrossEncoderReranker(model, candidates=5, batch_size=2, budget_ms=25, probe_every=3)
+        reranker.seconds_per_pair = 1.0  # left behind by one slow batch
+        query = "When does the library close on Sunday?"
+        for _ in range(3):
+            self.assertNotIn("rerank_score", reranker.rerank(query, _hits(), 3)[0])
+        self.assertEqual(model.pairs_scored, 0)
+
+        # The probe batch brings the estimate back down and the rest fits the budget
+        top = reranker.rerank(query, _hits(), 3)
+        self.assertIn("rerank_score", top[0])
+        self.assertEqual(model.pairs_scored, 5)
+        self.assertEqual((reranker.fallbacks, reranker.probes), (3, 1))
+        self.assertLess(reranker.seconds_per_pair, 0.01)
+
+    def test_disabled_passes_through(self):
+        """Test that a disabled stage neither loads a model nor changes results"""
+        reranker = CrossEncoderReranker(enabled=False)
+        self.assertEqual(reranker.candidate_limit(3), 3)
+        self.assertEqual(reranker.rerank("q", _hits(), 2), _hits()[:2])
+
+    def test_query_handler_sends_fewer_chunks(self):
+        """Test that the handler widens the search, re-ranks and trims the prompt context"""
+        with tempfile.TemporaryDirectory() as tmp:
+            config_path = Path(tmp) / "config.yaml"
+            _write_config(config_path, batch_size=32)
+            embedder = HashingEmbedder()
+            store = InMemoryVectorStore()
+            for i, question in enumerate(QUESTIONS):
+                content = f"Q: {question}\nA: The answer is number {i}."
+                store.insert(content, embedder.encode(content).tolist(), {"section": "Library", "category": "library"})
+
+            handler = build_query_handler(str(config_path), store, embedder, reranker=CrossEncoderReranker(
+                FakeCrossEncoder(), candidates=5, context_chunks=1))
+            result = handler.process_query("When does the library close on Sunday?", top_k=3)
+
+        self.assertEqual(len(result["sources"]), 3)
+        self.assertEqual(result["sources"][0]["question"], "When does the library close on Sunday?")
+        self.assertEqual(result["response"], "The answer is number 3.")
+        context = handler._format_context(handler._retrieve("When does the library close on Sunday?", 3))
+        self.assertEqual(context.count("Q:"), 1)
+
+    def test_fast_path_gates_on_rerank_score(self):
+        """Test that re-ranked hits are gated on the cross-encoder score, not the heuristic one"""
+        with tempfile.TemporaryDirectory() as tmp:
+            config_path = Path(tmp) / "config.yaml"
+            _write_config(config_path, batch_size=32)
+            embedder = HashingEmbedder()
+            store = InMemoryVectorStore()
+            for i, question in enumerate(QUESTIONS):
+                content = f"Q: {question}\nA: The answer is number {i}."
+                store.insert(content, embedder.encode(content).tolist(), {"section": "Library", "category": "library"})
+            handler = build_query_handler(str(config_path), store, embedder, reranker=CrossEncoderReranker(
+                FakeCrossEncoder(), candidates=5))
+        query = "When does the library close on Sunday?"
+
+        # A heuristic threshold no hit clears, the cross-encoder is confident
+        handler.fast_path = FastPathGate(enabled=True, min_score=2.0, min_vector_similarity=0.0,
+                                         min_rerank_score=0.9, min_rerank_margin=0.1)
+        result = handler.process_query(query)
+        self.assertTrue(result["fast_path"])
+        self.assertEqual(result["response"], "The answer is number 3.")
+
+        handler.fast_path = FastPathGate(enabled=True, min_score=0.0, min_vector_similarity=0.0,
+                                         min_rerank_score=0.99)
+        self.assertFalse(handler.process_query(query)["fast_path"])
+
+        # Without re-ranking the heuristic thresholds apply again
+        handler.reranker = CrossEncoderReranker(enabled=False)
+        handler.fast_path = FastPathGate(enabled=True, min_score=2.0, min_vector_similarity=0.0,
+                                         min_rerank_score=0.0)
+        self.assertFalse(handler.process_query(query)["fast_path"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+from pathlib import Path
+from src.data_processing.chunk_store import iter_chunks
+from src.data_processing.deduplicator import ChunkDeduplicator
+from src.data_processing.text_chunker import Chunk
+
+
+class TestChunkDeduplicator(unittest.TestCase):
+    def setUp(self):
+        """Set up test environment"""
+        self.deduplicator = ChunkDeduplicator(threshold=0.8)
+        self.chunks_dir = Path(__file__).parent / "test_data" / "Chunks"
+
+    def _chunk(self, question, answer, source, index, emails=()):
+        return Chunk(
+            content=f"Q: {question}\nA: {answer}",
+            metadata={
+                "chunk_index": index,
+                "source_file": source,
+                "question": question,
+                "section": "General Queries",
+                "extracted_info": {"emails": list(emails)},
+            },
+        )
+
+    def test_merges_near_duplicates(self):
+        """Test that editions of the same answer collapse into one chunk"""
+        answer = ("Student cards are issued by Student Services on the ground floor of Aungier Street. "
+                  "Bring photo identification and allow two working days for the card to be printed.")
+        chunks = [
+            self._chunk("How do I get my student card?", answer, "handbook_2023.pdf", 0, ["a@dbs.ie"]),
+            self._chunk("Where is the library?", "The library is on the second floor of Aungier Street.",
+                        "handbook_2023.pdf", 1),
+            self._chunk("How do I get my student card?", answer.replace("two", "three"),
+                        "handbook_2024.pdf", 0, ["b@dbs.ie"]),
+        ]
+
+        result = self.deduplicator.deduplicate(chunks)
+
+        self.assertEqual(result.input_count, 3)
+        self.assertEqual(result.collapsed, 1)
+        self.assertEqual(len(result.chunks), 2)
+        self.assertEqual(result.clusters, [[0, 2]])
+
+        merged = result.chunks[0]
+        self.assertIsInstance(merged, Chunk)
+        self.assertEqual([s["source_file"] for s in merged.metadata["sources"]],
+                         ["handbook_2023.pdf", "handbook_2024.pdf"])
+        self.assertEqual(merged.metadata["duplicate_count"], 1)
+        self.assertEqual(merged.metadata["extracted_info"]["emails"], ["a@dbs.ie", "b@dbs.ie"])
+        # Inputs are left untouched
+        self.assertNotIn("sources", chunks[0].metadata)
+
+    def test_faq_chunks(self):
+        """Test the real FAQ chunks, which repeat the VISA renewal answer once"""
+        chunks = list(iter_chunks(self.chunks_dir))
+        if not chunks:
+            self.skipTest("No chunk files available for testing")
+
+        baseline = self.deduplicator.deduplicate(chunks)
+        self.assertEqual(baseline.collapsed, 1)
+        for i in baseline.clusters[0]:
+            self.assertEqual(chunks[i]["metadata"]["question"], "What do I do to renew my VISA?")
+
+        # Exact copies of distinct chunks collapse one for one
+        result = self.deduplicator.deduplicate(chunks + [dict(c) for c in chunks[:5]])
+        self.assertEqual(result.collapsed, 6)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,125 @@
+import unittest
+import tempfile
+from pathlib import Path
+import yaml
+from src.benchmarks.fakes import CountingEmbedder, HashingEmbedder, InMemoryVectorStore
+from src.benchmarks.offline_suite import build_query_handler
+from src.data_processing.chunk_store import iter_chunks
+from src.db.data_loader import ChunkLoader
+from src.rag.entity_index import EntityIndex
+
+
+CHUNKS_DIR = Path(__file__).parent / "test_data" / "Chunks"
+
+
+class TestEntityIndex(unittest.TestCase):
+    def setUp(self):
+        """Set up test environment"""
+        self.index = EntityIndex(enabled=True)
+        self.index.add(iter_chunks(CHUNKS_DIR))
+
+    def test_answers_lookups(self):
+        """Test that single-entity questions are answered from the extracted entities"""
+        answer, hits = self.index.try_answer("What's the email for changing my course?")
+        self.assertIn("admissions@dbs.ie", answer)
+        self.assertEqual(hits[0]["metadata"]["question"], "How do I enquire about changing my course?")
+
+        self.assertIn("01-4177-573", self.index.try_answer("What is the phone number for Moodle problems?")[0])
+        self.assertIn("€10", self.index.try_answer("How much is a replacement student card?")[0])
+        self.assertEqual(self.index.stats()["served"], 3)
+
+    def test_falls_through(self):
+        """Test that other questions, missing subjects and mixed intents go through retrieval"""
+        self.assertEqual(self.index.try_answer("Will exams remain online?"), (None, []))
+        self.assertEqual(self.index.try_answer("What's the email?"), (None, []))
+        self.assertEqual(self.index.try_answer("What is the email and phone number for Moodle?"), (None, []))
+        # Locations are extracted too loosely to be answered on their own
+        self.assertEqual(self.index.try_answer("Where is the library located?"), (None, []))
+        # A single generic subject word matches too many chunks
+        self.assertEqual(self.index.try_answer("Where is the link to the student portal?"), (None, []))
+        self.assertIsNone(EntityIndex().try_answer("What's the email for changing my course?")[0])
+
+        # A follow-up without a subject takes it from the previous question
+        answer, _ = self.index.try_answer("and the email?", "How do I enquire about changing my course? and the email?")
+        self.assertIn("admissions@dbs.ie", answer)
+
+    def test_value_lookup_save_and_drop(self):
+        """Test value postings, persistence and dropping a replaced source"""
+        self.assertEqual(len(self.index.find("phone_numbers", "01-4177-573")), 2)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = str(Path(tmp) / "entities.json")
+            self.index.save(path)
+            loaded = EntityIndex(enabled=True, path=path)
+        self.assertEqual(loaded.stats()["types"], self.index.stats()["types"])
+
+        source = "FAQs from Students at Dublin Business School.pdf"
+        self.assertEqual(loaded.drop("source_file", source), self.index.size)
+        self.assertIsNone(loaded.try_answer("What's the email for changing my course?")[0])
+
+
+class FailingStore(InMemoryVectorStore):
+    """InMemoryVectorStore that rejects chunks mentioning a word"""
+
+    def __init__(self, word):
+        super().__init__()
+        self.word = word
+
+    def insert(self, content, embedding, metadata):
+        if self.word in content:
+            raise ConnectionError("insert failed")
+        return super().insert(content, embedding, metadata)
+
+
+class TestEntityLookupPath(unittest.TestCase):
+    def test_query_handler_skips_search_and_generation(self):
+        """Test that the loader builds the index and lookups skip embedding, search and the LLM"""
+        with tempfile.TemporaryDirectory() as tmp:
+            config_path = Path(tmp) / "config.yaml"
+            index_path = str(Path(tmp) / "entities.json")
+            with open(config_path, "w") as f:
+                yaml.safe_dump({
+                    "embedding": {"model_name": "hashing", "batch_size": 8},
+                    "model": {"max_new_tokens": 64},
+                    "entity_index": {"enabled": True, "path": index_path},
+                }, f)
+
+            embedder = CountingEmbedder()
+            store = InMemoryVectorStore()
+            ChunkLoader(str(config_path), embedding_model=embedder, milvus_client=store).load_chunks(str(CHUNKS_DIR))
+            index = EntityIndex.from_config(str(config_path))
+            self.assertGreater(index.size, 0)
+
+            # Loading again replaces the saved entries instead of appending to them
+            ChunkLoader(str(config_path), embedding_model=embedder, milvus_client=store).load_chunks(str(CHUNKS_DIR))
+            self.assertEqual(EntityIndex.from_config(str(config_path)).size, index.size)
+
+            handler = build_query_handler(str(config_path), store, embedder, entities=index)
+            embedder.calls = 0
+            result = handler.process_query("What's the email for changing my course?")
+            events = list(handler.stream_query("What is the phone number for Moodle problems?"))
+
+        self.assertIn("admissions@dbs.ie", result["response"])
+        self.assertTrue(result["fast_path"])
+        self.assertEqual(result["sources"][0]["question"], "How do I enquire about changing my course?")
+        self.assertIn("01-4177-573", events[-1]["response"])
+        self.assertEqual(embedder.calls, 0)
+
+    def test_failed_inserts_are_not_indexed(self):
+        """Test that chunks Milvus rejected can't be answered from the entity index"""
+        with tempfile.TemporaryDirectory() as tmp:
+            config_path = Path(tmp) / "config.yaml"
+            with open(config_path, "w") as f:
+                yaml.safe_dump({"embedding": {"model_name": "hashing", "batch_size": 8}}, f)
+            index = EntityIndex(enabled=True)
+            loader = ChunkLoader(str(config_path), embedding_model=HashingEmbedder(),
+                                 milvus_client=FailingStore("Moodle"), entity_index=index)
+            loader.load_chunks(str(CHUNKS_DIR))
+
+        self.assertGreater(index.size, 0)
+        self.assertIsNone(index.try_answer("What is the phone number for Moodle problems?")[0])
+        self.assertIn("admissions@dbs.ie", index.try_answer("What's the email for changing my course?")[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+from src.rag.fast_path import FastPathGate, question_overlap
+
+
+class TestFastPathGate(unittest.TestCase):
+    def setUp(self):
+        """Set up test environment"""
+        self.results = [
+            {
+                "content": "Q: How do I renew my student card?\nA: Bring your old card to Student Services.",
+                "metadata": {"section": "General Queries", "source_file": "faq.pdf"},
+                "score": 0.85,
+                "vector_similarity": 0.6,
+            },
+            {
+                "content": "Q: Where is the library?\nA: The library is on Aungier Street.",
+                "metadata": {"section": "Library Queries"},
+                "score": 0.70,
+                "vector_similarity": 0.3,
+            },
+        ]
+
+    def test_question_overlap(self):
+        self.assertEqual(question_overlap("How do I renew my student card?", "how do i renew my student card"), 1.0)
+        self.assertEqual(question_overlap("library hours", "How do I renew my student card?"), 0.0)
+
+    def test_serves_confident_match(self):
+        """Test that a near-exact question match returns the stored answer"""
+        gate = FastPathGate(enabled=True, template="{answer} ({section})")
+        answer = gate.try_answer("how can I renew my student card", self.results)
+        self.assertEqual(answer, "Bring your old card to Student Services. (General Queries)")
+        self.assertEqual(gate.hit_rate, 1.0)
+
+    def test_gate_thresholds(self):
+        """Test that each threshold can reject the fast path"""
+        query = "renew student card"
+        self.assertIsNone(FastPathGate(enabled=False).try_answer(query, self.results))
+        self.assertIsNone(FastPathGate(enabled=True, min_score=0.9).try_answer(query, self.results))
+        self.assertIsNone(FastPathGate(enabled=True, min_vector_similarity=0.7).try_answer(query, self.results))
+        self.assertIsNone(FastPathGate(enabled=True, min_margin=0.2).try_answer(query, self.results))
+        self.assertIsNone(FastPathGate(enabled=True).try_answer("where is the library", self.results))
+
+        gate = FastPathGate(enabled=True)
+        gate.try_answer(query, self.results)
+        gate.try_answer("what time is it", self.results)
+        self.assertEqual(gate.hit_rate, 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
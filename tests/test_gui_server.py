@@ -0,0 +1,114 @@
+import unittest
+import json
+import tempfile
+import urllib.error
+import urllib.parse
+import urllib.request
+from pathlib import Path
+from src.benchmarks.offline_suite import build_offline_handler
+from src.data_processing.chunk_store import iter_chunks
+from src.gui.server import ChatServer
+from src.utils.admission import AdmissionController
+from src.utils.metrics import Metrics, get_metrics, set_metrics
+
+
+def _read_events(response):
+    events = []
+    for frame in response.read().decode("utf-8").split("\n\n"):
+        data = [line[6:] for line in frame.split("\n") if line.startswith("data: ")]
+        if data:
+            events.append(json.loads("\n".join(data)))
+    return events
+
+
+class TestChatServer(unittest.TestCase):
+    def setUp(self):
+        """Set up test environment"""
+        chunks = list(iter_chunks(str(Path(__file__).parent / "test_data" / "Chunks")))
+        if not chunks:
+            self.skipTest("No chunk files available for testing")
+        self.previous_metrics = get_metrics()
+        set_metrics(Metrics(enabled=True))
+        with tempfile.TemporaryDirectory() as tmp:
+            self.handler = build_offline_handler(chunks, Path(tmp), token_latency=0.001, prompt_token_latency=0.0,
+                                                 fast_path=False)
+        self.server = ChatServer(self.handler, port=0)
+        self.server.start()
+        self.url = f"http://127.0.0.1:{self.server.port}"
+
+    def tearDown(self):
+        self.server.stop()
+        set_metrics(self.previous_metrics)
+
+    def test_index_page(self):
+        """Test that the chat page is served"""
+        with urllib.request.urlopen(self.url + "/") as response:
+            self.assertIn("text/html", response.headers["Content-Type"])
+            self.assertIn(b"readEvents", response.read())
+
+    def test_stream_sources_first(self):
+        """Test that sources arrive before the tokens and done closes the stream"""
+        query = urllib.parse.quote("How do I renew my visa?")
+        with urllib.request.urlopen(f"{self.url}/chat?q={query}") as response:
+            self.assertEqual(response.headers["Content-Type"], "text/event-stream")
+            events = _read_events(response)
+
+        self.assertEqual(events[0]["type"], "sources")
+        self.assertEqual(len(events[0]["sources"]), 3)
+        self.assertEqual(events[-1]["type"], "done")
+        tokens = [e["text"] for e in events if e["type"] == "token"]
+        self.assertGreater(len(tokens), 1)
+        self.assertEqual("".join(tokens).strip(), events[-1]["response"])
+
+    def test_post_chat_and_rejection(self):
+        """Test the JSON endpoint and the status of shed requests"""
+        request = urllib.request.Request(self.url + "/chat", data=json.dumps({"query": "library hours", "top_k": 2}).encode(),
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request) as response:
+            self.assertEqual(len(_read_events(response)[0]["sources"]), 2)
+
+        self.handler.admission = AdmissionController(client_rate=0.01, client_burst=1)
+        request.add_header("X-Client-Id", "student-1")
+        urllib.request.urlopen(request).read()
+        with self.assertRaises(urllib.error.HTTPError) as ctx:
+            urllib.request.urlopen(request)
+        self.assertEqual(ctx.exception.code, 429)
+        self.assertIsNotNone(ctx.exception.headers["Retry-After"])
+
+    def test_quota_keyed_on_peer(self):
+        """Test that X-Client-Id only picks the quota bucket behind a trusted proxy"""
+        self.handler.admission = AdmissionController(client_rate=0.01, client_burst=1)
+
+        def status(client_id):
+            request = urllib.request.Request(self.url + "/chat?q=library+hours", headers={"X-Client-Id": client_id})
+            try:
+                with urllib.request.urlopen(request) as response:
+                    response.read()
+                    return response.status
+            except urllib.error.HTTPError as e:
+                return e.code
+
+        # Renaming itself doesn't give a direct client a fresh bucket
+        self.assertEqual([status("a"), status("b")], [200, 429])
+
+        self.server.trusted_proxies = {"127.0.0.1"}
+        self.assertEqual([status("c"), status("d"), status("c")], [200, 200, 429])
+
+    def test_rum_reports(self):
+        """Test that client timings are recorded and summarized"""
+        for report in ({"cached": False, "sources_ms": 40, "ttft_ms": 120, "ttlt_ms": 900},
+                       {"cached": True, "sources_ms": 1, "ttft_ms": 1, "ttlt_ms": 1}):
+            request = urllib.request.Request(self.url + "/rum", data=json.dumps(report).encode(),
+                                             headers={"Content-Type": "application/json"})
+            with urllib.request.urlopen(request) as response:
+                self.assertEqual(response.status, 204)
+
+        with urllib.request.urlopen(self.url + "/rum") as response:
+            summary = json.loads(response.read())
+        self.assertEqual((summary["reports"], summary["cache_hits"]), (2, 1))
+        self.assertEqual(summary["ttft_ms"]["count"], 2)
+        self.assertIn("client_ttft_seconds", get_metrics().histograms)
+
+
+if __name__ == "__main__":
+    unittest.main()
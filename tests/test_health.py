@@ -0,0 +1,132 @@
+import unittest
+import json
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+import yaml
+from src.benchmarks.fakes import HashingEmbedder, InMemoryVectorStore, FakeLLM
+from src.llm.mistral_client import MistralClient
+from src.utils.health import HealthMonitor
+from src.utils.system_check import SystemCheck
+
+
+class _DownStore(InMemoryVectorStore):
+    def ping(self):
+        raise ConnectionError("Milvus unreachable")
+
+
+class _LazyStore(InMemoryVectorStore):
+    def ping(self):
+        return {"load_state": "Loaded" if self.loaded else "NotLoad", "loaded": self.loaded}
+
+
+class TestHealthMonitor(unittest.TestCase):
+    def setUp(self):
+        """Set up test environment"""
+        self.tmp = tempfile.TemporaryDirectory()
+        config_path = Path(self.tmp.name) / "config.yaml"
+        with open(config_path, "w") as f:
+            yaml.safe_dump({"model": {"path": "fake", "context_length": 4096}}, f)
+        self.mistral = MistralClient(str(config_path), model=FakeLLM())
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_ready_when_components_are_up(self):
+        """Test that loaded components report ready"""
+        monitor = HealthMonitor(InMemoryVectorStore(), self.mistral, HashingEmbedder())
+        monitor.refresh()
+
+        ready, body = monitor.readiness()
+        self.assertTrue(ready)
+        self.assertEqual(set(body["checks"]), {"milvus", "model", "embedding"})
+        self.assertTrue(monitor.liveness()[0])
+
+    def test_failed_check_is_not_ready(self):
+        """Test that a failing check flips readiness without raising"""
+        monitor = HealthMonitor(_DownStore(), self.mistral)
+        monitor.refresh()
+
+        ready, body = monitor.readiness()
+        self.assertFalse(ready)
+        self.assertIn("Milvus unreachable", body["checks"]["milvus"]["message"])
+        self.assertTrue(body["checks"]["model"]["ok"])
+
+    def test_start_loads_collection(self):
+        """Test that a fresh process becomes ready once the monitor has loaded the collection"""
+        store = _LazyStore()
+        monitor = HealthMonitor(store, interval=60)
+        monitor.refresh()
+        self.assertFalse(monitor.readiness()[0])
+        monitor.start()
+        monitor.stop()
+        self.assertEqual(store.loads, 1)
+        self.assertTrue(monitor.readiness()[0])
+
+    def test_lazy_load_released_collection_is_ready(self):
+        """Test that with lazy loading a released collection doesn't flip readiness"""
+        store = _LazyStore()
+        monitor = HealthMonitor(store, interval=60, lazy_load=True)
+        monitor.start()
+        monitor.stop()
+        self.assertEqual(store.loads, 0)
+        ready, body = monitor.readiness()
+        self.assertTrue(ready)
+        self.assertIn("NotLoad", body["checks"]["milvus"]["message"])
+
+    def test_stale_snapshot_is_not_ready(self):
+        """Test that a snapshot older than stale_after stops counting as ready"""
+        monitor = HealthMonitor(InMemoryVectorStore(), interval=60, stale_after=0.01)
+        self.assertFalse(monitor.readiness()[0])
+        monitor.refresh()
+        time.sleep(0.02)
+        ready, body = monitor.readiness()
+        self.assertFalse(ready)
+        self.assertEqual(body["status"], "stale")
+
+    def test_probes_read_from_memory(self):
+        """Test that probes do not run the checks"""
+        calls = []
+        monitor = HealthMonitor(interval=60)
+        monitor.add_check("counted", lambda: calls.append(1) or "ok")
+        monitor.start()
+        try:
+            start = time.perf_counter()
+            for _ in range(1000):
+                monitor.readiness()
+            elapsed = time.perf_counter() - start
+        finally:
+            monitor.stop()
+
+        self.assertEqual(len(calls), 1)
+        self.assertLess(elapsed / 1000, 0.001)
+
+    def test_http_probes(self):
+        """Test /healthz and /readyz status codes"""
+        monitor = HealthMonitor(_DownStore(), interval=60)
+        monitor.serve(0)
+        port = monitor._server.server_address[1]
+        try:
+            monitor.refresh()
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/healthz") as response:
+                self.assertEqual(response.status, 200)
+            with self.assertRaises(urllib.error.HTTPError) as ctx:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}/readyz")
+            self.assertEqual(ctx.exception.code, 503)
+            self.assertEqual(json.loads(ctx.exception.read())["status"], "not ready")
+        finally:
+            monitor.stop()
+
+    def test_system_check_uses_monitor_snapshot(self):
+        """Test that SystemCheck reports a running monitor instead of reloading components"""
+        monitor = HealthMonitor(InMemoryVectorStore(), self.mistral)
+        monitor.refresh()
+        results = SystemCheck.run_all_checks(monitor)
+        self.assertEqual(results["milvus"]["status"], "✅")
+        self.assertEqual(results["model"]["status"], "✅")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+import json
+import tempfile
+import time
+from pathlib import Path
+from src.benchmarks.load_test import (
+    HandlerTarget,
+    ScheduledRequest,
+    compare,
+    load_query_log,
+    run_load,
+    schedule,
+    summarize,
+)
+from src.benchmarks.offline_suite import build_offline_handler
+from src.data_processing.chunk_store import iter_chunks
+
+
+class TestLoadTest(unittest.TestCase):
+    def setUp(self):
+        """Set up test environment"""
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_schedule(self):
+        """Test open-loop schedules and replay timing"""
+        entries = [{"query": "a"}, {"query": "b"}]
+        uniform = schedule(entries, 5, rate=10, arrival="uniform")
+        self.assertEqual([r.query for r in uniform], ["a", "b", "a", "b", "a"])
+        self.assertAlmostEqual(uniform[-1].offset, 0.4)
+
+        poisson = schedule(entries, 2000, rate=50, seed=1)
+        self.assertAlmostEqual(len(poisson) / poisson[-1].offset, 50, delta=5)
+
+        log = Path(self.tmp.name) / "queries.jsonl"
+        log.write_text(json.dumps({"query": "visa", "ts": 100.0}) + "\n" +
+                       json.dumps({"query": "exam", "top_k": 5, "ts": 104.0}) + "\n")
+        replay = schedule(load_query_log(str(log)), 10, rate=1, replay_timing=True, speed=2)
+        self.assertEqual([(r.offset, r.query, r.top_k) for r in replay], [(0.0, "visa", 3), (2.0, "exam", 5)])
+
+    def test_queueing_counts_against_latency(self):
+        """Test that requests arriving faster than they are served accumulate queue time"""
+        def slow_target(query, top_k):
+            time.sleep(0.02)
+            if query == "fail":
+                raise RuntimeError("boom")
+            return 0.005
+
+        requests = [ScheduledRequest(0.0, "ok") for _ in range(4)] + [ScheduledRequest(0.0, "fail")]
+        results = run_load(slow_target, requests, concurrency=1)
+        summary = summarize(results, 0.1)
+
+        self.assertEqual(summary["errors"], 1)
+        self.assertEqual(summary["error_types"], {"RuntimeError": 1})
+        self.assertGreater(max(r.queue_ms for r in results), 50)
+        self.assertGreaterEqual(summary["latency_ms"]["max"], summary["ttft_ms"]["max"])
+
+    def test_offline_stream_ttft(self):
+        """Test that streaming through QueryHandler reports TTFT before the full latency"""
+        chunks = list(iter_chunks(str(Path(__file__).parent / "test_data" / "Chunks")))
+        if not chunks:
+            self.skipTest("No chunk files available for testing")
+        handler = build_offline_handler(chunks, Path(self.tmp.name), token_latency=0.002,
+                                        prompt_token_latency=0.0, fast_path=False)
+
+        events = list(handler.stream_query("How do I renew my visa?"))
+        self.assertEqual(events[0]["type"], "sources")
+        self.assertEqual(events[-1]["type"], "done")
+        self.assertEqual(events[-1]["response"], "".join(e["text"] for e in events if e["type"] == "token").strip())
+
+        results = run_load(HandlerTarget(handler), [ScheduledRequest(0.0, "library opening hours")], 1)
+        self.assertLess(results[0].ttft_ms, results[0].latency_ms)
+
+    def test_compare(self):
+        """Test regression detection between runs"""
+        baseline = {"steps": [{"rate": 5, "throughput_qps": 5.0, "error_rate": 0.0,
+                               "latency_ms": {"p99": 100.0}}]}
+        same = [{"rate": 5, "throughput_qps": 4.9, "error_rate": 0.0, "latency_ms": {"p99": 110.0}}]
+        worse = [{"rate": 5, "throughput_qps": 4.9, "error_rate": 0.1, "latency_ms": {"p99": 200.0}}]
+        self.assertEqual(compare(same, baseline, 0.2), [])
+        self.assertEqual(len(compare(worse, baseline, 0.2)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import tempfile
+import json
+from pathlib import Path
+from src.utils.metrics import Metrics
+
+
+class TestMetrics(unittest.TestCase):
+    def test_disabled_is_noop(self):
+        """Test that disabled metrics record nothing"""
+        metrics = Metrics(enabled=False)
+        with metrics.trace("query"):
+            with metrics.span("embed"):
+                pass
+        metrics.incr("requests")
+        self.assertEqual(metrics.snapshot(), {"histograms": {}, "counters": {}})
+
+    def test_trace_spans(self):
+        """Test that spans are grouped into a JSONL trace record"""
+        with tempfile.TemporaryDirectory() as tmp:
+            trace_file = Path(tmp) / "traces.jsonl"
+            metrics = Metrics(enabled=True, trace_file=str(trace_file))
+
+            with metrics.trace("query", top_k=3):
+                with metrics.span("embed"):
+                    pass
+                with metrics.span("search"):
+                    metrics.annotate(prompt_tokens=12)
+
+            with open(trace_file, "r") as f:
+                traces = [json.loads(line) for line in f]
+
+        self.assertEqual(len(traces), 1)
+        self.assertEqual([s["name"] for s in traces[0]["spans"]], ["embed", "search"])
+        self.assertEqual(traces[0]["top_k"], 3)
+        self.assertEqual(traces[0]["prompt_tokens"], 12)
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["histograms"]["stage_embed_seconds"]["count"], 1)
+        self.assertEqual(snapshot["counters"]["query_total"], 1)
+
+    def test_percentiles_and_prometheus(self):
+        """Test histogram percentiles and the text exposition format"""
+        metrics = Metrics(enabled=True)
+        for i in range(1, 101):
+            metrics.observe("latency_seconds", i)
+        metrics.record_cache("search", True)
+        metrics.record_cache("search", False)
+
+        summary = metrics.snapshot()["histograms"]["latency_seconds"]
+        self.assertEqual(summary["p50"], 51)
+        self.assertEqual(summary["p99"], 100)
+        self.assertAlmostEqual(metrics.cache_hit_ratio("search"), 0.5)
+
+        text = metrics.to_prometheus()
+        self.assertIn('chatbot_latency_seconds{quantile="0.95"}', text)
+        self.assertIn("chatbot_latency_seconds_count 100", text)
+        self.assertIn("chatbot_cache_search_hits 1", text)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,263 @@
+import unittest
+import asyncio
+import json
+import tempfile
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+import numpy as np
+import yaml
+from src.benchmarks.fakes import HashingEmbedder, InMemoryVectorStore
+from src.db import milvus_client as milvus_module
+from src.db.milvus_client import MilvusClient, DEFAULT_PARTITION, partition_name_for
+from src.db.snapshot import Snapshot, export_snapshot, _bulk_columns
+
+
+class FakeAsyncClient:
+    """AsyncMilvusClient stand-in that returns canned hits and records the loop it was created on"""
+
+    instances = []
+    hits = []
+    fail_next = 0
+
+    def __init__(self, uri):
+        self.uri = uri
+        self.loop = asyncio.get_running_loop()
+        self.closed = False
+        FakeAsyncClient.instances.append(self)
+
+    async def search(self, **kwargs):
+        if FakeAsyncClient.fail_next:
+            FakeAsyncClient.fail_next -= 1
+            raise ConnectionError("channel closed")
+        return [self.hits]
+
+    async def close(self):
+        self.closed = True
+
+
+class MockedMilvusTest(unittest.TestCase):
+    """Builds MilvusClients against a mocked pymilvus Collection and utility"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.collection = mock.MagicMock()
+        self.collection.schema.fields = [SimpleNamespace(name=name) for name in
+                                         ("id", "content", "embedding", "metadata", "rank_features")]
+        self.collection.has_partition.return_value = False
+        self.utility = mock.MagicMock()
+        self.utility.has_collection.return_value = True
+        self.connections = mock.MagicMock()
+        FakeAsyncClient.instances, FakeAsyncClient.hits, FakeAsyncClient.fail_next = [], [], 0
+
+        patcher = mock.patch.multiple(milvus_module, connections=self.connections, utility=self.utility,
+                                      Collection=mock.MagicMock(return_value=self.collection),
+                                      AsyncMilvusClient=FakeAsyncClient)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.embedder = HashingEmbedder()
+
+    def make_client(self, **milvus_config) -> MilvusClient:
+        config_path = Path(self.tmp.name) / "config.yaml"
+        with open(config_path, "w") as f:
+            yaml.safe_dump({"milvus": {"host": "localhost", "port": 19530, "collection_name": "school_docs",
+                                       **milvus_config}}, f)
+        return MilvusClient(str(config_path))
+
+    def hit(self, pk: int, question: str, section: str = "General"):
+        content, metadata = self.payload(question, section)
+        return {"id": pk, "distance": 0.3, "entity": {"content": content, "metadata": metadata}}
+
+    def payload(self, question: str, section: str = "General"):
+        return f"Q: {question}\nA: See the student handbook.", json.dumps({"question": question, "section": section})
+
+
+QUESTIONS = [
+    ("How do I renew my visa?", "Immigration"),
+    ("Where is the library?", "Library"),
+    ("When are exam results published?", "Exams"),
+]
+
+
+class TestMilvusClient(MockedMilvusTest):
+    def test_partitions(self):
+        """Test partition routing, and that dropping releases and drops only existing partitions"""
+        client = self.make_client(partition_key="source_file")
+        self.assertEqual(client.partition_for({"source_file": "handbook.pdf"}), partition_name_for("handbook.pdf"))
+        self.assertEqual(client.partition_for({}), DEFAULT_PARTITION)
+
+        self.assertFalse(client.drop_partition("handbook.pdf"))
+        self.collection.drop_partition.assert_not_called()
+
+        self.collection.has_partition.return_value = True
+        self.assertTrue(client.drop_partition("handbook.pdf"))
+        name = partition_name_for("handbook.pdf")
+        self.collection.partition.assert_called_with(name)
+        self.collection.partition.return_value.release.assert_called_once()
+        self.collection.drop_partition.assert_called_once_with(name)
+        with self.assertRaises(ValueError):
+            client.drop_partition("")
+
+        client.delete({"source_file": "handbook.pdf"})
+        self.assertEqual(self.collection.drop_partition.call_count, 2)
+        self.collection.delete.assert_not_called()
+
+    def test_insert_retries_only_connection_errors(self):
+        """Test that a failed insert reconnects and retries, while encoding errors are raised as they are"""
+        client = self.make_client()
+        content, metadata = self.payload(*QUESTIONS[0])
+        embedding = self.embedder.encode(content).tolist()
+        self.collection.insert.side_effect = [ConnectionError("node down"), mock.MagicMock()]
+        client.insert(content, embedding, json.loads(metadata))
+        self.assertEqual(self.collection.insert.call_count, 2)
+        self.assertEqual(self.connections.connect.call_count, 2)
+
+        with self.assertRaises(TypeError):
+            client.insert(content, embedding, {"tags": {"not", "serialisable"}})
+        self.assertEqual(self.collection.insert.call_count, 2)
+
+    def test_attach_payloads_queries_missing_ids_once(self):
+        """Test that payloads are fetched by primary key for uncached hits only, and cached"""
+        client = self.make_client(two_phase=True)
+        client.payload_cache.put(1, self.payload(*QUESTIONS[0]))
+        content, metadata = self.payload(*QUESTIONS[1])
+        self.collection.query.return_value = [{"id": 2, "content": content, "metadata": metadata}]
+
+        hits = client._attach_payloads([{"id": pk, "score": 1.0 - pk / 10} for pk in (1, 2, 3)])
+        self.collection.query.assert_called_once_with(expr="id in [2, 3]", output_fields=["content", "metadata"])
+        # 3 was deleted between the two phases
+        self.assertEqual([hit["id"] for hit in hits], [1, 2])
+        self.assertEqual(hits[1]["metadata"]["section"], "Library")
+
+        client._attach_payloads([{"id": 2, "score": 0.5}])
+        self.assertEqual(self.collection.query.call_count, 1)
+
+    def test_two_phase_ranks_like_single_phase(self):
+        """Test that ranking from rank_features orders hits like ranking the payloads"""
+        single, two_phase = self.make_client(), self.make_client(two_phase=True)
+        payloads = {pk: self.payload(*qs) for pk, qs in enumerate(QUESTIONS, 1)}
+        features = {pk: json.dumps(two_phase.ranker.features(content, json.loads(metadata)))
+                    for pk, (content, metadata) in payloads.items()}
+        self.collection.query.side_effect = lambda expr, output_fields: [
+            {"id": pk, "content": payloads[pk][0], "metadata": payloads[pk][1]} for pk in payloads]
+
+        def search(output_fields, **kwargs):
+            entity = (lambda pk: {"rank_features": features[pk]}) if output_fields == ["rank_features"] else \
+                (lambda pk: dict(zip(("content", "metadata"), payloads[pk])))
+            return [[SimpleNamespace(id=pk, score=0.5 + pk / 100, entity=entity(pk)) for pk in payloads]]
+
+        self.collection.search.side_effect = search
+        query = "library opening"
+        embedding = self.embedder.encode(query).tolist()
+        expected = single.search(embedding, limit=2, query=query)
+        actual = two_phase.search(embedding, limit=2, query=query)
+        self.assertEqual([h["content"] for h in actual], [h["content"] for h in expected])
+        self.assertEqual([h["score"] for h in actual], [h["score"] for h in expected])
+        self.assertEqual(actual[0]["metadata"]["section"], "Library")
+
+    def test_insert_columns_one_request_per_partition(self):
+        """Test that rows are grouped by partition and ranking features are computed when missing"""
+        client = self.make_client(partition_key="source_file")
+        contents = [self.payload(q)[0] for q, _ in QUESTIONS]
+        metadata = [json.dumps({"question": q, "section": s, "source_file": f})
+                    for (q, s), f in zip(QUESTIONS, ("a.pdf", "b.pdf", "a.pdf"))]
+        embeddings = self.embedder.encode(contents)
+
+        self.assertEqual(client.insert_columns(contents, embeddings, metadata), 3)
+        self.assertEqual(self.collection.create_partition.call_count, 2)
+        inserts = {call.kwargs["partition_name"]: call.args[0] for call in self.collection.insert.call_args_list}
+        self.assertEqual(set(inserts), {partition_name_for("a.pdf"), partition_name_for("b.pdf")})
+        data = inserts[partition_name_for("a.pdf")]
+        self.assertEqual(data[0], [contents[0], contents[2]])
+        self.assertEqual(data[2], [metadata[0], metadata[2]])
+        self.assertEqual(json.loads(data[3][1]), client.ranker.features(contents[2], json.loads(metadata[2])))
+
+
+class TestBulkImportedRows(MockedMilvusTest):
+    def test_parsed_metadata_round_trip(self):
+        """Test that rows bulk imported from a snapshot, whose JSON metadata comes back parsed, are searchable"""
+        source = InMemoryVectorStore()
+        for question, section in QUESTIONS:
+            content, metadata = self.payload(question, section)
+            source.insert(content, self.embedder.encode(content).tolist(), json.loads(metadata))
+        path = Path(self.tmp.name) / "snapshot"
+        export_snapshot(source, path)
+        snapshot = Snapshot(path)
+
+        client = self.make_client(two_phase=True)
+        n = len(snapshot)
+        columns = _bulk_columns(client, snapshot, list(range(n)), snapshot.strings("content", 0, n),
+                                snapshot.strings("metadata", 0, n), snapshot.strings("rank_features", 0, n))
+        # The uploaded column files as Milvus reads them, with the JSON field parsed
+        for field, values in columns.items():
+            np.save(Path(self.tmp.name) / f"{field}.npy", values)
+            columns[field] = np.load(Path(self.tmp.name) / f"{field}.npy")
+        rows = [{"id": i, "content": str(columns["content"][i]), "metadata": json.loads(str(columns["metadata"][i])),
+                 "rank_features": str(columns["rank_features"][i])} for i in range(n)]
+
+        self.collection.search.side_effect = lambda output_fields, **kwargs: [
+            [SimpleNamespace(id=row["id"], score=0.5, entity={f: row[f] for f in output_fields}) for row in rows]]
+        self.collection.query.side_effect = lambda expr, output_fields: rows
+        query = "where is the library"
+        embedding = self.embedder.encode(query).tolist()
+        for store in (client, self.make_client()):
+            hits = store.search(embedding, limit=3, query=query)
+            self.assertEqual(hits[0]["metadata"], {"question": "Where is the library?", "section": "Library"})
+            self.assertEqual(len(hits), 3)
+
+        # Exporting the imported rows gives back the snapshot's metadata strings
+        iterator = self.collection.query_iterator.return_value
+        exported = [{**row, "embedding": snapshot.embeddings[row["id"]].tolist()} for row in rows]
+        iterator.next.side_effect = [exported, []]
+        batch = next(self.make_client().export_batches())
+        self.assertEqual([json.loads(m) for m in batch["metadata"]], [row["metadata"] for row in rows])
+
+
+class TestAsyncSearch(MockedMilvusTest):
+    def test_client_per_event_loop(self):
+        """Test that each event loop gets its own AsyncMilvusClient, reused within the loop"""
+        client = self.make_client()
+        embedding = self.embedder.encode("library hours").tolist()
+
+        async def two_searches():
+            await client.asearch(embedding, limit=2, query="library hours")
+            await client.asearch(embedding, limit=2, query="library hours")
+
+        asyncio.run(two_searches())
+        asyncio.run(two_searches())
+        self.assertEqual(len(FakeAsyncClient.instances), 2)
+        self.assertEqual(self.collection.load.call_count, 4)
+
+    def test_reconnects_and_retries(self):
+        """Test that a failed search reconnects, replaces the loop's client and retries once"""
+        client = self.make_client()
+        FakeAsyncClient.hits = [self.hit(1, "Where is the library?", "Library")]
+        FakeAsyncClient.fail_next = 1
+
+        hits = asyncio.run(client.asearch(self.embedder.encode("library").tolist(), limit=1, query="library"))
+        self.assertEqual(hits[0]["content"].split("\n")[0], "Q: Where is the library?")
+        self.assertEqual(len(FakeAsyncClient.instances), 2)
+        self.assertTrue(FakeAsyncClient.instances[0].closed)
+        self.assertEqual(self.connections.connect.call_count, 2)
+
+    def test_partition_lookup_off_the_loop(self):
+        """Test that has_partition runs on an executor thread, not the event loop"""
+        client = self.make_client(partition_key="source_file")
+        threads = []
+        self.collection.has_partition.side_effect = lambda name: threads.append(threading.current_thread()) or True
+
+        async def search():
+            await client.asearch(self.embedder.encode("visa").tolist(), limit=1, query="visa",
+                                 partitions=["handbook.pdf"])
+            return threading.current_thread()
+
+        loop_thread = asyncio.run(search())
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], loop_thread)
+
+
+if __name__ == "__main__":
+    unittest.main()
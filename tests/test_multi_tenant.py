@@ -0,0 +1,131 @@
+import unittest
+import tempfile
+import yaml
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from src.benchmarks.fakes import HashingEmbedder, InMemoryVectorStore, FakeLLM
+from src.benchmarks.offline_suite import _write_config
+from src.db.ranking import HeuristicRanker
+from src.llm.mistral_client import MistralClient
+from src.llm.multi_tenant import CollectionPool, MultiTenantQueryHandler
+from src.rag.entity_index import EntityIndex
+from src.utils.admission import AdmissionController
+
+
+CAMPUS_CHUNKS = {
+    "london": [("Q: Where is the library?\nA: The London library is on Bishopsgate.", "Library")],
+    "manchester": [("Q: Where is the library?\nA: The Manchester library is on Oxford Road.", "Library")],
+    "birmingham": [("Q: Where is the library?\nA: The Birmingham library is in the Bullring.", "Library")],
+}
+
+
+class TestMultiTenant(unittest.TestCase):
+    def setUp(self):
+        """Set up test environment"""
+        self.tmp = tempfile.TemporaryDirectory()
+        config_path = Path(self.tmp.name) / "config.yaml"
+        _write_config(config_path, batch_size=32)
+
+        # A shared entity index no tenant may answer from
+        shared_index = EntityIndex(enabled=True, path=str(Path(self.tmp.name) / "entities.json"))
+        shared_index.add([{"content": "Q: How do I renew library books?\nA: Email library@london.ac.uk.",
+                           "metadata": {"question": "How do I renew library books?",
+                                        "extracted_info": {"emails": ["library@london.ac.uk"]}}}])
+        shared_index.save()
+        with open(config_path) as f:
+            config = yaml.safe_load(f)
+        config["entity_index"] = {"enabled": True, "path": shared_index.path}
+        with open(config_path, "w") as f:
+            yaml.safe_dump(config, f)
+
+        self.embedder = HashingEmbedder()
+        self.llm = FakeLLM()
+        self.stores = {}
+
+        def store_factory(tenant, profile):
+            store = InMemoryVectorStore(ranker=HeuristicRanker(priority_terms=profile["milvus"].get("priority_terms")))
+            for content, section in CAMPUS_CHUNKS[tenant]:
+                store.insert(content, self.embedder.encode(content).tolist(),
+                             {"section": section, "category": "library", "question": content.split("\n")[0][3:]})
+            self.stores[tenant] = store
+            return store
+
+        tenants = {name: {"milvus": {"collection_name": f"{name}_docs"}, "fast_path": {"enabled": False},
+                          "single_flight": {"enabled": False}}
+                   for name in CAMPUS_CHUNKS}
+        tenants["london"]["milvus"]["priority_terms"] = {"library": {"direct": ["library", "bishopsgate"]}}
+        tenants["london"]["entity_index"] = {"enabled": True, "path": shared_index.path}
+        self.handler = MultiTenantQueryHandler(
+            tenants,
+            embedding_model=self.embedder,
+            mistral_client=MistralClient(str(config_path), model=self.llm),
+            store_factory=store_factory,
+            max_loaded_collections=2,
+            admission=AdmissionController(enabled=False),
+            config_path=str(config_path),
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_routes_by_tenant_with_shared_models(self):
+        """Test that each tenant answers from its own collection through the shared models"""
+        answers = {t: self.handler.process_query(t, "Where is the library?")["response"] for t in CAMPUS_CHUNKS}
+        self.assertIn("Bishopsgate", answers["london"])
+        self.assertIn("Oxford Road", answers["manchester"])
+        self.assertIn("Bullring", answers["birmingham"])
+
+        handlers = [self.handler.handler_for(t) for t in CAMPUS_CHUNKS]
+        self.assertEqual(len({id(h.embedding_model) for h in handlers}), 1)
+        self.assertEqual(len({id(h.mistral_client) for h in handlers}), 1)
+        self.assertEqual(len({id(h.reranker) for h in handlers}), 1)
+        self.assertEqual(len({id(h.milvus_client) for h in handlers}), 3)
+        self.assertEqual(self.stores["london"].ranker.priority_terms, {"library": {"direct": ["library", "bishopsgate"]}})
+        self.assertIn("visa", self.stores["manchester"].ranker.priority_terms)
+
+        with self.assertRaises(KeyError):
+            self.handler.process_query("unknown", "Where is the library?")
+
+    def test_entity_index_per_tenant(self):
+        """Test that only a tenant with its own entity index answers lookups from it"""
+        query = "What is the email for library books?"
+        self.assertIn("library@london.ac.uk", self.handler.process_query("london", query)["response"])
+        self.assertFalse(self.handler.handler_for("manchester").entities.enabled)
+        self.assertNotIn("library@london.ac.uk", self.handler.process_query("manchester", query)["response"])
+
+    def test_collections_loaded_under_lru(self):
+        """Test that the least recently used idle collection is released"""
+        for tenant in ["london", "manchester", "london", "birmingham"]:
+            self.handler.process_query(tenant, "Where is the library?")
+
+        self.assertEqual(self.handler.pool.loaded, ["london", "birmingham"])
+        self.assertFalse(self.stores["manchester"].loaded)
+        self.assertTrue(self.stores["london"].loaded)
+        self.assertEqual((self.handler.pool.loads, self.handler.pool.releases), (3, 1))
+
+        events = list(self.handler.stream_query("manchester", "Where is the library?"))
+        self.assertEqual(events[-1]["type"], "done")
+        self.assertEqual(self.handler.pool.loaded, ["birmingham", "manchester"])
+
+    def test_busy_collection_is_not_released(self):
+        """Test that a collection with a request in flight stays loaded"""
+        pool = CollectionPool(max_loaded=1)
+        a, b = InMemoryVectorStore(), InMemoryVectorStore()
+        with pool.lease("a", a):
+            with pool.lease("b", b):
+                self.assertTrue(a.loaded and b.loaded)
+            self.assertTrue(a.loaded)
+            self.assertFalse(b.loaded)
+        self.assertEqual(pool.loaded, ["a"])
+
+    def test_concurrent_tenants(self):
+        """Test concurrent requests across tenants"""
+        work = [(t, "Where is the library?") for t in CAMPUS_CHUNKS] * 10
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda w: self.handler.process_query(*w), work))
+        self.assertEqual([r["tenant"] for r in results], [t for t, _ in work])
+        self.assertLessEqual(len(self.handler.pool.loaded), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
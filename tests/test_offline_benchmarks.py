@@ -0,0 +1,44 @@
+import unittest
+import tempfile
+from pathlib import Path
+from src.benchmarks.fakes import HashingEmbedder, InMemoryVectorStore, FakeLLM
+from src.benchmarks.offline_suite import run_suite, compare
+
+
+class TestOfflineBenchmarks(unittest.TestCase):
+    def test_fakes(self):
+        """Test that the in-memory store finds the inserted chunk for its own question"""
+        embedder = HashingEmbedder()
+        store = InMemoryVectorStore()
+        texts = {
+            "Q: How do I renew my visa?\nA: Book an appointment with immigration services.": "visa",
+            "Q: Where is the library?\nA: The library is on the second floor of Aungier Street.": "library",
+        }
+        for content, topic in texts.items():
+            store.insert(content, embedder.encode([content])[0].tolist(), {"section": topic, "category": topic})
+
+        results = store.search(embedder.encode(["renew my visa"])[0].tolist(), limit=1, query="renew my visa")
+        self.assertEqual(results[0]["metadata"]["section"], "visa")
+
+        store.delete({"section": "visa"})
+        self.assertEqual(store.num_entities, 1)
+
+        llm = FakeLLM()
+        self.assertEqual(llm("Context: Q: x?\nA: one two three", max_new_tokens=2), "one two")
+        self.assertEqual("".join(llm("Context: Q: x?\nA: one two", stream=True)), "one two")
+
+    def test_run_suite(self):
+        """Test a small end-to-end run of every component"""
+        with tempfile.TemporaryDirectory() as tmp:
+            results = run_suite(Path(tmp), documents=1, pairs_per_document=20, queries=10)
+
+        components = results["components"]
+        self.assertEqual(set(components), {"pdf_processor", "text_chunker", "chunk_loader", "query_handler"})
+        self.assertEqual(components["text_chunker"]["items"], 20)
+        self.assertEqual(components["chunk_loader"]["items"], 20)
+        self.assertIn("generate", results["query_stages_ms"])
+        self.assertEqual(compare(results, results, tolerance=0.2), [])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
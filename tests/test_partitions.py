@@ -0,0 +1,63 @@
+import unittest
+import tempfile
+import json
+from pathlib import Path
+import yaml
+from src.benchmarks.fakes import HashingEmbedder, InMemoryVectorStore
+from src.db.data_loader import ChunkLoader
+from src.db.milvus_client import partition_name_for, DEFAULT_PARTITION
+
+
+class TestPartitions(unittest.TestCase):
+    def setUp(self):
+        """Set up test environment"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.config_path = Path(self.tmp.name) / "config.yaml"
+        with open(self.config_path, "w") as f:
+            yaml.safe_dump({"embedding": {"model_name": "hashing", "batch_size": 4}}, f)
+
+        self.embedder = HashingEmbedder()
+        self.store = InMemoryVectorStore(partition_key="source_file")
+        self.loader = ChunkLoader(str(self.config_path), embedding_model=self.embedder,
+                                  milvus_client=self.store)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write_chunks(self, name, source, answers):
+        chunks_dir = Path(self.tmp.name) / name
+        chunks_dir.mkdir()
+        for i, answer in enumerate(answers):
+            with open(chunks_dir / f"chunk_{i}.json", "w") as f:
+                json.dump({
+                    "content": f"Q: Question {i} about {source}?\nA: {answer}",
+                    "metadata": {"source_file": source, "chunk_index": i},
+                }, f)
+        return chunks_dir
+
+    def test_partition_names(self):
+        """Test that partition names are valid, stable and distinct"""
+        name = partition_name_for("FAQs from Students at Dublin Business School.pdf")
+        self.assertRegex(name, r"^p_[A-Za-z0-9_]+_[0-9a-f]{8}$")
+        self.assertEqual(name, partition_name_for("FAQs from Students at Dublin Business School.pdf"))
+        self.assertNotEqual(partition_name_for("a b"), partition_name_for("a_b"))
+        self.assertEqual(partition_name_for(None), DEFAULT_PARTITION)
+
+    def test_replace_partition(self):
+        """Test that reloading one handbook leaves the other untouched"""
+        self.loader.load_chunks(str(self._write_chunks("faq", "faq.pdf", ["An FAQ answer that is long enough."] * 3)))
+        self.loader.load_chunks(str(self._write_chunks("hb", "handbook.pdf", ["Handbook 2024 answer text here."] * 5)))
+        self.assertEqual(self.store.num_entities, 8)
+
+        self.loader.load_chunks(str(self._write_chunks("hb2", "handbook.pdf", ["Handbook 2025 answer text here."] * 2)),
+                                replace_partitions=True)
+        self.assertEqual(self.store.num_entities, 5)
+
+        query = self.embedder.encode(["handbook answer"])[0].tolist()
+        results = self.store.search(query, limit=10, partitions=["handbook.pdf"])
+        self.assertEqual(len(results), 2)
+        self.assertTrue(all("2025" in r["content"] for r in results))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -1,6 +1,17 @@
 import unittest
 import os
-from src.data_processing.pdf_processor import PDFProcessor, ProcessedPDF
+import tempfile
+from dataclasses import asdict
+from src.data_processing.pdf_processor import (
+    PDFProcessor,
+    ProcessedPDF,
+    PDFExtractor,
+    FallbackExtractor,
+    degraded_reason,
+    get_extractor,
+)
+from src.data_processing.text_chunker import TextChunker
+from src.benchmarks.synthetic import generate_faq_pdfs
 from pathlib import Path
 
 
@@ -67,5 +78,67 @@ class TestPDFProcessor(unittest.TestCase):
         self.assertEqual(len(results), pdf_count)
 
 
+class _BlankPages(PDFExtractor):
+    """Extractor that loses the text layer of some pages"""
+
+    name = "blank"
+
+    def __init__(self, blank_pages):
+        self.inner = get_extractor("pdfium")
+        self.blank_pages = blank_pages
+
+    def extract(self, pdf_path, page_numbers=None):
+        pages = self.inner.extract(pdf_path, page_numbers)
+        for page in pages:
+            if page.page_number in self.blank_pages:
+                page.text = ""
+        return pages
+
+
+class TestPDFExtractors(unittest.TestCase):
+    def setUp(self):
+        """Set up test environment"""
+        self.tmp = tempfile.TemporaryDirectory()
+        test_dir = Path(os.path.dirname(os.path.abspath(__file__)))
+        self.pdf_files = sorted((test_dir / "test_data" / "raw").glob("*.pdf"))
+        synthetic, _ = generate_faq_pdfs(Path(self.tmp.name) / "synthetic", documents=1, pairs_per_document=40)
+        self.pdf_files += synthetic
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _chunks(self, pdf_path, extractor):
+        processor = PDFProcessor(input_dir=self.tmp.name, output_dir=self.tmp.name, extractor=extractor)
+        result = processor.process_single_pdf(str(pdf_path))
+        self.assertIsNotNone(result)
+        return TextChunker().process_document(asdict(result))
+
+    def test_chunk_parity(self):
+        """Test that the fast backend yields the same chunks as pdfplumber"""
+        for pdf_path in self.pdf_files:
+            expected = self._chunks(pdf_path, get_extractor("pdfplumber"))
+            self.assertTrue(expected)
+            self.assertEqual(self._chunks(pdf_path, get_extractor("pdfium")), expected)
+            self.assertEqual(self._chunks(pdf_path, get_extractor("auto")), expected)
+
+    def test_degraded_pages_fall_back(self):
+        """Test that pages with a missing text layer are re-extracted with pdfplumber"""
+        pdf_path = self.pdf_files[0]
+        extractor = FallbackExtractor(_BlankPages({3, 4}))
+
+        pages = extractor.extract(str(pdf_path))
+
+        self.assertEqual(extractor.fallback_pages, 2)
+        self.assertEqual([p.extractor for p in pages[2:5]], ["pdfplumber", "pdfplumber", "pdfium"])
+        self.assertEqual(self._chunks(pdf_path, extractor), self._chunks(pdf_path, get_extractor("pdfplumber")))
+
+    def test_degraded_reason(self):
+        """Test the heuristics that flag unusable fast-path text"""
+        self.assertIsNone(degraded_reason("What hours is the library open?\nFrom 9am to 9pm."))
+        self.assertEqual(degraded_reason("  \n "), "empty")
+        self.assertEqual(degraded_reason("Library \ufffd\ufffd\ufffd hours"), "unmapped glyphs")
+        self.assertEqual(degraded_reason("Thelibraryisopenfrom9amto9pm" * 10), "missing spaces")
+
+
 if __name__ == "__main__":
     unittest.main(verbosity=2)
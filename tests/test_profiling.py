@@ -0,0 +1,82 @@
+import unittest
+import tempfile
+import time
+from pathlib import Path
+from src.utils.profiling import Profiler, get_profiler, set_profiler, profiled
+
+
+def _busy_helper(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+@profiled("outer")
+def _outer(seconds):
+    _busy_helper(seconds)
+    return _inner(seconds)
+
+
+@profiled("inner")
+def _inner(seconds):
+    _busy_helper(seconds)
+    return "done"
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        """Set up test environment"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.previous = get_profiler()
+
+    def tearDown(self):
+        set_profiler(self.previous)
+        self.tmp.cleanup()
+
+    def test_disabled_profiler_records_nothing(self):
+        """Test that decorated functions bypass a disabled profiler"""
+        profiler = Profiler(enabled=False, sample_rate=1.0, output_dir=self.tmp.name)
+        set_profiler(profiler)
+
+        self.assertEqual(_outer(0.001), "done")
+        self.assertEqual(sum(profiler.calls.values()), 0)
+        self.assertEqual(list(Path(self.tmp.name).iterdir()), [])
+
+    def test_sampled_calls_write_flamegraph_and_report(self):
+        """Test that sampled calls produce collapsed stacks and a hotspot report"""
+        profiler = Profiler(enabled=True, sample_rate=1.0, output_dir=self.tmp.name, cprofile=True)
+        set_profiler(profiler)
+
+        for _ in range(3):
+            self.assertEqual(_outer(0.03), "done")
+        profiler.flush()
+
+        # Nested calls are counted but covered by the outer profile
+        self.assertEqual(profiler.profiled_calls["outer"], 3)
+        self.assertEqual(profiler.calls["inner"], 3)
+        self.assertEqual(profiler.profiled_calls["inner"], 0)
+
+        collapsed = (Path(self.tmp.name) / "outer.collapsed").read_text()
+        self.assertIn("outer;test_profiling.py:_outer;test_profiling.py:_busy_helper ", collapsed)
+        self.assertIn("test_profiling.py:_inner;test_profiling.py:_busy_helper ", collapsed)
+        self.assertNotIn("profiling.py:call", collapsed)
+
+        hotspots = profiler.hotspots("outer")
+        self.assertEqual(hotspots[0]["function"], "test_profiling.py:_busy_helper")
+        report = (Path(self.tmp.name) / "outer.top.txt").read_text()
+        self.assertIn("3 of 3 calls profiled", report)
+        self.assertIn("cProfile (cumulative)", report)
+
+    def test_sample_rate(self):
+        """Test that only a fraction of calls is profiled"""
+        profiler = Profiler(enabled=True, sample_rate=0.0, output_dir=self.tmp.name)
+        set_profiler(profiler)
+
+        for _ in range(20):
+            _inner(0)
+        self.assertEqual(profiler.calls["inner"], 20)
+        self.assertEqual(profiler.profiled_calls["inner"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+from pathlib import Path
+from src.benchmarks.fakes import HashingEmbedder
+from src.benchmarks.retrieval_eval import build_golden_set, build_memory_backend, sweep
+from src.data_processing.chunk_store import iter_chunks
+
+
+class TestRetrievalEval(unittest.TestCase):
+    def setUp(self):
+        """Set up test environment"""
+        self.chunks_dir = Path(__file__).parent / "test_data" / "Chunks"
+        self.chunks = list(iter_chunks(str(self.chunks_dir)))
+        if not self.chunks:
+            self.skipTest("No chunk files available for testing")
+
+    def test_golden_set(self):
+        """Test that every question appears verbatim plus its paraphrases"""
+        golden = build_golden_set(self.chunks, paraphrases=2)
+        verbatim = [g for g in golden if not g.paraphrased]
+        self.assertEqual(len(golden), len(verbatim) * 3)
+        self.assertTrue(all(g.relevant for g in golden))
+
+    def test_sweep(self):
+        """Test a sweep over weights and oversampling on the in-memory backend"""
+        embedder = HashingEmbedder()
+        store, indexed = build_memory_backend(self.chunks, embedder)
+        golden = build_golden_set(indexed, paraphrases=0)
+
+        rows = sweep(store, embedder, golden,
+                     weight_sets=[{}, {"vector": 0.7}], oversamples=[1, 4], nprobes=[None], k=5)
+
+        self.assertEqual(len(rows), 4)
+        for row in rows:
+            self.assertGreaterEqual(row["recall@5"], row["recall@1"])
+            self.assertGreater(row["mrr@5"], 0.5)
+        # Weights are restored after the sweep
+        self.assertEqual(store.ranker.weights["vector"], 0.25)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
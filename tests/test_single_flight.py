@@ -0,0 +1,169 @@
+import unittest
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from src.benchmarks.offline_suite import build_offline_handler
+from src.data_processing.chunk_store import iter_chunks
+from src.utils.admission import AdmissionController
+from src.utils.single_flight import SingleFlight, normalize_query
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_duplicates_share_one_call(self):
+        """Test that callers arriving while a call is in flight reuse its result"""
+        flight = SingleFlight(timeout=5)
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.1)
+            return {"answer": 42}
+
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            results = list(pool.map(lambda _: flight.do("key", compute), range(10)))
+
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(r == {"answer": 42} for r in results))
+        self.assertEqual((flight.leaders, flight.coalesced), (1, 9))
+
+        # Nothing is cached once the call finishes
+        flight.do("key", compute)
+        self.assertEqual(len(calls), 2)
+
+    def test_errors_propagate_to_waiters(self):
+        """Test that every coalesced caller sees the leader's exception"""
+        flight = SingleFlight(timeout=5)
+
+        def fail():
+            time.sleep(0.05)
+            raise ValueError("search failed")
+
+        def call(_):
+            try:
+                flight.do("key", fail)
+            except ValueError as e:
+                return str(e)
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            self.assertEqual(list(pool.map(call, range(4))), ["search failed"] * 4)
+
+    def test_timeout_computes_separately(self):
+        """Test that a duplicate stops waiting on a stuck call and runs its own"""
+        flight = SingleFlight(timeout=0.05)
+        release = threading.Event()
+        leader = threading.Thread(target=flight.do, args=("key", lambda: release.wait(5) and "slow"))
+        leader.start()
+        time.sleep(0.01)
+        try:
+            self.assertEqual(flight.do("key", lambda: "own"), "own")
+            self.assertEqual(flight.timeouts, 1)
+        finally:
+            release.set()
+            leader.join()
+
+    def test_stream_is_shared_and_replayed(self):
+        """Test that a late subscriber replays the events it missed, then follows live"""
+        flight = SingleFlight(timeout=5)
+        runs = []
+
+        def source():
+            runs.append(1)
+            for i in range(5):
+                time.sleep(0.02)
+                yield i
+
+        first = flight.stream("key", source)
+        self.assertEqual(next(first), 0)
+        late = list(flight.stream("key", source))
+        self.assertEqual(late, [0, 1, 2, 3, 4])
+        self.assertEqual(list(first), [1, 2, 3, 4])
+        self.assertEqual(len(runs), 1)
+        self.assertEqual(flight.coalesced, 1)
+
+    def test_abandoned_stream_stops_source(self):
+        """Test that the source is closed once every subscriber has left"""
+        flight = SingleFlight(timeout=5)
+        produced, closed = [], threading.Event()
+
+        def source():
+            try:
+                for i in range(100):
+                    time.sleep(0.01)
+                    produced.append(i)
+                    yield i
+            finally:
+                closed.set()
+
+        first, second = flight.stream("key", source), flight.stream("key", source)
+        self.assertEqual((next(first), next(second)), (0, 0))
+        first.close()
+        self.assertFalse(closed.wait(0.05))
+        second.close()
+        self.assertTrue(closed.wait(1))
+        self.assertLess(len(produced), 100)
+
+        # The next caller starts a fresh stream
+        self.assertEqual(list(flight.stream("key", lambda: iter([7]))), [7])
+
+    def test_normalize_query(self):
+        """Test that trivial variations map to one key"""
+        self.assertEqual(normalize_query("  How do I renew my VISA? "), normalize_query("how do i  renew my visa"))
+
+
+class TestQueryHandlerCoalescing(unittest.TestCase):
+    def test_thundering_herd(self):
+        """Test that a burst of the same question runs retrieval and generation once"""
+        chunks = list(iter_chunks(str(Path(__file__).parent / "test_data" / "Chunks")))
+        if not chunks:
+            self.skipTest("No chunk files available for testing")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            handler = build_offline_handler(chunks, Path(tmp), token_latency=0.005, prompt_token_latency=0.0,
+                                            fast_path=False, single_flight=True)
+        calls = []
+        generate = handler.mistral_client.generate_response
+        handler.mistral_client.generate_response = lambda **kw: calls.append(1) or generate(**kw)
+
+        queries = ["How do I renew my visa?", "how do I renew my visa", "HOW DO I RENEW MY VISA?"] * 4
+        with ThreadPoolExecutor(max_workers=len(queries)) as pool:
+            results = list(pool.map(handler.process_query, queries))
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len({r["response"] for r in results}), 1)
+        self.assertEqual([r["query"] for r in results], queries)
+        self.assertEqual(handler.single_flight.coalesced, len(queries) - 1)
+
+        # Other retrieval parameters are a different computation
+        handler.process_query(queries[0], top_k=5)
+        self.assertEqual(len(calls), 2)
+
+    def test_followers_take_no_admission_slot(self):
+        """Test that a burst of the same question is served through one admission slot"""
+        chunks = list(iter_chunks(str(Path(__file__).parent / "test_data" / "Chunks")))
+        if not chunks:
+            self.skipTest("No chunk files available for testing")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            handler = build_offline_handler(chunks, Path(tmp), token_latency=0.005, prompt_token_latency=0.0,
+                                            fast_path=False, single_flight=True)
+        handler.admission = AdmissionController(max_concurrency=1, max_queue=0, client_rate=0)
+
+        queries = ["How do I renew my visa?"] * 10
+        with ThreadPoolExecutor(max_workers=len(queries)) as pool:
+            results = list(pool.map(handler.process_query, queries))
+        self.assertEqual(len({r["response"] for r in results}), 1)
+        self.assertEqual(handler.admission.admitted, 1)
+        self.assertEqual(handler.admission.rejected, {})
+        self.assertEqual(handler.single_flight.leaders, 1)
+
+        with ThreadPoolExecutor(max_workers=len(queries)) as pool:
+            streams = list(pool.map(lambda q: list(handler.stream_query(q)), queries))
+        self.assertEqual(len({s[-1]["response"] for s in streams}), 1)
+        self.assertEqual(handler.admission.admitted, 2)
+        self.assertEqual(handler.admission.stats()["active"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
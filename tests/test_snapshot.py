@@ -0,0 +1,74 @@
+import unittest
+import tempfile
+from pathlib import Path
+from src.benchmarks.fakes import HashingEmbedder, InMemoryVectorStore
+from src.db.snapshot import Snapshot, export_snapshot, import_snapshot
+
+
+CHUNKS = [
+    ("Q: Where is the library?\nA: The library is on Bishopsgate next to the station.", "Library"),
+    ("Q: How do I renew my visa?\nA: Book an appointment with the visa team online.", "Visa"),
+    ("Q: Wann öffnet die Mensa?\nA: Die Mensa öffnet um 11:30 Uhr, Preise ab 3 €.", "Mensa"),
+    ("Q: Where can I print?\nA: Printers are on every floor of the library.", "Library"),
+]
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        """Set up test environment"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "snapshot"
+        self.embedder = HashingEmbedder()
+        self.source = InMemoryVectorStore(partition_key="section")
+        for content, section in CHUNKS:
+            self.source.insert(content, self.embedder.encode(content).tolist(), {"section": section})
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        """Test that an imported replica answers like the exported collection"""
+        manifest = export_snapshot(self.source, self.path, batch_size=3, embedding_model="hashing")
+        self.assertEqual(manifest["rows"], len(CHUNKS))
+
+        replica = InMemoryVectorStore(partition_key="section")
+        self.assertEqual(import_snapshot(replica, self.path, batch_size=2, embedding_model="hashing"), len(CHUNKS))
+        self.assertEqual(replica.contents, self.source.contents)
+        self.assertEqual(replica.metadata, self.source.metadata)
+        self.assertEqual(replica.rank_features, self.source.rank_features)
+
+        for query in ("where is the library", "Mensa Preise", "visa appointment"):
+            embedding = self.embedder.encode(query).tolist()
+            self.assertEqual(replica.search(embedding, limit=2, query=query),
+                             self.source.search(embedding, limit=2, query=query))
+        self.assertEqual(len(replica.search(embedding, query="print", partitions=["Library"])), 2)
+
+        snapshot = Snapshot(self.path)
+        self.assertEqual(snapshot.strings("content", 2, 3), [CHUNKS[2][0]])
+
+    def test_rejects_corrupt_or_incompatible_snapshots(self):
+        """Test that truncated files, other embedding models and dimensions are refused"""
+        export_snapshot(self.source, self.path, embedding_model="hashing")
+
+        with self.assertRaises(ValueError):
+            import_snapshot(InMemoryVectorStore(), self.path, embedding_model="all-MiniLM-L6-v2")
+        with self.assertRaises(ValueError):
+            import_snapshot(InMemoryVectorStore(dimension=128), self.path)
+
+        blob = self.path / "content.bin"
+        blob.write_bytes(blob.read_bytes()[:-1] + b"x")
+        with self.assertRaises(ValueError):
+            Snapshot(self.path)
+
+        (self.path / "manifest.json").unlink()
+        with self.assertRaises(FileNotFoundError):
+            Snapshot(self.path)
+
+    def test_empty_collection(self):
+        """Test that an empty collection exports and imports"""
+        export_snapshot(InMemoryVectorStore(), self.path)
+        self.assertEqual(import_snapshot(InMemoryVectorStore(), self.path), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
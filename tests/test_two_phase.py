@@ -0,0 +1,70 @@
+import unittest
+from pathlib import Path
+from src.benchmarks.fakes import HashingEmbedder, InMemoryVectorStore
+from src.benchmarks.retrieval_eval import build_golden_set, _chunk_text
+from src.data_processing.chunk_store import iter_chunks
+from src.db.ranking import HeuristicRanker
+from src.utils.lru_cache import LRUCache
+
+
+class TestTwoPhaseSearch(unittest.TestCase):
+    def setUp(self):
+        """Set up test environment"""
+        chunks_dir = Path(__file__).parent / "test_data" / "Chunks"
+        self.chunks = [c for c in iter_chunks(str(chunks_dir)) if _chunk_text(c) is not None]
+        if not self.chunks:
+            self.skipTest("No chunk files available for testing")
+
+        self.embedder = HashingEmbedder()
+        self.single = InMemoryVectorStore()
+        self.two_phase = InMemoryVectorStore(two_phase=True)
+        embeddings = self.embedder.encode([_chunk_text(c) for c in self.chunks])
+        for chunk, embedding in zip(self.chunks, embeddings):
+            self.single.insert(chunk["content"], embedding.tolist(), chunk["metadata"])
+            self.two_phase.insert(chunk["content"], embedding.tolist(), chunk["metadata"])
+
+    def test_feature_scores_match_full_scores(self):
+        """Test that scoring from compact features equals scoring from the payload"""
+        ranker = HeuristicRanker()
+        for chunk in self.chunks:
+            features = ranker.features(chunk["content"], chunk["metadata"])
+            for query in ("How do I renew my visa?", "library opening hours", "exam timetable"):
+                self.assertEqual(ranker.score(query, chunk["content"], chunk["metadata"], 0.4),
+                                 ranker.score_features(query, features, 0.4))
+
+    def test_same_results_as_single_phase(self):
+        """Test that two-phase search returns the same hits in the same order"""
+        for item in build_golden_set(self.chunks, paraphrases=1)[:30]:
+            embedding = self.embedder.encode([item.query])[0].tolist()
+            expected = self.single.search(embedding, limit=5, query=item.query)
+            actual = self.two_phase.search(embedding, limit=5, query=item.query)
+            self.assertEqual([(h["content"], h["metadata"], h["score"]) for h in expected],
+                             [(h["content"], h["metadata"], h["score"]) for h in actual])
+
+    def test_payloads_fetched_for_final_hits_only(self):
+        """Test that only the final hits are fetched, and repeats come from the cache"""
+        query = "How do I renew my visa?"
+        embedding = self.embedder.encode([query])[0].tolist()
+
+        self.two_phase.search(embedding, limit=3, query=query, oversample=4)
+        self.assertEqual(self.two_phase.payload_fetches, 3)
+
+        self.two_phase.search(embedding, limit=3, query=query, oversample=4)
+        self.assertEqual(self.two_phase.payload_fetches, 3)
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_eviction_order(self):
+        """Test that the least recently used entry is evicted first"""
+        cache = LRUCache(capacity=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+
+        self.assertNotIn("b", cache)
+        self.assertEqual(cache.get_many(["a", "b", "c"]), {"a": 1, "c": 3})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from src.db.vector_compression import (
+    build_compressor,
+    BinaryCompressor,
+    Float16Compressor,
+    PCACompressor,
+    FullPrecisionStore,
+)
+from src.benchmarks.vector_compression import benchmark_mode, synthetic_vectors
+
+
+class TestCompressors(unittest.TestCase):
+    def setUp(self):
+        self.vectors = synthetic_vectors(500, seed=1)
+
+    def test_build_compressor(self):
+        self.assertEqual(build_compressor(None).mode, "none")
+        self.assertIsInstance(build_compressor({"mode": "binary"}), BinaryCompressor)
+        self.assertIsInstance(build_compressor({"mode": "float16"}), Float16Compressor)
+        with self.assertRaises(ValueError):
+            build_compressor({"mode": "int4"})
+
+    def test_binary_codes(self):
+        compressor = BinaryCompressor(384)
+        codes = compressor.encode(self.vectors[:3])
+        self.assertEqual([len(c) for c in codes], [48, 48, 48])
+        self.assertEqual(compressor.distances(codes[0], codes)[0], 0)
+
+    def test_pca_roundtrip(self):
+        compressor = PCACompressor(384, pca_dim=32)
+        with self.assertRaises(RuntimeError):
+            compressor.encode(self.vectors[:1])
+
+        compressor.fit(self.vectors)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "pca.npz")
+            compressor.save(path)
+            loaded = build_compressor({"mode": "pca", "pca_path": path})
+
+        self.assertEqual(loaded.field_dim, 32)
+        np.testing.assert_allclose(loaded.encode(self.vectors[:2]), compressor.encode(self.vectors[:2]), rtol=1e-5)
+
+    def test_rescoring_recovers_recall(self):
+        queries = synthetic_vectors(520, seed=1)[500:]
+        for mode in ("binary", "pca"):
+            result = benchmark_mode(self.vectors, queries, mode, pca_dim=32)
+            self.assertGreaterEqual(result["rescored_recall@5"], result["first_stage_recall@5"])
+            self.assertLess(result["bytes_per_vector"], 384 * 4)
+
+
+class TestFullPrecisionStore(unittest.TestCase):
+    def test_append_get_and_reopen(self):
+        vectors = synthetic_vectors(4, seed=2)
+        with tempfile.TemporaryDirectory() as tmp:
+            store = FullPrecisionStore(tmp, "docs")
+            store.append([10, 11], vectors[:2])
+            store.append([12], vectors[2:3])
+
+            found = store.get([12, 99, 10])
+            np.testing.assert_array_equal(found[0], vectors[2])
+            self.assertTrue(np.isnan(found[1]).all())
+            np.testing.assert_array_equal(found[2], vectors[0])
+
+            reopened = FullPrecisionStore(tmp, "docs")
+            self.assertEqual(len(reopened), 3)
+            np.testing.assert_array_equal(reopened.get([11])[0], vectors[1])
+
+    def test_reopen_after_interrupted_append(self):
+        """Test that a crash between the vectors and the ids write doesn't shift later rows"""
+        dim = 4
+        with tempfile.TemporaryDirectory() as tmp:
+            store = FullPrecisionStore(tmp, "docs", dim=dim)
+            store.append([1], [[1, 1, 1, 1]])
+            # The vectors of the next append reached the disk, its ids did not
+            with open(store.vectors_path, "ab") as f:
+                f.write(np.full(dim, 9, dtype=np.float32).tobytes())
+            with open(store.ids_path, "ab") as f:
+                f.write(b"\x07\x00\x00")
+
+            reopened = FullPrecisionStore(tmp, "docs", dim=dim)
+            self.assertEqual(len(reopened), 1)
+            reopened.append([2], [[2, 2, 2, 2]])
+            np.testing.assert_array_equal(reopened.get([1, 2]), [[1, 1, 1, 1], [2, 2, 2, 2]])
+            np.testing.assert_array_equal(FullPrecisionStore(tmp, "docs", dim=dim).get([2])[0], [2, 2, 2, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()